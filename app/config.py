@@ -30,6 +30,7 @@ class Settings:
     APP_NAME: str = "FlexTraff ATCS API"
     APP_VERSION: str = "1.0.0"
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
+    ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development").lower()
 
     # CORS Configuration
     CORS_ORIGINS: list = [
@@ -45,6 +46,91 @@ class Settings:
     MQTT_USERNAME: Optional[str] = os.getenv("MQTT_USERNAME")
     MQTT_PASSWORD: Optional[str] = os.getenv("MQTT_PASSWORD")
 
+    # Database backend: "supabase", "sqlite", or "auto" (Supabase when
+    # credentials are configured, otherwise the embedded SQLite database;
+    # refused when ENVIRONMENT=production)
+    DATABASE_BACKEND: str = os.getenv("DATABASE_BACKEND", "auto").lower()
+    LOCAL_DATABASE_PATH: str = os.getenv("LOCAL_DATABASE_PATH", "data/flextraff.db")
+
+    # Junction metadata cache (seconds before junction rows are reloaded)
+    JUNCTION_CACHE_TTL_SECONDS: float = float(os.getenv("JUNCTION_CACHE_TTL_SECONDS", "300"))
+    # Minimum gap between reloads triggered by lookups of unknown junction IDs
+    JUNCTION_CACHE_MISS_RELOAD_SECONDS: float = float(os.getenv("JUNCTION_CACHE_MISS_RELOAD_SECONDS", "5"))
+
+    # Partition retention for vehicle_detections / system_logs (migration 006)
+    DETECTION_RETENTION_DAYS: int = int(os.getenv("DETECTION_RETENTION_DAYS", "180"))
+    SYSTEM_LOG_RETENTION_DAYS: int = int(os.getenv("SYSTEM_LOG_RETENTION_DAYS", "30"))
+    PARTITION_ARCHIVE: bool = os.getenv("PARTITION_ARCHIVE", "False").lower() == "true"
+    PARTITION_PREMAKE_DAYS: int = int(os.getenv("PARTITION_PREMAKE_DAYS", "62"))
+    PARTITION_MAINTENANCE_INTERVAL_HOURS: float = float(
+        os.getenv("PARTITION_MAINTENANCE_INTERVAL_HOURS", "24")
+    )
+
+    # Database call deadlines (adaptive per operation) and circuit breaker
+    DB_TIMEOUT_SECONDS: float = float(os.getenv("DB_TIMEOUT_SECONDS", "5"))
+    DB_TIMEOUT_MIN_SECONDS: float = float(os.getenv("DB_TIMEOUT_MIN_SECONDS", "0.5"))
+    DB_TIMEOUT_MAX_SECONDS: float = float(os.getenv("DB_TIMEOUT_MAX_SECONDS", "10"))
+    DB_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("DB_BREAKER_FAILURE_THRESHOLD", "5"))
+    DB_BREAKER_RESET_SECONDS: float = float(os.getenv("DB_BREAKER_RESET_SECONDS", "15"))
+    # Rollup backfills, partition maintenance and export pages: outside the breaker
+    DB_MAINTENANCE_TIMEOUT_SECONDS: float = float(
+        os.getenv("DB_MAINTENANCE_TIMEOUT_SECONDS", "600")
+    )
+
+    # Dedicated thread pools (CPU_WORKERS=0 sizes the CPU pool to the core count)
+    DB_READ_WORKERS: int = int(os.getenv("DB_READ_WORKERS", "16"))
+    DB_WRITE_WORKERS: int = int(os.getenv("DB_WRITE_WORKERS", "8"))
+    CPU_WORKERS: int = int(os.getenv("CPU_WORKERS", "0"))
+
+    # Duplicate FASTag read suppression on detection ingest
+    DEDUP_ENABLED: bool = os.getenv("DEDUP_ENABLED", "True").lower() == "true"
+    DEDUP_WINDOW_SECONDS: float = float(os.getenv("DEDUP_WINDOW_SECONDS", "30"))
+    DEDUP_MAX_KEYS_PER_JUNCTION: int = int(
+        os.getenv("DEDUP_MAX_KEYS_PER_JUNCTION", "20000")
+    )
+
+    # Junction-to-junction travel times from FASTag re-identification
+    TRAVEL_TIME_MAX_SECONDS: float = float(os.getenv("TRAVEL_TIME_MAX_SECONDS", "1800"))
+    TRAVEL_TIME_WINDOW_SECONDS: float = float(os.getenv("TRAVEL_TIME_WINDOW_SECONDS", "900"))
+    TRAVEL_TIME_BASELINE_SECONDS: float = float(
+        os.getenv("TRAVEL_TIME_BASELINE_SECONDS", "86400")
+    )
+    TRAVEL_TIME_MAX_TAGS: int = int(os.getenv("TRAVEL_TIME_MAX_TAGS", "500000"))
+
+    # Events queued per event-bus sink before the oldest is dropped
+    EVENT_BUS_QUEUE_SIZE: int = int(os.getenv("EVENT_BUS_QUEUE_SIZE", "10000"))
+
+    # WebSocket fan-out: per-client send queue and what happens when it fills
+    # (drop_oldest | coalesce | disconnect)
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+    WS_SLOW_CONSUMER_POLICY: str = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest")
+    WS_SEND_TIMEOUT_SECONDS: float = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+    # Carry broadcasts between workers / replicas: memory (single process) | redis
+    WS_BROADCAST_BACKEND: str = os.getenv("WS_BROADCAST_BACKEND", "memory")
+    WS_BROADCAST_CHANNEL: str = os.getenv("WS_BROADCAST_CHANNEL", "flextraff:ws")
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    # Live timing frames (lane counts, plan, countdown) per junction per second, at most
+    LIVE_TIMING_MAX_FPS: float = float(os.getenv("LIVE_TIMING_MAX_FPS", "2"))
+    # Recent broadcasts kept per junction for /ws/logs?since= replay (0 disables)
+    WS_REPLAY_BUFFER_SIZE: int = int(os.getenv("WS_REPLAY_BUFFER_SIZE", "500"))
+    # Junction controllers on /ws/ingest: device tokens are HMACs under this secret
+    # (unset: every controller is rejected)
+    DEVICE_TOKEN_SECRET: str = os.getenv("DEVICE_TOKEN_SECRET", "")
+    DEVICE_MAX_CONCURRENT_CALCULATIONS: int = int(
+        os.getenv("DEVICE_MAX_CONCURRENT_CALCULATIONS", "64")
+    )
+    # Comment line sent on idle /sse/logs streams so proxies keep them open
+    SSE_HEARTBEAT_SECONDS: float = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+    # Reject /ws/logs and /sse/logs clients without a valid ?token= (otherwise they see no junction events)
+    WS_REQUIRE_AUTH: bool = os.getenv("WS_REQUIRE_AUTH", "False").lower() == "true"
+
+    # Write-ahead spool for detection / cycle / RFID writes during outages
+    SPOOL_ENABLED: bool = os.getenv("SPOOL_ENABLED", "True").lower() == "true"
+    SPOOL_DIR: str = os.getenv("SPOOL_DIR", "data/spool")
+    SPOOL_SEGMENT_BYTES: int = int(os.getenv("SPOOL_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+    SPOOL_REPLAY_BATCH: int = int(os.getenv("SPOOL_REPLAY_BATCH", "500"))
+    SPOOL_REPLAY_INTERVAL_SECONDS: float = float(os.getenv("SPOOL_REPLAY_INTERVAL_SECONDS", "5"))
+
     # Logging Configuration
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
 
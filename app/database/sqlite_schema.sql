@@ -0,0 +1,168 @@
+-- FlexTraff ATCS schema for the embedded SQLite backend
+-- SQLite translation of supabase_setup.sql plus migrations 002-007, applied
+-- by SQLiteDatabaseService on startup (every statement is idempotent).
+--
+-- Differences from Postgres:
+-- * Timestamps are TEXT in one fixed-width UTC format
+--   (YYYY-MM-DDTHH:MM:SS.ffffff+00:00) so string comparison orders them
+-- * jsonb / integer[] columns are TEXT holding JSON
+-- * No monthly partitioning (migration 006); retention deletes rows instead
+
+PRAGMA foreign_keys = ON;
+
+CREATE TABLE IF NOT EXISTS traffic_junctions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    junction_name TEXT NOT NULL UNIQUE,
+    location TEXT,
+    latitude REAL,
+    longitude REAL,
+    status TEXT DEFAULT 'active',
+    algorithm_config TEXT DEFAULT '{"min_time": 15, "max_time": 90, "base_cycle_time": 120}',
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now')),
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS traffic_cycles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    junction_id INTEGER REFERENCES traffic_junctions(id),
+    cycle_start_time TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now')),
+    total_cycle_time INTEGER NOT NULL,
+    lane_1_green_time INTEGER NOT NULL,
+    lane_2_green_time INTEGER NOT NULL,
+    lane_3_green_time INTEGER NOT NULL,
+    lane_4_green_time INTEGER NOT NULL,
+    lane_1_vehicle_count INTEGER DEFAULT 0,
+    lane_2_vehicle_count INTEGER DEFAULT 0,
+    lane_3_vehicle_count INTEGER DEFAULT 0,
+    lane_4_vehicle_count INTEGER DEFAULT 0,
+    total_vehicles_detected INTEGER NOT NULL,
+    algorithm_version TEXT DEFAULT 'v1.0',
+    calculation_time_ms INTEGER,
+    status TEXT DEFAULT 'active',
+    ingest_key TEXT
+);
+
+-- Includes the logging fields from migration 002
+CREATE TABLE IF NOT EXISTS rfid_scanners (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    junction_id INTEGER REFERENCES traffic_junctions(id) ON DELETE CASCADE,
+    lane_number INTEGER NOT NULL CHECK (lane_number BETWEEN 1 AND 4),
+    scanner_mac_address TEXT UNIQUE,
+    scanner_position TEXT,
+    status TEXT DEFAULT 'active',
+    last_heartbeat TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now')),
+    lane_car_count TEXT DEFAULT '{}',
+    cycle_id INTEGER REFERENCES traffic_cycles(id) ON DELETE SET NULL,
+    log_timestamp TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now')),
+    ingest_key TEXT
+);
+
+CREATE TABLE IF NOT EXISTS vehicle_detections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    junction_id INTEGER REFERENCES traffic_junctions(id),
+    scanner_id INTEGER REFERENCES rfid_scanners(id),
+    lane_number INTEGER NOT NULL,
+    fastag_id TEXT NOT NULL,
+    detection_timestamp TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now')),
+    vehicle_type TEXT DEFAULT 'car',
+    processing_status TEXT DEFAULT 'pending',
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now')),
+    ingest_key TEXT
+);
+
+CREATE TABLE IF NOT EXISTS system_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    junction_id INTEGER REFERENCES traffic_junctions(id),
+    log_level TEXT NOT NULL,
+    component TEXT NOT NULL,
+    message TEXT NOT NULL,
+    metadata TEXT,
+    timestamp TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS demo_scenarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scenario_name TEXT NOT NULL,
+    description TEXT,
+    lane_counts TEXT NOT NULL CHECK (json_array_length(lane_counts) = 4),
+    expected_cycle_time INTEGER,
+    expected_green_times TEXT CHECK (json_array_length(expected_green_times) = 4),
+    is_active INTEGER DEFAULT 1,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_vehicle_detections_junction_time ON vehicle_detections(junction_id, detection_timestamp);
+CREATE INDEX IF NOT EXISTS idx_vehicle_detections_lane_time ON vehicle_detections(lane_number, detection_timestamp);
+CREATE INDEX IF NOT EXISTS idx_traffic_cycles_junction_time ON traffic_cycles(junction_id, cycle_start_time);
+CREATE INDEX IF NOT EXISTS idx_system_logs_timestamp ON system_logs(timestamp);
+CREATE INDEX IF NOT EXISTS idx_system_logs_junction_time ON system_logs(junction_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_rfid_scanners_junction ON rfid_scanners(junction_id);
+CREATE INDEX IF NOT EXISTS idx_rfid_scanners_cycle_id ON rfid_scanners(cycle_id);
+CREATE INDEX IF NOT EXISTS idx_rfid_scanners_log_timestamp ON rfid_scanners(log_timestamp);
+
+-- Migration 003: vehicle count rollups
+CREATE TABLE IF NOT EXISTS vehicle_counts_hourly (
+    junction_id INTEGER NOT NULL REFERENCES traffic_junctions(id) ON DELETE CASCADE,
+    lane_number INTEGER NOT NULL,
+    vehicle_type TEXT NOT NULL DEFAULT 'car',
+    bucket_hour TEXT NOT NULL,
+    vehicle_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now')),
+    PRIMARY KEY (junction_id, bucket_hour, lane_number, vehicle_type)
+);
+
+CREATE TABLE IF NOT EXISTS vehicle_counts_daily (
+    junction_id INTEGER NOT NULL REFERENCES traffic_junctions(id) ON DELETE CASCADE,
+    lane_number INTEGER NOT NULL,
+    vehicle_type TEXT NOT NULL DEFAULT 'car',
+    bucket_date TEXT NOT NULL,
+    vehicle_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now')),
+    PRIMARY KEY (junction_id, bucket_date, lane_number, vehicle_type)
+);
+
+CREATE INDEX IF NOT EXISTS idx_vehicle_counts_daily_date ON vehicle_counts_daily(bucket_date);
+CREATE INDEX IF NOT EXISTS idx_vehicle_counts_hourly_hour ON vehicle_counts_hourly(bucket_hour);
+
+CREATE TRIGGER IF NOT EXISTS trg_rollup_vehicle_detection
+AFTER INSERT ON vehicle_detections
+WHEN NEW.junction_id IS NOT NULL
+BEGIN
+    INSERT INTO vehicle_counts_hourly (junction_id, lane_number, vehicle_type, bucket_hour, vehicle_count)
+    VALUES (NEW.junction_id, NEW.lane_number, COALESCE(NEW.vehicle_type, 'car'),
+            substr(NEW.detection_timestamp, 1, 13) || ':00:00.000000+00:00', 1)
+    ON CONFLICT (junction_id, bucket_hour, lane_number, vehicle_type)
+    DO UPDATE SET vehicle_count = vehicle_count + 1,
+                  updated_at = strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now');
+
+    INSERT INTO vehicle_counts_daily (junction_id, lane_number, vehicle_type, bucket_date, vehicle_count)
+    VALUES (NEW.junction_id, NEW.lane_number, COALESCE(NEW.vehicle_type, 'car'),
+            substr(NEW.detection_timestamp, 1, 10), 1)
+    ON CONFLICT (junction_id, bucket_date, lane_number, vehicle_type)
+    DO UPDATE SET vehicle_count = vehicle_count + 1,
+                  updated_at = strftime('%Y-%m-%dT%H:%M:%f000+00:00', 'now');
+END;
+
+-- Migration 005: covering indexes for the detection history query
+CREATE INDEX IF NOT EXISTS idx_vehicle_detections_junction_time_id_covering
+    ON vehicle_detections(junction_id, detection_timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_traffic_cycles_junction_start_covering
+    ON traffic_cycles(junction_id, cycle_start_time, id);
+
+-- Migration 006: downsampled system log counts
+CREATE TABLE IF NOT EXISTS system_log_counts_daily (
+    bucket_date TEXT NOT NULL,
+    junction_id INTEGER NOT NULL DEFAULT 0,
+    component TEXT NOT NULL,
+    log_level TEXT NOT NULL,
+    log_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_date, junction_id, component, log_level)
+);
+
+-- Migration 007: ingest keys for idempotent spool replay
+-- (SQLiteDatabaseService adds the ingest_key columns to databases created
+-- before this migration, as SQLite has no ADD COLUMN IF NOT EXISTS)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_vehicle_detections_ingest_key ON vehicle_detections(ingest_key);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_traffic_cycles_ingest_key ON traffic_cycles(ingest_key);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_rfid_scanners_ingest_key ON rfid_scanners(ingest_key);
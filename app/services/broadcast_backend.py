@@ -0,0 +1,199 @@
+"""
+Broadcast Backends
+Carry live WebSocket events between processes. In memory, a publish is
+delivered straight to this process's clients; with Redis pub/sub every API
+worker / replica subscribes to one channel, so a client sees events from
+all of them. The message is serialised once per publish; the Redis envelope
+adds a small routing header so receivers never re-encode the payload.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from app.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - optional dependency
+    aioredis = None  # type: ignore[assignment]
+
+# (junction_id, component, level, coalescing key) of a broadcast
+Route = Tuple[Optional[int], Optional[str], Optional[str], Optional[Hashable]]
+Deliver = Callable[[str, Route], int]
+
+
+def _hashable(value: Any) -> Any:
+    """JSON arrays back to tuples so coalescing keys survive the round trip"""
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+
+def encode_envelope(payload: str, route: Route) -> str:
+    """Routing header line + payload (a JSON payload never contains a raw newline)"""
+    return json.dumps(route, separators=(",", ":"), default=str) + "\n" + payload
+
+
+def decode_envelope(envelope: str) -> Tuple[str, Route]:
+    header, _, payload = envelope.partition("\n")
+    junction_id, component, level, key = json.loads(header)
+    return payload, (junction_id, component, level, _hashable(key))
+
+
+class InMemoryBroadcastBackend:
+    """Single process: a publish is delivered locally and synchronously"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+        self.published = 0
+
+    def bind(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def start(self) -> None:
+        pass
+
+    async def publish(self, payload: str, route: Route) -> int:
+        """Returns the number of local clients the message was queued for"""
+        self.published += 1
+        return self._deliver(payload, route) if self._deliver else 0
+
+    async def stop(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "published": self.published}
+
+
+class RedisBroadcastBackend:
+    """
+    Redis pub/sub on one channel. Every process, the publisher included,
+    delivers to its own clients when the message comes back on its
+    subscription, so each client gets each event exactly once.
+
+    If Redis is unreachable a publish is delivered to this process's
+    clients only, and the listener resubscribes with backoff.
+    """
+
+    name = "redis"
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        channel: Optional[str] = None,
+        client=None,
+        reconnect_seconds: float = 1.0,
+    ):
+        if client is None and aioredis is None:
+            raise RuntimeError(
+                "redis is required for the Redis broadcast backend (pip install redis)"
+            )
+        self.url = url or settings.REDIS_URL
+        self.channel = channel or settings.WS_BROADCAST_CHANNEL
+        self.client = client or aioredis.from_url(self.url, decode_responses=True)
+        self.reconnect_seconds = reconnect_seconds
+        self._deliver: Optional[Deliver] = None
+        self._task: Optional[asyncio.Task] = None
+        self._subscribed = asyncio.Event()
+        self.published = 0
+        self.received = 0
+        self.publish_errors = 0
+        self.reconnects = 0
+        self.logger = logging.getLogger(__name__)
+
+    def bind(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def start(self, timeout: float = 5.0) -> None:
+        """Subscribe (waits up to `timeout` for the first subscription)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+        try:
+            await asyncio.wait_for(self._subscribed.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"⚠️ Redis broadcast channel {self.channel} not subscribed yet")
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self._subscribed.set()
+                self.logger.info(f"📡 Subscribed to Redis broadcast channel {self.channel}")
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    self.received += 1
+                    try:
+                        payload, route = decode_envelope(message["data"])
+                    except (ValueError, TypeError) as e:
+                        self.logger.warning(f"⚠️ Ignoring malformed broadcast envelope: {e}")
+                        continue
+                    if self._deliver:
+                        self._deliver(payload, route)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._subscribed.clear()
+                self.reconnects += 1
+                self.logger.warning(
+                    f"⚠️ Redis broadcast subscription lost ({e}); "
+                    f"retrying in {self.reconnect_seconds}s"
+                )
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(self.reconnect_seconds)
+
+    async def publish(self, payload: str, route: Route) -> int:
+        """Returns the number of processes subscribed to the channel"""
+        self.published += 1
+        try:
+            return await self.client.publish(self.channel, encode_envelope(payload, route))
+        except Exception as e:
+            self.publish_errors += 1
+            self.logger.warning(f"⚠️ Redis publish failed, delivering locally only: {e}")
+            if self._deliver:
+                self._deliver(payload, route)
+            return 0
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._subscribed.clear()
+        try:
+            await self.client.aclose()
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "channel": self.channel,
+            "subscribed": self._subscribed.is_set(),
+            "published": self.published,
+            "received": self.received,
+            "publish_errors": self.publish_errors,
+            "reconnects": self.reconnects,
+        }
+
+
+def create_broadcast_backend(name: Optional[str] = None):
+    """Backend named by WS_BROADCAST_BACKEND (memory | redis)"""
+    name = (name or settings.WS_BROADCAST_BACKEND).lower()
+    if name == "redis":
+        return RedisBroadcastBackend()
+    if name == "memory":
+        return InMemoryBroadcastBackend()
+    raise ValueError(f"Unknown broadcast backend {name!r} (expected memory or redis)")
@@ -0,0 +1,220 @@
+"""
+Database Circuit Breaker
+Per-operation adaptive deadlines and a circuit breaker for database calls,
+so a degraded database makes requests fail fast instead of piling up on
+worker threads until every endpoint stalls
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, Type
+
+from app.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the database while the breaker is open"""
+
+
+class AdaptiveTimeout:
+    """
+    Deadline for one operation, adapted to its observed latency like a TCP
+    retransmission timeout: smoothed latency + 4 x latency deviation,
+    clamped to [min_seconds, max_seconds].
+    """
+
+    def __init__(self, initial_seconds: float, min_seconds: float, max_seconds: float):
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self._initial = initial_seconds
+        self._smoothed: Optional[float] = None
+        self._deviation = 0.0
+        self.samples = 0
+
+    def record(self, latency: float) -> None:
+        if self._smoothed is None:
+            self._smoothed = latency
+            self._deviation = latency / 2
+        else:
+            self._deviation = 0.75 * self._deviation + 0.25 * abs(self._smoothed - latency)
+            self._smoothed = 0.875 * self._smoothed + 0.125 * latency
+        self.samples += 1
+
+    @property
+    def seconds(self) -> float:
+        if self._smoothed is None:
+            return self._initial
+        return min(max(self._smoothed + 4 * self._deviation, self.min_seconds), self.max_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "timeout_seconds": round(self.seconds, 3),
+            "latency_ms": round(self._smoothed * 1000, 2) if self._smoothed is not None else None,
+            "samples": self.samples,
+        }
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker shared by all calls to one backend.
+
+    closed    -> calls go through; `failure_threshold` consecutive failures
+                 (errors or deadline overruns) open the circuit
+    open      -> calls fail immediately with CircuitOpenError until
+                 `reset_seconds` have passed
+    half_open -> a single probe call is let through; success closes the
+                 circuit, failure re-opens it
+
+    Exceptions in `ignored_exceptions` (e.g. the server rejecting a query)
+    prove the backend is reachable and don't count as failures.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: Optional[int] = None,
+        reset_seconds: Optional[float] = None,
+        timeout_seconds: Optional[float] = None,
+        min_timeout_seconds: Optional[float] = None,
+        max_timeout_seconds: Optional[float] = None,
+        ignored_exceptions: Tuple[Type[BaseException], ...] = (),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.DB_BREAKER_FAILURE_THRESHOLD
+        self.reset_seconds = (
+            settings.DB_BREAKER_RESET_SECONDS if reset_seconds is None else reset_seconds
+        )
+        self.timeout_seconds = timeout_seconds or settings.DB_TIMEOUT_SECONDS
+        self.min_timeout_seconds = min_timeout_seconds or settings.DB_TIMEOUT_MIN_SECONDS
+        self.max_timeout_seconds = max_timeout_seconds or settings.DB_TIMEOUT_MAX_SECONDS
+        self.ignored_exceptions = ignored_exceptions
+        self._clock = clock
+
+        self.state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._timeouts: Dict[str, AdaptiveTimeout] = {}
+        self.counters = {"calls": 0, "failures": 0, "timeouts": 0, "rejected": 0, "opened": 0}
+        self.logger = logging.getLogger(__name__)
+
+    def timeout_for(self, operation: str) -> AdaptiveTimeout:
+        if operation not in self._timeouts:
+            self._timeouts[operation] = AdaptiveTimeout(
+                self.timeout_seconds, self.min_timeout_seconds, self.max_timeout_seconds
+            )
+        return self._timeouts[operation]
+
+    def _admit(self) -> bool:
+        """Whether a call may proceed; returns True if it is the half-open probe"""
+        if self.state == OPEN:
+            if self._clock() - self._opened_at < self.reset_seconds:
+                self.counters["rejected"] += 1
+                raise CircuitOpenError(f"{self.name} circuit open")
+            self.state = HALF_OPEN
+
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                self.counters["rejected"] += 1
+                raise CircuitOpenError(f"{self.name} circuit half-open, probe in flight")
+            self._probe_in_flight = True
+            return True
+
+        return False
+
+    def _open(self) -> None:
+        if self.state != OPEN:
+            self.counters["opened"] += 1
+            self.logger.error(f"🔌 {self.name} circuit opened")
+        self.state = OPEN
+        self._opened_at = self._clock()
+
+    def _on_success(self) -> None:
+        if self.state != CLOSED:
+            self.logger.info(f"✅ {self.name} circuit closed")
+        self.state = CLOSED
+        self._consecutive_failures = 0
+
+    def _on_failure(self, probe: bool) -> None:
+        self.counters["failures"] += 1
+        self._consecutive_failures += 1
+        if probe or self._consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    async def call(self, operation: str, run: Callable[[], Awaitable[Any]]) -> Any:
+        """Await `run()` under the breaker and the operation's deadline"""
+        probe = self._admit()
+        self.counters["calls"] += 1
+        deadline = self.timeout_for(operation)
+        started = time.perf_counter()
+
+        try:
+            result = await asyncio.wait_for(run(), deadline.seconds)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            self._on_failure(probe)
+            raise TimeoutError(
+                f"{self.name} {operation} exceeded {deadline.seconds:.2f}s deadline"
+            )
+        except self.ignored_exceptions:
+            deadline.record(time.perf_counter() - started)
+            self._on_success()
+            raise
+        except Exception:
+            self._on_failure(probe)
+            raise
+        finally:
+            if probe:
+                self._probe_in_flight = False
+
+        deadline.record(time.perf_counter() - started)
+        self._on_success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Breaker state, counters and per-operation deadlines for metrics"""
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self._consecutive_failures,
+            "open_for_seconds": (
+                round(self._clock() - self._opened_at, 1) if self.state == OPEN else None
+            ),
+            **self.counters,
+            "operations": {op: t.stats() for op, t in sorted(self._timeouts.items())},
+        }
+
+
+class LastGoodCache:
+    """
+    Bounded LRU of the last successful result per read, served by read
+    methods when the database fails or the breaker is open.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.fallbacks = 0
+
+    def put(self, key: Hashable, value: Any) -> Any:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def get(self, key: Hashable, default: Any) -> Any:
+        if key in self._entries:
+            self.fallbacks += 1
+            return self._entries[key]
+        return default
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "fallbacks_served": self.fallbacks}
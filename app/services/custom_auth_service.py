@@ -10,6 +10,7 @@ from passlib.context import CryptContext
 from supabase import Client, create_client
 
 from app.services.database_service import DatabaseService
+from app.services.executors import run_cpu
 
 # Load environment variables
 load_dotenv()
@@ -103,7 +104,8 @@ class CustomAuthService:
 
             user = result.data[0]
 
-            if not self.verify_password(password, user["password_hash"]):
+            # bcrypt is deliberately slow; keep it off the event loop
+            if not await run_cpu(self.verify_password, password, user["password_hash"]):
                 await self.db_service.log_system_event(
                     message=f"Login failed: invalid password ({username})",
                     log_level="WARNING",
@@ -347,7 +349,7 @@ class CustomAuthService:
         if role not in ["OPERATOR", "OBSERVER"]:
             raise ValueError("Invalid role")
 
-        password_hash = self.hash_password(password)
+        password_hash = await run_cpu(self.hash_password, password)
 
         user_data = {
             "username": username,
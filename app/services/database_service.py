@@ -2,14 +2,39 @@ import asyncio
 import logging
 import os
 from datetime import date, datetime, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
 
 from dotenv import load_dotenv
+from postgrest.exceptions import APIError
 from supabase import Client, create_client
 
+from app.config import settings
+from app.services.circuit_breaker import CircuitBreaker, LastGoodCache
+from app.services.executors import run_db_read, run_db_write
+
 # Load environment variables
 load_dotenv()
 
+# traffic_cycles columns the cycle history can project
+TRAFFIC_CYCLE_FIELDS = (
+    "id",
+    "junction_id",
+    "cycle_start_time",
+    "total_cycle_time",
+    "lane_1_green_time",
+    "lane_2_green_time",
+    "lane_3_green_time",
+    "lane_4_green_time",
+    "lane_1_vehicle_count",
+    "lane_2_vehicle_count",
+    "lane_3_vehicle_count",
+    "lane_4_vehicle_count",
+    "total_vehicles_detected",
+    "algorithm_version",
+    "calculation_time_ms",
+    "status",
+)
+
 
 class DatabaseService:
     """
@@ -17,6 +42,39 @@ class DatabaseService:
     Handles all database operations including system logging
     """
 
+    # Reported by /health
+    BACKEND = "supabase"
+
+    # PostgREST caps rows per response (Supabase default: 1000)
+    RPC_PAGE_SIZE = 1000
+
+    # Operations run on the database write pool; everything else is a read
+    WRITE_OPERATIONS = frozenset(
+        {
+            "log_system_event",
+            "log_system_error",
+            "log_rfid_scanner_data",
+            "log_vehicle_detection",
+            "log_vehicle_detections_bulk",
+            "log_traffic_cycle",
+            "backfill_vehicle_count_rollups",
+            "ensure_time_partitions",
+            "apply_partition_retention",
+            "insert_spooled_rows",
+        }
+    )
+
+    # Long-running by design: they get DB_MAINTENANCE_TIMEOUT_SECONDS instead
+    # of the adaptive deadline and never count toward the circuit breaker
+    MAINTENANCE_OPERATIONS = frozenset(
+        {
+            "backfill_vehicle_count_rollups",
+            "ensure_time_partitions",
+            "apply_partition_retention",
+            "iter_rows_by_id",
+        }
+    )
+
     def __init__(self):
         self.supabase_url = os.getenv("SUPABASE_URL")
         self.supabase_service_key = os.getenv("SUPABASE_SERVICE_KEY")
@@ -25,6 +83,10 @@ class DatabaseService:
         self.logger = logging.getLogger("DatabaseService")
         self.logger.setLevel(logging.INFO)
 
+        # A query rejected by PostgREST proves the database is reachable
+        self.breaker = CircuitBreaker("supabase", ignored_exceptions=(APIError,))
+        self._last_good = LastGoodCache()
+
         if not self.supabase_url or not self.supabase_service_key:
             self.logger.warning(
                 "Supabase credentials not configured - using mock mode for testing"
@@ -37,6 +99,21 @@ class DatabaseService:
 
         self.logger.info("✅ DatabaseService initialized")
 
+    async def _run(self, operation: str, query: Callable[[], Any]) -> Any:
+        """
+        Run a blocking Supabase call on the database read or write pool,
+        under the circuit breaker and the operation's adaptive deadline.
+        Raises CircuitOpenError without using a thread while the database is
+        known to be down. MAINTENANCE_OPERATIONS bypass the breaker and run
+        under DB_MAINTENANCE_TIMEOUT_SECONDS.
+        """
+        executor = run_db_write if operation in self.WRITE_OPERATIONS else run_db_read
+        if operation in self.MAINTENANCE_OPERATIONS:
+            return await asyncio.wait_for(
+                executor(query), settings.DB_MAINTENANCE_TIMEOUT_SECONDS
+            )
+        return await self.breaker.call(operation, lambda: executor(query))
+
     # ------------------------------------------------------------------
     # 🔥 SYSTEM LOGGING (SAFE + ASYNC FIXED)
     # ------------------------------------------------------------------
@@ -60,7 +137,8 @@ class DatabaseService:
                 "junction_id": junction_id,
             }
 
-            await asyncio.to_thread(
+            await self._run(
+                "log_system_event",
                 lambda: self.supabase.table("system_logs")
                 .insert(log_data)
                 .execute()
@@ -92,12 +170,84 @@ class DatabaseService:
                 "metadata": metadata or {},
             }
 
-            self.supabase.table("system_logs").insert(log_data).execute()
+            await self._run(
+                "log_system_error",
+                lambda: self.supabase.table("system_logs").insert(log_data).execute(),
+            )
 
         except Exception as e:
             # Logging should never crash the system
             self.logger.error(f"❌ Failed to insert error log: {e}")
 
+    # ------------------------------------------------------------------
+    # 🧱 ROW BUILDERS
+    # ------------------------------------------------------------------
+    # Shared by the log_* methods and the write spool, so spooled rows have
+    # exactly the shape of directly written ones.
+
+    @staticmethod
+    def build_rfid_scanner_row(
+        junction_id: int,
+        cycle_id: int,
+        lane_car_count: Dict[str, int],
+        ingest_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        row = {
+            "junction_id": junction_id,
+            "cycle_id": cycle_id,
+            "lane_car_count": lane_car_count,
+            "log_timestamp": datetime.utcnow().isoformat(),
+        }
+        if ingest_key is not None:
+            row["ingest_key"] = ingest_key
+        return row
+
+    @staticmethod
+    def build_vehicle_detection_row(
+        junction_id: int,
+        lane_number: int,
+        fastag_id: str,
+        vehicle_type: str = "car",
+        detection_timestamp: Optional[str] = None,
+        ingest_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        row = {
+            "junction_id": junction_id,
+            "lane_number": lane_number,
+            "fastag_id": fastag_id,
+            "vehicle_type": vehicle_type,
+            "processing_status": "processed",
+        }
+        if detection_timestamp is not None:
+            row["detection_timestamp"] = detection_timestamp
+        if ingest_key is not None:
+            row["ingest_key"] = ingest_key
+        return row
+
+    @staticmethod
+    def build_traffic_cycle_row(
+        junction_id: int,
+        lane_counts: List[int],
+        green_times: List[int],
+        cycle_time: int,
+        calculation_time_ms: int,
+    ) -> Dict[str, Any]:
+        return {
+            "junction_id": junction_id,
+            "total_cycle_time": cycle_time,
+            "lane_1_green_time": green_times[0],
+            "lane_2_green_time": green_times[1],
+            "lane_3_green_time": green_times[2],
+            "lane_4_green_time": green_times[3],
+            "lane_1_vehicle_count": lane_counts[0],
+            "lane_2_vehicle_count": lane_counts[1],
+            "lane_3_vehicle_count": lane_counts[2],
+            "lane_4_vehicle_count": lane_counts[3],
+            "total_vehicles_detected": sum(lane_counts),
+            "algorithm_version": "v1.0",
+            "calculation_time_ms": calculation_time_ms,
+        }
+
     # ------------------------------------------------------------------
     # � RFID SCANNER LOGS (NEW)
     # ------------------------------------------------------------------
@@ -107,6 +257,7 @@ class DatabaseService:
         junction_id: int,
         cycle_id: int,
         lane_car_count: Dict[str, int],
+        ingest_key: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         Log RFID scanner data (car counts and cycle ID) for user visibility
@@ -115,22 +266,21 @@ class DatabaseService:
             junction_id: ID of the junction
             cycle_id: ID of the traffic cycle
             lane_car_count: Dict with keys 'north', 'south', 'east', 'west' containing car counts
+            ingest_key: Key the write spool stamped on the row, if any
         
         Returns:
             The inserted record data
         """
         try:
-            log_data = {
-                "junction_id": junction_id,
-                "cycle_id": cycle_id,
-                "lane_car_count": lane_car_count,
-                "log_timestamp": datetime.utcnow().isoformat(),
-            }
+            log_data = self.build_rfid_scanner_row(
+                junction_id, cycle_id, lane_car_count, ingest_key
+            )
 
-            result = (
-                self.supabase.table("rfid_scanners")
+            result = await self._run(
+                "log_rfid_scanner_data",
+                lambda: self.supabase.table("rfid_scanners")
                 .insert(log_data)
-                .execute()
+                .execute(),
             )
 
             if not result.data:
@@ -164,17 +314,21 @@ class DatabaseService:
         lane_number: int,
         fastag_id: str,
         vehicle_type: str = "car",
+        detection_timestamp: Optional[str] = None,
+        ingest_key: Optional[str] = None,
     ) -> Dict[str, Any]:
         try:
-            detection_data = {
-                "junction_id": junction_id,
-                "lane_number": lane_number,
-                "fastag_id": fastag_id,
-                "vehicle_type": vehicle_type,
-                "processing_status": "processed",
-            }
+            detection_data = self.build_vehicle_detection_row(
+                junction_id,
+                lane_number,
+                fastag_id,
+                vehicle_type,
+                detection_timestamp,
+                ingest_key,
+            )
 
-            result = await asyncio.to_thread(
+            result = await self._run(
+                "log_vehicle_detection",
                 lambda: self.supabase.table("vehicle_detections")
                 .insert(detection_data)
                 .execute()
@@ -200,6 +354,59 @@ class DatabaseService:
             )
             raise
 
+    async def log_vehicle_detections_bulk(
+        self, detections: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Insert many detections with one multi-row insert and write a single
+        summary row to system_logs (instead of one log row per vehicle).
+
+        Args:
+            detections: Dicts with junction_id, lane_number, fastag_id,
+                vehicle_type and optionally detection_timestamp
+
+        Returns:
+            Inserted rows, in input order
+        """
+        if not detections:
+            return []
+
+        junction_ids = sorted({d["junction_id"] for d in detections})
+        try:
+            rows = [
+                {**detection, "processing_status": "processed"}
+                for detection in detections
+            ]
+
+            result = await self._run(
+                "log_vehicle_detections_bulk",
+                lambda: self.supabase.table("vehicle_detections")
+                .insert(rows)
+                .execute()
+            )
+
+            if not result.data or len(result.data) != len(rows):
+                raise Exception("Bulk insert returned an unexpected number of rows")
+
+            await self.log_system_event(
+                message=(
+                    f"Bulk vehicle detections | count={len(rows)} | "
+                    f"junctions={junction_ids}"
+                ),
+                component="vehicle_detection",
+                junction_id=junction_ids[0] if len(junction_ids) == 1 else None,
+            )
+
+            return result.data
+
+        except Exception as e:
+            await self.log_system_event(
+                message=f"Bulk detection insert failed ({len(detections)} rows): {e}",
+                log_level="ERROR",
+                component="vehicle_detection",
+            )
+            raise
+
     # ------------------------------------------------------------------
     # 🚦 TRAFFIC CYCLES
     # ------------------------------------------------------------------
@@ -213,23 +420,12 @@ class DatabaseService:
         calculation_time_ms: int,
     ) -> Dict[str, Any]:
         try:
-            cycle_data = {
-                "junction_id": junction_id,
-                "total_cycle_time": cycle_time,
-                "lane_1_green_time": green_times[0],
-                "lane_2_green_time": green_times[1],
-                "lane_3_green_time": green_times[2],
-                "lane_4_green_time": green_times[3],
-                "lane_1_vehicle_count": lane_counts[0],
-                "lane_2_vehicle_count": lane_counts[1],
-                "lane_3_vehicle_count": lane_counts[2],
-                "lane_4_vehicle_count": lane_counts[3],
-                "total_vehicles_detected": sum(lane_counts),
-                "algorithm_version": "v1.0",
-                "calculation_time_ms": calculation_time_ms,
-            }
+            cycle_data = self.build_traffic_cycle_row(
+                junction_id, lane_counts, green_times, cycle_time, calculation_time_ms
+            )
 
-            result = await asyncio.to_thread(
+            result = await self._run(
+                "log_traffic_cycle",
                 lambda: self.supabase.table("traffic_cycles")
                 .insert(cycle_data)
                 .execute()
@@ -261,6 +457,9 @@ class DatabaseService:
     # ------------------------------------------------------------------
     # 📊 QUERIES
     # ------------------------------------------------------------------
+    # Reads log a failure and return an empty or last good result. Those
+    # taking `raise_errors` re-raise instead, for streamed exports that must
+    # not end early under a 200 as if the data were complete.
 
     async def get_current_lane_counts(
         self, junction_id: int, time_window_minutes: int = 5
@@ -270,7 +469,8 @@ class DatabaseService:
                 datetime.utcnow() - timedelta(minutes=time_window_minutes)
             ).isoformat()
 
-            result = await asyncio.to_thread(
+            result = await self._run(
+                "get_current_lane_counts",
                 lambda: self.supabase.table("vehicle_detections")
                 .select("lane_number")
                 .eq("junction_id", junction_id)
@@ -286,14 +486,17 @@ class DatabaseService:
                 if ln in lane_counts:
                     lane_counts[ln] += 1
 
-            return [
-                {
-                    "lane": lane_names[i],
-                    "lane_number": i,
-                    "count": lane_counts[i],
-                }
-                for i in range(1, 5)
-            ]
+            return self._last_good.put(
+                ("lane_counts", junction_id, time_window_minutes),
+                [
+                    {
+                        "lane": lane_names[i],
+                        "lane_number": i,
+                        "count": lane_counts[i],
+                    }
+                    for i in range(1, 5)
+                ],
+            )
 
         except Exception as e:
             await self.log_system_event(
@@ -302,25 +505,125 @@ class DatabaseService:
                 component="lane_count_query",
                 junction_id=junction_id,
             )
-            return []
+            return self._last_good.get(
+                ("lane_counts", junction_id, time_window_minutes), []
+            )
 
     async def get_vehicles_count_by_date(
         self, junction_id: int, target_date: date
     ) -> int:
+        """
+        Total vehicles seen at a junction on a UTC date.
+        Reads the daily rollup (one row per lane / vehicle type) instead of
+        counting raw vehicle_detections rows.
+        """
         try:
-            start = target_date.isoformat()
-            end = (target_date + timedelta(days=1)).isoformat()
+            result = await self._run(
+                "get_vehicles_count_by_date",
+                lambda: self.supabase.table("vehicle_counts_daily")
+                .select("vehicle_count")
+                .eq("junction_id", junction_id)
+                .eq("bucket_date", target_date.isoformat())
+                .execute()
+            )
 
-            result = await asyncio.to_thread(
-                lambda: self.supabase.table("vehicle_detections")
-                .select("id", count="exact")
+            return self._last_good.put(
+                ("vehicles_count", junction_id, target_date),
+                sum(row["vehicle_count"] for row in result.data or []),
+            )
+
+        except Exception as e:
+            await self.log_system_event(
+                message=str(e),
+                log_level="ERROR",
+                component="vehicle_count_query",
+                junction_id=junction_id,
+            )
+            return self._last_good.get(("vehicles_count", junction_id, target_date), 0)
+
+    async def get_vehicle_totals_by_date(self, target_date: date) -> Dict[int, int]:
+        """
+        Vehicle totals for every junction on a UTC date, from one grouped
+        query. Junctions without traffic are absent from the result.
+        """
+        totals = await self.get_vehicle_totals_by_date_range(target_date, target_date)
+        return totals.get(target_date.isoformat(), {})
+
+    async def get_vehicle_totals_by_date_range(
+        self, start_date: date, end_date: date, raise_errors: bool = False
+    ) -> Dict[str, Dict[int, int]]:
+        """
+        Per-junction vehicle totals for each date in [start_date, end_date],
+        keyed by ISO date then junction ID. Grouping happens in the database
+        (vehicle_totals_by_date); results are paged past PostgREST's row cap.
+        """
+        try:
+            params = {
+                "p_start_date": start_date.isoformat(),
+                "p_end_date": end_date.isoformat(),
+            }
+            totals: Dict[str, Dict[int, int]] = {}
+            offset = 0
+
+            while True:
+                result = await self._run(
+                    "get_vehicle_totals_by_date_range",
+                    lambda: self.supabase.rpc("vehicle_totals_by_date", params)
+                    .order("bucket_date")
+                    .order("junction_id")
+                    .range(offset, offset + self.RPC_PAGE_SIZE - 1)
+                    .execute()
+                )
+                rows = result.data or []
+
+                for row in rows:
+                    totals.setdefault(row["bucket_date"], {})[row["junction_id"]] = int(
+                        row["total_vehicles"]
+                    )
+
+                if len(rows) < self.RPC_PAGE_SIZE:
+                    return self._last_good.put(
+                        ("vehicle_totals", start_date, end_date), totals
+                    )
+                offset += self.RPC_PAGE_SIZE
+
+        except Exception as e:
+            await self.log_system_event(
+                message=str(e),
+                log_level="ERROR",
+                component="vehicle_count_query",
+            )
+            if raise_errors:
+                raise
+            return self._last_good.get(("vehicle_totals", start_date, end_date), {})
+
+    async def get_hourly_vehicle_counts(
+        self, junction_id: int, target_date: date, raise_errors: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Hourly vehicle counts for a junction on a UTC date, broken down by
+        lane and vehicle type (rows from the hourly rollup)
+        """
+        try:
+            start = datetime.combine(target_date, datetime.min.time()).isoformat()
+            end = datetime.combine(
+                target_date + timedelta(days=1), datetime.min.time()
+            ).isoformat()
+
+            result = await self._run(
+                "get_hourly_vehicle_counts",
+                lambda: self.supabase.table("vehicle_counts_hourly")
+                .select("bucket_hour, lane_number, vehicle_type, vehicle_count")
                 .eq("junction_id", junction_id)
-                .gte("detection_timestamp", start)
-                .lt("detection_timestamp", end)
+                .gte("bucket_hour", start)
+                .lt("bucket_hour", end)
+                .order("bucket_hour")
                 .execute()
             )
 
-            return result.count or 0
+            return self._last_good.put(
+                ("hourly_counts", junction_id, target_date), result.data or []
+            )
 
         except Exception as e:
             await self.log_system_event(
@@ -329,13 +632,61 @@ class DatabaseService:
                 component="vehicle_count_query",
                 junction_id=junction_id,
             )
-            return 0
+            if raise_errors:
+                raise
+            return self._last_good.get(("hourly_counts", junction_id, target_date), [])
+
+    @staticmethod
+    def _check_backfill_range(start_date: date) -> None:
+        """
+        A backfill replaces the range's rollups with counts of its raw
+        detections. Before the retention horizon those have been retired,
+        so the rollups are the only copy left and must not be rebuilt.
+        """
+        cutoff = datetime.utcnow() - timedelta(days=settings.DETECTION_RETENTION_DAYS)
+        first_retained = cutoff.date() + timedelta(days=1)
+        if start_date < first_retained:
+            raise ValueError(
+                f"Raw detections before {first_retained.isoformat()} may have been "
+                f"retired; refusing to rebuild rollups from {start_date.isoformat()}"
+            )
+
+    async def backfill_vehicle_count_rollups(
+        self, start_date: date, end_date: date
+    ) -> int:
+        """
+        Rebuild hourly/daily rollups for [start_date, end_date) from raw
+        detections. Returns the number of hourly rollup rows written.
+        Raises ValueError for ranges past the detection retention horizon.
+        """
+        self._check_backfill_range(start_date)
+        result = await self._run(
+            "backfill_vehicle_count_rollups",
+            lambda: self.supabase.rpc(
+                "backfill_vehicle_count_rollups",
+                {
+                    "p_start_date": start_date.isoformat(),
+                    "p_end_date": end_date.isoformat(),
+                },
+            ).execute()
+        )
+
+        await self.log_system_event(
+            message=(
+                f"Vehicle count rollups backfilled | "
+                f"{start_date.isoformat()} -> {end_date.isoformat()}"
+            ),
+            component="rollup_backfill",
+        )
+
+        return result.data or 0
 
     async def get_current_traffic_cycle(
         self, junction_id: int
     ) -> Optional[Dict[str, Any]]:
         try:
-            result = await asyncio.to_thread(
+            result = await self._run(
+                "get_current_traffic_cycle",
                 lambda: self.supabase.table("traffic_cycles")
                 .select("*")
                 .eq("junction_id", junction_id)
@@ -344,7 +695,9 @@ class DatabaseService:
                 .execute()
             )
 
-            return result.data[0] if result.data else None
+            return self._last_good.put(
+                ("current_cycle", junction_id), result.data[0] if result.data else None
+            )
 
         except Exception as e:
             await self.log_system_event(
@@ -353,11 +706,172 @@ class DatabaseService:
                 component="traffic_cycle_query",
                 junction_id=junction_id,
             )
-            return None
+            return self._last_good.get(("current_cycle", junction_id), None)
+
+    @staticmethod
+    def traffic_cycle_columns(fields: Optional[List[str]]) -> List[str]:
+        """
+        Columns to select for a cycle history projection. The keyset columns
+        (id, cycle_start_time) are always included; unknown fields raise
+        ValueError.
+        """
+        if not fields:
+            return list(TRAFFIC_CYCLE_FIELDS)
+        unknown = sorted(set(fields) - set(TRAFFIC_CYCLE_FIELDS))
+        if unknown:
+            raise ValueError(f"Unknown traffic cycle fields: {', '.join(unknown)}")
+        columns = ["id", "cycle_start_time"]
+        return columns + [f for f in dict.fromkeys(fields) if f not in columns]
+
+    async def get_traffic_cycle_history(
+        self,
+        junction_id: int,
+        start_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+        before_timestamp: Optional[str] = None,
+        before_id: Optional[int] = None,
+        limit: int = 100,
+        fields: Optional[List[str]] = None,
+        bucket_seconds: Optional[int] = None,
+        raise_errors: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Traffic cycles for a junction, newest first, with cycle_start_time in
+        [start_time, end_time).
+
+        Keyset pagination: pass the cycle_start_time and id of the last row
+        of the previous page as before_timestamp / before_id. `fields`
+        projects columns (see traffic_cycle_columns). With `bucket_seconds`
+        each interval is reduced to its last plan (migration 008).
+        """
+        columns = self.traffic_cycle_columns(fields)
+        try:
+            params = {
+                "p_junction_id": junction_id,
+                "p_start_time": start_time,
+                "p_end_time": end_time,
+                "p_before_time": before_timestamp,
+                "p_before_id": before_id,
+                "p_limit": limit,
+                "p_bucket_seconds": bucket_seconds,
+            }
+
+            result = await self._run(
+                "get_traffic_cycle_history",
+                lambda: self.supabase.rpc("get_traffic_cycle_history", params)
+                .select(",".join(columns))
+                .execute()
+            )
+
+            return result.data or []
+
+        except Exception as e:
+            await self.log_system_event(
+                message=str(e),
+                log_level="ERROR",
+                component="traffic_cycle_query",
+                junction_id=junction_id,
+            )
+            if raise_errors:
+                raise
+            return []
+
+    async def get_recent_detections_with_signals(
+        self,
+        junction_id: int,
+        limit: int = 20,
+        before_timestamp: Optional[str] = None,
+        before_id: Optional[int] = None,
+        lookback_days: int = 90,
+        raise_errors: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Recent detections for a junction, newest first, each joined to the
+        traffic cycle active at detection time (cycle_* / lane_*_green_time
+        fields, null when no cycle had started yet).
+
+        Keyset pagination: pass the detection_timestamp and id of the last
+        row of the previous page as before_timestamp / before_id. Only
+        `lookback_days` before the cursor are scanned, so partitions older
+        than that are pruned.
+        """
+        try:
+            params = {
+                "p_junction_id": junction_id,
+                "p_limit": limit,
+                "p_before_timestamp": before_timestamp,
+                "p_before_id": before_id,
+                "p_lookback_days": lookback_days,
+            }
+
+            result = await self._run(
+                "get_recent_detections_with_signals",
+                lambda: self.supabase.rpc(
+                    "get_recent_detections_with_signals", params
+                ).execute()
+            )
+
+            return result.data or []
+
+        except Exception as e:
+            await self.log_system_event(
+                message=str(e),
+                log_level="ERROR",
+                component="detection_history_query",
+                junction_id=junction_id,
+            )
+            if raise_errors:
+                raise
+            return []
+
+    async def iter_rows_by_id(
+        self,
+        table: str,
+        time_column: str,
+        start: datetime,
+        end: datetime,
+        after_id: int = 0,
+        junction_ids: Optional[List[int]] = None,
+        columns: str = "*",
+        chunk_size: int = 1000,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Stream rows of `table` with `time_column` in [start, end) in chunks,
+        ordered by id and paged with an `id > last id` keyset, so memory is
+        bounded by `chunk_size` however large the range is.
+        """
+        # A larger page would be truncated by PostgREST and end the scan early
+        chunk_size = min(chunk_size, self.RPC_PAGE_SIZE)
+        last_id = after_id
+        while True:
+            query = (
+                self.supabase.table(table)
+                .select(columns)
+                .gt("id", last_id)
+                .gte(time_column, start.isoformat())
+                .lt(time_column, end.isoformat())
+            )
+            if junction_ids:
+                query = query.in_("junction_id", junction_ids)
+
+            result = await self._run(
+                "iter_rows_by_id",
+                lambda: query.order("id").limit(chunk_size).execute()
+            )
+            rows = result.data or []
+            if not rows:
+                return
+
+            yield rows
+
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1]["id"]
 
     async def get_all_junctions(self) -> List[Dict[str, Any]]:
         try:
-            result = await asyncio.to_thread(
+            result = await self._run(
+                "get_all_junctions",
                 lambda: self.supabase.table("traffic_junctions")
                 .select("*")
                 .eq("status", "active")
@@ -365,7 +879,7 @@ class DatabaseService:
                 .execute()
             )
 
-            return result.data or []
+            return self._last_good.put(("junctions",), result.data or [])
 
         except Exception as e:
             await self.log_system_event(
@@ -373,7 +887,85 @@ class DatabaseService:
                 log_level="ERROR",
                 component="junction_query",
             )
-            return []
+            return self._last_good.get(("junctions",), [])
+
+    # ------------------------------------------------------------------
+    # 🗂️ PARTITION MAINTENANCE
+    # ------------------------------------------------------------------
+    # vehicle_detections and system_logs are partitioned by month (migration
+    # 006). Every query on them above carries a time bound so the planner
+    # prunes partitions outside the requested range.
+
+    async def ensure_time_partitions(
+        self, table: str, from_date: date, to_date: date
+    ) -> int:
+        """Create missing monthly partitions of `table` covering the date range"""
+        result = await self._run(
+            "ensure_time_partitions",
+            lambda: self.supabase.rpc(
+                "ensure_time_partitions",
+                {
+                    "p_table": table,
+                    "p_from": from_date.isoformat(),
+                    "p_to": to_date.isoformat(),
+                },
+            ).execute()
+        )
+        return result.data or 0
+
+    async def apply_partition_retention(
+        self, table: str, retain_days: int, archive: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Downsample and retire monthly partitions of `table` older than
+        `retain_days`. Returns one row per dropped/archived partition.
+        """
+        result = await self._run(
+            "apply_partition_retention",
+            lambda: self.supabase.rpc(
+                "apply_partition_retention",
+                {
+                    "p_table": table,
+                    "p_retain_days": retain_days,
+                    "p_archive": archive,
+                },
+            ).execute()
+        )
+        return result.data or []
+
+    # ------------------------------------------------------------------
+    # 📼 SPOOL REPLAY
+    # ------------------------------------------------------------------
+
+    # Conflict target of the ingest_key unique index per table (migration 007)
+    INGEST_KEY_CONFLICT_COLUMNS = {
+        "vehicle_detections": "ingest_key,detection_timestamp",
+        "traffic_cycles": "ingest_key",
+        "rfid_scanners": "ingest_key",
+    }
+
+    async def insert_spooled_rows(
+        self, table: str, rows: List[Dict[str, Any]]
+    ) -> int:
+        """
+        Replay rows from the write spool. Rows carry an ingest_key and rows
+        already present are skipped, so replaying a batch twice is harmless.
+        Returns the number of rows actually inserted; raises on failure.
+        """
+        if not rows:
+            return 0
+
+        result = await self._run(
+            "insert_spooled_rows",
+            lambda: self.supabase.table(table)
+            .upsert(
+                rows,
+                on_conflict=self.INGEST_KEY_CONFLICT_COLUMNS[table],
+                ignore_duplicates=True,
+            )
+            .execute()
+        )
+        return len(result.data or [])
 
     # ------------------------------------------------------------------
     # ❤️ HEALTH
@@ -381,7 +973,8 @@ class DatabaseService:
 
     async def health_check(self) -> Dict[str, Any]:
         try:
-            await asyncio.to_thread(
+            await self._run(
+                "health_check",
                 lambda: self.supabase.table("traffic_junctions")
                 .select("id")
                 .limit(1)
@@ -399,3 +992,37 @@ class DatabaseService:
                 "error": str(e),
                 "timestamp": datetime.utcnow().isoformat(),
             }
+
+
+def create_database_service() -> DatabaseService:
+    """
+    Build the configured database backend (settings.DATABASE_BACKEND).
+    "auto" uses Supabase when credentials are set and falls back to the
+    embedded SQLite database instead of mock mode - except in production,
+    where missing credentials are a deployment error.
+    """
+    backend = settings.DATABASE_BACKEND
+    if backend == "auto":
+        has_credentials = os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_SERVICE_KEY")
+        if has_credentials:
+            backend = "supabase"
+        elif settings.ENVIRONMENT == "production":
+            raise RuntimeError(
+                "SUPABASE_URL/SUPABASE_SERVICE_KEY are not set; refusing to fall back to the "
+                "local SQLite database in production (set DATABASE_BACKEND=sqlite to use it)"
+            )
+        else:
+            logging.getLogger("DatabaseService").error(
+                "Supabase credentials not configured - writing to local SQLite database %s",
+                settings.LOCAL_DATABASE_PATH,
+            )
+            backend = "sqlite"
+
+    if backend == "sqlite":
+        from app.services.sqlite_database_service import SQLiteDatabaseService
+
+        return SQLiteDatabaseService()
+    if backend == "supabase":
+        return DatabaseService()
+
+    raise ValueError(f"Unknown DATABASE_BACKEND: {settings.DATABASE_BACKEND}")
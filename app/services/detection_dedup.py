@@ -0,0 +1,166 @@
+"""
+FASTag Duplicate-Read Suppression
+Scanners report the same tag several times while a vehicle passes; only the
+first read per (junction, lane, FASTag) within a time window is stored, so
+repeat reads don't inflate lane counts and green times
+"""
+
+import time
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+# (junction_id, bucket, key) of a recorded read, for release()
+Reservation = Tuple[int, int, int]
+
+from app.config import settings
+
+
+class _JunctionWindow:
+    """Time-bucketed hash sets of recent read keys for one junction"""
+
+    __slots__ = ("buckets", "keys", "reads", "suppressed")
+
+    def __init__(self):
+        self.buckets: Dict[int, Set[int]] = {}
+        self.keys = 0
+        self.reads = 0
+        self.suppressed = 0
+
+
+class DetectionDeduplicator:
+    """
+    Per-junction duplicate filter over a sliding time window.
+
+    Reads are hashed by (lane, FASTag) into buckets of window / buckets
+    seconds; a read is a duplicate when its key is in any bucket covering
+    the last window (so the effective window is rounded up to one bucket).
+    Checking a read (is_duplicate) and remembering it (record) are separate
+    steps. Callers record a new read right after checking it, before the
+    write is awaited, so concurrent repeats of it are suppressed, and
+    release() the reservation if the write fails so a retry is stored.
+    Duplicates are recorded too, so a tag read continuously - a vehicle
+    queued at the scanner - stays suppressed until it has been gone for a
+    full window. Buckets older than the window are dropped; if a junction
+    holds more than `max_keys_per_junction` keys its oldest buckets are
+    dropped early, which bounds memory at the cost of a shorter window.
+
+    State is per process: with several API workers a repeat read reaching
+    another worker is not suppressed.
+    """
+
+    def __init__(
+        self,
+        window_seconds: Optional[float] = None,
+        max_keys_per_junction: Optional[int] = None,
+        buckets_per_window: int = 4,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.window_seconds = window_seconds or settings.DEDUP_WINDOW_SECONDS
+        self.max_keys_per_junction = (
+            max_keys_per_junction or settings.DEDUP_MAX_KEYS_PER_JUNCTION
+        )
+        self.buckets_per_window = buckets_per_window
+        self.bucket_seconds = self.window_seconds / buckets_per_window
+        self._clock = clock
+        self._junctions: Dict[int, _JunctionWindow] = {}
+        self.evicted_buckets = 0
+
+    def _drop_oldest(self, window: _JunctionWindow) -> None:
+        oldest = min(window.buckets)
+        window.keys -= len(window.buckets.pop(oldest))
+
+    def _locate(
+        self, junction_id: int, lane_number: int, fastag_id: str, timestamp: Optional[float]
+    ) -> Tuple[_JunctionWindow, int, int]:
+        window = self._junctions.get(junction_id)
+        if window is None:
+            window = self._junctions[junction_id] = _JunctionWindow()
+        bucket = int((self._clock() if timestamp is None else timestamp) // self.bucket_seconds)
+        return window, bucket, hash((lane_number, fastag_id))
+
+    def is_duplicate(
+        self,
+        junction_id: int,
+        lane_number: int,
+        fastag_id: str,
+        timestamp: Optional[float] = None,
+    ) -> bool:
+        """
+        True if the same tag was recorded on the same lane within the window
+        of `timestamp` (epoch seconds, default now). Only counts the read;
+        call record() once it is stored or suppressed.
+        """
+        window, bucket, key = self._locate(junction_id, lane_number, fastag_id, timestamp)
+        window.reads += 1
+
+        duplicate = any(
+            key in window.buckets.get(b, ())
+            for b in range(bucket - self.buckets_per_window, bucket + 1)
+        )
+        if duplicate:
+            window.suppressed += 1
+        return duplicate
+
+    def record(
+        self,
+        junction_id: int,
+        lane_number: int,
+        fastag_id: str,
+        timestamp: Optional[float] = None,
+    ) -> Optional[Reservation]:
+        """
+        Remember a read. Returns a reservation to release() if the read
+        ends up not stored, or None if there was nothing new to remember.
+        """
+        window, bucket, key = self._locate(junction_id, lane_number, fastag_id, timestamp)
+
+        newest = max(window.buckets, default=bucket)
+        if bucket < newest - self.buckets_per_window:
+            # Late read from before the retained window: nothing to record
+            return None
+
+        reservation: Optional[Reservation] = None
+        keys = window.buckets.setdefault(bucket, set())
+        if key not in keys:
+            keys.add(key)
+            window.keys += 1
+            reservation = (junction_id, bucket, key)
+
+        horizon = max(newest, bucket) - self.buckets_per_window
+        for stale in [b for b in window.buckets if b < horizon]:
+            window.keys -= len(window.buckets.pop(stale))
+        while window.keys > self.max_keys_per_junction:
+            self._drop_oldest(window)
+            self.evicted_buckets += 1
+        return reservation
+
+    def release(self, reservation: Optional[Reservation]) -> None:
+        """Forget a recorded read whose write failed, so a retry is not suppressed"""
+        if reservation is None:
+            return
+        junction_id, bucket, key = reservation
+        window = self._junctions.get(junction_id)
+        keys = window.buckets.get(bucket) if window is not None else None
+        if window is not None and keys is not None and key in keys:
+            keys.discard(key)
+            window.keys -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Reads and suppressed duplicates, overall and per junction"""
+        return {
+            "window_seconds": self.window_seconds,
+            "reads": sum(w.reads for w in self._junctions.values()),
+            "suppressed": sum(w.suppressed for w in self._junctions.values()),
+            "tracked_keys": sum(w.keys for w in self._junctions.values()),
+            "evicted_buckets": self.evicted_buckets,
+            "junctions": {
+                junction_id: {"reads": w.reads, "suppressed": w.suppressed}
+                for junction_id, w in sorted(self._junctions.items())
+            },
+        }
+
+    def clear(self) -> None:
+        self._junctions.clear()
+        self.evicted_buckets = 0
+
+
+detection_deduplicator = DetectionDeduplicator()
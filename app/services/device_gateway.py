@@ -0,0 +1,194 @@
+"""
+Device Gateway
+Persistent WebSocket ingest for junction controllers that cannot reach the
+MQTT broker. A controller keeps one connection open (/ws/ingest), sends
+car-count reports on it and gets its green times back on the same socket,
+through the same calculation pipeline as MQTT.
+
+Each connection is one receive loop with at most one report in flight, and
+calculations across all devices are capped by a semaphore, so thousands of
+idle or slow controllers cost little more than their sockets.
+
+Controllers authenticate with a per-junction device token, an HMAC of the
+junction id under DEVICE_TOKEN_SECRET, checked without a database lookup:
+
+    python -m app.services.device_gateway 12
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.config import settings
+
+LANES = 4
+
+# Close code for a connection replaced by a newer one from the same junction
+REPLACED_CLOSE_CODE = 4000
+
+Process = Callable[..., Awaitable[Optional[Dict[str, Any]]]]
+
+
+def device_token(junction_id: int, secret: Optional[str] = None) -> str:
+    """Token a controller presents for `junction_id`"""
+    key = (secret or settings.DEVICE_TOKEN_SECRET).encode()
+    return hmac.new(key, f"junction:{junction_id}".encode(), hashlib.sha256).hexdigest()
+
+
+def verify_device_token(junction_id: int, token: Optional[str]) -> bool:
+    """False for every token while DEVICE_TOKEN_SECRET is unset"""
+    if not settings.DEVICE_TOKEN_SECRET or not token:
+        return False
+    return hmac.compare_digest(device_token(junction_id), token)
+
+
+def _validate_report(junction_id: int, data: Any) -> Optional[str]:
+    """Why a car-count report is unusable, or None"""
+    if not isinstance(data, dict):
+        return "Report must be a JSON object"
+    lane_counts = data.get("lane_counts")
+    if (
+        not isinstance(lane_counts, list)
+        or len(lane_counts) != LANES
+        or not all(isinstance(c, int) and not isinstance(c, bool) and c >= 0 for c in lane_counts)
+    ):
+        return f"lane_counts must contain exactly {LANES} non-negative integers"
+    if data.get("junction_id", junction_id) != junction_id:
+        return f"This connection reports for junction {junction_id}"
+    cycle_id = data.get("cycle_id")
+    if cycle_id is not None and (not isinstance(cycle_id, int) or isinstance(cycle_id, bool)):
+        return "cycle_id must be an integer"
+    return None
+
+
+class DeviceGateway:
+    """Connected controllers by junction, and the report -> green times loop"""
+
+    def __init__(
+        self,
+        process: Optional[Process] = None,
+        max_concurrent: Optional[int] = None,
+        send_timeout: Optional[float] = None,
+    ):
+        self.process = process
+        self.max_concurrent = max_concurrent or settings.DEVICE_MAX_CONCURRENT_CALCULATIONS
+        self.send_timeout = send_timeout or settings.WS_SEND_TIMEOUT_SECONDS
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.connections: Dict[int, Any] = {}
+        self.reports = 0
+        self.rejected = 0
+        self.failed = 0
+        self.replaced = 0
+        self.in_flight = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.logger = logging.getLogger(__name__)
+
+    async def register(self, junction_id: int, ws) -> None:
+        """Track a controller; an older connection for the junction is closed"""
+        previous = self.connections.get(junction_id)
+        self.connections[junction_id] = ws
+        if previous is not None and previous is not ws:
+            self.replaced += 1
+            self.logger.warning(f"⚠️ Junction {junction_id} controller reconnected; closing old socket")
+            try:
+                await asyncio.wait_for(previous.close(code=REPLACED_CLOSE_CODE), self.send_timeout)
+            except Exception:
+                pass
+
+    def unregister(self, junction_id: int, ws) -> None:
+        if self.connections.get(junction_id) is ws:
+            del self.connections[junction_id]
+
+    async def handle(self, junction_id: int, text: str) -> Dict[str, Any]:
+        """Reply to one message from a controller"""
+        if text == "ping":
+            return {"type": "pong"}
+        try:
+            data = json.loads(text)
+        except ValueError:
+            self.rejected += 1
+            return {"type": "error", "message": "Invalid JSON"}
+        problem = _validate_report(junction_id, data)
+        if problem:
+            self.rejected += 1
+            return {"type": "error", "message": problem, "cycle_id": _cycle_id(data)}
+
+        report = {**data, "junction_id": junction_id}
+        process = self.process
+        if process is None:
+            self.failed += 1
+            self.logger.error("❌ Device gateway has no calculation pipeline")
+            return {"type": "error", "message": "Calculation failed", "cycle_id": report.get("cycle_id")}
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        started = time.perf_counter()
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                reply = await process(report, "ws/ingest", component="device_gateway")
+            except Exception as e:
+                self.logger.error(f"❌ Junction {junction_id} report failed: {e}")
+                reply = None
+            finally:
+                self.in_flight -= 1
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.reports += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+        if reply is None:
+            self.failed += 1
+            return {"type": "error", "message": "Calculation failed", "cycle_id": report.get("cycle_id")}
+        return {"type": "green_times", **reply}
+
+    async def send(self, ws, reply: Dict[str, Any]) -> None:
+        async with asyncio.timeout(self.send_timeout):
+            await ws.send_text(json.dumps(reply))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": len(self.connections),
+            "reports": self.reports,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "replaced": self.replaced,
+            "in_flight": self.in_flight,
+            "avg_ms": round(self.total_ms / self.reports, 1) if self.reports else 0.0,
+            "max_ms": round(self.max_ms, 1),
+        }
+
+    async def close_all(self) -> None:
+        """Close every controller connection (shutdown)"""
+        connections = list(self.connections.values())
+        self.connections.clear()
+        await asyncio.gather(
+            *(asyncio.wait_for(ws.close(code=1001), self.send_timeout) for ws in connections),
+            return_exceptions=True,
+        )
+
+
+def _cycle_id(data: Any) -> Any:
+    return data.get("cycle_id") if isinstance(data, dict) else None
+
+
+# Process-wide gateway; main wires it to the MQTT calculation pipeline
+device_gateway = DeviceGateway()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Print the device token for a junction")
+    parser.add_argument("junction_id", type=int)
+    args = parser.parse_args()
+    if not settings.DEVICE_TOKEN_SECRET:
+        parser.error("DEVICE_TOKEN_SECRET is not set")
+    print(device_token(args.junction_id))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+In-process Event Bus
+Detection ingest, timing calculations, the MQTT handler and system logging
+publish typed events once; sinks (WebSocket fan-out, rolling counters, the
+system_logs write-behind) consume them from their own bounded queues, so a
+producer never awaits a sink and a slow sink never delays the others
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, List, Optional
+
+from app.config import settings
+
+# Event types
+DETECTION = "detection"
+PLAN_CALCULATED = "plan_calculated"
+MQTT_RECEIVED = "mqtt_received"
+SYSTEM_LOG = "system_log"
+EVENT_TYPES = (DETECTION, PLAN_CALCULATED, MQTT_RECEIVED, SYSTEM_LOG)
+
+# Event data kept for in-process sinks but never sent to WebSocket / SSE
+# clients: a FASTag id identifies a vehicle
+PRIVATE_FIELDS = frozenset({"fastag_id"})
+
+
+class Event:
+    """One published fact; `data` holds the type-specific fields"""
+
+    __slots__ = ("type", "junction_id", "component", "level", "data", "timestamp")
+
+    def __init__(
+        self,
+        type: str,
+        junction_id: Optional[int] = None,
+        component: Optional[str] = None,
+        level: str = "INFO",
+        data: Optional[Dict[str, Any]] = None,
+    ):
+        self.type = type
+        self.junction_id = junction_id
+        self.component = component
+        self.level = level
+        self.data = data or {}
+        self.timestamp = datetime.now(timezone.utc)
+
+    def to_message(self) -> Dict[str, Any]:
+        """
+        Flat dict for WebSocket clients (routed on junction_id / component /
+        log_level), without PRIVATE_FIELDS
+        """
+        return {
+            "type": self.type,
+            "junction_id": self.junction_id,
+            "component": self.component,
+            "log_level": self.level,
+            "timestamp": self.timestamp.isoformat(),
+            **{k: v for k, v in self.data.items() if k not in PRIVATE_FIELDS},
+        }
+
+
+def detection_event(
+    junction_id: int, lane_number: int, fastag_id: str, vehicle_type: Optional[str] = None
+) -> Event:
+    return Event(
+        DETECTION,
+        junction_id,
+        component="vehicle_detection",
+        data={"lane_number": lane_number, "fastag_id": fastag_id, "vehicle_type": vehicle_type},
+    )
+
+
+def plan_event(
+    junction_id: Optional[int],
+    lane_counts: List[int],
+    green_times: List[int],
+    cycle_time: int,
+    component: str = "traffic_calculator",
+) -> Event:
+    return Event(
+        PLAN_CALCULATED,
+        junction_id,
+        component=component,
+        data={"lane_counts": lane_counts, "green_times": green_times, "cycle_time": cycle_time},
+    )
+
+
+def mqtt_event(
+    topic: str, junction_id: Optional[int], cycle_id: Optional[int], lane_counts: List[int]
+) -> Event:
+    return Event(
+        MQTT_RECEIVED,
+        junction_id,
+        component="mqtt_handler",
+        data={"topic": topic, "cycle_id": cycle_id, "lane_counts": lane_counts},
+    )
+
+
+def log_event(
+    message: str,
+    log_level: str = "INFO",
+    component: str = "backend",
+    junction_id: Optional[int] = None,
+    error_type: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> Event:
+    """A system log line; with `error_type` it is stored as an error (log_system_error)"""
+    data: Dict[str, Any] = {"message": message}
+    if error_type:
+        data["error_type"] = error_type
+        if metadata:
+            data["metadata"] = metadata
+    return Event(
+        SYSTEM_LOG,
+        junction_id,
+        component=component,
+        level="ERROR" if error_type else log_level,
+        data=data,
+    )
+
+
+Handler = Callable[[Event], Awaitable[None]]
+
+
+class _Subscription:
+    __slots__ = ("name", "handler", "types", "queue", "task", "delivered", "dropped", "errors")
+
+    def __init__(self, name: str, handler: Handler, types: Optional[FrozenSet[str]], max_queue: int):
+        self.name = name
+        self.handler = handler
+        self.types = types
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.task: Optional[asyncio.Task] = None
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+
+
+class EventBus:
+    """
+    Fan-out of events to named sinks.
+
+    publish() is synchronous and never blocks: the event goes onto the
+    bounded queue of every sink subscribed to its type, and each sink's
+    consumer task awaits its handler one event at a time. A full queue
+    drops its oldest event. A handler error is logged and counted; the
+    sink keeps consuming.
+    """
+
+    def __init__(self, max_queue: Optional[int] = None):
+        self.max_queue = max_queue or settings.EVENT_BUS_QUEUE_SIZE
+        self._subscriptions: Dict[str, _Subscription] = {}
+        self.published: Dict[str, int] = dict.fromkeys(EVENT_TYPES, 0)
+        self._running = False
+        self.logger = logging.getLogger(__name__)
+
+    def subscribe(self, name: str, handler: Handler, types: Optional[Iterable[str]] = None) -> None:
+        """Register (or replace) sink `name` for `types` (default: all)"""
+        self.unsubscribe(name)
+        subscription = _Subscription(
+            name, handler, frozenset(types) if types else None, self.max_queue
+        )
+        self._subscriptions[name] = subscription
+        if self._running:
+            subscription.task = asyncio.create_task(self._consume(subscription))
+
+    def unsubscribe(self, name: str) -> None:
+        subscription = self._subscriptions.pop(name, None)
+        if subscription is not None and subscription.task is not None:
+            subscription.task.cancel()
+
+    def publish(self, event: Event) -> int:
+        """Queue `event` for its sinks; returns how many it was queued for"""
+        self.published[event.type] = self.published.get(event.type, 0) + 1
+        queued = 0
+        for subscription in self._subscriptions.values():
+            if subscription.types is not None and event.type not in subscription.types:
+                continue
+            if subscription.queue.full():
+                subscription.queue.get_nowait()
+                subscription.queue.task_done()
+                subscription.dropped += 1
+            subscription.queue.put_nowait(event)
+            queued += 1
+        return queued
+
+    async def _consume(self, subscription: _Subscription) -> None:
+        while True:
+            event = await subscription.queue.get()
+            try:
+                await subscription.handler(event)
+                subscription.delivered += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                subscription.errors += 1
+                self.logger.error(f"❌ Event sink {subscription.name} failed on {event.type}: {e}")
+            finally:
+                subscription.queue.task_done()
+
+    def start(self) -> None:
+        """Start a consumer task per sink on the running event loop"""
+        self._running = True
+        for subscription in self._subscriptions.values():
+            if subscription.task is None or subscription.task.done():
+                subscription.task = asyncio.create_task(self._consume(subscription))
+
+    async def drain(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued event has been handled; False on timeout"""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(s.queue.join() for s in self._subscriptions.values())),
+                timeout,
+            )
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stop(self, drain_timeout: float = 5.0) -> None:
+        """Flush queued events (up to `drain_timeout`), then stop the consumers"""
+        if self._running:
+            await self.drain(drain_timeout)
+        self._running = False
+        tasks = [s.task for s in self._subscriptions.values() if s.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for subscription in self._subscriptions.values():
+            subscription.task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._running,
+            "published": dict(self.published),
+            "sinks": {
+                s.name: {
+                    "queued": s.queue.qsize(),
+                    "delivered": s.delivered,
+                    "dropped": s.dropped,
+                    "errors": s.errors,
+                }
+                for s in self._subscriptions.values()
+            },
+        }
+
+
+class EventCounters:
+    """
+    Rolling per-junction counts of detections, calculated plans and MQTT
+    receipts over the last `window_seconds`, in one-minute buckets
+    """
+
+    COUNTED = (DETECTION, PLAN_CALCULATED, MQTT_RECEIVED)
+
+    def __init__(self, window_seconds: int = 900, clock: Callable[[], float] = time.time):
+        self.window_minutes = max(1, window_seconds // 60)
+        self._clock = clock
+        # junction_id -> event type -> minute -> count
+        self._buckets: Dict[Any, Dict[str, Dict[int, int]]] = {}
+        self.totals: Dict[str, int] = dict.fromkeys(EVENT_TYPES, 0)
+
+    async def handle(self, event: Event) -> None:
+        self.record(event)
+
+    def record(self, event: Event) -> None:
+        self.totals[event.type] = self.totals.get(event.type, 0) + 1
+        if event.type not in self.COUNTED:
+            return
+        minute = int(event.timestamp.timestamp() // 60)
+        buckets = self._buckets.setdefault(event.junction_id, {}).setdefault(event.type, {})
+        buckets[minute] = buckets.get(minute, 0) + 1
+        for stale in [m for m in buckets if m <= minute - self.window_minutes]:
+            del buckets[stale]
+
+    def rolling(self) -> Dict[Any, Dict[str, int]]:
+        """junction_id -> event type -> count within the window"""
+        horizon = int(self._clock() // 60) - self.window_minutes
+        return {
+            junction_id: {
+                event_type: sum(n for m, n in buckets.items() if m > horizon)
+                for event_type, buckets in by_type.items()
+            }
+            for junction_id, by_type in sorted(
+                self._buckets.items(), key=lambda item: (item[0] is None, item[0] or 0)
+            )
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_minutes": self.window_minutes,
+            "totals": dict(self.totals),
+            "junctions": self.rolling(),
+        }
+
+    def clear(self) -> None:
+        self._buckets.clear()
+        self.totals = dict.fromkeys(EVENT_TYPES, 0)
+
+
+class SystemLogWriter:
+    """Write-behind sink persisting SYSTEM_LOG events to system_logs"""
+
+    def __init__(self, db_service):
+        self.db_service = db_service
+
+    async def handle(self, event: Event) -> None:
+        if event.type != SYSTEM_LOG:
+            return
+        error_type = event.data.get("error_type")
+        if error_type:
+            await self.db_service.log_system_error(
+                error_message=event.data["message"],
+                error_type=error_type,
+                component=event.component,
+                junction_id=event.junction_id,
+                metadata=event.data.get("metadata"),
+            )
+        else:
+            await self.db_service.log_system_event(
+                message=event.data["message"],
+                log_level=event.level,
+                component=event.component,
+                junction_id=event.junction_id,
+            )
+
+
+# Process-wide bus and counters, wired to their sinks at startup
+event_bus = EventBus()
+event_counters = EventCounters()
@@ -0,0 +1,185 @@
+"""
+Dedicated Thread Pools
+Separately sized executors for database reads, database writes and
+CPU-bound work (bcrypt), so a flood of log inserts or password hashes can't
+queue latency-critical reads behind them in the shared default executor
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Tuple
+
+from app.config import settings
+
+DB_READ = "db_read"
+DB_WRITE = "db_write"
+CPU = "cpu"
+
+
+def _percentile(samples: list, fraction: float) -> float:
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+
+class InstrumentedExecutor:
+    """
+    Thread pool that measures how long work waits for a free worker and how
+    busy the workers are.
+
+    Queue wait is kept for the last `wait_samples` tasks; utilisation is the
+    share of worker time spent running tasks over the last `window_seconds`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int,
+        window_seconds: float = 60.0,
+        wait_samples: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.max_workers = max_workers
+        self.window_seconds = window_seconds
+        self._clock = clock
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"flextraff-{name}"
+        )
+        self._lock = threading.Lock()
+        self._created = clock()
+
+        self.submitted = 0
+        self.completed = 0
+        self._queued = 0
+        self._running: Dict[int, float] = {}
+        self._finished: Deque[Tuple[float, float]] = deque()
+        self._waits: Deque[float] = deque(maxlen=wait_samples)
+
+    def _execute(self, task_id: int, submitted: float, context, fn, args, kwargs) -> Any:
+        started = self._clock()
+        with self._lock:
+            self._queued -= 1
+            self._running[task_id] = started
+            self._waits.append(started - submitted)
+        try:
+            return context.run(fn, *args, **kwargs)
+        finally:
+            finished = self._clock()
+            with self._lock:
+                del self._running[task_id]
+                self.completed += 1
+                self._finished.append((started, finished))
+                self._prune(finished)
+
+    def _prune(self, now: float) -> None:
+        horizon = now - self.window_seconds
+        while self._finished and self._finished[0][1] <= horizon:
+            self._finished.popleft()
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run `fn(*args, **kwargs)` on this pool (context vars propagate, like to_thread)"""
+        with self._lock:
+            self.submitted += 1
+            task_id = self.submitted
+            self._queued += 1
+
+        future = self._pool.submit(
+            self._execute,
+            task_id,
+            self._clock(),
+            contextvars.copy_context(),
+            fn,
+            args,
+            kwargs,
+        )
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Cancelled before a worker picked it up: it will never run
+            if future.cancelled():
+                with self._lock:
+                    self._queued -= 1
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool size, queue depth, queue-wait percentiles and utilisation"""
+        now = self._clock()
+        with self._lock:
+            self._prune(now)
+            horizon = now - self.window_seconds
+            busy = sum(end - max(start, horizon) for start, end in self._finished)
+            busy += sum(now - max(start, horizon) for start in self._running.values())
+            waits = sorted(self._waits)
+            active, queued = len(self._running), self._queued
+
+        window = min(self.window_seconds, now - self._created) or self.window_seconds
+        return {
+            "workers": self.max_workers,
+            "active": active,
+            "queued": queued,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "utilisation": round(min(busy / (window * self.max_workers), 1.0), 3),
+            "queue_wait_ms": {
+                "p50": round(_percentile(waits, 0.50) * 1000, 2) if waits else 0.0,
+                "p95": round(_percentile(waits, 0.95) * 1000, 2) if waits else 0.0,
+                "max": round(waits[-1] * 1000, 2) if waits else 0.0,
+            },
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_executors: Dict[str, InstrumentedExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _pool_size(name: str) -> int:
+    if name == DB_READ:
+        return settings.DB_READ_WORKERS
+    if name == DB_WRITE:
+        return settings.DB_WRITE_WORKERS
+    return settings.CPU_WORKERS or max(os.cpu_count() or 1, 2)
+
+
+def get_executor(name: str) -> InstrumentedExecutor:
+    """Process-wide pool `name` (DB_READ, DB_WRITE or CPU), created on first use"""
+    if name not in (DB_READ, DB_WRITE, CPU):
+        raise ValueError(f"Unknown executor {name}")
+    with _executors_lock:
+        if name not in _executors:
+            _executors[name] = InstrumentedExecutor(name, _pool_size(name))
+        return _executors[name]
+
+
+async def run_db_read(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    return await get_executor(DB_READ).run(fn, *args, **kwargs)
+
+
+async def run_db_write(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    return await get_executor(DB_WRITE).run(fn, *args, **kwargs)
+
+
+async def run_cpu(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    return await get_executor(CPU).run(fn, *args, **kwargs)
+
+
+def executor_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats of every pool created so far"""
+    with _executors_lock:
+        executors = dict(_executors)
+    return {name: executor.stats() for name, executor in sorted(executors.items())}
+
+
+def shutdown_executors(wait: bool = False) -> None:
+    """Stop all pools; the next call to get_executor starts fresh ones"""
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
@@ -0,0 +1,161 @@
+"""
+Junction Metadata Cache
+In-memory index of active junctions keyed by junction ID, so per-junction
+endpoints don't fetch the whole traffic_junctions table to find one row
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+
+
+class JunctionCache:
+    """
+    Process-wide cache of active junction rows.
+
+    Rows are loaded through DatabaseService.get_all_junctions() and kept for
+    `ttl_seconds`; lookups by ID are served from a dict index, and an ID
+    missing from it triggers a throttled reload. Each load gets
+    an ETag derived from the row contents so HTTP clients can revalidate
+    without the server touching the database.
+    """
+
+    def __init__(
+        self, ttl_seconds: Optional[float] = None, miss_reload_seconds: Optional[float] = None
+    ):
+        self.ttl_seconds = (
+            settings.JUNCTION_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        )
+        self.miss_reload_seconds = (
+            settings.JUNCTION_CACHE_MISS_RELOAD_SECONDS
+            if miss_reload_seconds is None
+            else miss_reload_seconds
+        )
+        self._miss_reload_at: Optional[float] = None
+        self._junctions: List[Dict[str, Any]] = []
+        self._by_id: Dict[int, Dict[str, Any]] = {}
+        self._etag: Optional[str] = None
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < self.ttl_seconds
+        )
+
+    @staticmethod
+    def _compute_etag(junctions: List[Dict[str, Any]]) -> str:
+        body = json.dumps(junctions, sort_keys=True, default=str).encode()
+        return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+    async def _load(self, db) -> None:
+        """Reload rows from the database; the caller holds the lock"""
+        try:
+            junctions = await db.get_all_junctions()
+        except Exception as e:
+            if not self._junctions:
+                raise
+            # Keep serving the last good rows until the database recovers
+            self.logger.warning(f"⚠️ Junction refresh failed, serving stale cache: {e}")
+            return
+
+        if not junctions and self._junctions:
+            # get_all_junctions() returns [] on a database error
+            self.logger.warning("⚠️ Junction refresh returned no rows, serving stale cache")
+            return
+
+        self._junctions = junctions
+        self._by_id = {junction["id"]: junction for junction in junctions}
+        self._etag = self._compute_etag(junctions)
+
+        # An empty result is usually a swallowed DB error - don't pin it
+        self._loaded_at = time.monotonic() if junctions else None
+
+    async def _ensure_loaded(self, db) -> None:
+        if self._is_fresh():
+            return
+
+        # Single-flight: concurrent requests share one refresh
+        async with self._lock:
+            if self._is_fresh():
+                return
+            await self._load(db)
+
+    async def _reload_after_miss(self, db, junction_id: int) -> None:
+        """
+        Reload once for an ID missing from fresh rows (a junction added since
+        the last load), at most every `miss_reload_seconds`, so lookups of
+        unknown IDs can't turn into a reload per request
+        """
+        async with self._lock:
+            if junction_id in self._by_id:
+                # Found by a reload another request just ran
+                return
+            now = time.monotonic()
+            if (
+                self._miss_reload_at is not None
+                and now - self._miss_reload_at < self.miss_reload_seconds
+            ):
+                return
+            self._miss_reload_at = now
+            await self._load(db)
+
+    async def get_all(self, db) -> List[Dict[str, Any]]:
+        """All active junctions, ordered as returned by the database"""
+        await self._ensure_loaded(db)
+        return self._junctions
+
+    async def get(self, db, junction_id: int) -> Optional[Dict[str, Any]]:
+        """Single junction row by ID, or None if unknown/inactive"""
+        await self._ensure_loaded(db)
+        if junction_id not in self._by_id:
+            await self._reload_after_miss(db, junction_id)
+        return self._by_id.get(junction_id)
+
+    async def get_etag(self, db) -> str:
+        """ETag of the current junction list"""
+        await self._ensure_loaded(db)
+        return self._etag or self._compute_etag(self._junctions)
+
+    def invalidate(self) -> None:
+        """Drop cached rows; the next lookup reloads from the database"""
+        self._junctions = []
+        self._by_id = {}
+        self._etag = None
+        self._loaded_at = None
+        self._miss_reload_at = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache state for diagnostics"""
+        return {
+            "junctions": len(self._junctions),
+            "fresh": self._is_fresh(),
+            "age_seconds": (
+                round(time.monotonic() - self._loaded_at, 1)
+                if self._loaded_at is not None
+                else None
+            ),
+            "ttl_seconds": self.ttl_seconds,
+            "etag": self._etag,
+        }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an If-None-Match header against an ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(
+        tag.removeprefix("W/") == etag for tag in candidates
+    )
+
+
+# single cache instance shared by all request handlers
+junction_cache = JunctionCache()
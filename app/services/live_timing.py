@@ -0,0 +1,261 @@
+"""
+Live Timing Stream
+Per-junction live state - rolling lane counts, the current signal plan and
+the phase countdown - kept in memory from the broadcast events every
+process receives (detections, calculated plans), and pushed to WebSocket
+clients as delta frames: each frame carries only the fields that changed
+since the junction's previous frame. Changes are coalesced to at most
+LIVE_TIMING_MAX_FPS frames per second per junction, replacing dashboards
+polling /junction/{id}/live-timing (a DB scan and a recalculation each).
+"""
+
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+
+LIVE_TIMING = "live_timing"
+LANES = 4
+
+# Event types the tracker follows (the first element of a broadcast's route key)
+_DETECTION = "detection"
+_PLAN_CALCULATED = "plan_calculated"
+
+
+class _JunctionState:
+    __slots__ = (
+        "detections", "lane_counts", "green_times", "cycle_time", "plan_lane_counts",
+        "plan_started", "plan_calculated_at", "last_frame", "frame", "dirty",
+    )
+
+    def __init__(self):
+        # (second, lane index) of detections within the window
+        self.detections: Deque[Tuple[int, int]] = deque()
+        self.lane_counts = [0] * LANES
+        self.green_times: Optional[List[int]] = None
+        self.cycle_time: Optional[int] = None
+        self.plan_lane_counts: Optional[List[int]] = None
+        self.plan_started: Optional[float] = None
+        self.plan_calculated_at: Optional[str] = None
+        # Fields as of the last frame sent
+        self.last_frame: Dict[str, Any] = {}
+        self.frame = 0
+        self.dirty = True
+
+
+class LiveTimingTracker:
+    """
+    observe() is a WSManager listener: it sees every delivered broadcast
+    (from every worker with the Redis backend) and parses only detection
+    and plan events. A ticker task diffs each changed junction once per
+    frame interval and hands the frame to `deliver`, so every process
+    computes the same frames for its own clients.
+
+    A frame is {"type": "live_timing", "junction_id", "frame", "keyframe",
+    ...changed fields}. Every `keyframe_seconds` a junction sends its full
+    state; a client that sees a gap in "frame" can also ask for a snapshot.
+    """
+
+    def __init__(
+        self,
+        max_fps: Optional[float] = None,
+        window_seconds: int = 300,
+        keyframe_seconds: float = 30.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_fps = max_fps or settings.LIVE_TIMING_MAX_FPS
+        self.window_seconds = window_seconds
+        self.keyframe_seconds = keyframe_seconds
+        self._clock = clock
+        self._junctions: Dict[int, _JunctionState] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._last_keyframe = 0.0
+        self.events = 0
+        self.frames = 0
+        self.keyframes = 0
+        self.logger = logging.getLogger(__name__)
+
+    # ------------------------------------------------------------------
+    # Input
+    # ------------------------------------------------------------------
+
+    def observe(self, payload: str, route) -> None:
+        """WSManager listener; ignores everything but detections and plans"""
+        junction_id, _, _, key = route
+        if junction_id is None or not isinstance(key, tuple) or not key:
+            return
+        if key[0] not in (_DETECTION, _PLAN_CALCULATED):
+            return
+        self.observe_message(json.loads(payload))
+
+    def observe_message(self, message: Dict[str, Any]) -> None:
+        junction_id = message.get("junction_id")
+        if junction_id is None:
+            return
+        state = self._state(junction_id)
+        now = self._clock()
+        if message.get("type") == _DETECTION:
+            lane = message.get("lane_number")
+            if isinstance(lane, int) and 1 <= lane <= LANES:
+                state.detections.append((int(now), lane - 1))
+                state.lane_counts[lane - 1] += 1
+        elif message.get("type") == _PLAN_CALCULATED:
+            state.green_times = list(message.get("green_times") or [])
+            state.cycle_time = message.get("cycle_time")
+            state.plan_lane_counts = list(message.get("lane_counts") or [])
+            state.plan_started = now
+            state.plan_calculated_at = message.get("timestamp")
+        else:
+            return
+        self.events += 1
+        state.dirty = True
+
+    def _state(self, junction_id: int) -> _JunctionState:
+        state = self._junctions.get(junction_id)
+        if state is None:
+            state = self._junctions[junction_id] = _JunctionState()
+        return state
+
+    # ------------------------------------------------------------------
+    # State and frames
+    # ------------------------------------------------------------------
+
+    def _expire(self, state: _JunctionState, now: float) -> None:
+        horizon = int(now) - self.window_seconds
+        detections = state.detections
+        while detections and detections[0][0] <= horizon:
+            _, lane = detections.popleft()
+            state.lane_counts[lane] -= 1
+            state.dirty = True
+
+    def _phase(self, state: _JunctionState, now: float) -> Tuple[Optional[int], Optional[int]]:
+        """(green lane 1-4 or None during clearance, whole seconds left in the phase)"""
+        if not state.green_times or not state.cycle_time or state.plan_started is None:
+            return None, None
+        elapsed = (now - state.plan_started) % state.cycle_time
+        phase_end = 0.0
+        for lane, green in enumerate(state.green_times, start=1):
+            phase_end += green
+            if elapsed < phase_end:
+                return lane, math.ceil(phase_end - elapsed)
+        return None, math.ceil(state.cycle_time - elapsed)
+
+    def _fields(self, state: _JunctionState, now: float) -> Dict[str, Any]:
+        self._expire(state, now)
+        phase_lane, phase_remaining = self._phase(state, now)
+        return {
+            "lane_counts": list(state.lane_counts),
+            "green_times": state.green_times,
+            "cycle_time": state.cycle_time,
+            "plan_lane_counts": state.plan_lane_counts,
+            "plan_calculated_at": state.plan_calculated_at,
+            "phase_lane": phase_lane,
+            "phase_remaining": phase_remaining,
+        }
+
+    def _frame(self, junction_id: int, fields: Dict[str, Any], keyframe: bool) -> Dict[str, Any]:
+        return {
+            "type": LIVE_TIMING,
+            "junction_id": junction_id,
+            "component": LIVE_TIMING,
+            "log_level": "INFO",
+            "window_seconds": self.window_seconds,
+            "keyframe": keyframe,
+            **fields,
+        }
+
+    def snapshot(self, junction_id: int) -> Optional[Dict[str, Any]]:
+        """Full state of a tracked junction, numbered like its last frame"""
+        state = self._junctions.get(junction_id)
+        if state is None:
+            return None
+        frame = self._frame(junction_id, self._fields(state, self._clock()), keyframe=True)
+        frame["frame"] = state.frame
+        return frame
+
+    def snapshots(self, junction_ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """Snapshots for `junction_ids` (None: every tracked junction)"""
+        ids = sorted(self._junctions) if junction_ids is None else sorted(junction_ids)
+        return [s for s in map(self.snapshot, ids) if s is not None]
+
+    def tick(self) -> List[Dict[str, Any]]:
+        """
+        Frames due now: a delta for every junction whose fields changed
+        (the countdown changes every second while a plan runs), or a full
+        keyframe for every junction once per `keyframe_seconds`.
+        """
+        now = self._clock()
+        keyframe = now - self._last_keyframe >= self.keyframe_seconds
+        if keyframe:
+            self._last_keyframe = now
+        frames = []
+        for junction_id, state in self._junctions.items():
+            if not (keyframe or state.dirty or state.plan_started is not None
+                    or state.detections):
+                continue
+            fields = self._fields(state, now)
+            changes = fields if keyframe else {
+                k: v for k, v in fields.items() if state.last_frame.get(k, ...) != v
+            }
+            state.dirty = False
+            if not changes:
+                continue
+            state.last_frame = fields
+            state.frame += 1
+            frame = self._frame(junction_id, changes, keyframe)
+            frame["frame"] = state.frame
+            frames.append(frame)
+        self.frames += len(frames)
+        if keyframe:
+            self.keyframes += 1
+        return frames
+
+    # ------------------------------------------------------------------
+    # Ticker
+    # ------------------------------------------------------------------
+
+    def start(self, deliver: Callable[[Dict[str, Any]], Any]) -> None:
+        """Emit frames through `deliver` at most max_fps times a second"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(deliver))
+
+    async def _run(self, deliver: Callable[[Dict[str, Any]], Any]) -> None:
+        interval = 1.0 / self.max_fps
+        while True:
+            try:
+                for frame in self.tick():
+                    deliver(frame)
+            except Exception as e:
+                self.logger.error(f"❌ Live timing frame failed: {e}")
+            await asyncio.sleep(interval)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "junctions": len(self._junctions),
+            "max_fps": self.max_fps,
+            "events": self.events,
+            "frames": self.frames,
+            "keyframes": self.keyframes,
+        }
+
+    def clear(self) -> None:
+        self._junctions.clear()
+        self._last_keyframe = 0.0
+
+
+# Process-wide tracker, fed by the WebSocket manager at startup
+live_timing = LiveTimingTracker()
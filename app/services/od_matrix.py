@@ -0,0 +1,268 @@
+"""
+Origin-Destination Matrix Job
+Streams a day of vehicle_detections, sessionizes each FASTag into trips
+across junctions and counts trips per (time slice, origin, destination)
+into a sparse junction x junction matrix for planners
+
+Usage:
+    python -m app.services.od_matrix --start 2025-09-15 --end 2025-09-16 \\
+        --out od/ [--slice-minutes 60] [--max-gap-minutes 30] [--workers 8]
+"""
+
+import argparse
+import asyncio
+import csv
+import gzip
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+# Spilled detection: 64-bit tag hash, epoch seconds, junction id
+SPILL_RECORD = struct.Struct("<qdi")
+
+# (slice index, origin junction, destination junction) -> trips
+ODCounts = Dict[Tuple[int, int, int], int]
+
+
+def _tag_key(fastag_id: str) -> int:
+    """Stable 64-bit key for a tag (identical across worker processes)"""
+    return int.from_bytes(
+        hashlib.blake2b(fastag_id.encode(), digest_size=8).digest(), "little", signed=True
+    )
+
+
+def _epoch(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def sessionize_partition(
+    path: str,
+    day_start: float,
+    day_end: float,
+    slice_seconds: int,
+    max_gap_seconds: float,
+) -> Tuple[ODCounts, Dict[str, int]]:
+    """
+    Count the trips in one spilled partition. Runs in a worker process.
+
+    Records are sorted by (tag, time); a trip is a run of one tag's
+    detections with no gap over `max_gap_seconds`. Repeat detections at the
+    same junction collapse, and a trip seen at a single junction has no
+    destination, so it is counted as unmatched. Only trips starting in
+    [day_start, day_end) are counted, in the slice of their first detection.
+    """
+    with open(path, "rb") as f:
+        records = sorted(SPILL_RECORD.iter_unpack(f.read()))
+
+    counts: ODCounts = Counter()
+    stats = {"detections": len(records), "tags": 0, "trips": 0, "unmatched": 0}
+
+    def close_trip(start: float, origin: int, destination: int, hops: int) -> None:
+        if not day_start <= start < day_end:
+            return
+        if hops == 0:
+            stats["unmatched"] += 1
+            return
+        stats["trips"] += 1
+        counts[(int((start - day_start) // slice_seconds), origin, destination)] += 1
+
+    tag = None
+    start = last_at = 0.0
+    origin = last_junction = hops = 0
+    for key, at, junction_id in records:
+        if key != tag or at - last_at > max_gap_seconds:
+            if tag is not None:
+                close_trip(start, origin, last_junction, hops)
+            if key != tag:
+                stats["tags"] += 1
+                tag = key
+            start, origin, last_junction, hops = at, junction_id, junction_id, 0
+        elif junction_id != last_junction:
+            last_junction = junction_id
+            hops += 1
+        last_at = at
+    if tag is not None:
+        close_trip(start, origin, last_junction, hops)
+
+    return dict(counts), stats
+
+
+class ODMatrixBuilder:
+    """
+    Hourly (or `slice_minutes`) origin-destination matrices, one day at a time.
+
+    The day is read once in id-ordered keyset chunks, padded by
+    `max_gap_minutes` on both sides so trips running over midnight are
+    neither cut short nor counted twice. Each detection is spilled as a
+    fixed-width record to one of `workers` partition files by tag hash, so
+    every tag's detections land in one partition and the parent holds no
+    more than one read chunk in memory. Partitions are sessionized in a
+    process pool and their counts summed.
+
+    Output per day, written atomically:
+
+        <out>/od_YYYY-MM-DD.csv.gz   slice_start,origin_junction_id,destination_junction_id,trips
+        <out>/od_YYYY-MM-DD.json     parameters and detection / trip totals
+
+    Only non-zero cells are written (COO form), sorted by slice then origin.
+    """
+
+    def __init__(
+        self,
+        db_service,
+        output_dir: str,
+        slice_minutes: int = 60,
+        max_gap_minutes: int = 30,
+        workers: Optional[int] = None,
+        read_chunk_size: int = 1000,
+    ):
+        self.db_service = db_service
+        self.output_dir = output_dir
+        self.slice_seconds = slice_minutes * 60
+        self.max_gap_seconds = max_gap_minutes * 60
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.read_chunk_size = read_chunk_size
+        self.logger = logging.getLogger(__name__)
+
+    async def _spill(self, start: datetime, end: datetime, spill_dir: str) -> Tuple[List[str], int]:
+        """Stream detections in [start, end) into per-partition spill files"""
+        paths = [os.path.join(spill_dir, f"part-{i}.bin") for i in range(self.workers)]
+        files = [open(path, "wb", buffering=1 << 20) for path in paths]
+        read = 0
+        try:
+            async for chunk in self.db_service.iter_rows_by_id(
+                "vehicle_detections",
+                "detection_timestamp",
+                start,
+                end,
+                columns="id,junction_id,fastag_id,detection_timestamp",
+                chunk_size=self.read_chunk_size,
+            ):
+                for row in chunk:
+                    key = _tag_key(row["fastag_id"])
+                    files[key % self.workers].write(
+                        SPILL_RECORD.pack(
+                            key, _epoch(row["detection_timestamp"]), row["junction_id"]
+                        )
+                    )
+                read += len(chunk)
+        finally:
+            for f in files:
+                f.close()
+        return paths, read
+
+    async def _sessionize(self, paths: List[str], day_start: float, day_end: float):
+        args = (day_start, day_end, self.slice_seconds, self.max_gap_seconds)
+        if self.workers == 1:
+            return [await asyncio.to_thread(sessionize_partition, paths[0], *args)]
+
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            return await asyncio.gather(
+                *(loop.run_in_executor(pool, sessionize_partition, path, *args) for path in paths)
+            )
+
+    def _write(self, day: date, counts: ODCounts, summary: Dict[str, Any]) -> str:
+        day_start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+        path = os.path.join(self.output_dir, f"od_{day.isoformat()}.csv.gz")
+
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                ["slice_start", "origin_junction_id", "destination_junction_id", "trips"]
+            )
+            for (slice_index, origin, destination), trips in sorted(counts.items()):
+                slice_start = day_start + timedelta(seconds=slice_index * self.slice_seconds)
+                writer.writerow([slice_start.isoformat(), origin, destination, trips])
+        os.replace(tmp_path, path)
+
+        summary_path = os.path.join(self.output_dir, f"od_{day.isoformat()}.json")
+        with open(summary_path + ".tmp", "w") as f:
+            json.dump(summary, f, indent=2)
+        os.replace(summary_path + ".tmp", summary_path)
+        return path
+
+    async def build_day(self, day: date) -> Dict[str, Any]:
+        """Build and write the OD matrix for one UTC day"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        day_start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+        day_end = day_start + timedelta(days=1)
+        padding = timedelta(seconds=self.max_gap_seconds)
+
+        with tempfile.TemporaryDirectory(prefix=".od-spill-", dir=self.output_dir) as spill_dir:
+            paths, read = await self._spill(day_start - padding, day_end + padding, spill_dir)
+            results = await self._sessionize(
+                paths, day_start.timestamp(), day_end.timestamp()
+            )
+
+        counts: ODCounts = Counter()
+        totals: Counter[str] = Counter()
+        for partition_counts, partition_stats in results:
+            counts.update(partition_counts)
+            totals.update(partition_stats)
+
+        summary = {
+            "date": day.isoformat(),
+            "slice_minutes": self.slice_seconds // 60,
+            "max_gap_minutes": self.max_gap_seconds // 60,
+            "detections_read": read,
+            "tags": totals["tags"],
+            "trips": totals["trips"],
+            "unmatched_trips": totals["unmatched"],
+            "cells": len(counts),
+        }
+        path = await asyncio.to_thread(self._write, day, counts, summary)
+
+        self.logger.info(
+            f"🗺️ OD matrix {day}: {summary['trips']} trips from {read} detections "
+            f"in {len(counts)} cells"
+        )
+        return {**summary, "file": path}
+
+    async def build(self, start_date: date, end_date: date) -> List[Dict[str, Any]]:
+        """Build each day in [start_date, end_date) in turn"""
+        days = (end_date - start_date).days
+        return [await self.build_day(start_date + timedelta(days=i)) for i in range(days)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build origin-destination matrices")
+    parser.add_argument("--start", required=True, type=date.fromisoformat, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Day after the last day (default: start + 1)")
+    parser.add_argument("--out", default="od", help="Output directory")
+    parser.add_argument("--slice-minutes", type=int, default=60, help="Matrix time slice")
+    parser.add_argument("--max-gap-minutes", type=int, default=30, help="Gap that ends a trip")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPUs)")
+    args = parser.parse_args()
+
+    from app.services.database_service import create_database_service
+
+    logging.basicConfig(level=logging.INFO)
+    builder = ODMatrixBuilder(
+        create_database_service(),
+        args.out,
+        slice_minutes=args.slice_minutes,
+        max_gap_minutes=args.max_gap_minutes,
+        workers=args.workers,
+    )
+    results = asyncio.run(builder.build(args.start, args.end or args.start + timedelta(days=1)))
+    for result in results:
+        print(f"{result['date']}: {result['trips']} trips, {result['cells']} cells -> {result['file']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""
+Parquet Export Job
+Streams vehicle_detections and traffic_cycles for a date range into
+Hive-partitioned Parquet files on local disk for offline analytics, so
+analysts don't page through the REST API against production
+
+Usage:
+    python -m app.services.parquet_exporter --start 2025-09-01 --end 2025-10-01 \\
+        --out exports/ [--junctions 1,2] [--tables vehicle_detections] [--incremental]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from datetime import date, datetime, time, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+
+def _schemas() -> Dict[str, "pa.Schema"]:
+    ts = pa.timestamp("us", tz="UTC")
+    return {
+        "vehicle_detections": pa.schema(
+            [
+                ("id", pa.int64()),
+                ("junction_id", pa.int64()),
+                ("scanner_id", pa.int64()),
+                ("lane_number", pa.int32()),
+                ("fastag_id", pa.string()),
+                ("detection_timestamp", ts),
+                ("vehicle_type", pa.string()),
+                ("processing_status", pa.string()),
+                ("created_at", ts),
+            ]
+        ),
+        "traffic_cycles": pa.schema(
+            [
+                ("id", pa.int64()),
+                ("junction_id", pa.int64()),
+                ("cycle_start_time", ts),
+                ("total_cycle_time", pa.int32()),
+                ("lane_1_green_time", pa.int32()),
+                ("lane_2_green_time", pa.int32()),
+                ("lane_3_green_time", pa.int32()),
+                ("lane_4_green_time", pa.int32()),
+                ("lane_1_vehicle_count", pa.int32()),
+                ("lane_2_vehicle_count", pa.int32()),
+                ("lane_3_vehicle_count", pa.int32()),
+                ("lane_4_vehicle_count", pa.int32()),
+                ("total_vehicles_detected", pa.int32()),
+                ("algorithm_version", pa.string()),
+                ("calculation_time_ms", pa.int32()),
+                ("status", pa.string()),
+            ]
+        ),
+    }
+
+
+# Time column used for range filtering and date partitioning per table
+TIME_COLUMNS = {
+    "vehicle_detections": "detection_timestamp",
+    "traffic_cycles": "cycle_start_time",
+}
+
+STATE_FILE = "_export_state.json"
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class ParquetExporter:
+    """
+    Chunked, resumable export of detection and cycle history to Parquet.
+
+    Rows are read in id order with keyset paging and buffered up to
+    `rows_per_file`, then written as one file per (date, junction) group:
+
+        <out>/<table>/date=YYYY-MM-DD/junction_id=N/part-<first_id>-<last_id>.parquet
+
+    Incremental runs record the highest exported id after each flush in
+    <out>/_export_state.json, per table, date range and junction selection,
+    and resume from it; full runs leave the state alone. Before writing, a
+    run removes the part files of its partitions that it is about to
+    produce again: every part for a full run, and the parts after the
+    resume point (left by a flush that crashed before its state was saved)
+    for an incremental one. Re-running therefore replaces rather than
+    duplicates, however the new rows fall into files.
+    """
+
+    def __init__(
+        self,
+        db_service,
+        output_dir: str,
+        rows_per_file: int = 50000,
+        read_chunk_size: int = 1000,
+    ):
+        if pa is None:
+            raise RuntimeError(
+                "pyarrow is required for Parquet export (pip install pyarrow)"
+            )
+        self.db_service = db_service
+        self.output_dir = output_dir
+        self.rows_per_file = rows_per_file
+        self.read_chunk_size = read_chunk_size
+        self.schemas = _schemas()
+        self.logger = logging.getLogger(__name__)
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+
+    def _state_path(self) -> str:
+        return os.path.join(self.output_dir, STATE_FILE)
+
+    @staticmethod
+    def state_key(
+        table: str, start_date: date, end_date: date, junction_ids: Optional[List[int]] = None
+    ) -> str:
+        """State entry for `table` exported over [start_date, end_date) for `junction_ids` (None: all)"""
+        key = f"{table}:{start_date.isoformat()}..{end_date.isoformat()}"
+        if not junction_ids:
+            return key
+        return f"{key}:junction_id={','.join(str(j) for j in sorted(set(junction_ids)))}"
+
+    def load_state(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._state_path()) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_state(self, state: Dict[str, Dict[str, Any]]) -> None:
+        tmp_path = self._state_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._state_path())
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def _to_table(self, table: str, rows: List[Dict[str, Any]]) -> "pa.Table":
+        schema = self.schemas[table]
+        timestamp_fields = [f.name for f in schema if pa.types.is_timestamp(f.type)]
+        columns = {
+            field.name: [
+                _parse_timestamp(row.get(field.name))
+                if field.name in timestamp_fields
+                else row.get(field.name)
+                for row in rows
+            ]
+            for field in schema
+        }
+        return pa.Table.from_pydict(columns, schema=schema)
+
+    def _clear_parts(
+        self,
+        table: str,
+        start_date: date,
+        end_date: date,
+        junction_ids: Optional[List[int]],
+        after_id: int,
+    ) -> int:
+        """Remove part files of the exported partitions whose ids start after `after_id`"""
+        root = os.path.join(self.output_dir, table)
+        if not os.path.isdir(root):
+            return 0
+        days = {
+            f"date={date.fromordinal(d).isoformat()}"
+            for d in range(start_date.toordinal(), end_date.toordinal())
+        }
+        junctions = {f"junction_id={j}" for j in junction_ids} if junction_ids else None
+
+        removed = 0
+        for day in sorted(days & set(os.listdir(root))):
+            for junction in os.listdir(os.path.join(root, day)):
+                if junctions is not None and junction not in junctions:
+                    continue
+                directory = os.path.join(root, day, junction)
+                for name in os.listdir(directory):
+                    if not name.startswith("part-") or not name.endswith(".parquet"):
+                        continue
+                    first_id = int(name[len("part-"):].split("-", 1)[0])
+                    if first_id > after_id:
+                        os.remove(os.path.join(directory, name))
+                        removed += 1
+        return removed
+
+    def _flush(self, table: str, rows: List[Dict[str, Any]]) -> List[str]:
+        """Write buffered rows as one Parquet file per (date, junction)"""
+        time_column = TIME_COLUMNS[table]
+        groups: Dict[Tuple[str, Any], List[Dict[str, Any]]] = {}
+        for row in rows:
+            timestamp = _parse_timestamp(row[time_column])
+            if timestamp is None:
+                raise ValueError(f"{table} row {row.get('id')} has no {time_column}")
+            day = timestamp.astimezone(timezone.utc).date().isoformat()
+            groups.setdefault((day, row.get("junction_id")), []).append(row)
+
+        written = []
+        for (day, junction_id), group in sorted(groups.items(), key=lambda g: str(g[0])):
+            directory = os.path.join(
+                self.output_dir, table, f"date={day}", f"junction_id={junction_id}"
+            )
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(
+                directory, f"part-{group[0]['id']}-{group[-1]['id']}.parquet"
+            )
+            tmp_path = path + ".tmp"
+            pq.write_table(self._to_table(table, group), tmp_path, compression="zstd")
+            os.replace(tmp_path, path)
+            written.append(path)
+
+        return written
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    async def export_table(
+        self,
+        table: str,
+        start_date: date,
+        end_date: date,
+        junction_ids: Optional[List[int]] = None,
+        incremental: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Export rows of `table` with their time column in [start_date, end_date).
+        Memory is bounded by `rows_per_file` rows.
+        """
+        if table not in TIME_COLUMNS:
+            raise ValueError(f"Unsupported export table: {table}")
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        state = self.load_state()
+        key = self.state_key(table, start_date, end_date, junction_ids)
+        after_id = state.get(key, {}).get("last_id", 0) if incremental else 0
+        last_id = after_id
+        await asyncio.to_thread(
+            self._clear_parts, table, start_date, end_date, junction_ids, after_id
+        )
+
+        start = datetime.combine(start_date, time.min, tzinfo=timezone.utc)
+        end = datetime.combine(end_date, time.min, tzinfo=timezone.utc)
+
+        exported_rows = 0
+        files: List[str] = []
+        buffer: List[Dict[str, Any]] = []
+
+        async def flush():
+            nonlocal buffer, exported_rows, last_id
+            if not buffer:
+                return
+            files.extend(await asyncio.to_thread(self._flush, table, buffer))
+            exported_rows += len(buffer)
+            last_id = buffer[-1]["id"]
+            if incremental:
+                state[key] = {
+                    "last_id": last_id,
+                    "exported_at": datetime.now(timezone.utc).isoformat(),
+                }
+                self._save_state(state)
+            buffer = []
+
+        async for chunk in self.db_service.iter_rows_by_id(
+            table,
+            TIME_COLUMNS[table],
+            start,
+            end,
+            after_id=after_id,
+            junction_ids=junction_ids,
+            chunk_size=self.read_chunk_size,
+        ):
+            buffer.extend(chunk)
+            if len(buffer) >= self.rows_per_file:
+                await flush()
+
+        await flush()
+
+        self.logger.info(
+            f"📦 Exported {exported_rows} {table} rows into {len(files)} files "
+            f"(after_id={after_id})"
+        )
+        return {
+            "table": table,
+            "rows": exported_rows,
+            "files": files,
+            "last_id": last_id,
+        }
+
+    async def export(
+        self,
+        start_date: date,
+        end_date: date,
+        junction_ids: Optional[List[int]] = None,
+        tables: Optional[List[str]] = None,
+        incremental: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Export each requested table in turn"""
+        return [
+            await self.export_table(table, start_date, end_date, junction_ids, incremental)
+            for table in (tables or list(TIME_COLUMNS))
+        ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export FlexTraff history to Parquet")
+    parser.add_argument("--start", required=True, type=date.fromisoformat, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--end", required=True, type=date.fromisoformat, help="Day after the last day (exclusive)")
+    parser.add_argument("--out", default="exports", help="Output directory")
+    parser.add_argument("--junctions", default="", help="Comma-separated junction IDs (default: all)")
+    parser.add_argument("--tables", default=",".join(TIME_COLUMNS), help="Comma-separated tables")
+    parser.add_argument("--incremental", action="store_true", help="Resume from the last exported id")
+    parser.add_argument("--rows-per-file", type=int, default=50000)
+    args = parser.parse_args()
+
+    from app.services.database_service import create_database_service
+
+    logging.basicConfig(level=logging.INFO)
+    exporter = ParquetExporter(create_database_service(), args.out, rows_per_file=args.rows_per_file)
+    results = asyncio.run(
+        exporter.export(
+            args.start,
+            args.end,
+            junction_ids=[int(j) for j in args.junctions.split(",") if j] or None,
+            tables=[t for t in args.tables.split(",") if t],
+            incremental=args.incremental,
+        )
+    )
+    for result in results:
+        print(f"{result['table']}: {result['rows']} rows, {len(result['files'])} files, last_id={result['last_id']}")
+
+
+if __name__ == "__main__":
+    main()
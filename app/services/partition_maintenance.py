@@ -0,0 +1,116 @@
+"""
+Partition Maintenance Job
+Keeps the monthly partitions of vehicle_detections and system_logs in shape:
+creates upcoming partitions ahead of time and retires old ones after their
+contents have been downsampled into the rollup tables
+"""
+
+import asyncio
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+
+
+class PartitionMaintenance:
+    """
+    Periodic maintenance for the time-partitioned tables (migrations 006, 009).
+
+    Each run:
+    1. Creates any missing monthly partitions up to `premake_days` ahead,
+       moving rows that already landed in the default partition into them
+    2. Downsamples and drops (or archives) partitions older than the
+       configured retention for each table
+    """
+
+    def __init__(
+        self,
+        db_service,
+        detection_retention_days: Optional[int] = None,
+        log_retention_days: Optional[int] = None,
+        archive: Optional[bool] = None,
+        premake_days: Optional[int] = None,
+        interval_hours: Optional[float] = None,
+    ):
+        self.db_service = db_service
+        self.retention_days = {
+            "vehicle_detections": (
+                settings.DETECTION_RETENTION_DAYS
+                if detection_retention_days is None
+                else detection_retention_days
+            ),
+            "system_logs": (
+                settings.SYSTEM_LOG_RETENTION_DAYS
+                if log_retention_days is None
+                else log_retention_days
+            ),
+        }
+        self.archive = settings.PARTITION_ARCHIVE if archive is None else archive
+        self.premake_days = (
+            settings.PARTITION_PREMAKE_DAYS if premake_days is None else premake_days
+        )
+        self.interval_hours = (
+            settings.PARTITION_MAINTENANCE_INTERVAL_HOURS
+            if interval_hours is None
+            else interval_hours
+        )
+        self._task: Optional[asyncio.Task] = None
+        self.logger = logging.getLogger(__name__)
+
+    async def run_once(self) -> Dict[str, Any]:
+        """Run one maintenance pass over every partitioned table"""
+        today = date.today()
+        report: Dict[str, Any] = {}
+
+        for table, retain_days in self.retention_days.items():
+            created = await self.db_service.ensure_time_partitions(
+                table, today, today + timedelta(days=self.premake_days)
+            )
+            retired: List[Dict[str, Any]] = await self.db_service.apply_partition_retention(
+                table, retain_days, archive=self.archive
+            )
+            report[table] = {"created": created, "retired": retired}
+
+            if created or retired:
+                await self.db_service.log_system_event(
+                    message=(
+                        f"Partition maintenance | table={table} | created={created} | "
+                        f"retired={[p.get('partition_name') for p in retired]}"
+                    ),
+                    component="partition_maintenance",
+                )
+
+        return report
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                report = await self.run_once()
+                self.logger.info(f"🗂️ Partition maintenance complete: {report}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"❌ Partition maintenance failed: {e}")
+                await self.db_service.log_system_error(
+                    error_message=str(e),
+                    error_type="PARTITION_MAINTENANCE_ERROR",
+                    component="partition_maintenance",
+                )
+
+            await asyncio.sleep(self.interval_hours * 3600)
+
+    def start(self) -> None:
+        """Schedule the periodic job on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        """Cancel the periodic job"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,109 @@
+"""
+Replay Buffer
+Bounded per-junction rings of recent broadcasts, stamped with a sequence
+number, so a reconnecting WebSocket client can resume from the last
+sequence it saw without a database query. Every ring holds at most
+`size` messages; system-wide messages (no junction_id) share one ring.
+"""
+
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+
+# (sequence, payload, component, level)
+Entry = Tuple[int, str, Optional[str], Optional[str]]
+
+
+def stamp_sequence(payload: str, sequence: int) -> Optional[str]:
+    """Insert "sequence" into a serialised JSON object; None for other payloads"""
+    if not payload.startswith("{"):
+        return None
+    rest = payload[1:].lstrip()
+    separator = "" if rest.startswith("}") else ", "
+    return f'{{"sequence": {sequence}{separator}{rest}'
+
+
+class ReplayBuffer:
+    """
+    Sequence numbers are per process: `stream` identifies this buffer, and
+    a cursor from another stream (another worker, or before a restart) is
+    answered with everything buffered, flagged as incomplete.
+    """
+
+    def __init__(self, size: Optional[int] = None):
+        self.size = settings.WS_REPLAY_BUFFER_SIZE if size is None else size
+        self.stream = uuid.uuid4().hex[:12]
+        self.sequence = 0
+        self._rings: Dict[Any, Deque[Entry]] = {}
+        # junction_id -> highest sequence pushed out of its ring
+        self._evicted: Dict[Any, int] = {}
+
+    def record(
+        self,
+        payload: str,
+        junction_id: Optional[int],
+        component: Optional[str],
+        level: Optional[str],
+    ) -> str:
+        """Stamp and keep a JSON object payload; returns what to deliver"""
+        if self.size <= 0:
+            return payload
+        stamped = stamp_sequence(payload, self.sequence + 1)
+        if stamped is None:
+            return payload
+        self.sequence += 1
+
+        ring = self._rings.get(junction_id)
+        if ring is None:
+            ring = self._rings[junction_id] = deque()
+        if len(ring) >= self.size:
+            self._evicted[junction_id] = ring.popleft()[0]
+        ring.append((self.sequence, stamped, component, level))
+        return stamped
+
+    def since(
+        self,
+        sequence: int,
+        junction_ids: Optional[Iterable[int]] = None,
+        upto: Optional[int] = None,
+        stream: Optional[str] = None,
+    ) -> Tuple[List[Entry], bool]:
+        """
+        Buffered messages after `sequence` (up to `upto`) for `junction_ids`
+        (None: every junction) plus system-wide ones, oldest first. The flag
+        is False when some of them have already been evicted, or the cursor
+        belongs to another stream.
+        """
+        complete = True
+        if (stream is not None and stream != self.stream) or sequence > self.sequence:
+            sequence, complete = 0, False
+        upto = self.sequence if upto is None else upto
+
+        if junction_ids is None:
+            keys = list(self._rings)
+        else:
+            keys = [None, *junction_ids]
+        entries: List[Entry] = []
+        for key in keys:
+            if self._evicted.get(key, 0) > sequence:
+                complete = False
+            ring = self._rings.get(key)
+            if ring:
+                entries.extend(e for e in ring if sequence < e[0] <= upto)
+        entries.sort(key=lambda e: e[0])
+        return entries, complete
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stream": self.stream,
+            "sequence": self.sequence,
+            "size_per_junction": self.size,
+            "junctions": sum(1 for key in self._rings if key is not None),
+            "buffered": sum(len(ring) for ring in self._rings.values()),
+        }
+
+    def clear(self) -> None:
+        self._rings.clear()
+        self._evicted.clear()
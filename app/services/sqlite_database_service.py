@@ -0,0 +1,931 @@
+"""
+Embedded SQLite Database Service
+Runs the same DatabaseService interface against a local SQLite file, so edge
+deployments and CI get a working stack (and realistic query latency) without
+Supabase. Schema: app/database/sqlite_schema.sql
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from app.services.circuit_breaker import CircuitBreaker, LastGoodCache
+from app.services.database_service import DatabaseService
+from app.services.executors import run_db_read, run_db_write
+
+SCHEMA_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "database",
+    "sqlite_schema.sql",
+)
+
+# Columns stored as JSON text (jsonb in Postgres)
+JSON_COLUMNS = {"algorithm_config", "lane_car_count", "metadata"}
+
+# Timestamp columns normalised on insert (see to_db_timestamp)
+TIMESTAMP_COLUMNS = {
+    "detection_timestamp",
+    "cycle_start_time",
+    "log_timestamp",
+    "timestamp",
+    "created_at",
+    "last_heartbeat",
+}
+
+# Tables that gained an ingest_key column in migration 007
+INGEST_KEY_TABLES = ("vehicle_detections", "traffic_cycles", "rfid_scanners")
+
+# Tables the generic row streaming helper may read
+STREAMABLE_TABLES = {"vehicle_detections", "traffic_cycles", "system_logs"}
+
+# Retention column per table (matches the partition key in migration 006)
+RETENTION_COLUMNS = {
+    "vehicle_detections": "detection_timestamp",
+    "system_logs": "timestamp",
+}
+
+
+def to_db_timestamp(value: Any) -> Optional[str]:
+    """
+    Normalise a datetime or ISO string to the fixed-width UTC text format used
+    by the schema, so timestamps compare correctly as strings. Naive values
+    are taken as UTC (the API produces them with datetime.utcnow()).
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    elif not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+
+
+def _row_to_dict(cursor: sqlite3.Cursor, row: Sequence[Any]) -> Dict[str, Any]:
+    record = {}
+    for column, value in zip(cursor.description, row):
+        name = column[0]
+        if name in JSON_COLUMNS and isinstance(value, str):
+            value = json.loads(value)
+        record[name] = value
+    return record
+
+
+class SQLiteDatabaseService(DatabaseService):
+    """
+    DatabaseService backed by an embedded SQLite database.
+
+    One connection is shared behind a lock; each call runs on the database
+    read or write pool, like the Supabase client calls. Logging methods never
+    raise, writes re-raise after logging and queries return empty defaults
+    on error, exactly as in DatabaseService.
+    """
+
+    BACKEND = "sqlite"
+
+    def __init__(self, db_path: Optional[str] = None):
+        from app.config import settings
+
+        self.db_path = db_path or settings.LOCAL_DATABASE_PATH
+        self.supabase = None
+
+        self.logger = logging.getLogger("DatabaseService")
+        self.logger.setLevel(logging.INFO)
+
+        # Local file access doesn't go through the breaker; kept so metrics
+        # report the same shape for both backends
+        self.breaker = CircuitBreaker("sqlite")
+        self._last_good = LastGoodCache()
+
+        if self.db_path != ":memory:":
+            directory = os.path.dirname(os.path.abspath(self.db_path))
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = _row_to_dict
+        if self.db_path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+
+        self._add_ingest_key_columns()
+        with open(SCHEMA_PATH) as f:
+            self._conn.executescript(f.read())
+
+        self.logger.info(f"✅ DatabaseService initialized (SQLite: {self.db_path})")
+
+    # ------------------------------------------------------------------
+    # Connection helpers
+    # ------------------------------------------------------------------
+
+    def _fetch_all(self, sql: str, params: Any = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _fetch_one(self, sql: str, params: Any = ()) -> Optional[Dict[str, Any]]:
+        rows = self._fetch_all(sql, params)
+        return rows[0] if rows else None
+
+    def _add_ingest_key_columns(self) -> None:
+        """Bring databases created before migration 007 up to date"""
+        for table in INGEST_KEY_TABLES:
+            columns = [
+                row["name"]
+                for row in self._conn.execute(f"PRAGMA table_info({table})").fetchall()
+            ]
+            if columns and "ingest_key" not in columns:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN ingest_key TEXT")
+
+    @staticmethod
+    def _to_db_value(column: str, value: Any) -> Any:
+        if value is None:
+            return None
+        if column in JSON_COLUMNS:
+            return json.dumps(value)
+        if column in TIMESTAMP_COLUMNS:
+            return to_db_timestamp(value)
+        return value
+
+    def _insert_many(
+        self, table: str, rows: List[Dict[str, Any]], on_conflict: str = ""
+    ) -> List[Dict[str, Any]]:
+        """
+        Insert rows in one transaction and return them as stored.
+        `on_conflict` (a conflict target) skips rows that already exist.
+        """
+        conflict_clause = f" ON CONFLICT ({on_conflict}) DO NOTHING" if on_conflict else ""
+        inserted = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for row in rows:
+                    values = {k: self._to_db_value(k, v) for k, v in row.items()}
+                    columns = ", ".join(values)
+                    placeholders = ", ".join(f":{k}" for k in values)
+                    inserted.extend(
+                        self._conn.execute(
+                            f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+                            f"{conflict_clause} RETURNING *",
+                            values,
+                        ).fetchall()
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return inserted
+
+    async def _insert(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        rows = await run_db_write(self._insert_many, table, [row])
+        return rows[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------
+    # 🔥 SYSTEM LOGGING
+    # ------------------------------------------------------------------
+
+    async def log_system_event(
+        self,
+        message: str,
+        log_level: str = "INFO",
+        component: str = "backend",
+        junction_id: Optional[int] = None,
+    ) -> None:
+        try:
+            await self._insert(
+                "system_logs",
+                {
+                    "log_level": log_level,
+                    "component": component,
+                    "message": message,
+                    "junction_id": junction_id,
+                    "timestamp": to_db_timestamp(datetime.utcnow()),
+                },
+            )
+        except Exception as e:
+            self.logger.error(f"❌ Failed to insert system log: {e}")
+
+    async def log_system_error(
+        self,
+        error_message: str,
+        error_type: str = "SYSTEM_ERROR",
+        component: str = "backend",
+        junction_id: Optional[int] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        try:
+            await self._insert(
+                "system_logs",
+                {
+                    "timestamp": to_db_timestamp(datetime.utcnow()),
+                    "log_level": "ERROR",
+                    "component": component,
+                    "message": f"{error_type}: {error_message}",
+                    "junction_id": junction_id,
+                    "metadata": metadata or {},
+                },
+            )
+        except Exception as e:
+            self.logger.error(f"❌ Failed to insert error log: {e}")
+
+    # ------------------------------------------------------------------
+    # 📡 RFID SCANNER LOGS
+    # ------------------------------------------------------------------
+
+    async def log_rfid_scanner_data(
+        self,
+        junction_id: int,
+        cycle_id: int,
+        lane_car_count: Dict[str, int],
+        ingest_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        try:
+            row = await self._insert(
+                "rfid_scanners",
+                self.build_rfid_scanner_row(
+                    junction_id, cycle_id, lane_car_count, ingest_key
+                ),
+            )
+
+            await self.log_system_event(
+                message=f"RFID scanner log created | cycle_id={cycle_id} | counts={lane_car_count}",
+                component="rfid_scanner",
+                junction_id=junction_id,
+            )
+
+            return row
+
+        except Exception as e:
+            await self.log_system_error(
+                error_message=str(e),
+                error_type="RFID_LOGGING_ERROR",
+                component="rfid_scanner",
+                junction_id=junction_id,
+                metadata={"cycle_id": cycle_id, "lane_car_count": lane_car_count},
+            )
+            raise
+
+    # ------------------------------------------------------------------
+    # 🚗 VEHICLE DETECTIONS
+    # ------------------------------------------------------------------
+
+    async def log_vehicle_detection(
+        self,
+        junction_id: int,
+        lane_number: int,
+        fastag_id: str,
+        vehicle_type: str = "car",
+        detection_timestamp: Optional[str] = None,
+        ingest_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        try:
+            row = await self._insert(
+                "vehicle_detections",
+                self.build_vehicle_detection_row(
+                    junction_id,
+                    lane_number,
+                    fastag_id,
+                    vehicle_type,
+                    detection_timestamp=detection_timestamp or datetime.utcnow().isoformat(),
+                    ingest_key=ingest_key,
+                ),
+            )
+
+            await self.log_system_event(
+                message=f"Vehicle detected | FASTag={fastag_id} | lane={lane_number}",
+                component="vehicle_detection",
+                junction_id=junction_id,
+            )
+
+            return row
+
+        except Exception as e:
+            await self.log_system_event(
+                message=str(e),
+                log_level="ERROR",
+                component="vehicle_detection",
+                junction_id=junction_id,
+            )
+            raise
+
+    async def log_vehicle_detections_bulk(
+        self, detections: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        if not detections:
+            return []
+
+        junction_ids = sorted({d["junction_id"] for d in detections})
+        now = to_db_timestamp(datetime.utcnow())
+        try:
+            rows = [
+                {
+                    **detection,
+                    "processing_status": "processed",
+                    "detection_timestamp": detection.get("detection_timestamp") or now,
+                }
+                for detection in detections
+            ]
+
+            inserted = await run_db_write(
+                self._insert_many, "vehicle_detections", rows
+            )
+
+            await self.log_system_event(
+                message=(
+                    f"Bulk vehicle detections | count={len(rows)} | "
+                    f"junctions={junction_ids}"
+                ),
+                component="vehicle_detection",
+                junction_id=junction_ids[0] if len(junction_ids) == 1 else None,
+            )
+
+            return inserted
+
+        except Exception as e:
+            await self.log_system_event(
+                message=f"Bulk detection insert failed ({len(detections)} rows): {e}",
+                log_level="ERROR",
+                component="vehicle_detection",
+            )
+            raise
+
+    # ------------------------------------------------------------------
+    # 🚦 TRAFFIC CYCLES
+    # ------------------------------------------------------------------
+
+    async def log_traffic_cycle(
+        self,
+        junction_id: int,
+        lane_counts: List[int],
+        green_times: List[int],
+        cycle_time: int,
+        calculation_time_ms: int,
+    ) -> Dict[str, Any]:
+        try:
+            row = await self._insert(
+                "traffic_cycles",
+                {
+                    **self.build_traffic_cycle_row(
+                        junction_id, lane_counts, green_times, cycle_time, calculation_time_ms
+                    ),
+                    "cycle_start_time": datetime.utcnow().isoformat(),
+                },
+            )
+
+            await self.log_system_event(
+                message=(
+                    f"Traffic cycle calculated | "
+                    f"cycle={cycle_time}s | vehicles={sum(lane_counts)}"
+                ),
+                component="traffic_calculator",
+                junction_id=junction_id,
+            )
+
+            return row
+
+        except Exception as e:
+            await self.log_system_event(
+                message=str(e),
+                log_level="ERROR",
+                component="traffic_calculator",
+                junction_id=junction_id,
+            )
+            raise
+
+    # ------------------------------------------------------------------
+    # 📊 QUERIES
+    # ------------------------------------------------------------------
+
+    async def get_current_lane_counts(
+        self, junction_id: int, time_window_minutes: int = 5
+    ) -> List[Dict[str, Any]]:
+        try:
+            time_threshold = to_db_timestamp(
+                datetime.utcnow() - timedelta(minutes=time_window_minutes)
+            )
+
+            rows = await run_db_read(
+                self._fetch_all,
+                "SELECT lane_number, count(*) AS count FROM vehicle_detections "
+                "WHERE junction_id = ? AND detection_timestamp >= ? "
+                "GROUP BY lane_number",
+                (junction_id, time_threshold),
+            )
+            counts = {row["lane_number"]: row["count"] for row in rows}
+            lane_names = {1: "North", 2: "South", 3: "East", 4: "West"}
+
+            return [
+                {"lane": lane_names[i], "lane_number": i, "count": counts.get(i, 0)}
+                for i in range(1, 5)
+            ]
+
+        except Exception as e:
+            await self.log_system_event(
+                message=str(e),
+                log_level="ERROR",
+                component="lane_count_query",
+                junction_id=junction_id,
+            )
+            return []
+
+    async def get_vehicles_count_by_date(
+        self, junction_id: int, target_date: date
+    ) -> int:
+        try:
+            row = await run_db_read(
+                self._fetch_one,
+                "SELECT COALESCE(sum(vehicle_count), 0) AS total FROM vehicle_counts_daily "
+                "WHERE junction_id = ? AND bucket_date = ?",
+                (junction_id, target_date.isoformat()),
+            )
+            return int(row["total"])
+
+        except Exception as e:
+            await self.log_system_event(
+                message=str(e),
+                log_level="ERROR",
+                component="vehicle_count_query",
+                junction_id=junction_id,
+            )
+            return 0
+
+    async def get_vehicle_totals_by_date_range(
+        self, start_date: date, end_date: date, raise_errors: bool = False
+    ) -> Dict[str, Dict[int, int]]:
+        try:
+            rows = await run_db_read(
+                self._fetch_all,
+                "SELECT bucket_date, junction_id, sum(vehicle_count) AS total_vehicles "
+                "FROM vehicle_counts_daily WHERE bucket_date >= ? AND bucket_date <= ? "
+                "GROUP BY bucket_date, junction_id ORDER BY bucket_date, junction_id",
+                (start_date.isoformat(), end_date.isoformat()),
+            )
+
+            totals: Dict[str, Dict[int, int]] = {}
+            for row in rows:
+                totals.setdefault(row["bucket_date"], {})[row["junction_id"]] = int(
+                    row["total_vehicles"]
+                )
+            return totals
+
+        except Exception as e:
+            await self.log_system_event(
+                message=str(e),
+                log_level="ERROR",
+                component="vehicle_count_query",
+            )
+            if raise_errors:
+                raise
+            return {}
+
+    async def get_hourly_vehicle_counts(
+        self, junction_id: int, target_date: date, raise_errors: bool = False
+    ) -> List[Dict[str, Any]]:
+        try:
+            return await run_db_read(
+                self._fetch_all,
+                "SELECT bucket_hour, lane_number, vehicle_type, vehicle_count "
+                "FROM vehicle_counts_hourly "
+                "WHERE junction_id = ? AND bucket_hour >= ? AND bucket_hour < ? "
+                "ORDER BY bucket_hour",
+                (
+                    junction_id,
+                    to_db_timestamp(target_date),
+                    to_db_timestamp(target_date + timedelta(days=1)),
+                ),
+            )
+
+        except Exception as e:
+            await self.log_system_event(
+                message=str(e),
+                log_level="ERROR",
+                component="vehicle_count_query",
+                junction_id=junction_id,
+            )
+            if raise_errors:
+                raise
+            return []
+
+    def _backfill_rollups(self, start: str, end: str, start_date: str, end_date: str) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "DELETE FROM vehicle_counts_hourly WHERE bucket_hour >= ? AND bucket_hour < ?",
+                    (start, end),
+                )
+                self._conn.execute(
+                    "DELETE FROM vehicle_counts_daily WHERE bucket_date >= ? AND bucket_date < ?",
+                    (start_date, end_date),
+                )
+                written = self._conn.execute(
+                    "INSERT INTO vehicle_counts_hourly "
+                    "(junction_id, lane_number, vehicle_type, bucket_hour, vehicle_count) "
+                    "SELECT junction_id, lane_number, COALESCE(vehicle_type, 'car'), "
+                    "substr(detection_timestamp, 1, 13) || ':00:00.000000+00:00', count(*) "
+                    "FROM vehicle_detections "
+                    "WHERE junction_id IS NOT NULL "
+                    "AND detection_timestamp >= ? AND detection_timestamp < ? "
+                    "GROUP BY 1, 2, 3, 4",
+                    (start, end),
+                ).rowcount
+                self._conn.execute(
+                    "INSERT INTO vehicle_counts_daily "
+                    "(junction_id, lane_number, vehicle_type, bucket_date, vehicle_count) "
+                    "SELECT junction_id, lane_number, vehicle_type, substr(bucket_hour, 1, 10), "
+                    "sum(vehicle_count) FROM vehicle_counts_hourly "
+                    "WHERE bucket_hour >= ? AND bucket_hour < ? GROUP BY 1, 2, 3, 4",
+                    (start, end),
+                )
+                self._conn.execute("COMMIT")
+                return written
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    async def backfill_vehicle_count_rollups(
+        self, start_date: date, end_date: date
+    ) -> int:
+        self._check_backfill_range(start_date)
+        written = await run_db_write(
+            self._backfill_rollups,
+            to_db_timestamp(start_date),
+            to_db_timestamp(end_date),
+            start_date.isoformat(),
+            end_date.isoformat(),
+        )
+
+        await self.log_system_event(
+            message=(
+                f"Vehicle count rollups backfilled | "
+                f"{start_date.isoformat()} -> {end_date.isoformat()}"
+            ),
+            component="rollup_backfill",
+        )
+
+        return written
+
+    async def get_current_traffic_cycle(
+        self, junction_id: int
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            return await run_db_read(
+                self._fetch_one,
+                "SELECT * FROM traffic_cycles WHERE junction_id = ? "
+                "ORDER BY cycle_start_time DESC LIMIT 1",
+                (junction_id,),
+            )
+
+        except Exception as e:
+            await self.log_system_event(
+                message=str(e),
+                log_level="ERROR",
+                component="traffic_cycle_query",
+                junction_id=junction_id,
+            )
+            return None
+
+    async def get_traffic_cycle_history(
+        self,
+        junction_id: int,
+        start_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+        before_timestamp: Optional[str] = None,
+        before_id: Optional[int] = None,
+        limit: int = 100,
+        fields: Optional[List[str]] = None,
+        bucket_seconds: Optional[int] = None,
+        raise_errors: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Same query as get_traffic_cycle_history() in migration 008"""
+        columns = ", ".join(self.traffic_cycle_columns(fields))
+        try:
+            before = to_db_timestamp(before_timestamp)
+            params = {
+                "junction_id": junction_id,
+                "start": to_db_timestamp(start_time),
+                "end": to_db_timestamp(end_time),
+                "before": before,
+                "before_id": before_id if before_id is not None else 2**63 - 1,
+                "limit": min(max(limit, 1), 1000),
+                "bucket": bucket_seconds,
+            }
+            bounds = """
+                c.junction_id = :junction_id
+                AND (:start IS NULL OR c.cycle_start_time >= :start)
+                AND (:end IS NULL OR c.cycle_start_time < :end)
+            """
+
+            if not bucket_seconds:
+                sql = f"""
+                    SELECT {columns} FROM traffic_cycles c
+                    WHERE {bounds}
+                      AND (:before IS NULL
+                           OR (c.cycle_start_time, c.id) < (:before, :before_id))
+                    ORDER BY c.cycle_start_time DESC, c.id DESC
+                    LIMIT :limit
+                """
+            else:
+                # Next page starts at the bucket before the cursor's
+                if before:
+                    epoch = int(datetime.fromisoformat(before).timestamp())
+                    params["before"] = to_db_timestamp(
+                        datetime.fromtimestamp(
+                            epoch - epoch % bucket_seconds, tz=timezone.utc
+                        )
+                    )
+                sql = f"""
+                    SELECT {columns} FROM (
+                        SELECT c.*, row_number() OVER (
+                            PARTITION BY CAST(strftime('%s', c.cycle_start_time) AS INTEGER) / :bucket
+                            ORDER BY c.cycle_start_time DESC, c.id DESC
+                        ) AS bucket_rank
+                        FROM traffic_cycles c
+                        WHERE {bounds}
+                          AND (:before IS NULL OR c.cycle_start_time < :before)
+                    )
+                    WHERE bucket_rank = 1
+                    ORDER BY cycle_start_time DESC, id DESC
+                    LIMIT :limit
+                """
+
+            return await run_db_read(self._fetch_all, sql, params)
+
+        except Exception as e:
+            await self.log_system_event(
+                message=str(e),
+                log_level="ERROR",
+                component="traffic_cycle_query",
+                junction_id=junction_id,
+            )
+            if raise_errors:
+                raise
+            return []
+
+    async def get_recent_detections_with_signals(
+        self,
+        junction_id: int,
+        limit: int = 20,
+        before_timestamp: Optional[str] = None,
+        before_id: Optional[int] = None,
+        lookback_days: int = 90,
+        raise_errors: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Same query as get_recent_detections_with_signals() in migration 006"""
+        try:
+            before = to_db_timestamp(before_timestamp)
+            anchor = (
+                datetime.fromisoformat(before) if before else datetime.now(timezone.utc)
+            )
+            params = {
+                "junction_id": junction_id,
+                "limit": min(max(limit, 1), 500),
+                "before": before,
+                "before_id": before_id if before_id is not None else 2**63 - 1,
+                "lower": to_db_timestamp(anchor - timedelta(days=max(lookback_days, 1))),
+            }
+
+            return await run_db_read(
+                self._fetch_all,
+                """
+                WITH detections AS (
+                    SELECT d.id, d.junction_id, d.lane_number, d.fastag_id, d.vehicle_type,
+                           d.processing_status, d.detection_timestamp
+                    FROM vehicle_detections d
+                    WHERE d.junction_id = :junction_id
+                      AND d.detection_timestamp >= :lower
+                      AND (:before IS NULL
+                           OR (d.detection_timestamp, d.id) < (:before, :before_id))
+                    ORDER BY d.detection_timestamp DESC, d.id DESC
+                    LIMIT :limit
+                ),
+                bounds AS (
+                    SELECT min(detection_timestamp) AS oldest, max(detection_timestamp) AS newest
+                    FROM detections
+                ),
+                cycles AS (
+                    SELECT c.id, c.cycle_start_time, c.total_cycle_time,
+                           c.lane_1_green_time, c.lane_2_green_time,
+                           c.lane_3_green_time, c.lane_4_green_time,
+                           lead(c.cycle_start_time) OVER (ORDER BY c.cycle_start_time, c.id)
+                               AS cycle_end_time
+                    FROM traffic_cycles c, bounds b
+                    WHERE c.junction_id = :junction_id
+                      AND c.cycle_start_time <= b.newest
+                      AND c.cycle_start_time >= COALESCE(
+                          (SELECT max(c2.cycle_start_time) FROM traffic_cycles c2
+                           WHERE c2.junction_id = :junction_id
+                             AND c2.cycle_start_time <= b.oldest),
+                          ''
+                      )
+                )
+                SELECT d.id, d.junction_id, d.lane_number, d.fastag_id, d.vehicle_type,
+                       d.processing_status, d.detection_timestamp,
+                       c.id AS cycle_id, c.cycle_start_time, c.total_cycle_time,
+                       CASE d.lane_number
+                           WHEN 1 THEN c.lane_1_green_time
+                           WHEN 2 THEN c.lane_2_green_time
+                           WHEN 3 THEN c.lane_3_green_time
+                           WHEN 4 THEN c.lane_4_green_time
+                       END AS lane_green_time,
+                       c.lane_1_green_time, c.lane_2_green_time,
+                       c.lane_3_green_time, c.lane_4_green_time
+                FROM detections d
+                LEFT JOIN cycles c
+                    ON d.detection_timestamp >= c.cycle_start_time
+                   AND (c.cycle_end_time IS NULL OR d.detection_timestamp < c.cycle_end_time)
+                ORDER BY d.detection_timestamp DESC, d.id DESC
+                """,
+                params,
+            )
+
+        except Exception as e:
+            await self.log_system_event(
+                message=str(e),
+                log_level="ERROR",
+                component="detection_history_query",
+                junction_id=junction_id,
+            )
+            if raise_errors:
+                raise
+            return []
+
+    async def iter_rows_by_id(
+        self,
+        table: str,
+        time_column: str,
+        start: datetime,
+        end: datetime,
+        after_id: int = 0,
+        junction_ids: Optional[List[int]] = None,
+        columns: str = "*",
+        chunk_size: int = 1000,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        if table not in STREAMABLE_TABLES:
+            raise ValueError(f"Unsupported table: {table}")
+
+        junction_filter = ""
+        if junction_ids:
+            junction_filter = (
+                f" AND junction_id IN ({', '.join(str(int(j)) for j in junction_ids)})"
+            )
+        sql = (
+            f"SELECT {columns} FROM {table} WHERE id > ? "
+            f"AND {time_column} >= ? AND {time_column} < ?{junction_filter} "
+            f"ORDER BY id LIMIT ?"
+        )
+
+        last_id = after_id
+        while True:
+            rows = await run_db_read(
+                self._fetch_all,
+                sql,
+                (last_id, to_db_timestamp(start), to_db_timestamp(end), chunk_size),
+            )
+            if not rows:
+                return
+
+            yield rows
+
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1]["id"]
+
+    async def get_all_junctions(self) -> List[Dict[str, Any]]:
+        try:
+            return await run_db_read(
+                self._fetch_all,
+                "SELECT * FROM traffic_junctions WHERE status = 'active' "
+                "ORDER BY junction_name",
+            )
+
+        except Exception as e:
+            await self.log_system_event(
+                message=str(e),
+                log_level="ERROR",
+                component="junction_query",
+            )
+            return []
+
+    # ------------------------------------------------------------------
+    # 🗂️ RETENTION
+    # ------------------------------------------------------------------
+    # SQLite has no partitions: ensure_time_partitions is a no-op and
+    # retention deletes (or archives) expired rows directly.
+
+    async def ensure_time_partitions(
+        self, table: str, from_date: date, to_date: date
+    ) -> int:
+        return 0
+
+    def _retire_rows(self, table: str, cutoff: str, archive: bool) -> List[Dict[str, Any]]:
+        time_column = RETENTION_COLUMNS[table]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                expired = self._conn.execute(
+                    f"SELECT min({time_column}) AS range_start, count(*) AS row_count "
+                    f"FROM {table} WHERE {time_column} < ?",
+                    (cutoff,),
+                ).fetchone()
+                if not expired["row_count"]:
+                    self._conn.execute("COMMIT")
+                    return []
+
+                if table == "system_logs":
+                    # Rows are counted once and then deleted, so counts accumulate
+                    self._conn.execute(
+                        "INSERT INTO system_log_counts_daily "
+                        "(bucket_date, junction_id, component, log_level, log_count) "
+                        "SELECT substr(timestamp, 1, 10), COALESCE(junction_id, 0), "
+                        "component, log_level, count(*) FROM system_logs "
+                        "WHERE timestamp < ? GROUP BY 1, 2, 3, 4 "
+                        "ON CONFLICT (bucket_date, junction_id, component, log_level) "
+                        "DO UPDATE SET log_count = log_count + excluded.log_count",
+                        (cutoff,),
+                    )
+
+                if archive:
+                    self._conn.execute(
+                        f"CREATE TABLE IF NOT EXISTS archive_{table} AS "
+                        f"SELECT * FROM {table} WHERE 0"
+                    )
+                    self._conn.execute(
+                        f"INSERT INTO archive_{table} SELECT * FROM {table} "
+                        f"WHERE {time_column} < ?",
+                        (cutoff,),
+                    )
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE {time_column} < ?", (cutoff,)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return [
+            {
+                "partition_name": table,
+                "range_start": expired["range_start"],
+                "range_end": cutoff,
+                "action": "archived" if archive else "dropped",
+            }
+        ]
+
+    async def apply_partition_retention(
+        self, table: str, retain_days: int, archive: bool = False
+    ) -> List[Dict[str, Any]]:
+        if table not in RETENTION_COLUMNS:
+            raise ValueError(f"Retention is not configured for table {table}")
+
+        cutoff = to_db_timestamp(datetime.now(timezone.utc) - timedelta(days=retain_days))
+        return await run_db_write(self._retire_rows, table, cutoff, archive)
+
+    # ------------------------------------------------------------------
+    # 📼 SPOOL REPLAY
+    # ------------------------------------------------------------------
+
+    async def insert_spooled_rows(
+        self, table: str, rows: List[Dict[str, Any]]
+    ) -> int:
+        if not rows:
+            return 0
+
+        inserted = await run_db_write(
+            self._insert_many, table, rows, "ingest_key"
+        )
+        return len(inserted)
+
+    # ------------------------------------------------------------------
+    # ❤️ HEALTH
+    # ------------------------------------------------------------------
+
+    async def health_check(self) -> Dict[str, Any]:
+        try:
+            await run_db_read(
+                self._fetch_all, "SELECT id FROM traffic_junctions LIMIT 1"
+            )
+
+            return {
+                "database_connected": True,
+                "backend": "sqlite",
+                "timestamp": datetime.utcnow().isoformat(),
+            }
+
+        except Exception as e:
+            return {
+                "database_connected": False,
+                "backend": "sqlite",
+                "error": str(e),
+                "timestamp": datetime.utcnow().isoformat(),
+            }
@@ -0,0 +1,105 @@
+"""
+Server-Sent Events
+An SSE response is one more client of the WebSocket manager: SSEConnection
+has the accept / send_text / close surface the manager's writer uses, so SSE
+clients share its routing, per-client queues, slow-consumer policy and
+replay buffer. A broadcast is serialised once for every client; framing it
+as an SSE event is cached per payload, so all SSE clients share that too.
+"""
+
+import asyncio
+from functools import lru_cache
+from typing import AsyncIterator, Callable, Optional, Tuple
+
+from app.config import settings
+
+# Suggested reconnect delay sent to EventSource clients
+RETRY_MILLISECONDS = 3000
+
+_SEQUENCE_PREFIX = '{"sequence": '
+
+
+def event_id(stream: str, sequence: int) -> str:
+    return f"{stream}-{sequence}"
+
+
+def parse_event_id(value: Optional[str]) -> Optional[Tuple[str, int]]:
+    """(stream, sequence) from a Last-Event-ID; None if absent or malformed"""
+    if not value:
+        return None
+    stream, _, sequence = value.strip().rpartition("-")
+    if not stream or not sequence.isdigit():
+        return None
+    return stream, int(sequence)
+
+
+def _sequence_of(payload: str) -> Optional[int]:
+    if not payload.startswith(_SEQUENCE_PREFIX):
+        return None
+    digits = payload[len(_SEQUENCE_PREFIX):len(_SEQUENCE_PREFIX) + 20]
+    end = 0
+    while end < len(digits) and digits[end].isdigit():
+        end += 1
+    return int(digits[:end]) if end else None
+
+
+@lru_cache(maxsize=4096)
+def sse_frame(payload: str, stream: str) -> str:
+    """One SSE event for a serialised message; sequenced messages get an id"""
+    sequence = _sequence_of(payload)
+    data = payload.replace("\n", "\ndata: ")
+    if sequence is None:
+        return f"data: {data}\n\n"
+    return f"id: {event_id(stream, sequence)}\ndata: {data}\n\n"
+
+
+class SSEConnection:
+    """
+    Adapter between the manager's per-client writer and a streaming
+    response. send_text() hands over one payload at a time, so a slow HTTP
+    client holds up its writer and falls under WS_SEND_TIMEOUT_SECONDS and
+    the slow-consumer policy exactly like a WebSocket would.
+    """
+
+    transport = "sse"
+
+    def __init__(self, stream: str, client=None, heartbeat_seconds: Optional[float] = None):
+        self.stream = stream
+        self.client = client
+        self.heartbeat_seconds = heartbeat_seconds or settings.SSE_HEARTBEAT_SECONDS
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.closed = False
+        self.heartbeats = 0
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, payload: str) -> None:
+        await self._outbox.put(payload)
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed = True
+        if self._outbox.empty():
+            self._outbox.put_nowait(None)
+
+    async def frames(self, connected: Callable[[], bool] = lambda: True) -> AsyncIterator[str]:
+        """
+        SSE text for the response body: queued messages as events, and a
+        comment line whenever nothing was sent for `heartbeat_seconds` so
+        proxies keep the connection open. Ends once the connection is
+        closed or dropped by the manager.
+        """
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        while not self.closed:
+            try:
+                async with asyncio.timeout(self.heartbeat_seconds):
+                    payload = await self._outbox.get()
+            except TimeoutError:
+                if not connected():
+                    return
+                self.heartbeats += 1
+                yield ": heartbeat\n\n"
+                continue
+            if payload is None:
+                return
+            yield sse_frame(payload, self.stream)
@@ -0,0 +1,313 @@
+"""
+Junction-to-Junction Travel Times
+Re-identifies FASTags across junctions: each detection is joined to the
+same tag's previous sighting through a hash index, and the elapsed time is
+added to a rolling quantile sketch for that (from, to) link. Feeds
+congestion detection (recent vs baseline travel time) and green-wave tuning
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+
+# Quantiles reported for a single link
+LINK_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99)
+
+
+class QuantileSketch:
+    """
+    Log-bucketed histogram (DDSketch): every quantile is returned within
+    `relative_accuracy` of the true value, in a few hundred integers at most
+    for travel times from seconds to hours. Sketches merge exactly.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.count = 0
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value <= 0:
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.bins[index] = self.bins.get(index, 0) + count
+        self.count += count
+
+    def merge(self, other: "QuantileSketch") -> None:
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return 2 * self.gamma**index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+
+class RollingQuantileSketch:
+    """
+    Sketches per time slice of `slice_seconds`, keeping `slices` of them;
+    quantiles over any trailing window are answered by merging slices.
+    """
+
+    def __init__(self, slice_seconds: float, slices: int, relative_accuracy: float = 0.01):
+        self.slice_seconds = slice_seconds
+        self.slices = slices
+        self.relative_accuracy = relative_accuracy
+        self._slices: Dict[int, QuantileSketch] = {}
+
+    def add(self, value: float, timestamp: float) -> None:
+        slice_id = int(timestamp // self.slice_seconds)
+        newest = max(self._slices, default=slice_id)
+        if slice_id <= newest - self.slices:
+            return
+        sketch = self._slices.get(slice_id)
+        if sketch is None:
+            sketch = self._slices[slice_id] = QuantileSketch(self.relative_accuracy)
+        sketch.add(value)
+        horizon = max(newest, slice_id) - self.slices
+        for stale in [s for s in self._slices if s <= horizon]:
+            del self._slices[stale]
+
+    def window(self, since: float) -> QuantileSketch:
+        """Merged sketch of the slices overlapping [since, now]"""
+        first = int(since // self.slice_seconds)
+        merged = QuantileSketch(self.relative_accuracy)
+        for slice_id, sketch in self._slices.items():
+            if slice_id >= first:
+                merged.merge(sketch)
+        return merged
+
+
+def _to_epoch(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class TravelTimeEngine:
+    """
+    Streaming join of detections on fastag_id.
+
+    `last_seen` maps each tag to its latest (junction, time), kept in time
+    order so entries older than `max_travel_seconds` - which can no longer
+    join - are evicted from the front in O(1); `max_tags` caps the index
+    outright. A detection at a different junction than the tag's previous
+    sighting, between `min_travel_seconds` and `max_travel_seconds` later,
+    is one travel-time sample for link (previous junction -> junction).
+    Detections should arrive in roughly time order; one older than the
+    tag's previous sighting is counted as out of order and skipped. Live
+    detections arriving during `warm_up` are held back and applied after the
+    replayed history, so they don't make it look out of order.
+
+    Per link, travel times go to a rolling sketch retaining
+    `baseline_seconds`; the recent `window_seconds` are compared against the
+    whole baseline for a congestion index.
+    """
+
+    def __init__(
+        self,
+        max_travel_seconds: Optional[float] = None,
+        min_travel_seconds: float = 1.0,
+        window_seconds: Optional[float] = None,
+        baseline_seconds: Optional[float] = None,
+        slice_seconds: float = 300.0,
+        max_tags: Optional[int] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_travel_seconds = max_travel_seconds or settings.TRAVEL_TIME_MAX_SECONDS
+        self.min_travel_seconds = min_travel_seconds
+        self.window_seconds = window_seconds or settings.TRAVEL_TIME_WINDOW_SECONDS
+        self.baseline_seconds = baseline_seconds or settings.TRAVEL_TIME_BASELINE_SECONDS
+        self.slice_seconds = slice_seconds
+        self.max_tags = max_tags or settings.TRAVEL_TIME_MAX_TAGS
+        self._clock = clock
+
+        self._last_seen: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._links: Dict[Tuple[int, int], RollingQuantileSketch] = {}
+        self.counters = {"detections": 0, "samples": 0, "out_of_order": 0, "evicted_tags": 0}
+        # (time, junction, tag) of live detections held back while warming up
+        self._pending: Optional[List[Tuple[float, int, str]]] = None
+        self.logger = logging.getLogger(__name__)
+
+    def observe(self, junction_id: int, fastag_id: str, timestamp: Any = None) -> Optional[float]:
+        """
+        Add one detection (timestamp: datetime, ISO string or epoch seconds;
+        default now). Returns the travel time if it completed a link sample.
+        """
+        at = self._clock() if timestamp is None else _to_epoch(timestamp)
+        if self._pending is not None:
+            self._pending.append((at, junction_id, fastag_id))
+            return None
+        return self._observe(junction_id, fastag_id, at)
+
+    def _observe(self, junction_id: int, fastag_id: str, at: float) -> Optional[float]:
+        self.counters["detections"] += 1
+
+        previous = self._last_seen.get(fastag_id)
+        if previous is not None and at < previous[1]:
+            self.counters["out_of_order"] += 1
+            return None
+
+        self._last_seen[fastag_id] = (junction_id, at)
+        self._last_seen.move_to_end(fastag_id)
+        self._evict(at)
+
+        if previous is None or previous[0] == junction_id:
+            return None
+        elapsed = at - previous[1]
+        if not self.min_travel_seconds <= elapsed <= self.max_travel_seconds:
+            return None
+
+        link = (previous[0], junction_id)
+        sketch = self._links.get(link)
+        if sketch is None:
+            sketch = self._links[link] = RollingQuantileSketch(
+                self.slice_seconds, math.ceil(self.baseline_seconds / self.slice_seconds)
+            )
+        sketch.add(elapsed, at)
+        self.counters["samples"] += 1
+        return elapsed
+
+    def observe_many(self, detections: Iterable[Dict[str, Any]]) -> int:
+        """
+        Add detection rows (junction_id, fastag_id and optional
+        detection_timestamp, default now) in time order
+        """
+        samples = 0
+        for at, junction_id, fastag_id in self._time_ordered(detections):
+            if self.observe(junction_id, fastag_id, at) is not None:
+                samples += 1
+        return samples
+
+    def _time_ordered(self, detections: Iterable[Dict[str, Any]]) -> List[Tuple[float, int, str]]:
+        now = self._clock()
+        return sorted(
+            (
+                _to_epoch(d["detection_timestamp"]) if d.get("detection_timestamp") else now,
+                d["junction_id"],
+                d["fastag_id"],
+            )
+            for d in detections
+        )
+
+    def _evict(self, now: float) -> None:
+        horizon = now - self.max_travel_seconds
+        while self._last_seen:
+            tag, (_, seen_at) = next(iter(self._last_seen.items()))
+            if seen_at >= horizon and len(self._last_seen) <= self.max_tags:
+                return
+            del self._last_seen[tag]
+            self.counters["evicted_tags"] += 1
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _summarise(
+        self, link: Tuple[int, int], quantiles: Iterable[float] = (0.5, 0.9, 0.95)
+    ) -> Dict[str, Any]:
+        now = self._clock()
+        sketch = self._links[link]
+        recent = sketch.window(now - self.window_seconds)
+        baseline = sketch.window(now - self.baseline_seconds)
+
+        summary: Dict[str, Any] = {
+            "from_junction_id": link[0],
+            "to_junction_id": link[1],
+            "samples": recent.count,
+            "baseline_samples": baseline.count,
+        }
+        for q in quantiles:
+            value = recent.quantile(q)
+            summary[f"p{round(q * 100)}_seconds"] = round(value, 1) if value else None
+        recent_median, baseline_median = recent.quantile(0.5), baseline.quantile(0.5)
+        summary["baseline_p50_seconds"] = round(baseline_median, 1) if baseline_median else None
+        summary["congestion_index"] = (
+            round(recent_median / baseline_median, 2)
+            if recent_median and baseline_median
+            else None
+        )
+        return summary
+
+    def links(self, min_samples: int = 1) -> List[Dict[str, Any]]:
+        """Recent travel-time summary of every link with enough samples"""
+        summaries = [self._summarise(link) for link in sorted(self._links)]
+        return [s for s in summaries if s["samples"] >= min_samples]
+
+    def link(self, from_junction_id: int, to_junction_id: int) -> Optional[Dict[str, Any]]:
+        """Detailed quantiles for one link, or None if it was never observed"""
+        key = (from_junction_id, to_junction_id)
+        if key not in self._links:
+            return None
+        return self._summarise(key, LINK_QUANTILES)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "tracked_tags": len(self._last_seen),
+            "links": len(self._links),
+            "pending": len(self._pending or ()),
+        }
+
+    def clear(self) -> None:
+        self._last_seen.clear()
+        self._links.clear()
+        if self._pending is not None:
+            self._pending.clear()
+        self.counters = dict.fromkeys(self.counters, 0)
+
+    async def warm_up(self, db_service, since: Optional[datetime] = None) -> int:
+        """
+        Replay detections from `since` (default: the baseline period) so the
+        sketches survive restarts. Live detections observed meanwhile are
+        applied, in time order, once the replay ends. Returns the number of
+        detections read.
+        """
+        end = datetime.utcnow()
+        start = since or end - timedelta(seconds=self.baseline_seconds)
+        read = 0
+        pending: List[Tuple[float, int, str]] = []
+        self._pending = pending
+        try:
+            async for chunk in db_service.iter_rows_by_id(
+                "vehicle_detections",
+                "detection_timestamp",
+                start,
+                end,
+                columns="id,junction_id,fastag_id,detection_timestamp",
+            ):
+                for at, junction_id, fastag_id in self._time_ordered(chunk):
+                    self._observe(junction_id, fastag_id, at)
+                read += len(chunk)
+                await asyncio.sleep(0)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Travel-time warm-up stopped after {read} detections: {e}")
+            return read
+        finally:
+            self._pending = None
+            for at, junction_id, fastag_id in sorted(pending):
+                self._observe(junction_id, fastag_id, at)
+        self.logger.info(f"🛣️ Travel times warmed up from {read} detections")
+        return read
+
+
+travel_time_engine = TravelTimeEngine()
@@ -13,6 +13,7 @@ from passlib.context import CryptContext
 from supabase import Client, create_client
 
 from app.config import settings
+from app.services.executors import run_cpu
 
 
 class UserManagementService:
@@ -269,7 +270,8 @@ class UserManagementService:
 
             user = result.data[0]
 
-            if not self.verify_password(password, user["password_hash"]):
+            # bcrypt is deliberately slow; keep it off the event loop
+            if not await run_cpu(self.verify_password, password, user["password_hash"]):
                 self.logger.warning(f"Invalid password for user: {username}")
                 return None
 
@@ -519,7 +521,7 @@ class UserManagementService:
         if role not in ["ADMIN", "OPERATOR", "OBSERVER"]:
             raise ValueError("Invalid role")
 
-        password_hash = self.hash_password(password)
+        password_hash = await run_cpu(self.hash_password, password)
 
         user_data = {
             "username": username,
@@ -586,7 +588,7 @@ class UserManagementService:
     async def change_password(self, user_id: int, new_password: str) -> bool:
         """Change user password (admin only)"""
         try:
-            password_hash = self.hash_password(new_password)
+            password_hash = await run_cpu(self.hash_password, new_password)
             self.supabase.table("users").update(
                 {"password_hash": password_hash}
             ).eq("id", user_id).execute()
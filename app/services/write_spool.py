@@ -0,0 +1,497 @@
+"""
+Write-Ahead Disk Spool
+Keeps detection, cycle and RFID writes when the database is slow or
+unreachable: rows are appended to local segment files at memory speed and
+replayed into the database once it is healthy again.
+
+Each process (uvicorn worker) owns one `worker-N` subdirectory of SPOOL_DIR,
+held with an exclusive file lock; a directory left behind by a worker that
+is gone is drained by whichever replayer can lock it.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+
+import httpx
+
+from app.config import settings
+from app.services.circuit_breaker import CircuitOpenError
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: one process per spool directory
+    fcntl = None  # type: ignore[assignment]
+
+# Tables the spool accepts, with the time column fixed at spool time so a
+# replayed row keeps its original timestamp instead of the replay time
+SPOOL_TIME_COLUMNS = {
+    "vehicle_detections": "detection_timestamp",
+    "traffic_cycles": "cycle_start_time",
+    "rfid_scanners": "log_timestamp",
+}
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+CURSOR_FILE = "cursor.json"
+DEAD_LETTER_FILE = "dead_letter.jsonl"
+LOCK_FILE = ".lock"
+WORKER_PREFIX = "worker-"
+
+# Failures meaning the database could not be reached. Anything else (e.g.
+# PostgREST rejecting the row, which the breaker ignores for the same
+# reason) would fail again on replay, so it is raised instead of spooled.
+SPOOLABLE_ERRORS: Tuple[Type[BaseException], ...] = (
+    CircuitOpenError,
+    TimeoutError,
+    ConnectionError,
+    httpx.TransportError,
+)
+
+# (segment number, byte offset) of the next unreplayed record
+Position = Tuple[int, int]
+
+
+class SpoolLockedError(RuntimeError):
+    """The spool directory is held by another process"""
+
+
+def _lock_directory(directory: str) -> Optional[int]:
+    """Exclusive lock on a spool directory, held until the fd is closed"""
+    if fcntl is None:
+        return None
+    fd = os.open(os.path.join(directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        raise SpoolLockedError(f"Spool directory {directory} is in use by another process")
+    return fd
+
+
+class WriteSpool:
+    """
+    Append-only spool of pending rows in numbered segment files.
+
+    Each record is one JSON line {"table", "row", "spooled_at"}; the row holds
+    an `ingest_key` so replay is idempotent (migration 007). Appends go to
+    the OS page cache (they survive a process crash) and are fsynced on
+    `sync()`, which the replayer calls every tick. The replay position is
+    committed to cursor.json and fully replayed segments are deleted.
+    """
+
+    def __init__(self, directory: Optional[str] = None, segment_bytes: Optional[int] = None):
+        self.directory = directory or settings.SPOOL_DIR
+        self.segment_bytes = segment_bytes or settings.SPOOL_SEGMENT_BYTES
+        os.makedirs(self.directory, exist_ok=True)
+        # Segments, cursor and pending count belong to one process
+        self._directory_lock = _lock_directory(self.directory)
+
+        self._lock = threading.Lock()
+        self._cursor: Position = self._load_cursor()
+        segments = self._segments()
+        self._active = max(segments) if segments else max(self._cursor[0], 1)
+        self._truncate_torn_tail(self._active)
+        self._fd = self._open_segment(self._active)
+        self._pending = self._count_pending()
+        self.logger = logging.getLogger(__name__)
+
+    # ------------------------------------------------------------------
+    # Files
+    # ------------------------------------------------------------------
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{number:012d}{SEGMENT_SUFFIX}")
+
+    def _segments(self) -> List[int]:
+        return sorted(
+            int(name[len(SEGMENT_PREFIX) : -len(SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def _open_segment(self, number: int) -> int:
+        return os.open(
+            self._segment_path(number), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644
+        )
+
+    def _truncate_torn_tail(self, number: int) -> None:
+        """Drop a partial record left by a crash mid-append"""
+        path = self._segment_path(number)
+        if not os.path.exists(path):
+            return
+        with open(path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def _load_cursor(self) -> Position:
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE)) as f:
+                cursor = json.load(f)
+            return cursor["segment"], cursor["offset"]
+        except FileNotFoundError:
+            segments = self._segments()
+            return (segments[0] if segments else 1), 0
+
+    def _save_cursor(self, position: Position) -> None:
+        path = os.path.join(self.directory, CURSOR_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"segment": position[0], "offset": position[1]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    def _read_from(
+        self, position: Position, max_records: Optional[int]
+    ) -> Tuple[List[Dict[str, Any]], Position]:
+        """Read complete records from `position`; a torn last line is left for later"""
+        records: List[Dict[str, Any]] = []
+        segment, offset = position
+        for number in [s for s in self._segments() if s >= segment]:
+            if number != segment:
+                segment, offset = number, 0
+            with open(self._segment_path(number), "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        return records, (segment, offset)
+                    records.append(json.loads(line))
+                    offset += len(line)
+                    if max_records is not None and len(records) >= max_records:
+                        return records, (segment, offset)
+        return records, (segment, offset)
+
+    def _count_pending(self) -> int:
+        records, _ = self._read_from(self._cursor, None)
+        return len(records)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def stamp(table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Rows for `table` with an ingest_key and their time column (if
+        unset). Rows that already have them keep them, so a direct write
+        and a later replay of the same rows share their key.
+        """
+        if table not in SPOOL_TIME_COLUMNS:
+            raise ValueError(f"Table {table} cannot be spooled")
+
+        now = datetime.utcnow().isoformat()
+        return [
+            {
+                "ingest_key": str(uuid.uuid4()),
+                **row,
+                SPOOL_TIME_COLUMNS[table]: row.get(SPOOL_TIME_COLUMNS[table]) or now,
+            }
+            for row in rows
+        ]
+
+    def append(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Spool rows for `table`, stamped (see `stamp`); the stamped rows are returned"""
+        stamped = self.stamp(table, rows)
+        now = datetime.utcnow().isoformat()
+        payload = b"".join(
+            json.dumps({"table": table, "row": row, "spooled_at": now}, default=str).encode()
+            + b"\n"
+            for row in stamped
+        )
+
+        with self._lock:
+            if os.fstat(self._fd).st_size >= self.segment_bytes:
+                os.fsync(self._fd)
+                os.close(self._fd)
+                self._active += 1
+                self._fd = self._open_segment(self._active)
+            os.write(self._fd, payload)
+            self._pending += len(stamped)
+
+        return stamped
+
+    def sync(self) -> None:
+        """fsync the active segment"""
+        with self._lock:
+            os.fsync(self._fd)
+
+    # ------------------------------------------------------------------
+    # Replay
+    # ------------------------------------------------------------------
+
+    def read_batch(self, max_records: int) -> Tuple[List[Dict[str, Any]], Position]:
+        """Next records to replay and the position to commit once they are stored"""
+        with self._lock:
+            return self._read_from(self._cursor, max_records)
+
+    def commit(self, position: Position, count: int) -> None:
+        """Mark records up to `position` as replayed and drop finished segments"""
+        with self._lock:
+            self._save_cursor(position)
+            self._cursor = position
+            self._pending = max(self._pending - count, 0)
+            for number in self._segments():
+                if number < position[0] and number != self._active:
+                    os.remove(self._segment_path(number))
+
+    def dead_letter(self, records: List[Dict[str, Any]], error: str) -> None:
+        """Set aside records the database rejects, so they don't block replay"""
+        with open(os.path.join(self.directory, DEAD_LETTER_FILE), "a") as f:
+            for record in records:
+                f.write(json.dumps({**record, "error": error}, default=str) + "\n")
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+
+    def depth(self) -> int:
+        return self._pending
+
+    def stats(self) -> Dict[str, Any]:
+        """Pending records, bytes on disk and age of the oldest pending record"""
+        with self._lock:
+            head, _ = self._read_from(self._cursor, 1) if self._pending else ([], None)
+            segments = self._segments()
+            size = sum(os.path.getsize(self._segment_path(s)) for s in segments)
+
+        lag_seconds = 0.0
+        if head:
+            oldest = datetime.fromisoformat(head[0]["spooled_at"])
+            lag_seconds = round((datetime.utcnow() - oldest).total_seconds(), 3)
+
+        return {
+            "depth": self._pending,
+            "lag_seconds": lag_seconds,
+            "segments": len(segments),
+            "bytes": size,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            os.fsync(self._fd)
+            os.close(self._fd)
+            if self._directory_lock is not None:
+                os.close(self._directory_lock)
+
+
+async def write_or_spool(
+    spool: Optional[WriteSpool],
+    table: str,
+    rows: List[Dict[str, Any]],
+    write: Callable[[List[Dict[str, Any]]], Awaitable[Any]],
+) -> Tuple[Any, bool]:
+    """
+    Run the direct database `write(rows)`, falling back to spooling the same
+    rows if the database cannot be reached. The rows are stamped with their
+    ingest_key first, so a write that committed but timed out on our side is
+    skipped when its spooled copy is replayed. While the spool holds a
+    backlog new rows go straight to it, which keeps them in order behind the
+    backlog and avoids waiting on a database that is known to be down.
+    Errors other than SPOOLABLE_ERRORS are raised.
+
+    Returns (result of `write` or the spooled rows, spooled?).
+    """
+    if spool is None:
+        return await write(rows), False
+
+    rows = spool.stamp(table, rows)
+    if spool.depth() == 0:
+        try:
+            return await write(rows), False
+        except SPOOLABLE_ERRORS as e:
+            logging.getLogger(__name__).warning(f"⚠️ Database write failed, spooling: {e}")
+
+    return spool.append(table, rows), True
+
+
+class SpoolReplayer:
+    """
+    Background job draining the spool into the database.
+
+    Each tick it fsyncs the spool and, when records are pending and the
+    database reports healthy, replays them in batches grouped by table.
+    A batch the database rejects while healthy is retried row by row and
+    the rows it still rejects go to the dead-letter file. A connectivity
+    error (SPOOLABLE_ERRORS) stops the drain with the cursor uncommitted,
+    so nothing is dead-lettered because the database was briefly away.
+    """
+
+    def __init__(
+        self,
+        db_service,
+        spool: WriteSpool,
+        batch_size: Optional[int] = None,
+        interval_seconds: Optional[float] = None,
+    ):
+        self.db_service = db_service
+        self.spool = spool
+        self.batch_size = batch_size or settings.SPOOL_REPLAY_BATCH
+        self.interval_seconds = (
+            settings.SPOOL_REPLAY_INTERVAL_SECONDS
+            if interval_seconds is None
+            else interval_seconds
+        )
+        self.replayed = 0
+        self.dead_lettered = 0
+        self._task: Optional[asyncio.Task] = None
+        self.logger = logging.getLogger(__name__)
+
+    async def _replay_records(self, records: List[Dict[str, Any]]) -> None:
+        by_table: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            by_table.setdefault(record["table"], []).append(record["row"])
+        for table, rows in by_table.items():
+            await self.db_service.insert_spooled_rows(table, rows)
+
+    async def drain_once(self) -> int:
+        """Replay everything currently pending; returns records replayed"""
+        replayed = 0
+        while True:
+            records, position = await asyncio.to_thread(
+                self.spool.read_batch, self.batch_size
+            )
+            if not records:
+                return replayed
+
+            try:
+                await self._replay_records(records)
+            except SPOOLABLE_ERRORS:
+                raise
+            except Exception as e:
+                health = await self.db_service.health_check()
+                if not health.get("database_connected"):
+                    raise
+
+                for record in records:
+                    try:
+                        await self._replay_records([record])
+                    except SPOOLABLE_ERRORS:
+                        # The database went away mid-batch: leave the cursor
+                        # where it is, rows already stored are skipped by
+                        # their ingest_key on the next attempt
+                        raise
+                    except Exception as row_error:
+                        self.spool.dead_letter([record], str(row_error))
+                        self.dead_lettered += 1
+                self.logger.error(f"❌ Spool batch rejected, replayed row by row: {e}")
+
+            self.spool.commit(position, len(records))
+            replayed += len(records)
+            self.replayed += len(records)
+
+    def _claim_orphans(self) -> List[WriteSpool]:
+        """
+        Spools with pending records in sibling directories no live process
+        holds (a worker that exited, or a shrunk worker count), plus
+        segments left in SPOOL_DIR itself by the single-directory layout
+        """
+        if fcntl is None:
+            # Without directory locks a live worker's spool can't be told apart
+            return []
+        base = os.path.dirname(self.spool.directory)
+        candidates = [
+            os.path.join(base, name)
+            for name in sorted(os.listdir(base))
+            if name.startswith(WORKER_PREFIX)
+        ]
+        if any(name.startswith(SEGMENT_PREFIX) for name in os.listdir(base)):
+            candidates.append(base)
+
+        orphans = []
+        for directory in candidates:
+            if directory == self.spool.directory:
+                continue
+            try:
+                orphan = WriteSpool(directory)
+            except SpoolLockedError:
+                continue
+            if orphan.depth():
+                orphans.append(orphan)
+            else:
+                orphan.close()
+        return orphans
+
+    async def tick(self) -> int:
+        """
+        One replayer pass: fsync the spool, then replay it and any orphaned
+        spools if the database is healthy. Returns records replayed.
+        """
+        await asyncio.to_thread(self.spool.sync)
+        orphans = await asyncio.to_thread(self._claim_orphans)
+        try:
+            if not self.spool.depth() and not orphans:
+                return 0
+            health = await self.db_service.health_check()
+            if not health.get("database_connected"):
+                return 0
+
+            replayed = await self.drain_once()
+            for orphan in orphans:
+                replayed += await SpoolReplayer(
+                    self.db_service, orphan, batch_size=self.batch_size
+                ).drain_once()
+        finally:
+            for orphan in orphans:
+                orphan.close()
+
+        if replayed:
+            self.logger.info(f"📼 Replayed {replayed} spooled writes")
+            await self.db_service.log_system_event(
+                message=f"Spool replayed | records={replayed}",
+                component="write_spool",
+            )
+        return replayed
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning(f"⚠️ Spool replay deferred: {e}")
+
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        """Schedule the replay loop on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        """Cancel the replay loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_write_spool: Optional[WriteSpool] = None
+
+
+def claim_write_spool(base_directory: Optional[str] = None) -> WriteSpool:
+    """Spool in the first `worker-N` directory under SPOOL_DIR no other process holds"""
+    base = base_directory or settings.SPOOL_DIR
+    slot = 0
+    while True:
+        try:
+            return WriteSpool(os.path.join(base, f"{WORKER_PREFIX}{slot}"))
+        except SpoolLockedError:
+            slot += 1
+
+
+def get_write_spool() -> Optional[WriteSpool]:
+    """Process-wide spool (None when SPOOL_ENABLED is off), created on first use"""
+    global _write_spool
+    if _write_spool is None and settings.SPOOL_ENABLED:
+        _write_spool = claim_write_spool()
+    return _write_spool
@@ -0,0 +1,132 @@
+"""
+Streaming Responses
+NDJSON and CSV encoders for history and analytics endpoints. Rows come from
+async iterators fed by chunked keyset / date-window queries, so memory stays
+flat however large the range and the first bytes go out immediately
+"""
+
+import csv
+import io
+import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from fastapi.responses import StreamingResponse
+
+STREAM_FORMATS = ("ndjson", "csv")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+# Rows fetched per database round trip when streaming
+STREAM_PAGE_SIZE = 1000
+
+Row = Dict[str, Any]
+
+logger = logging.getLogger(__name__)
+
+
+async def iter_keyset_pages(
+    fetch_page: Callable[[Optional[Row]], Awaitable[List[Row]]],
+    page_size: int,
+) -> AsyncIterator[Row]:
+    """
+    Yield rows page by page. `fetch_page(last_row)` returns the page after
+    `last_row` (the first page for None); a page shorter than `page_size`
+    ends the stream.
+    """
+    last: Optional[Row] = None
+    while True:
+        page = await fetch_page(last)
+        for row in page:
+            yield row
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+
+async def ndjson_lines(rows: AsyncIterator[Row]) -> AsyncIterator[bytes]:
+    async for row in rows:
+        yield json.dumps(row, default=str).encode() + b"\n"
+
+
+async def csv_lines(
+    rows: AsyncIterator[Row], columns: Optional[Sequence[str]] = None
+) -> AsyncIterator[bytes]:
+    """
+    CSV with a header row. Without `columns` the header is taken from the
+    first row; nested values are written as JSON.
+    """
+    buffer = io.StringIO()
+
+    def start(header: Sequence[str]) -> csv.DictWriter:
+        writer = csv.DictWriter(buffer, fieldnames=list(header), extrasaction="ignore")
+        writer.writeheader()
+        return writer
+
+    def drain() -> bytes:
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer: Optional[csv.DictWriter] = None
+    if columns is not None:
+        writer = start(columns)
+        yield drain()
+
+    async for row in rows:
+        if writer is None:
+            writer = start(list(row))
+        writer.writerow({k: _csv_value(v) for k, v in row.items()})
+        yield drain()
+
+    if writer is None:
+        # No rows and no known columns: an empty document
+        yield b""
+
+
+async def abort_on_error(body: AsyncIterator[bytes], response_format: str) -> AsyncIterator[bytes]:
+    """
+    Pass `body` through. If producing it fails, NDJSON gets a trailing
+    {"error": ...} record and the error is re-raised, so the server aborts
+    the chunked response instead of ending it cleanly: a failed page never
+    yields a truncated export that looks complete.
+    """
+    try:
+        async for chunk in body:
+            yield chunk
+    except Exception as e:
+        logger.error(f"❌ Streamed export aborted: {e}")
+        if response_format == "ndjson":
+            yield json.dumps({"error": f"Export aborted: {e}"}).encode() + b"\n"
+        raise
+
+
+def streaming_response(
+    rows: AsyncIterator[Row],
+    response_format: str,
+    filename: str,
+    columns: Optional[Sequence[str]] = None,
+) -> StreamingResponse:
+    """
+    Stream `rows` as NDJSON or CSV (`filename` without extension). `rows`
+    should raise on a failed page rather than end early (see abort_on_error).
+    """
+    if response_format == "csv":
+        body = csv_lines(rows, columns)
+    else:
+        body = ndjson_lines(rows)
+
+    return StreamingResponse(
+        abort_on_error(body, response_format),
+        media_type=MEDIA_TYPES[response_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{response_format}"',
+            "Cache-Control": "no-store",
+        },
+    )
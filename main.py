@@ -7,22 +7,46 @@ and communication with IoT devices with MQTT for dynamic processing
 """
 
 import asyncio
+import json
 import logging
-from datetime import date, datetime
-from typing import Any, Dict, List, Optional
-from mqtt_handler import mqtt
-from fastapi import WebSocket, WebSocketDisconnect
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from mqtt_handler import mqtt, process_car_counts, set_services as set_mqtt_services
+from fastapi import WebSocket, WebSocketDisconnect, WebSocketException, status
 from ws_broadcast import manager  # relative import depending on location
 
 
 
 
-from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException
+from fastapi import BackgroundTasks, Depends, FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, field_validator
-
-from app.services.database_service import DatabaseService
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, field_validator
+
+from app.config import settings
+from app.services.database_service import DatabaseService, create_database_service
+from app.services.detection_dedup import DetectionDeduplicator, Reservation, detection_deduplicator
+from app.services.device_gateway import device_gateway, verify_device_token
+from app.services.event_bus import (
+    SYSTEM_LOG,
+    Event,
+    SystemLogWriter,
+    detection_event,
+    event_bus,
+    event_counters,
+    log_event,
+    plan_event,
+)
+from app.services.executors import executor_stats, shutdown_executors
+from app.services.junction_cache import etag_matches, junction_cache
+from app.services.live_timing import live_timing
+from app.services.partition_maintenance import PartitionMaintenance
+from app.services.sse import SSEConnection, parse_event_id
 from app.services.traffic_calculator import TrafficCalculator
+from app.services.travel_time import travel_time_engine
+from app.services.write_spool import SpoolReplayer, WriteSpool, get_write_spool, write_or_spool
+from app.utils.streaming import STREAM_PAGE_SIZE, iter_keyset_pages, streaming_response
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -38,6 +62,8 @@ app = FastAPI(
 )
 
 mqtt.init_app(app)
+# Controllers on /ws/ingest go through the MQTT calculation pipeline
+device_gateway.process = process_car_counts
 
 # CORS middleware for frontend integration
 app.add_middleware(
@@ -54,17 +80,26 @@ app.add_middleware(
 # Global services
 _db_service = None
 _traffic_calculator = None
+_partition_maintenance = None
+_write_spool = None
+_spool_replayer = None
+_travel_time_warm_up = None
+
+
+async def _broadcast_event(event: Event) -> None:
+    await manager.broadcast(event.to_message())
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
-    global _db_service, _traffic_calculator
+    global _db_service, _traffic_calculator, _partition_maintenance, _write_spool, _spool_replayer
+    global _travel_time_warm_up
     logger.info("🚀 Starting FlexTraff ATCS API...")
 
     try:
         # Initialize database and calculator
-        _db_service = DatabaseService()
+        _db_service = create_database_service()
         await _db_service.log_system_event(
             message="FlexTraff backend started successfully",
             log_level="INFO",
@@ -72,11 +107,42 @@ async def startup_event():
         )
 
         _traffic_calculator = TrafficCalculator(db_service=_db_service)
+        # MQTT and /ws/ingest reports write through the same database service
+        set_mqtt_services(_db_service, _traffic_calculator)
+
+        # Live WebSocket broadcasts (subscribes to Redis with that backend)
+        await manager.start()
+        # Live timing state follows the delivered events; frames go to local clients
+        manager.add_listener(live_timing.observe)
+        live_timing.start(manager.deliver_local)
+
+        # Producers publish events once; each sink consumes its own queue
+        event_bus.subscribe("websocket", _broadcast_event)
+        event_bus.subscribe("counters", event_counters.handle)
+        event_bus.subscribe(
+            "system_logs", SystemLogWriter(_db_service).handle, types=[SYSTEM_LOG]
+        )
+        event_bus.start()
+
+        # Writes spooled during a database outage are replayed once it recovers
+        _write_spool = get_write_spool()
+        if _write_spool is not None:
+            _spool_replayer = SpoolReplayer(_db_service, _write_spool)
+            _spool_replayer.start()
 
         # Test database connection
         health = await _db_service.health_check()
         if health["database_connected"]:
             logger.info("✅ Database connection established")
+
+            # Create upcoming partitions / retire expired ones in the background
+            _partition_maintenance = PartitionMaintenance(_db_service)
+            _partition_maintenance.start()
+
+            # Rebuild travel-time sketches from recent detections
+            _travel_time_warm_up = asyncio.create_task(
+                travel_time_engine.warm_up(_db_service)
+            )
         else:
             logger.error(f"❌ Database connection failed: {health.get('error')}")
             await _db_service.log_system_error(
@@ -136,7 +202,21 @@ async def shutdown_event():
     """Handle graceful shutdown and log system closure"""
     # global _db_service
     logger.info("🛑 FlexTraff ATCS API shutting down...")
-    
+
+    # Flush queued events (WebSocket clients, system_logs write-behind)
+    await event_bus.stop()
+    if _partition_maintenance:
+        await _partition_maintenance.stop()
+    if _travel_time_warm_up and not _travel_time_warm_up.done():
+        _travel_time_warm_up.cancel()
+    await live_timing.stop()
+    await manager.close_all()
+    await device_gateway.close_all()
+    if _spool_replayer:
+        await _spool_replayer.stop()
+    if _write_spool:
+        _write_spool.close()
+
     try:
         if _db_service:
             await _db_service.log_system_event(
@@ -147,6 +227,8 @@ async def shutdown_event():
     except Exception as e:
         logger.error(f"⚠️ Warning during shutdown logging: {e}")
 
+    shutdown_executors()
+
 
 # Dependency to get database service
 async def get_db_service() -> DatabaseService:
@@ -155,6 +237,95 @@ async def get_db_service() -> DatabaseService:
     return _db_service
 
 
+# Dependency to get the write spool (None when spooling is disabled)
+async def get_spool() -> Optional[WriteSpool]:
+    return _write_spool
+
+
+# Dependency to get the duplicate-read filter (None when dedup is disabled)
+async def get_deduplicator() -> Optional[DetectionDeduplicator]:
+    return detection_deduplicator if settings.DEDUP_ENABLED else None
+
+
+_auth_service = None
+
+
+def _get_auth_service():
+    """Token verifier, created on first use (it needs Supabase credentials)"""
+    global _auth_service
+    if _auth_service is None:
+        from app.services.custom_auth_service import CustomAuthService
+
+        _auth_service = CustomAuthService()
+    return _auth_service
+
+
+async def _verify_stream_token(token: str) -> Optional[dict]:
+    try:
+        return await _get_auth_service().verify_token(token)
+    except Exception as e:
+        logger.error(f"❌ Stream token verification failed: {str(e)}")
+        return None
+
+
+# Dependency for admin-only operational endpoints. Same rule as
+# app.middleware.access_control.require_admin, with the lazily created verifier
+async def get_admin_user(
+    credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer()),
+) -> dict:
+    user = await _verify_stream_token(credentials.credentials)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if user.get("role") != "ADMIN":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
+
+
+# Dependency to get the WebSocket user from ?token= (None when anonymous)
+async def get_ws_user(token: Optional[str] = Query(None)) -> Optional[dict]:
+    if not token:
+        if settings.WS_REQUIRE_AUTH:
+            raise WebSocketException(
+                code=status.WS_1008_POLICY_VIOLATION, reason="Authentication required"
+            )
+        return None
+
+    user = await _verify_stream_token(token)
+    if not user:
+        raise WebSocketException(
+            code=status.WS_1008_POLICY_VIOLATION, reason="Invalid or expired token"
+        )
+    return user
+
+
+# Dependency to get the SSE user from ?token= (EventSource cannot send headers)
+async def get_sse_user(token: Optional[str] = Query(None)) -> Optional[dict]:
+    if not token:
+        if settings.WS_REQUIRE_AUTH:
+            raise HTTPException(status_code=401, detail="Authentication required")
+        return None
+
+    user = await _verify_stream_token(token)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    return user
+
+
+# Dependency to authenticate a junction controller on /ws/ingest
+async def get_device_junction(
+    junction_id: int = Query(..., ge=1),
+    token: Optional[str] = Query(None),
+    authorization: Optional[str] = Header(None),
+) -> int:
+    if token is None and authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not verify_device_token(junction_id, token):
+        raise WebSocketException(
+            code=status.WS_1008_POLICY_VIOLATION, reason="Invalid device token"
+        )
+    return junction_id
+
+
 # Dependency to get traffic calculator
 async def get_traffic_calculator() -> TrafficCalculator:
     if _traffic_calculator is None:
@@ -204,6 +375,12 @@ class VehicleDetectionRequest(BaseModel):
     vehicle_type: str = Field("car", description="Type of vehicle")
 
 
+class BulkVehicleDetectionItem(VehicleDetectionRequest):
+    detection_timestamp: Optional[datetime] = Field(
+        None, description="Read time at the scanner (defaults to insert time)"
+    )
+
+
 class JunctionStatusResponse(BaseModel):
     junction_id: int
     junction_name: str
@@ -212,12 +389,50 @@ class JunctionStatusResponse(BaseModel):
     total_vehicles_today: int
 
 
+class WebSocketCommand(BaseModel):
+    action: str = Field(..., pattern="^(subscribe|unsubscribe)$")
+    junction_ids: Optional[List[int]] = None
+    components: Optional[List[str]] = None
+    levels: Optional[List[str]] = None
+    # Replay buffered messages after this sequence under the new filters
+    since: Optional[int] = Field(None, ge=0)
+    stream: Optional[str] = None
+
+
 class HealthResponse(BaseModel):
     status: str
     database_connected: bool
     algorithm_version: str
     uptime: str
     error: Optional[str] = None
+    database_backend: Optional[str] = None
+    spool: Optional[Dict[str, Any]] = None
+    circuit_breaker: Optional[Dict[str, Any]] = None
+    executors: Optional[Dict[str, Any]] = None
+    dedup: Optional[Dict[str, Any]] = None
+    websockets: Optional[Dict[str, Any]] = None
+    events: Optional[Dict[str, Any]] = None
+    devices: Optional[Dict[str, Any]] = None
+
+
+def _database_backend(db: DatabaseService) -> Optional[str]:
+    """Backend actually serving requests ("supabase" or "sqlite")"""
+    backend = getattr(type(db), "BACKEND", None)
+    return backend if isinstance(backend, str) else None
+
+
+def _circuit_breaker_stats(db: DatabaseService) -> Optional[Dict[str, Any]]:
+    """Database circuit breaker state plus stale reads served from cache"""
+    breaker = getattr(db, "breaker", None)
+    last_good = getattr(db, "_last_good", None)
+    if breaker is None or last_good is None:
+        return None
+    if not hasattr(breaker, "stats") or not hasattr(last_good, "stats"):
+        return None
+    try:
+        return {**breaker.stats(), "last_good": last_good.stats()}
+    except Exception:
+        return None
 
 
 # API Endpoints
@@ -236,8 +451,21 @@ async def root():
 
 
 @app.get("/health", response_model=HealthResponse)
-async def health_check(db: DatabaseService = Depends(get_db_service)):
-    """Health check endpoint"""
+async def health_check(
+    db: DatabaseService = Depends(get_db_service),
+    spool: Optional[WriteSpool] = Depends(get_spool),
+    dedup: Optional[DetectionDeduplicator] = Depends(get_deduplicator),
+):
+    """
+    Health check endpoint (includes write spool depth and replay lag, the
+    database circuit breaker state with per-operation deadlines, queue
+    wait / utilisation of the database and CPU thread pools, duplicate
+    FASTag read counters, WebSocket send queues with the slowest clients,
+    event bus sinks with rolling per-junction event counts, and connected
+    junction controllers)
+    """
+    spool_stats = spool.stats() if spool is not None else None
+    dedup_stats = dedup.stats() if dedup is not None else None
     try:
         health_data = await db.health_check()
         return HealthResponse(
@@ -246,6 +474,14 @@ async def health_check(db: DatabaseService = Depends(get_db_service)):
             algorithm_version="ATCS v1.0",
             uptime="Active",
             error=health_data.get("error"),
+            database_backend=_database_backend(db),
+            spool=spool_stats,
+            circuit_breaker=_circuit_breaker_stats(db),
+            executors=executor_stats(),
+            dedup=dedup_stats,
+            websockets={**manager.stats(), "live_timing": live_timing.stats()},
+            events={**event_bus.stats(), "counters": event_counters.stats()},
+            devices=device_gateway.stats(),
         )
     except Exception as e:
         return HealthResponse(
@@ -254,6 +490,14 @@ async def health_check(db: DatabaseService = Depends(get_db_service)):
             algorithm_version="ATCS v1.0",
             uptime="Active",
             error=str(e),
+            database_backend=_database_backend(db),
+            spool=spool_stats,
+            circuit_breaker=_circuit_breaker_stats(db),
+            executors=executor_stats(),
+            dedup=dedup_stats,
+            websockets={**manager.stats(), "live_timing": live_timing.stats()},
+            events={**event_bus.stats(), "counters": event_counters.stats()},
+            devices=device_gateway.stats(),
         )
 
 
@@ -266,15 +510,20 @@ async def calculate_traffic_timing(
     try:
         logger.info(f"📊 Calculating timing for lane counts: {request.lane_counts}")
 
-        await calculator.db_service.log_system_event(
-        message=f"Traffic calculated for lanes {request.lane_counts}",
-        component="traffic_calculator",
-        junction_id=request.junction_id,)
-
+        event_bus.publish(
+            log_event(
+                f"Traffic calculated for lanes {request.lane_counts}",
+                component="traffic_calculator",
+                junction_id=request.junction_id,
+            )
+        )
 
         green_times, cycle_time = await calculator.calculate_green_times(
             request.lane_counts, junction_id=request.junction_id
         )
+        event_bus.publish(
+            plan_event(request.junction_id, request.lane_counts, green_times, cycle_time)
+        )
 
         algorithm_info = calculator.get_algorithm_info()
 
@@ -297,39 +546,284 @@ async def log_vehicle_detection(
     request: VehicleDetectionRequest,
     background_tasks: BackgroundTasks,
     db: DatabaseService = Depends(get_db_service),
+    spool: Optional[WriteSpool] = Depends(get_spool),
+    dedup: Optional[DetectionDeduplicator] = Depends(get_deduplicator),
 ):
-    """Log vehicle detection event"""
-    try:
-        # Log vehicle detection in background
-        await db.log_vehicle_detection(
-    request.junction_id,
-    request.lane_number,
-    request.fastag_id,
-    request.vehicle_type,
-)
+    """
+    Log vehicle detection event (spooled to disk if the database is down).
+    A repeat read of the same FASTag on the same lane within the dedup
+    window is acknowledged but not stored.
+    """
+    read = (request.junction_id, request.lane_number, request.fastag_id)
+    if dedup is not None and dedup.is_duplicate(*read):
+        dedup.record(*read)
+        return {
+            "status": "duplicate",
+            "message": "Repeat read within the dedup window, not stored",
+            "spooled": False,
+            "junction_id": request.junction_id,
+            "lane": request.lane_number,
+            "fastag_id": request.fastag_id,
+        }
+    # Reserved before the write is awaited, so concurrent repeats are suppressed
+    reservation = dedup.record(*read) if dedup is not None else None
 
+    try:
+        row = DatabaseService.build_vehicle_detection_row(
+            request.junction_id,
+            request.lane_number,
+            request.fastag_id,
+            request.vehicle_type,
+        )
+        _, spooled = await write_or_spool(
+            spool,
+            "vehicle_detections",
+            [row],
+            lambda rows: db.log_vehicle_detection(
+                request.junction_id,
+                request.lane_number,
+                request.fastag_id,
+                request.vehicle_type,
+                detection_timestamp=rows[0].get("detection_timestamp"),
+                ingest_key=rows[0].get("ingest_key"),
+            ),
+        )
+        travel_time_engine.observe(request.junction_id, request.fastag_id)
+        event_bus.publish(
+            detection_event(
+                request.junction_id,
+                request.lane_number,
+                request.fastag_id,
+                request.vehicle_type,
+            )
+        )
 
         return {
             "status": "success",
-            "message": "Vehicle detection logged",
+            "message": (
+                "Vehicle detection spooled until the database recovers"
+                if spooled
+                else "Vehicle detection logged"
+            ),
+            "spooled": spooled,
             "junction_id": request.junction_id,
             "lane": request.lane_number,
             "fastag_id": request.fastag_id,
         }
 
     except Exception as e:
+        if dedup is not None:
+            dedup.release(reservation)
         logger.error(f"❌ Vehicle detection logging failed: {str(e)}")
         raise HTTPException(
             status_code=500, detail=f"Failed to log vehicle detection: {str(e)}"
         )
 
 
+MAX_BULK_DETECTIONS = 1000
+# Bodies are capped before parsing; ~1 KiB per detection is ample headroom
+MAX_BULK_BODY_BYTES = 1024 * MAX_BULK_DETECTIONS
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+_bulk_detection_adapter = TypeAdapter(List[BulkVehicleDetectionItem])
+
+
+def _parse_bulk_detection_body(
+    body: bytes, content_type: str
+) -> Tuple[List[Any], Dict[int, List[Dict[str, str]]]]:
+    """
+    Split a bulk ingest body into raw items.
+    Accepts {"detections": [...]}, a bare JSON array, or NDJSON (one
+    detection per line). Returns items plus per-index parse errors.
+    """
+    if content_type.split(";")[0].strip() in NDJSON_CONTENT_TYPES:
+        items: List[Any] = []
+        parse_errors: Dict[int, List[Dict[str, str]]] = {}
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                parse_errors[len(items)] = [{"field": "", "message": f"Invalid JSON: {e.msg}"}]
+                items.append(None)
+        return items, parse_errors
+
+    try:
+        payload = json.loads(body or b"null")
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e.msg}")
+
+    if isinstance(payload, dict):
+        payload = payload.get("detections")
+    if not isinstance(payload, list):
+        raise HTTPException(
+            status_code=400,
+            detail='Body must be {"detections": [...]}, a JSON array, or NDJSON',
+        )
+    return payload, {}
+
+
+def _validate_detection_batch(
+    items: List[Any],
+) -> Tuple[List[Tuple[int, BulkVehicleDetectionItem]], Dict[int, List[Dict[str, str]]]]:
+    """
+    Validate all items in one Pydantic pass. Only when the batch has errors
+    are the valid items re-validated individually to keep them.
+    """
+    try:
+        return list(enumerate(_bulk_detection_adapter.validate_python(items))), {}
+    except ValidationError as exc:
+        errors: Dict[int, List[Dict[str, str]]] = {}
+        for error in exc.errors(include_url=False):
+            index = int(error["loc"][0])
+            errors.setdefault(index, []).append(
+                {
+                    "field": ".".join(str(part) for part in error["loc"][1:]),
+                    "message": error["msg"],
+                }
+            )
+
+    valid = [
+        (index, BulkVehicleDetectionItem.model_validate(item))
+        for index, item in enumerate(items)
+        if index not in errors
+    ]
+    return valid, errors
+
+
+async def _read_bulk_body(request: Request) -> bytes:
+    """
+    Request body, refused with 413 as soon as it exceeds MAX_BULK_BODY_BYTES:
+    up front from Content-Length, otherwise while it streams in
+    """
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"Request body exceeds {MAX_BULK_BODY_BYTES} bytes",
+    )
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > MAX_BULK_BODY_BYTES:
+        raise too_large
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > MAX_BULK_BODY_BYTES:
+            raise too_large
+    return bytes(body)
+
+
+@app.post("/vehicle-detection/bulk")
+async def log_vehicle_detections_bulk(
+    request: Request,
+    db: DatabaseService = Depends(get_db_service),
+    spool: Optional[WriteSpool] = Depends(get_spool),
+    dedup: Optional[DetectionDeduplicator] = Depends(get_deduplicator),
+):
+    """
+    Log many vehicle detections in one request (JSON or NDJSON).
+    Valid items are written with a single multi-row insert; the response
+    carries a status per input item. Repeat reads (same junction, lane and
+    FASTag within the dedup window, also within the batch) are reported as
+    "duplicate" and not stored.
+    """
+    items, parse_errors = _parse_bulk_detection_body(
+        await _read_bulk_body(request), request.headers.get("content-type", "")
+    )
+
+    if not items:
+        raise HTTPException(status_code=400, detail="No detections in request")
+    if len(items) > MAX_BULK_DETECTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_BULK_DETECTIONS} detections per request",
+        )
+
+    valid, errors = _validate_detection_batch(items)
+    errors.update(parse_errors)
+    valid = [(index, item) for index, item in valid if index not in parse_errors]
+
+    # Reads are recorded as they are checked, so repeats within the batch and
+    # in concurrent requests are suppressed; released again if the write fails
+    duplicates: List[int] = []
+    reservations: List[Optional[Reservation]] = []
+    if dedup is not None:
+        unique = []
+        for index, item in valid:
+            read_at = item.detection_timestamp
+            if read_at is not None and read_at.tzinfo is None:
+                read_at = read_at.replace(tzinfo=timezone.utc)
+            read = (
+                item.junction_id,
+                item.lane_number,
+                item.fastag_id,
+                read_at.timestamp() if read_at else None,
+            )
+            if dedup.is_duplicate(*read):
+                duplicates.append(index)
+            else:
+                unique.append((index, item))
+            reservations.append(dedup.record(*read))
+        valid = unique
+
+    rows = [item.model_dump(mode="json", exclude_none=True) for _, item in valid]
+    try:
+        inserted, spooled = await write_or_spool(
+            spool,
+            "vehicle_detections",
+            [DatabaseService.build_vehicle_detection_row(**row) for row in rows],
+            db.log_vehicle_detections_bulk,
+        )
+    except Exception as e:
+        if dedup is not None:
+            for reservation in reservations:
+                dedup.release(reservation)
+        logger.error(f"❌ Bulk vehicle detection logging failed: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to log vehicle detections: {str(e)}"
+        )
+    travel_time_engine.observe_many(rows)
+    for row in rows:
+        event_bus.publish(
+            detection_event(
+                row["junction_id"], row["lane_number"], row["fastag_id"], row.get("vehicle_type")
+            )
+        )
+
+    results: List[Dict[str, Any]] = [
+        {"index": index, "status": "rejected", "errors": item_errors}
+        for index, item_errors in errors.items()
+    ]
+    results.extend({"index": index, "status": "duplicate"} for index in duplicates)
+    results.extend(
+        {"index": index, "status": "accepted", "id": None if spooled else row.get("id")}
+        for (index, _), row in zip(valid, inserted)
+    )
+    results.sort(key=lambda r: r["index"])
+
+    kept = len(valid) + len(duplicates)
+    return {
+        "status": "success" if not errors else ("partial" if kept else "rejected"),
+        "received": len(items),
+        "accepted": len(valid),
+        "duplicates": len(duplicates),
+        "rejected": len(errors),
+        "spooled": spooled,
+        "results": results,
+    }
+
+
 @app.get("/junctions")
-async def get_junctions(db: DatabaseService = Depends(get_db_service)):
-    """Get all active junctions"""
+async def get_junctions(request: Request, db: DatabaseService = Depends(get_db_service)):
+    """Get all active junctions (supports If-None-Match revalidation)"""
     try:
-        junctions = await db.get_all_junctions()
-        return {"junctions": junctions}
+        junctions = await junction_cache.get_all(db)
+        etag = await junction_cache.get_etag(db)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        return JSONResponse(content={"junctions": junctions}, headers=headers)
 
     except Exception as e:
         logger.error(f"❌ Failed to get junctions: {str(e)}")
@@ -338,27 +832,27 @@ async def get_junctions(db: DatabaseService = Depends(get_db_service)):
         )
 
 
+@app.post("/junctions/cache/invalidate")
+async def invalidate_junction_cache(admin: dict = Depends(get_admin_user)):
+    """Drop cached junction metadata after junctions are edited (admin only)"""
+    junction_cache.invalidate()
+    return {"status": "success", "message": "Junction cache invalidated"}
+
+
 @app.get("/junction/{junction_id}/status", response_model=JunctionStatusResponse)
 async def get_junction_status(
     junction_id: int, db: DatabaseService = Depends(get_db_service)
 ):
     """Get current status of a specific junction"""
     try:
-        # Get current lane counts
-        lane_counts = await db.get_current_lane_counts(
-            junction_id, time_window_minutes=5
+        # Independent lookups run concurrently; junction row comes from the cache
+        junction, lane_counts, latest_cycle, today_count = await asyncio.gather(
+            junction_cache.get(db, junction_id),
+            db.get_current_lane_counts(junction_id, time_window_minutes=5),
+            db.get_current_traffic_cycle(junction_id),
+            db.get_vehicles_count_by_date(junction_id, date.today()),
         )
 
-        # Get latest traffic cycle
-        latest_cycle = await db.get_current_traffic_cycle(junction_id)
-
-        # Get today's vehicle count
-        today_count = await db.get_vehicles_count_by_date(junction_id, date.today())
-
-        # Get junction info
-        junctions = await db.get_all_junctions()
-        junction = next((j for j in junctions if j["id"] == junction_id), None)
-
         if not junction:
             raise HTTPException(status_code=404, detail="Junction not found")
 
@@ -423,26 +917,80 @@ async def get_live_timing(
         )
 
 
-@app.get("/junction/{junction_id}/history") #The return values and the values to be inserted in the db seems incorrect
+def _format_query():
+    return Query(
+        "json",
+        alias="format",
+        pattern="^(json|ndjson|csv)$",
+        description="json (one page), or ndjson / csv to stream every row",
+    )
+
+
+@app.get("/junction/{junction_id}/history")
 async def get_junction_history(
-    junction_id: int, limit: int = 10, db: DatabaseService = Depends(get_db_service)
+    junction_id: int,
+    limit: int = Query(10, ge=1, le=250),
+    before_timestamp: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    response_format: str = _format_query(),
+    db: DatabaseService = Depends(get_db_service),
 ):
-    """Get recent traffic cycles and detections for a junction"""
+    """
+    Get recent detections (joined to the signal plan active at detection
+    time) and the latest traffic cycle for a junction.
+    Pass next_cursor values back as before_timestamp/before_id to page.
+    With format=ndjson/csv every detection from the cursor back is streamed
+    instead, fetched in keyset pages.
+    """
+    if response_format != "json":
+        page_size = 500
+
+        async def fetch_page(last: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            if last is None:
+                cursor_time = before_timestamp.isoformat() if before_timestamp else None
+                cursor_id = before_id
+            else:
+                cursor_time, cursor_id = last["detection_timestamp"], last["id"]
+            return await db.get_recent_detections_with_signals(
+                junction_id,
+                limit=page_size,
+                before_timestamp=cursor_time,
+                before_id=cursor_id,
+                raise_errors=True,
+            )
+
+        return streaming_response(
+            iter_keyset_pages(fetch_page, page_size),
+            response_format,
+            filename=f"junction-{junction_id}-detections",
+        )
+
     try:
-        # Get recent detections
-        recent_detections = await db.get_recent_detections_with_signals(
-            junction_id, limit=limit * 2
+        page_size = limit * 2
+        recent_detections, latest_cycle = await asyncio.gather(
+            db.get_recent_detections_with_signals(
+                junction_id,
+                limit=page_size,
+                before_timestamp=before_timestamp.isoformat() if before_timestamp else None,
+                before_id=before_id,
+            ),
+            db.get_current_traffic_cycle(junction_id),
         )
 
-        # Get recent cycles (if available through a method)
-        # For now, we'll use get_current_traffic_cycle which gets the latest
-        latest_cycle = await db.get_current_traffic_cycle(junction_id)
+        next_cursor = None
+        if len(recent_detections) >= page_size:
+            last = recent_detections[-1]
+            next_cursor = {
+                "before_timestamp": last["detection_timestamp"],
+                "before_id": last["id"],
+            }
 
         return {
             "junction_id": junction_id,
             "recent_detections": recent_detections,
             "latest_cycle": latest_cycle,
             "total_records": len(recent_detections),
+            "next_cursor": next_cursor,
         }
 
     except Exception as e:
@@ -452,6 +1000,126 @@ async def get_junction_history(
         )
 
 
+@app.get("/junction/{junction_id}/cycles")
+async def get_traffic_cycle_history(
+    junction_id: int,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    before_timestamp: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated traffic_cycles columns (id and cycle_start_time are always included)"
+    ),
+    bucket_seconds: Optional[int] = Query(
+        None, ge=60, le=7 * 86400, description="Return one representative plan per interval"
+    ),
+    response_format: str = _format_query(),
+    db: DatabaseService = Depends(get_db_service),
+):
+    """
+    Get the signal plan history of a junction, newest first, optionally
+    limited to [start_time, end_time), projected to `fields` and downsampled
+    to the last plan of each `bucket_seconds` interval.
+    Pass next_cursor values back as before_timestamp/before_id to page.
+    With format=ndjson/csv the whole range is streamed instead of one page.
+    """
+    if start_time and end_time and start_time >= end_time:
+        raise HTTPException(status_code=400, detail="start_time must be before end_time")
+
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    try:
+        columns = DatabaseService.traffic_cycle_columns(field_list)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def fetch_page(
+        page_size: int,
+        cursor_time: Optional[str],
+        cursor_id: Optional[int],
+        raise_errors: bool = False,
+    ) -> List[Dict[str, Any]]:
+        return await db.get_traffic_cycle_history(
+            junction_id,
+            start_time=start_time.isoformat() if start_time else None,
+            end_time=end_time.isoformat() if end_time else None,
+            before_timestamp=cursor_time,
+            before_id=cursor_id,
+            limit=page_size,
+            fields=field_list,
+            bucket_seconds=bucket_seconds,
+            raise_errors=raise_errors,
+        )
+
+    first_cursor = before_timestamp.isoformat() if before_timestamp else None
+
+    if response_format != "json":
+        async def fetch_next(last: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            if last is None:
+                return await fetch_page(STREAM_PAGE_SIZE, first_cursor, before_id, True)
+            return await fetch_page(
+                STREAM_PAGE_SIZE, last["cycle_start_time"], last["id"], True
+            )
+
+        return streaming_response(
+            iter_keyset_pages(fetch_next, STREAM_PAGE_SIZE),
+            response_format,
+            filename=f"junction-{junction_id}-cycles",
+            columns=columns,
+        )
+
+    try:
+        cycles = await fetch_page(limit, first_cursor, before_id)
+
+        next_cursor = None
+        if len(cycles) >= limit:
+            last = cycles[-1]
+            next_cursor = {
+                "before_timestamp": last["cycle_start_time"],
+                "before_id": last["id"],
+            }
+
+        return {
+            "junction_id": junction_id,
+            "bucket_seconds": bucket_seconds,
+            "cycles": cycles,
+            "total_records": len(cycles),
+            "next_cursor": next_cursor,
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Failed to get traffic cycle history: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to get traffic cycle history: {str(e)}"
+        )
+
+
+MAX_SUMMARY_RANGE_DAYS = 92
+# Streamed summaries are fetched in windows, so they can span far longer ranges
+MAX_STREAM_RANGE_DAYS = 3660
+STREAM_SUMMARY_WINDOW_DAYS = 31
+
+
+def _build_daily_summary(
+    target_date: date, junctions: List[Dict[str, Any]], totals: Dict[int, int]
+) -> Dict[str, Any]:
+    """Shape per-junction totals for one date into the daily-summary payload"""
+    summary = [
+        {
+            "junction_id": junction["id"],
+            "junction_name": junction["junction_name"],
+            "total_vehicles": totals.get(junction["id"], 0),
+            "date": target_date.isoformat(),
+        }
+        for junction in junctions
+    ]
+    return {
+        "date": target_date.isoformat(),
+        "junction_summaries": summary,
+        "total_vehicles": sum(s["total_vehicles"] for s in summary),
+    }
+
+
 @app.get("/analytics/daily-summary")
 async def get_daily_summary(
     target_date: Optional[date] = None, db: DatabaseService = Depends(get_db_service)
@@ -461,36 +1129,189 @@ async def get_daily_summary(
         if target_date is None:
             target_date = date.today()
 
-        # Get all junctions
-        junctions = await db.get_all_junctions()
+        # Junction metadata and the grouped per-junction totals are independent
+        junctions, totals = await asyncio.gather(
+            junction_cache.get_all(db), db.get_vehicle_totals_by_date(target_date)
+        )
+
+        return _build_daily_summary(target_date, junctions, totals)
+
+    except Exception as e:
+        logger.error(f"❌ Failed to get daily summary: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to get daily summary: {str(e)}"
+        )
+
 
-        summary = []
-        for junction in junctions:
-            vehicle_count = await db.get_vehicles_count_by_date(
-                junction["id"], target_date
+@app.get("/analytics/daily-summary/range")
+async def get_daily_summary_range(
+    start_date: date,
+    end_date: Optional[date] = None,
+    response_format: str = _format_query(),
+    db: DatabaseService = Depends(get_db_service),
+):
+    """
+    Get daily traffic summaries across all junctions for a date range (inclusive).
+    With format=ndjson/csv one row per date and junction is streamed,
+    querying STREAM_SUMMARY_WINDOW_DAYS at a time.
+    """
+    if end_date is None:
+        end_date = date.today()
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    max_days = MAX_SUMMARY_RANGE_DAYS if response_format == "json" else MAX_STREAM_RANGE_DAYS
+    if (end_date - start_date).days + 1 > max_days:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Date range cannot exceed {max_days} days",
+        )
+
+    if response_format != "json":
+        async def summary_rows():
+            junctions = await junction_cache.get_all(db)
+            window_start = start_date
+            while window_start <= end_date:
+                window_end = min(
+                    window_start + timedelta(days=STREAM_SUMMARY_WINDOW_DAYS - 1), end_date
+                )
+                totals = await db.get_vehicle_totals_by_date_range(
+                    window_start, window_end, raise_errors=True
+                )
+                current = window_start
+                while current <= window_end:
+                    summary = _build_daily_summary(
+                        current, junctions, totals.get(current.isoformat(), {})
+                    )
+                    for row in summary["junction_summaries"]:
+                        yield row
+                    current += timedelta(days=1)
+                window_start = window_end + timedelta(days=1)
+
+        return streaming_response(
+            summary_rows(),
+            response_format,
+            filename=f"daily-summary-{start_date.isoformat()}-{end_date.isoformat()}",
+            columns=["date", "junction_id", "junction_name", "total_vehicles"],
+        )
+
+    try:
+        junctions, totals = await asyncio.gather(
+            junction_cache.get_all(db),
+            db.get_vehicle_totals_by_date_range(start_date, end_date),
+        )
+
+        days = []
+        current = start_date
+        while current <= end_date:
+            days.append(
+                _build_daily_summary(
+                    current, junctions, totals.get(current.isoformat(), {})
+                )
             )
-            summary.append(
-                {
-                    "junction_id": junction["id"],
-                    "junction_name": junction["junction_name"],
-                    "total_vehicles": vehicle_count,
-                    "date": target_date.isoformat(),
-                }
+            current += timedelta(days=1)
+
+        return {
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "days": days,
+            "total_vehicles": sum(d["total_vehicles"] for d in days),
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Failed to get daily summary range: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to get daily summary range: {str(e)}"
+        )
+
+
+@app.get("/analytics/junction/{junction_id}/hourly")
+async def get_hourly_summary(
+    junction_id: int,
+    target_date: Optional[date] = None,
+    response_format: str = _format_query(),
+    db: DatabaseService = Depends(get_db_service),
+):
+    """
+    Get hourly vehicle counts for a junction, per lane and vehicle type.
+    format=ndjson/csv streams the flat rollup rows instead.
+    """
+    if target_date is None:
+        target_date = date.today()
+
+    if response_format != "json":
+        async def rollup_rows():
+            for row in await db.get_hourly_vehicle_counts(
+                junction_id, target_date, raise_errors=True
+            ):
+                yield row
+
+        return streaming_response(
+            rollup_rows(),
+            response_format,
+            filename=f"junction-{junction_id}-hourly-{target_date.isoformat()}",
+            columns=["bucket_hour", "lane_number", "vehicle_type", "vehicle_count"],
+        )
+
+    try:
+        rows = await db.get_hourly_vehicle_counts(junction_id, target_date)
+
+        hours: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            bucket = hours.setdefault(
+                row["bucket_hour"],
+                {"hour": row["bucket_hour"], "total_vehicles": 0, "lanes": {}, "vehicle_types": {}},
+            )
+            count = row["vehicle_count"]
+            lane = str(row["lane_number"])
+            vehicle_type = row["vehicle_type"]
+            bucket["total_vehicles"] += count
+            bucket["lanes"][lane] = bucket["lanes"].get(lane, 0) + count
+            bucket["vehicle_types"][vehicle_type] = (
+                bucket["vehicle_types"].get(vehicle_type, 0) + count
             )
 
+        hourly = sorted(hours.values(), key=lambda h: h["hour"])
         return {
+            "junction_id": junction_id,
             "date": target_date.isoformat(),
-            "junction_summaries": summary,
-            "total_vehicles": sum(s["total_vehicles"] for s in summary),
+            "hourly": hourly,
+            "total_vehicles": sum(h["total_vehicles"] for h in hourly),
         }
 
     except Exception as e:
-        logger.error(f"❌ Failed to get daily summary: {str(e)}")
+        logger.error(f"❌ Failed to get hourly summary: {str(e)}")
         raise HTTPException(
-            status_code=500, detail=f"Failed to get daily summary: {str(e)}"
+            status_code=500, detail=f"Failed to get hourly summary: {str(e)}"
         )
 
 
+@app.get("/analytics/travel-times")
+async def get_travel_times(min_samples: int = Query(1, ge=1)):
+    """
+    Recent travel times between junction pairs, from FASTags re-identified
+    at successive junctions. congestion_index is the recent median over the
+    baseline median (above 1 means slower than usual).
+    """
+    return {
+        "window_seconds": travel_time_engine.window_seconds,
+        "baseline_seconds": travel_time_engine.baseline_seconds,
+        "links": travel_time_engine.links(min_samples=min_samples),
+        "engine": travel_time_engine.stats(),
+    }
+
+
+@app.get("/analytics/travel-times/{from_junction_id}/{to_junction_id}")
+async def get_link_travel_time(from_junction_id: int, to_junction_id: int):
+    """Travel-time quantiles for one junction-to-junction link"""
+    link = travel_time_engine.link(from_junction_id, to_junction_id)
+    if link is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No travel times observed from junction {from_junction_id} to {to_junction_id}",
+        )
+    return {"window_seconds": travel_time_engine.window_seconds, **link}
+
+
 # Error handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
@@ -512,26 +1333,131 @@ async def general_exception_handler(request, exc):
         status_code=500, content={"error": "Internal server error", "status_code": 500}
     )
 
+async def _handle_ws_command(websocket: WebSocket, text: str) -> None:
+    """Apply a subscribe / unsubscribe command and acknowledge it"""
+    try:
+        command = WebSocketCommand.model_validate_json(text)
+    except ValidationError as e:
+        await manager.send(
+            websocket, {"type": "error", "message": f"Invalid command: {e.errors()[0]['msg']}"}
+        )
+        return
+
+    if command.action == "unsubscribe":
+        ack = manager.subscribe(websocket)
+    else:
+        ack = manager.subscribe(
+            websocket, command.junction_ids, command.components, command.levels
+        )
+    await manager.send(websocket, ack)
+    if command.since is not None:
+        manager.replay_since(websocket, command.since, command.stream)
+    # Current live timing state of the subscribed junctions, for later delta frames
+    for frame in live_timing.snapshots(command.junction_ids):
+        manager.send_routed(websocket, frame)
+
+
 @app.websocket("/ws/logs")
-async def websocket_logs_endpoint(websocket: WebSocket):
+async def websocket_logs_endpoint(
+    websocket: WebSocket,
+    user: Optional[dict] = Depends(get_ws_user),
+    since: Optional[int] = Query(None, ge=0),
+    stream: Optional[str] = Query(None),
+):
     """
     Clients connect here to receive live log/messages from MQTT and internal events.
+    Send {"action": "subscribe", "junction_ids": [...], "components": [...],
+    "levels": [...]} to filter them (omitted fields: no filter), or
+    {"action": "unsubscribe"} to clear the filters. With ?token= only
+    junctions the user has access to are delivered. Reconnect with
+    ?since=<last sequence>&stream=<stream> to receive what was missed first.
     """
-    await manager.connect(websocket)
+    await manager.connect(websocket, user=user, since=since, stream=stream)
     try:
         while True:
-            # keep the socket open; don't need to read client messages
-            # but reading will keep connection alive if ping/pong implemented
+            # keep the socket open; reading also picks up ping and subscriptions
             msg = await websocket.receive_text()
-            # optional: respond to ping messages if your client sends them
             if msg == "ping":
-                await websocket.send_text('{"type":"pong"}')
+                await manager.send(websocket, {"type": "pong"})
+            else:
+                await _handle_ws_command(websocket, msg)
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception:
         manager.disconnect(websocket)
 
 
+@app.websocket("/ws/ingest")
+async def device_ingest_endpoint(
+    websocket: WebSocket, junction_id: int = Depends(get_device_junction)
+):
+    """
+    Persistent connection for a junction controller that cannot reach the
+    MQTT broker. Send car counts as {"lane_counts": [n, s, e, w],
+    "cycle_id": 123}; each report is answered on the same socket with
+    {"type": "green_times", "green_times": [...], "cycle_time": ...,
+    "junction_id": ..., "cycle_id": ...} or {"type": "error", ...}.
+    Authenticate with ?junction_id=&token= (or Authorization: Bearer).
+    """
+    await websocket.accept()
+    await device_gateway.register(junction_id, websocket)
+    try:
+        while True:
+            text = await websocket.receive_text()
+            reply = await device_gateway.handle(junction_id, text)
+            await device_gateway.send(websocket, reply)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.warning(f"⚠️ Junction {junction_id} controller disconnected: {e}")
+    finally:
+        device_gateway.unregister(junction_id, websocket)
+
+
+@app.get("/sse/logs")
+async def sse_logs_endpoint(
+    request: Request,
+    user: Optional[dict] = Depends(get_sse_user),
+    junction_ids: Optional[List[int]] = Query(None),
+    components: Optional[List[str]] = Query(None),
+    levels: Optional[List[str]] = Query(None),
+    since: Optional[int] = Query(None, ge=0),
+    stream: Optional[str] = Query(None),
+):
+    """
+    The /ws/logs messages as Server-Sent Events, for read-only dashboards
+    behind proxies that handle WebSockets badly. Filters are query
+    parameters (repeat them for several values). A reconnecting
+    EventSource resumes from its Last-Event-ID header; ?since=&stream=
+    does the same for the first connection. Comment lines are sent as
+    heartbeats while there is nothing to deliver.
+    """
+    resume = parse_event_id(request.headers.get("last-event-id"))
+    if resume is not None:
+        stream, since = resume
+
+    connection = SSEConnection(manager.replay.stream, client=request.client)
+    await manager.connect(connection, user=user)
+    ack = manager.subscribe(connection, junction_ids, components, levels)
+    await manager.send(connection, ack)
+    if since is not None:
+        manager.replay_since(connection, since, stream)
+    for frame in live_timing.snapshots(junction_ids):
+        manager.send_routed(connection, frame)
+
+    async def events():
+        try:
+            async for frame in connection.frames(lambda: connection in manager.clients):
+                yield frame
+        finally:
+            manager.disconnect(connection)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,109 @@
+-- Migration: Add hourly and daily vehicle count rollups
+-- Date: 2026-10-19
+-- Purpose: Keep pre-aggregated vehicle counts per junction, lane, vehicle type
+-- and hour/day so analytics queries scan O(days) rollup rows instead of
+-- counting raw vehicle_detections rows on every request.
+-- Rollups are maintained incrementally by a trigger on vehicle_detections and
+-- can be rebuilt for historical data with backfill_vehicle_count_rollups().
+
+-- Hourly rollup (bucket_hour is the UTC hour the detections fall into)
+CREATE TABLE IF NOT EXISTS vehicle_counts_hourly (
+    junction_id bigint NOT NULL REFERENCES traffic_junctions(id) ON DELETE CASCADE,
+    lane_number integer NOT NULL,
+    vehicle_type text NOT NULL DEFAULT 'car',
+    bucket_hour timestamp with time zone NOT NULL,
+    vehicle_count bigint NOT NULL DEFAULT 0,
+    updated_at timestamp with time zone DEFAULT now(),
+    PRIMARY KEY (junction_id, bucket_hour, lane_number, vehicle_type)
+);
+
+-- Daily rollup (bucket_date is the UTC calendar date)
+CREATE TABLE IF NOT EXISTS vehicle_counts_daily (
+    junction_id bigint NOT NULL REFERENCES traffic_junctions(id) ON DELETE CASCADE,
+    lane_number integer NOT NULL,
+    vehicle_type text NOT NULL DEFAULT 'car',
+    bucket_date date NOT NULL,
+    vehicle_count bigint NOT NULL DEFAULT 0,
+    updated_at timestamp with time zone DEFAULT now(),
+    PRIMARY KEY (junction_id, bucket_date, lane_number, vehicle_type)
+);
+
+-- Cross-junction lookups by date (daily summary) read this index
+CREATE INDEX IF NOT EXISTS idx_vehicle_counts_daily_date ON vehicle_counts_daily(bucket_date);
+CREATE INDEX IF NOT EXISTS idx_vehicle_counts_hourly_hour ON vehicle_counts_hourly(bucket_hour);
+
+-- Incremental maintenance: bump both rollups for every inserted detection
+CREATE OR REPLACE FUNCTION rollup_vehicle_detection()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_ts timestamp with time zone := COALESCE(NEW.detection_timestamp, now());
+    v_type text := COALESCE(NEW.vehicle_type, 'car');
+BEGIN
+    IF NEW.junction_id IS NULL THEN
+        RETURN NEW;
+    END IF;
+
+    INSERT INTO vehicle_counts_hourly (junction_id, lane_number, vehicle_type, bucket_hour, vehicle_count)
+    VALUES (NEW.junction_id, NEW.lane_number, v_type, date_trunc('hour', v_ts AT TIME ZONE 'UTC') AT TIME ZONE 'UTC', 1)
+    ON CONFLICT (junction_id, bucket_hour, lane_number, vehicle_type)
+    DO UPDATE SET vehicle_count = vehicle_counts_hourly.vehicle_count + 1, updated_at = now();
+
+    INSERT INTO vehicle_counts_daily (junction_id, lane_number, vehicle_type, bucket_date, vehicle_count)
+    VALUES (NEW.junction_id, NEW.lane_number, v_type, (v_ts AT TIME ZONE 'UTC')::date, 1)
+    ON CONFLICT (junction_id, bucket_date, lane_number, vehicle_type)
+    DO UPDATE SET vehicle_count = vehicle_counts_daily.vehicle_count + 1, updated_at = now();
+
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS trg_rollup_vehicle_detection ON vehicle_detections;
+CREATE TRIGGER trg_rollup_vehicle_detection AFTER INSERT ON vehicle_detections
+    FOR EACH ROW EXECUTE FUNCTION rollup_vehicle_detection();
+
+-- Backfill: rebuild rollups for [p_start_date, p_end_date) from raw detections.
+-- Safe to re-run; existing rollup rows for the range are replaced.
+CREATE OR REPLACE FUNCTION backfill_vehicle_count_rollups(p_start_date date, p_end_date date)
+RETURNS bigint AS $$
+DECLARE
+    v_start timestamp with time zone := p_start_date::timestamp AT TIME ZONE 'UTC';
+    v_end timestamp with time zone := p_end_date::timestamp AT TIME ZONE 'UTC';
+    v_rows bigint;
+BEGIN
+    DELETE FROM vehicle_counts_hourly WHERE bucket_hour >= v_start AND bucket_hour < v_end;
+    DELETE FROM vehicle_counts_daily WHERE bucket_date >= p_start_date AND bucket_date < p_end_date;
+
+    INSERT INTO vehicle_counts_hourly (junction_id, lane_number, vehicle_type, bucket_hour, vehicle_count)
+    SELECT junction_id,
+           lane_number,
+           COALESCE(vehicle_type, 'car'),
+           date_trunc('hour', detection_timestamp AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+           count(*)
+    FROM vehicle_detections
+    WHERE junction_id IS NOT NULL
+      AND detection_timestamp >= v_start
+      AND detection_timestamp < v_end
+    GROUP BY 1, 2, 3, 4;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+    -- Daily rows are derived from the hourly rows just written
+    INSERT INTO vehicle_counts_daily (junction_id, lane_number, vehicle_type, bucket_date, vehicle_count)
+    SELECT junction_id,
+           lane_number,
+           vehicle_type,
+           (bucket_hour AT TIME ZONE 'UTC')::date,
+           sum(vehicle_count)
+    FROM vehicle_counts_hourly
+    WHERE bucket_hour >= v_start AND bucket_hour < v_end
+    GROUP BY 1, 2, 3, 4;
+
+    RETURN v_rows;
+END;
+$$ language 'plpgsql';
+
+-- Populate rollups for all existing history
+SELECT backfill_vehicle_count_rollups(
+    COALESCE((SELECT min(detection_timestamp AT TIME ZONE 'UTC')::date FROM vehicle_detections), current_date),
+    current_date + 1
+);
@@ -0,0 +1,14 @@
+-- Migration: Add grouped vehicle totals function for daily summaries
+-- Date: 2026-10-19
+-- Purpose: Return per-junction vehicle totals for a date range in a single
+-- grouped query over vehicle_counts_daily, so /analytics/daily-summary no
+-- longer issues one count query per junction.
+
+CREATE OR REPLACE FUNCTION vehicle_totals_by_date(p_start_date date, p_end_date date)
+RETURNS TABLE (bucket_date date, junction_id bigint, total_vehicles bigint) AS $$
+    SELECT d.bucket_date, d.junction_id, sum(d.vehicle_count)::bigint
+    FROM vehicle_counts_daily d
+    WHERE d.bucket_date >= p_start_date
+      AND d.bucket_date <= p_end_date
+    GROUP BY d.bucket_date, d.junction_id
+$$ language 'sql' STABLE;
@@ -0,0 +1,99 @@
+-- Migration: Add joined detection history function
+-- Date: 2026-10-19
+-- Purpose: Back /junction/{id}/history with a single query that returns
+-- recent vehicle detections together with the traffic_cycles row that was
+-- active at each detection time. Cycles are turned into [start, next_start)
+-- ranges and range-joined to the page of detections, instead of looking up
+-- a cycle per detection. Pagination is keyset on (detection_timestamp, id).
+
+-- Covering indexes: the detection page and the cycle window are read from
+-- the index alone (no heap lookups for the projected columns)
+CREATE INDEX IF NOT EXISTS idx_vehicle_detections_junction_time_id_covering
+    ON vehicle_detections (junction_id, detection_timestamp DESC, id DESC)
+    INCLUDE (lane_number, fastag_id, vehicle_type, processing_status);
+
+CREATE INDEX IF NOT EXISTS idx_traffic_cycles_junction_start_covering
+    ON traffic_cycles (junction_id, cycle_start_time, id)
+    INCLUDE (
+        total_cycle_time,
+        lane_1_green_time, lane_2_green_time, lane_3_green_time, lane_4_green_time,
+        total_vehicles_detected
+    );
+
+CREATE OR REPLACE FUNCTION get_recent_detections_with_signals(
+    p_junction_id bigint,
+    p_limit integer DEFAULT 20,
+    p_before_timestamp timestamp with time zone DEFAULT NULL,
+    p_before_id bigint DEFAULT NULL
+)
+RETURNS TABLE (
+    id bigint,
+    junction_id bigint,
+    lane_number integer,
+    fastag_id text,
+    vehicle_type text,
+    processing_status text,
+    detection_timestamp timestamp with time zone,
+    cycle_id bigint,
+    cycle_start_time timestamp with time zone,
+    total_cycle_time integer,
+    lane_green_time integer,
+    lane_1_green_time integer,
+    lane_2_green_time integer,
+    lane_3_green_time integer,
+    lane_4_green_time integer
+) AS $$
+    WITH detections AS (
+        -- One keyset page of detections, newest first
+        SELECT d.id, d.junction_id, d.lane_number, d.fastag_id, d.vehicle_type,
+               d.processing_status, d.detection_timestamp
+        FROM vehicle_detections d
+        WHERE d.junction_id = p_junction_id
+          AND (
+              p_before_timestamp IS NULL
+              OR (d.detection_timestamp, d.id) < (p_before_timestamp, COALESCE(p_before_id, 9223372036854775807))
+          )
+        ORDER BY d.detection_timestamp DESC, d.id DESC
+        LIMIT LEAST(GREATEST(p_limit, 1), 500)
+    ),
+    bounds AS (
+        SELECT min(detection_timestamp) AS oldest, max(detection_timestamp) AS newest
+        FROM detections
+    ),
+    cycles AS (
+        -- Only cycles that can cover the page: from the last cycle started
+        -- before the oldest detection up to the newest detection
+        SELECT c.id, c.cycle_start_time, c.total_cycle_time,
+               c.lane_1_green_time, c.lane_2_green_time,
+               c.lane_3_green_time, c.lane_4_green_time,
+               lead(c.cycle_start_time) OVER (ORDER BY c.cycle_start_time, c.id) AS cycle_end_time
+        FROM traffic_cycles c, bounds b
+        WHERE c.junction_id = p_junction_id
+          AND c.cycle_start_time <= b.newest
+          AND c.cycle_start_time >= COALESCE(
+              (
+                  SELECT max(c2.cycle_start_time)
+                  FROM traffic_cycles c2
+                  WHERE c2.junction_id = p_junction_id
+                    AND c2.cycle_start_time <= b.oldest
+              ),
+              '-infinity'::timestamp with time zone
+          )
+    )
+    SELECT d.id, d.junction_id, d.lane_number, d.fastag_id, d.vehicle_type,
+           d.processing_status, d.detection_timestamp,
+           c.id, c.cycle_start_time, c.total_cycle_time,
+           CASE d.lane_number
+               WHEN 1 THEN c.lane_1_green_time
+               WHEN 2 THEN c.lane_2_green_time
+               WHEN 3 THEN c.lane_3_green_time
+               WHEN 4 THEN c.lane_4_green_time
+           END,
+           c.lane_1_green_time, c.lane_2_green_time,
+           c.lane_3_green_time, c.lane_4_green_time
+    FROM detections d
+    LEFT JOIN cycles c
+        ON d.detection_timestamp >= c.cycle_start_time
+       AND (c.cycle_end_time IS NULL OR d.detection_timestamp < c.cycle_end_time)
+    ORDER BY d.detection_timestamp DESC, d.id DESC
+$$ language 'sql' STABLE;
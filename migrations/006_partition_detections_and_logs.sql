@@ -0,0 +1,312 @@
+-- Migration: Partition vehicle_detections and system_logs by month
+-- Date: 2026-10-19
+-- Purpose: Both tables grew forever as single heaps, so their time indexes
+-- kept growing too. They are rebuilt as RANGE-partitioned tables (one
+-- partition per calendar month, UTC) so that:
+--   * time-bounded queries only touch the partitions in range (pruning)
+--   * old months can be downsampled into rollup tables and then dropped or
+--     moved to the `archive` schema in O(1), without bulk DELETEs
+-- Partitions are created ahead of time and retired by
+-- app/services/partition_maintenance.py, which calls the functions below.
+
+CREATE SCHEMA IF NOT EXISTS archive;
+
+-- ------------------------------------------------------------------
+-- Partition management helpers
+-- ------------------------------------------------------------------
+
+-- Create the monthly partitions of p_table that cover [p_from, p_to]
+CREATE OR REPLACE FUNCTION ensure_time_partitions(p_table text, p_from date, p_to date)
+RETURNS integer AS $$
+DECLARE
+    v_start date := date_trunc('month', p_from)::date;
+    v_end date;
+    v_name text;
+    v_created integer := 0;
+BEGIN
+    WHILE v_start <= p_to LOOP
+        v_end := (v_start + interval '1 month')::date;
+        v_name := format('%s_y%sm%s', p_table, to_char(v_start, 'YYYY'), to_char(v_start, 'MM'));
+
+        IF to_regclass('public.' || v_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE public.%I PARTITION OF public.%I FOR VALUES FROM (%L) TO (%L)',
+                v_name, p_table,
+                v_start::timestamp AT TIME ZONE 'UTC',
+                v_end::timestamp AT TIME ZONE 'UTC'
+            );
+            v_created := v_created + 1;
+        END IF;
+
+        v_start := v_end;
+    END LOOP;
+
+    RETURN v_created;
+END;
+$$ language 'plpgsql';
+
+-- ------------------------------------------------------------------
+-- vehicle_detections
+-- ------------------------------------------------------------------
+
+ALTER TABLE vehicle_detections RENAME TO vehicle_detections_unpartitioned;
+DROP TRIGGER IF EXISTS trg_rollup_vehicle_detection ON vehicle_detections_unpartitioned;
+
+CREATE SEQUENCE IF NOT EXISTS vehicle_detections_id_seq AS bigint;
+SELECT setval(
+    'vehicle_detections_id_seq',
+    COALESCE((SELECT max(id) FROM vehicle_detections_unpartitioned), 0) + 1,
+    false
+);
+
+CREATE TABLE vehicle_detections (
+    id bigint NOT NULL DEFAULT nextval('vehicle_detections_id_seq'),
+    junction_id bigint references traffic_junctions(id),
+    scanner_id bigint references rfid_scanners(id),
+    lane_number integer NOT NULL,
+    fastag_id text NOT NULL,
+    detection_timestamp timestamp with time zone NOT NULL DEFAULT now(),
+    vehicle_type text DEFAULT 'car',
+    processing_status text DEFAULT 'pending',
+    created_at timestamp with time zone DEFAULT now(),
+    PRIMARY KEY (id, detection_timestamp)
+) PARTITION BY RANGE (detection_timestamp);
+
+ALTER SEQUENCE vehicle_detections_id_seq OWNED BY vehicle_detections.id;
+
+-- Catch-all so an unexpected timestamp never fails an insert
+CREATE TABLE vehicle_detections_default PARTITION OF vehicle_detections DEFAULT;
+
+SELECT ensure_time_partitions(
+    'vehicle_detections',
+    COALESCE((SELECT min(detection_timestamp AT TIME ZONE 'UTC')::date FROM vehicle_detections_unpartitioned), current_date),
+    current_date + 90
+);
+
+INSERT INTO vehicle_detections (
+    id, junction_id, scanner_id, lane_number, fastag_id, detection_timestamp,
+    vehicle_type, processing_status, created_at
+)
+SELECT id, junction_id, scanner_id, lane_number, fastag_id,
+       COALESCE(detection_timestamp, created_at, now()),
+       vehicle_type, processing_status, created_at
+FROM vehicle_detections_unpartitioned;
+
+DROP TABLE vehicle_detections_unpartitioned;
+
+-- Indexes are declared on the parent and created on every partition
+CREATE INDEX idx_vehicle_detections_junction_time ON vehicle_detections(junction_id, detection_timestamp);
+CREATE INDEX idx_vehicle_detections_lane_time ON vehicle_detections(lane_number, detection_timestamp);
+CREATE INDEX idx_vehicle_detections_junction_time_id_covering
+    ON vehicle_detections (junction_id, detection_timestamp DESC, id DESC)
+    INCLUDE (lane_number, fastag_id, vehicle_type, processing_status);
+
+CREATE TRIGGER trg_rollup_vehicle_detection AFTER INSERT ON vehicle_detections
+    FOR EACH ROW EXECUTE FUNCTION rollup_vehicle_detection();
+
+-- ------------------------------------------------------------------
+-- system_logs
+-- ------------------------------------------------------------------
+
+ALTER TABLE system_logs RENAME TO system_logs_unpartitioned;
+
+CREATE SEQUENCE IF NOT EXISTS system_logs_id_seq AS bigint;
+SELECT setval(
+    'system_logs_id_seq',
+    COALESCE((SELECT max(id) FROM system_logs_unpartitioned), 0) + 1,
+    false
+);
+
+CREATE TABLE system_logs (
+    id bigint NOT NULL DEFAULT nextval('system_logs_id_seq'),
+    junction_id bigint references traffic_junctions(id),
+    log_level text NOT NULL,
+    component text NOT NULL,
+    message text NOT NULL,
+    metadata jsonb,
+    timestamp timestamp with time zone NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+ALTER SEQUENCE system_logs_id_seq OWNED BY system_logs.id;
+
+CREATE TABLE system_logs_default PARTITION OF system_logs DEFAULT;
+
+SELECT ensure_time_partitions(
+    'system_logs',
+    COALESCE((SELECT min(timestamp AT TIME ZONE 'UTC')::date FROM system_logs_unpartitioned), current_date),
+    current_date + 90
+);
+
+INSERT INTO system_logs (id, junction_id, log_level, component, message, metadata, timestamp)
+SELECT id, junction_id, log_level, component, message, metadata, COALESCE(timestamp, now())
+FROM system_logs_unpartitioned;
+
+DROP TABLE system_logs_unpartitioned;
+
+CREATE INDEX idx_system_logs_timestamp ON system_logs(timestamp);
+CREATE INDEX idx_system_logs_junction_time ON system_logs(junction_id, timestamp);
+
+-- Daily log rollup: what survives once a system_logs partition is retired
+CREATE TABLE IF NOT EXISTS system_log_counts_daily (
+    bucket_date date NOT NULL,
+    junction_id bigint NOT NULL DEFAULT 0,
+    component text NOT NULL,
+    log_level text NOT NULL,
+    log_count bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_date, junction_id, component, log_level)
+);
+
+-- ------------------------------------------------------------------
+-- History query: bound the scan so old partitions are pruned
+-- ------------------------------------------------------------------
+
+DROP FUNCTION IF EXISTS get_recent_detections_with_signals(bigint, integer, timestamp with time zone, bigint);
+
+CREATE OR REPLACE FUNCTION get_recent_detections_with_signals(
+    p_junction_id bigint,
+    p_limit integer DEFAULT 20,
+    p_before_timestamp timestamp with time zone DEFAULT NULL,
+    p_before_id bigint DEFAULT NULL,
+    p_lookback_days integer DEFAULT 90
+)
+RETURNS TABLE (
+    id bigint,
+    junction_id bigint,
+    lane_number integer,
+    fastag_id text,
+    vehicle_type text,
+    processing_status text,
+    detection_timestamp timestamp with time zone,
+    cycle_id bigint,
+    cycle_start_time timestamp with time zone,
+    total_cycle_time integer,
+    lane_green_time integer,
+    lane_1_green_time integer,
+    lane_2_green_time integer,
+    lane_3_green_time integer,
+    lane_4_green_time integer
+) AS $$
+    WITH detections AS (
+        SELECT d.id, d.junction_id, d.lane_number, d.fastag_id, d.vehicle_type,
+               d.processing_status, d.detection_timestamp
+        FROM vehicle_detections d
+        WHERE d.junction_id = p_junction_id
+          AND d.detection_timestamp >= COALESCE(p_before_timestamp, now())
+                                       - make_interval(days => GREATEST(p_lookback_days, 1))
+          AND (
+              p_before_timestamp IS NULL
+              OR (d.detection_timestamp, d.id) < (p_before_timestamp, COALESCE(p_before_id, 9223372036854775807))
+          )
+        ORDER BY d.detection_timestamp DESC, d.id DESC
+        LIMIT LEAST(GREATEST(p_limit, 1), 500)
+    ),
+    bounds AS (
+        SELECT min(detection_timestamp) AS oldest, max(detection_timestamp) AS newest
+        FROM detections
+    ),
+    cycles AS (
+        SELECT c.id, c.cycle_start_time, c.total_cycle_time,
+               c.lane_1_green_time, c.lane_2_green_time,
+               c.lane_3_green_time, c.lane_4_green_time,
+               lead(c.cycle_start_time) OVER (ORDER BY c.cycle_start_time, c.id) AS cycle_end_time
+        FROM traffic_cycles c, bounds b
+        WHERE c.junction_id = p_junction_id
+          AND c.cycle_start_time <= b.newest
+          AND c.cycle_start_time >= COALESCE(
+              (
+                  SELECT max(c2.cycle_start_time)
+                  FROM traffic_cycles c2
+                  WHERE c2.junction_id = p_junction_id
+                    AND c2.cycle_start_time <= b.oldest
+              ),
+              '-infinity'::timestamp with time zone
+          )
+    )
+    SELECT d.id, d.junction_id, d.lane_number, d.fastag_id, d.vehicle_type,
+           d.processing_status, d.detection_timestamp,
+           c.id, c.cycle_start_time, c.total_cycle_time,
+           CASE d.lane_number
+               WHEN 1 THEN c.lane_1_green_time
+               WHEN 2 THEN c.lane_2_green_time
+               WHEN 3 THEN c.lane_3_green_time
+               WHEN 4 THEN c.lane_4_green_time
+           END,
+           c.lane_1_green_time, c.lane_2_green_time,
+           c.lane_3_green_time, c.lane_4_green_time
+    FROM detections d
+    LEFT JOIN cycles c
+        ON d.detection_timestamp >= c.cycle_start_time
+       AND (c.cycle_end_time IS NULL OR d.detection_timestamp < c.cycle_end_time)
+    ORDER BY d.detection_timestamp DESC, d.id DESC
+$$ language 'sql' STABLE;
+
+-- ------------------------------------------------------------------
+-- Retention: downsample, then drop or archive whole partitions
+-- ------------------------------------------------------------------
+
+-- Retire every monthly partition of p_table that ends before
+-- now() - p_retain_days. Detection months are re-aggregated into the
+-- vehicle count rollups and log months into system_log_counts_daily first.
+-- Returns one row per retired partition.
+CREATE OR REPLACE FUNCTION apply_partition_retention(
+    p_table text,
+    p_retain_days integer,
+    p_archive boolean DEFAULT false
+)
+RETURNS TABLE (partition_name text, range_start timestamp with time zone, range_end timestamp with time zone, action text) AS $$
+DECLARE
+    v_cutoff timestamp with time zone := now() - make_interval(days => p_retain_days);
+    v_part record;
+BEGIN
+    IF p_table NOT IN ('vehicle_detections', 'system_logs') THEN
+        RAISE EXCEPTION 'Retention is not configured for table %', p_table;
+    END IF;
+
+    FOR v_part IN
+        SELECT c.relname AS name,
+               (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'FROM \(''([^'']+)''\)'))[1]::timestamp with time zone AS lower_bound,
+               (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'TO \(''([^'']+)''\)'))[1]::timestamp with time zone AS upper_bound
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = p_table
+          AND pg_get_expr(c.relpartbound, c.oid) <> 'DEFAULT'
+        ORDER BY 2
+    LOOP
+        CONTINUE WHEN v_part.upper_bound > v_cutoff;
+
+        IF p_table = 'vehicle_detections' THEN
+            PERFORM backfill_vehicle_count_rollups(
+                (v_part.lower_bound AT TIME ZONE 'UTC')::date,
+                (v_part.upper_bound AT TIME ZONE 'UTC')::date
+            );
+        ELSE
+            EXECUTE format(
+                'INSERT INTO system_log_counts_daily (bucket_date, junction_id, component, log_level, log_count)
+                 SELECT (timestamp AT TIME ZONE ''UTC'')::date, COALESCE(junction_id, 0), component, log_level, count(*)
+                 FROM public.%I
+                 GROUP BY 1, 2, 3, 4
+                 ON CONFLICT (bucket_date, junction_id, component, log_level)
+                 DO UPDATE SET log_count = EXCLUDED.log_count',
+                v_part.name
+            );
+        END IF;
+
+        EXECUTE format('ALTER TABLE public.%I DETACH PARTITION public.%I', p_table, v_part.name);
+
+        IF p_archive THEN
+            EXECUTE format('ALTER TABLE public.%I SET SCHEMA archive', v_part.name);
+            action := 'archived';
+        ELSE
+            EXECUTE format('DROP TABLE public.%I', v_part.name);
+            action := 'dropped';
+        END IF;
+
+        partition_name := v_part.name;
+        range_start := v_part.lower_bound;
+        range_end := v_part.upper_bound;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ language 'plpgsql';
@@ -0,0 +1,24 @@
+-- Migration: Add ingest keys for idempotent replay of spooled writes
+-- Date: 2026-10-19
+-- Purpose: While the database is unreachable the API appends detection, cycle
+-- and RFID writes to a local disk spool (app/services/write_spool.py). Each
+-- spooled row carries a client-generated ingest_key; replaying it with
+-- INSERT ... ON CONFLICT DO NOTHING on these unique indexes makes replay
+-- idempotent, so a crash between insert and cursor commit cannot duplicate rows.
+-- With the spool enabled a direct write carries the same key its spooled
+-- fallback would, so a write that committed but timed out is not stored
+-- twice; rows written without the spool keep ingest_key NULL (NULLs never
+-- conflict).
+
+ALTER TABLE vehicle_detections ADD COLUMN IF NOT EXISTS ingest_key uuid;
+ALTER TABLE traffic_cycles ADD COLUMN IF NOT EXISTS ingest_key uuid;
+ALTER TABLE rfid_scanners ADD COLUMN IF NOT EXISTS ingest_key uuid;
+
+-- A unique index on a partitioned table must contain the partition key
+-- (migration 006); spooled rows always carry their detection_timestamp
+CREATE UNIQUE INDEX IF NOT EXISTS uq_vehicle_detections_ingest_key
+    ON vehicle_detections (ingest_key, detection_timestamp);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_traffic_cycles_ingest_key
+    ON traffic_cycles (ingest_key);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_rfid_scanners_ingest_key
+    ON rfid_scanners (ingest_key);
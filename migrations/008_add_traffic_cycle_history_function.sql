@@ -0,0 +1,60 @@
+-- Migration: Add traffic cycle history function
+-- Date: 2026-10-19
+-- Purpose: Back /junction/{id}/cycles, the paged history of signal plans.
+-- Rows come newest first with keyset pagination on (cycle_start_time, id)
+-- and optional [p_start_time, p_end_time) bounds, served by the
+-- (junction_id, cycle_start_time, id) index from migration 005.
+-- With p_bucket_seconds set, each interval of that length is reduced to one
+-- representative plan - the last one started in it, i.e. the plan in force
+-- at the end of the interval - so weeks of plans chart in a few hundred rows.
+-- Returns SETOF traffic_cycles so callers project columns with ?select=.
+
+CREATE OR REPLACE FUNCTION get_traffic_cycle_history(
+    p_junction_id bigint,
+    p_start_time timestamp with time zone DEFAULT NULL,
+    p_end_time timestamp with time zone DEFAULT NULL,
+    p_before_time timestamp with time zone DEFAULT NULL,
+    p_before_id bigint DEFAULT NULL,
+    p_limit integer DEFAULT 100,
+    p_bucket_seconds integer DEFAULT NULL
+)
+RETURNS SETOF traffic_cycles AS $$
+BEGIN
+    IF p_bucket_seconds IS NULL THEN
+        RETURN QUERY
+        SELECT c.*
+        FROM traffic_cycles c
+        WHERE c.junction_id = p_junction_id
+          AND (p_start_time IS NULL OR c.cycle_start_time >= p_start_time)
+          AND (p_end_time IS NULL OR c.cycle_start_time < p_end_time)
+          AND (
+              p_before_time IS NULL
+              OR (c.cycle_start_time, c.id) < (p_before_time, COALESCE(p_before_id, 9223372036854775807))
+          )
+        ORDER BY c.cycle_start_time DESC, c.id DESC
+        LIMIT LEAST(GREATEST(p_limit, 1), 1000);
+    ELSE
+        -- The cursor is the representative of the last bucket returned, so
+        -- the next page starts at the bucket before it
+        RETURN QUERY
+        SELECT r.*
+        FROM (
+            SELECT DISTINCT ON (floor(extract(epoch FROM c.cycle_start_time) / p_bucket_seconds)) c.*
+            FROM traffic_cycles c
+            WHERE c.junction_id = p_junction_id
+              AND (p_start_time IS NULL OR c.cycle_start_time >= p_start_time)
+              AND (p_end_time IS NULL OR c.cycle_start_time < p_end_time)
+              AND (
+                  p_before_time IS NULL
+                  OR c.cycle_start_time < to_timestamp(
+                      floor(extract(epoch FROM p_before_time) / p_bucket_seconds) * p_bucket_seconds
+                  )
+              )
+            ORDER BY floor(extract(epoch FROM c.cycle_start_time) / p_bucket_seconds) DESC,
+                     c.cycle_start_time DESC, c.id DESC
+        ) r
+        ORDER BY r.cycle_start_time DESC, r.id DESC
+        LIMIT LEAST(GREATEST(p_limit, 1), 1000);
+    END IF;
+END;
+$$ language 'plpgsql' STABLE;
@@ -0,0 +1,77 @@
+-- Migration: Create monthly partitions over rows in the default partition
+-- Date: 2026-10-19
+-- Purpose: Rows whose month had no partition yet (clock skew, replayed
+-- spools, late backfills) land in the <table>_default catch-all from
+-- migration 006. After that, `CREATE TABLE ... PARTITION OF ... FOR VALUES`
+-- for the month fails, because the default partition already holds rows in
+-- its range, and partition maintenance stops creating partitions.
+-- ensure_time_partitions now builds such a month as a plain table, moves the
+-- month's rows out of the default partition into it and then attaches it.
+-- The rows are not re-inserted through the parent, so row triggers (the
+-- vehicle_detections rollup) don't count them twice.
+
+CREATE OR REPLACE FUNCTION ensure_time_partitions(p_table text, p_from date, p_to date)
+RETURNS integer AS $$
+DECLARE
+    v_start date := date_trunc('month', p_from)::date;
+    v_end date;
+    v_name text;
+    v_default text := p_table || '_default';
+    v_column text;
+    v_lower timestamp with time zone;
+    v_upper timestamp with time zone;
+    v_stranded boolean;
+    v_moved bigint;
+    v_created integer := 0;
+BEGIN
+    -- Partition key column, e.g. "RANGE (detection_timestamp)"
+    v_column := substring(pg_get_partkeydef(('public.' || p_table)::regclass) FROM '\((.*)\)');
+
+    WHILE v_start <= p_to LOOP
+        v_end := (v_start + interval '1 month')::date;
+        v_name := format('%s_y%sm%s', p_table, to_char(v_start, 'YYYY'), to_char(v_start, 'MM'));
+        v_lower := v_start::timestamp AT TIME ZONE 'UTC';
+        v_upper := v_end::timestamp AT TIME ZONE 'UTC';
+
+        IF to_regclass('public.' || v_name) IS NULL THEN
+            v_stranded := false;
+            IF to_regclass('public.' || v_default) IS NOT NULL THEN
+                EXECUTE format(
+                    'SELECT EXISTS (SELECT 1 FROM public.%I WHERE %I >= %L AND %I < %L)',
+                    v_default, v_column, v_lower, v_column, v_upper
+                ) INTO v_stranded;
+            END IF;
+
+            IF v_stranded THEN
+                -- Hold off concurrent inserts until the month is attached
+                EXECUTE format('LOCK TABLE public.%I IN SHARE ROW EXCLUSIVE MODE', p_table);
+                EXECUTE format(
+                    'CREATE TABLE public.%I (LIKE public.%I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                    v_name, p_table
+                );
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM public.%I WHERE %I >= %L AND %I < %L RETURNING *) '
+                    'INSERT INTO public.%I SELECT * FROM moved',
+                    v_default, v_column, v_lower, v_column, v_upper, v_name
+                );
+                GET DIAGNOSTICS v_moved = ROW_COUNT;
+                EXECUTE format(
+                    'ALTER TABLE public.%I ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+                    p_table, v_name, v_lower, v_upper
+                );
+                RAISE NOTICE 'Moved % rows from % into new partition %', v_moved, v_default, v_name;
+            ELSE
+                EXECUTE format(
+                    'CREATE TABLE public.%I PARTITION OF public.%I FOR VALUES FROM (%L) TO (%L)',
+                    v_name, p_table, v_lower, v_upper
+                );
+            END IF;
+            v_created := v_created + 1;
+        END IF;
+
+        v_start := v_end;
+    END LOOP;
+
+    RETURN v_created;
+END;
+$$ language 'plpgsql';
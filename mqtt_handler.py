@@ -3,12 +3,12 @@ import json
 import httpx
 import asyncio
 import logging
+from typing import Optional
 # existing imports...
-from ws_broadcast import manager  # import the manager to broadcast messages
-from app.services.database_service import DatabaseService
+from app.services.event_bus import event_bus, log_event, mqtt_event, plan_event
+from app.services.write_spool import get_write_spool, write_or_spool
 
 logger = logging.getLogger(__name__)
-db_service = DatabaseService()
 
 # --- MQTT Configuration ---
 mqtt_config = MQTTConfig(
@@ -19,6 +19,9 @@ mqtt_config = MQTTConfig(
 )
 mqtt = FastMQTT(config=mqtt_config)
 
+CAR_COUNTS_TOPIC = "flextraff/car_counts"
+GREEN_TIMES_TOPIC = "flextraff/green_times"
+
 
 @mqtt.on_connect()
 def connect(client, flags, rc, properties):
@@ -28,8 +31,8 @@ def connect(client, flags, rc, properties):
     print("=" * 60)
     
     # Subscribe to the car counts topic
-    mqtt.client.subscribe("flextraff/car_counts", qos=1)
-    print("📡 Subscribed to topic: flextraff/car_counts")
+    mqtt.client.subscribe(CAR_COUNTS_TOPIC, qos=1)
+    print(f"📡 Subscribed to topic: {CAR_COUNTS_TOPIC}")
     print("🎧 Listening for messages from Raspberry Pi...\n")
 
 
@@ -45,12 +48,114 @@ def subscribe(client, mid, qos, properties):
     print(f"✅ Subscription confirmed (mid={mid}, qos={qos})")
 
 
+# Injected by main at startup: the pipeline shares the API's database service
+# (one circuit breaker, last-good cache and connection) and its stateless
+# TrafficCalculator
+_db_service = None
+_calculator = None
+
+
+def set_services(db_service, calculator) -> None:
+    """Use the API's database service and calculator for car-count reports"""
+    global _db_service, _calculator
+    _db_service = db_service
+    _calculator = calculator
+
+
+async def process_car_counts(
+    data: dict, source: str = CAR_COUNTS_TOPIC, component: str = "mqtt_handler"
+) -> Optional[dict]:
+    """
+    Calculation pipeline for one car-count report from a junction
+    controller, shared by MQTT and the device WebSocket (/ws/ingest):
+    publish the receipt, log the lane counts to rfid_scanners (spooled
+    during an outage), calculate green times and publish the plan.
+
+    Returns the green-times reply for the controller, or None when the
+    calculation failed (the error is published as a system log event).
+    """
+    lane_counts = data.get("lane_counts", [])
+    junction_id = data.get("junction_id", 1)
+    cycle_id = data.get("cycle_id")
+    event_bus.publish(mqtt_event(source, junction_id, cycle_id, lane_counts))
+
+    # Log RFID scanner data with lane car counts
+    if cycle_id:
+        try:
+            # Convert lane_counts array to named dictionary
+            lane_car_count_dict = {
+                "north": lane_counts[0] if len(lane_counts) > 0 else 0,
+                "south": lane_counts[1] if len(lane_counts) > 1 else 0,
+                "east": lane_counts[2] if len(lane_counts) > 2 else 0,
+                "west": lane_counts[3] if len(lane_counts) > 3 else 0,
+            }
+
+            db_service = _db_service
+            if db_service is None:
+                raise RuntimeError("database service not initialised")
+            _, spooled = await write_or_spool(
+                get_write_spool(),
+                "rfid_scanners",
+                [db_service.build_rfid_scanner_row(junction_id, cycle_id, lane_car_count_dict)],
+                lambda rows: db_service.log_rfid_scanner_data(
+                    junction_id=junction_id,
+                    cycle_id=cycle_id,
+                    lane_car_count=lane_car_count_dict,
+                    ingest_key=rows[0].get("ingest_key"),
+                ),
+            )
+            if spooled:
+                logger.info("📼 RFID scanner data spooled until the database recovers")
+        except Exception as e:
+            logger.warning(f"⚠️  Failed to log RFID scanner data: {e}")
+            event_bus.publish(log_event(
+                f"Failed to log RFID data: {str(e)}",
+                component=component,
+                junction_id=junction_id,
+                error_type="RFID_LOGGING_FAILED",
+            ))
+
+    # Calculate timing directly using TrafficCalculator
+    try:
+        if _calculator is None:
+            raise RuntimeError("traffic calculator not initialised")
+        green_times, cycle_time = await _calculator.calculate_green_times(
+            lane_counts,
+            junction_id=junction_id
+        )
+    except Exception as e:
+        logger.error(f"❌ Traffic calculation error: {type(e).__name__}: {e}")
+        event_bus.publish(log_event(
+            str(e),
+            component=component,
+            junction_id=junction_id,
+            error_type="CALCULATION_ERROR",
+        ))
+        return None
+
+    # Log the calculation event
+    event_bus.publish(log_event(
+        f"Traffic calculated for lanes {lane_counts}",
+        component=component,
+        junction_id=junction_id,
+    ))
+    event_bus.publish(plan_event(
+        junction_id, lane_counts, green_times, cycle_time, component=component
+    ))
+    return {
+        "green_times": green_times,
+        "cycle_time": cycle_time,
+        "junction_id": junction_id,
+        "cycle_id": cycle_id,
+    }
+
+
 @mqtt.on_message()
 async def message_handler(client, topic, payload, qos, properties):
     """
     Main message handler - receives car counts from Pi
     and sends back calculated green times
-    
+
     Expected MQTT payload format:
     {
         "lane_counts": [north_count, south_count, east_count, west_count],
@@ -66,112 +171,39 @@ async def message_handler(client, topic, payload, qos, properties):
         # Decode the payload
         data = json.loads(payload.decode())
         print(f"📥 Car count data from Pi: {data}")
-        
-        lane_counts = data.get("lane_counts", [])
-        junction_id = data.get("junction_id", 1)
-        cycle_id = data.get("cycle_id")
-        
-        print(f"🚗 Lane counts: {lane_counts}")
-        print(f"🚦 Junction ID: {junction_id}")
-        print(f"🔄 Cycle ID: {cycle_id}")
-
-        # Log RFID scanner data with lane car counts
-        if cycle_id:
-            try:
-                # Convert lane_counts array to named dictionary
-                lane_car_count_dict = {
-                    "north": lane_counts[0] if len(lane_counts) > 0 else 0,
-                    "south": lane_counts[1] if len(lane_counts) > 1 else 0,
-                    "east": lane_counts[2] if len(lane_counts) > 2 else 0,
-                    "west": lane_counts[3] if len(lane_counts) > 3 else 0,
-                }
-                
-                await db_service.log_rfid_scanner_data(
-                    junction_id=junction_id,
-                    cycle_id=cycle_id,
-                    lane_car_count=lane_car_count_dict,
-                )
-                print("✅ RFID scanner data logged successfully")
-            except Exception as e:
-                print(f"⚠️  Warning: Failed to log RFID scanner data: {e}")
-                await db_service.log_system_error(
-                    error_message=f"Failed to log RFID data: {str(e)}",
-                    error_type="RFID_LOGGING_FAILED",
-                    component="mqtt_handler",
-                    junction_id=junction_id,
-                )
 
-        # Calculate timing directly using TrafficCalculator 
-        print("\n📊 Calculating green times using TrafficCalculator...")
-        
-        try:
-            # Create calculator instance
-            from app.services.traffic_calculator import TrafficCalculator
-            calculator = TrafficCalculator(db_service=db_service)
-            
-            # Calculate green times directly
-            green_times, cycle_time = await calculator.calculate_green_times(
-                lane_counts, 
-                junction_id=junction_id
-            )
-            
-            print(f"✅ Calculated green times: {green_times}")
-            print(f"⏱️  Total cycle time: {cycle_time}s")
-            
-            # Log the calculation event
-            await db_service.log_system_event(
-                message=f"Traffic calculated for lanes {lane_counts}",
-                component="mqtt_handler",
-                junction_id=junction_id,
-            )
-            
-            # Publish green times back to Pi
-            green_times_payload = json.dumps({
-                "green_times": green_times,
-                "cycle_time": cycle_time,
-                "junction_id": junction_id,
-                "cycle_id": cycle_id
-            })
-            
-            mqtt.client.publish(
-                "flextraff/green_times", 
-                green_times_payload,
-                qos=1,
-                retain=False
-            )
-            
-            print(f"📡 Published green times to Pi on topic: flextraff/green_times")
-            print(f"✅ MQTT message processing complete\n")
-            
-        except Exception as e:
-            error_msg = f"Traffic calculation error: {type(e).__name__}: {e}"
-            print(f"❌ {error_msg}")
-            await db_service.log_system_error(
-                error_message=str(e),
-                error_type="CALCULATION_ERROR",
-                component="mqtt_handler",
-                junction_id=junction_id,
-            )
+        reply = await process_car_counts(data, topic)
+        if reply is None:
+            return
+        print(f"✅ Calculated green times: {reply['green_times']}")
+        print(f"⏱️  Total cycle time: {reply['cycle_time']}s")
+
+        # Publish green times back to Pi
+        mqtt.client.publish(
+            GREEN_TIMES_TOPIC,
+            json.dumps(reply),
+            qos=1,
+            retain=False
+        )
+
+        print(f"📡 Published green times to Pi on topic: {GREEN_TIMES_TOPIC}")
+        print(f"✅ MQTT message processing complete\n")
 
     except json.JSONDecodeError as e:
         error_msg = f"Failed to decode JSON payload: {e}"
         print(f"❌ {error_msg}")
         print(f"   Raw payload: {payload}")
-        await db_service.log_system_error(
-            error_message=error_msg,
-            error_type="JSON_DECODE_ERROR",
-            component="mqtt_handler",
-        )
+        event_bus.publish(log_event(
+            error_msg, component="mqtt_handler", error_type="JSON_DECODE_ERROR"
+        ))
     except Exception as e:
         error_msg = f"MQTT message handler error: {type(e).__name__}: {e}"
         print(f"❌ {error_msg}")
         import traceback
         traceback.print_exc()
-        await db_service.log_system_error(
-            error_message=str(e),
-            error_type="MQTT_HANDLER_ERROR",
-            component="mqtt_handler",
-        )
+        event_bus.publish(log_event(
+            str(e), component="mqtt_handler", error_type="MQTT_HANDLER_ERROR"
+        ))
 
 
 # Export the mqtt instance
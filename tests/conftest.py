@@ -12,8 +12,13 @@ import pytest_asyncio
 from fastapi.testclient import TestClient
 
 from app.services.database_service import DatabaseService
+from app.services.detection_dedup import detection_deduplicator
+from app.services.junction_cache import junction_cache
+from app.services.live_timing import live_timing
 from app.services.traffic_calculator import TrafficCalculator
+from app.services.travel_time import travel_time_engine
 from main import app, get_db_service, get_traffic_calculator
+from ws_broadcast import manager
 
 # Test configuration
 TEST_BASE_URL = "http://127.0.0.1:8001"
@@ -52,6 +57,11 @@ def mock_db_service():
     # Mock vehicle detection logging (async)
     mock_db.log_vehicle_detection = AsyncMock(return_value={"id": 1, "status": "logged"})
 
+    # Mock bulk detection insert: echo rows back with sequential IDs (async)
+    mock_db.log_vehicle_detections_bulk = AsyncMock(
+        side_effect=lambda rows: [{"id": i + 1, **row} for i, row in enumerate(rows)]
+    )
+
     # Mock traffic cycle logging (async)
     mock_db.log_traffic_cycle = AsyncMock(return_value={"id": 1, "status": "logged"})
 
@@ -74,6 +84,20 @@ def mock_db_service():
     # Mock vehicles count by date (async)
     mock_db.get_vehicles_count_by_date = AsyncMock(return_value=150)
 
+    # Mock grouped per-junction totals (async)
+    mock_db.get_vehicle_totals_by_date = AsyncMock(return_value={1: 150, 2: 150})
+    mock_db.get_vehicle_totals_by_date_range = AsyncMock(return_value={
+        "2025-09-14": {1: 100, 2: 80},
+        "2025-09-15": {1: 150},
+    })
+
+    # Mock hourly rollup rows (async)
+    mock_db.get_hourly_vehicle_counts = AsyncMock(return_value=[
+        {"bucket_hour": "2025-09-15T08:00:00+00:00", "lane_number": 1, "vehicle_type": "car", "vehicle_count": 40},
+        {"bucket_hour": "2025-09-15T08:00:00+00:00", "lane_number": 2, "vehicle_type": "truck", "vehicle_count": 5},
+        {"bucket_hour": "2025-09-15T09:00:00+00:00", "lane_number": 1, "vehicle_type": "car", "vehicle_count": 30},
+    ])
+
     # Mock recent detections (async)
     mock_db.get_recent_detections_with_signals = AsyncMock(return_value=[
         {
@@ -124,6 +148,14 @@ def test_client(
     app.dependency_overrides[get_db_service] = lambda: mock_db_service
     app.dependency_overrides[get_traffic_calculator] = lambda: mock_traffic_calculator
 
+    # Each test gets its own mock database - don't serve junctions cached by another
+    junction_cache.invalidate()
+    # ...and its own duplicate-read window, travel-time, replay and live timing state
+    detection_deduplicator.clear()
+    travel_time_engine.clear()
+    manager.replay.clear()
+    live_timing.clear()
+
     client = TestClient(app)
 
     yield client
@@ -3,8 +3,10 @@ Unit tests for individual API endpoints
 Tests each endpoint in isolation with mocked dependencies
 """
 
+import asyncio
 import json
 from datetime import date
+from unittest.mock import AsyncMock
 
 import pytest
 from fastapi.testclient import TestClient
@@ -76,6 +78,41 @@ class TestHealthEndpoint:
         assert data["database_connected"] is False
         assert data["error"] == "Connection failed"
 
+    def test_health_reports_circuit_breaker(self, test_client: TestClient, mock_db_service):
+        """Test health includes breaker state and last-good fallbacks"""
+        from app.services.circuit_breaker import CircuitBreaker, LastGoodCache
+
+        mock_db_service.breaker = CircuitBreaker("supabase")
+        mock_db_service._last_good = LastGoodCache()
+
+        data = test_client.get("/health").json()
+
+        assert data["circuit_breaker"]["state"] == "closed"
+        assert data["circuit_breaker"]["last_good"] == {"entries": 0, "fallbacks_served": 0}
+
+    def test_health_reports_database_backend(self, test_client: TestClient, tmp_path):
+        """Test health names the backend actually serving requests"""
+        from app.services.sqlite_database_service import SQLiteDatabaseService
+        from main import app, get_db_service
+
+        sqlite_db = SQLiteDatabaseService(str(tmp_path / "flextraff.db"))
+        app.dependency_overrides[get_db_service] = lambda: sqlite_db
+
+        data = test_client.get("/health").json()
+        sqlite_db.close()
+
+        assert data["database_backend"] == "sqlite"
+
+    def test_health_reports_thread_pools(self, test_client: TestClient):
+        """Test health includes queue wait and utilisation per thread pool"""
+        from app.services.executors import DB_READ, get_executor
+
+        get_executor(DB_READ)
+        pools = test_client.get("/health").json()["executors"]
+
+        assert pools[DB_READ]["workers"] >= 1
+        assert set(pools[DB_READ]["queue_wait_ms"]) == {"p50", "p95", "max"}
+
 
 @pytest.mark.unit
 @pytest.mark.api
@@ -358,6 +395,300 @@ class TestJunctionHistoryEndpoint:
         # Should respect the limit (though mock data may be smaller)
         assert len(data["recent_detections"]) <= 10  # limit * 2 as per implementation
 
+    def test_get_junction_history_keyset_cursor(
+        self, test_client: TestClient, mock_db_service
+    ):
+        """Test a full page returns a cursor that is passed through on the next call"""
+        mock_db_service.get_recent_detections_with_signals.return_value = [
+            {"id": 10 - i, "detection_timestamp": f"2025-09-15T12:00:0{i}+00:00"}
+            for i in range(2)
+        ]
+
+        data = test_client.get("/junction/1/history?limit=1").json()
+
+        assert data["next_cursor"] == {
+            "before_timestamp": "2025-09-15T12:00:01+00:00",
+            "before_id": 9,
+        }
+
+        test_client.get(
+            "/junction/1/history",
+            params={"limit": 1, **data["next_cursor"]},
+        )
+        _, kwargs = mock_db_service.get_recent_detections_with_signals.call_args
+        assert kwargs["before_id"] == 9
+        assert kwargs["before_timestamp"] == "2025-09-15T12:00:01+00:00"
+
+    def test_get_junction_history_last_page(self, test_client: TestClient):
+        """Test a short page has no cursor"""
+        data = test_client.get("/junction/1/history?limit=5").json()
+
+        assert data["next_cursor"] is None
+
+
+
+@pytest.mark.unit
+@pytest.mark.api
+class TestTrafficCycleHistoryEndpoint:
+    """Test traffic cycle history endpoint (/junction/{junction_id}/cycles)"""
+
+    def test_full_page_returns_cursor(self, test_client: TestClient, mock_db_service):
+        """Test a full page returns the last row as keyset cursor"""
+        mock_db_service.get_traffic_cycle_history = AsyncMock(return_value=[
+            {"id": 8 - i, "cycle_start_time": f"2025-09-15T12:0{i}:00+00:00"} for i in range(2)
+        ])
+
+        data = test_client.get(
+            "/junction/1/cycles",
+            params={"limit": 2, "fields": "total_cycle_time, lane_1_green_time", "bucket_seconds": 900},
+        ).json()
+
+        assert data["total_records"] == 2
+        assert data["next_cursor"] == {"before_timestamp": "2025-09-15T12:01:00+00:00", "before_id": 7}
+        _, kwargs = mock_db_service.get_traffic_cycle_history.call_args
+        assert kwargs["fields"] == ["total_cycle_time", "lane_1_green_time"]
+        assert kwargs["bucket_seconds"] == 900
+
+    def test_short_page_has_no_cursor(self, test_client: TestClient, mock_db_service):
+        """Test a short page ends pagination"""
+        mock_db_service.get_traffic_cycle_history = AsyncMock(return_value=[])
+
+        data = test_client.get("/junction/1/cycles").json()
+
+        assert data["cycles"] == []
+        assert data["next_cursor"] is None
+
+    def test_invalid_requests_rejected(self, test_client: TestClient, mock_db_service):
+        """Test unknown fields, inverted ranges and tiny buckets are rejected"""
+        mock_db_service.get_traffic_cycle_history = AsyncMock(return_value=[])
+
+        assert test_client.get("/junction/1/cycles?fields=password").status_code == 400
+        assert test_client.get(
+            "/junction/1/cycles",
+            params={"start_time": "2025-09-02T00:00:00", "end_time": "2025-09-01T00:00:00"},
+        ).status_code == 400
+        assert test_client.get("/junction/1/cycles?bucket_seconds=5").status_code == 422
+        mock_db_service.get_traffic_cycle_history.assert_not_called()
+
+
+
+@pytest.mark.unit
+@pytest.mark.api
+class TestStreamingFormats:
+    """Test format=ndjson/csv on history and analytics endpoints"""
+
+    def test_cycles_stream_every_page(self, test_client: TestClient, mock_db_service):
+        """Test a streamed cycle history follows the keyset cursor to the end"""
+        from app.utils.streaming import STREAM_PAGE_SIZE
+
+        pages = [
+            [{"id": 5000 - i, "cycle_start_time": f"t{5000 - i}"} for i in range(STREAM_PAGE_SIZE)],
+            [{"id": 1, "cycle_start_time": "t1"}],
+        ]
+        mock_db_service.get_traffic_cycle_history = AsyncMock(side_effect=pages)
+
+        response = test_client.get("/junction/1/cycles?format=ndjson&limit=5")
+
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = response.text.splitlines()
+        assert len(lines) == STREAM_PAGE_SIZE + 1
+        assert json.loads(lines[-1]) == {"id": 1, "cycle_start_time": "t1"}
+        second = mock_db_service.get_traffic_cycle_history.call_args_list[1].kwargs
+        assert (second["before_timestamp"], second["before_id"]) == (
+            f"t{5001 - STREAM_PAGE_SIZE}", 5001 - STREAM_PAGE_SIZE
+        )
+
+    @pytest.mark.asyncio
+    async def test_failed_page_aborts_stream(self, mock_db_service):
+        """Test a page that fails mid-stream doesn't end the export cleanly"""
+        from app.utils.streaming import STREAM_PAGE_SIZE
+        from main import get_traffic_cycle_history
+
+        first = [{"id": 5000 - i, "cycle_start_time": f"t{5000 - i}"} for i in range(STREAM_PAGE_SIZE)]
+        mock_db_service.get_traffic_cycle_history = AsyncMock(
+            side_effect=[first, ConnectionError("database unreachable")]
+        )
+        response = await get_traffic_cycle_history(
+            1, start_time=None, end_time=None, before_timestamp=None, before_id=None,
+            limit=100, fields=None, bucket_seconds=None, response_format="ndjson",
+            db=mock_db_service,
+        )
+
+        chunks = []
+        with pytest.raises(ConnectionError):
+            async for chunk in response.body_iterator:
+                chunks.append(chunk)
+
+        lines = b"".join(chunks).decode().splitlines()
+        assert len(lines) == STREAM_PAGE_SIZE + 1
+        assert json.loads(lines[-1]) == {"error": "Export aborted: database unreachable"}
+        assert mock_db_service.get_traffic_cycle_history.call_args.kwargs["raise_errors"] is True
+
+    def test_cycles_csv_uses_projection_as_header(self, test_client: TestClient, mock_db_service):
+        """Test CSV columns follow the requested fields"""
+        mock_db_service.get_traffic_cycle_history = AsyncMock(return_value=[
+            {"id": 3, "cycle_start_time": "2025-09-15T10:00:00+00:00", "total_cycle_time": 120}
+        ])
+
+        response = test_client.get("/junction/1/cycles?format=csv&fields=total_cycle_time")
+
+        assert response.headers["content-type"].startswith("text/csv")
+        assert 'filename="junction-1-cycles.csv"' in response.headers["content-disposition"]
+        assert response.text.splitlines() == [
+            "id,cycle_start_time,total_cycle_time",
+            "3,2025-09-15T10:00:00+00:00,120",
+        ]
+
+    def test_detection_history_stream(self, test_client: TestClient, mock_db_service):
+        """Test detection history streams without the latest-cycle lookup"""
+        response = test_client.get("/junction/1/history?format=ndjson")
+
+        assert response.status_code == 200
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert rows == mock_db_service.get_recent_detections_with_signals.return_value
+        mock_db_service.get_current_traffic_cycle.assert_not_called()
+
+    def test_summary_range_streams_in_windows(self, test_client: TestClient, mock_db_service):
+        """Test a long streamed range is queried one window at a time"""
+        mock_db_service.get_vehicle_totals_by_date_range = AsyncMock(
+            side_effect=lambda start, end, **kwargs: {start.isoformat(): {1: 7}}
+        )
+
+        response = test_client.get(
+            "/analytics/daily-summary/range",
+            params={"start_date": "2024-01-01", "end_date": "2024-12-31", "format": "csv"},
+        )
+
+        lines = response.text.splitlines()
+        assert lines[0] == "date,junction_id,junction_name,total_vehicles"
+        assert lines[1] == "2024-01-01,1,Test Junction 1,7"
+        assert len(lines) == 1 + 366 * 2
+        windows = mock_db_service.get_vehicle_totals_by_date_range.call_args_list
+        assert len(windows) == 12
+        assert all((end - start).days < 31 for start, end in (c.args for c in windows))
+
+    def test_json_range_limit_still_applies(self, test_client: TestClient):
+        """Test the buffered JSON format keeps its range cap"""
+        response = test_client.get(
+            "/analytics/daily-summary/range",
+            params={"start_date": "2024-01-01", "end_date": "2024-12-31"},
+        )
+
+        assert response.status_code == 400
+
+    def test_hourly_stream(self, test_client: TestClient, mock_db_service):
+        """Test hourly rollup rows stream flat"""
+        mock_db_service.get_hourly_vehicle_counts = AsyncMock(return_value=[
+            {"bucket_hour": "2025-09-15T10:00:00+00:00", "lane_number": 1,
+             "vehicle_type": "car", "vehicle_count": 12}
+        ])
+
+        response = test_client.get("/analytics/junction/1/hourly?target_date=2025-09-15&format=csv")
+
+        assert response.text.splitlines()[1] == "2025-09-15T10:00:00+00:00,1,car,12"
+
+    def test_unknown_format_rejected(self, test_client: TestClient):
+        """Test formats other than json/ndjson/csv are rejected"""
+        assert test_client.get("/junction/1/cycles?format=xml").status_code == 422
+
+
+
+@pytest.mark.unit
+@pytest.mark.api
+class TestDuplicateReadSuppression:
+    """Repeat FASTag reads are acknowledged but not stored"""
+
+    def test_repeat_single_read_not_stored(self, test_client: TestClient, mock_db_service):
+        """Test the second read of a tag on the same lane is a duplicate"""
+        detection = TestData.VALID_VEHICLE_DETECTIONS[0]
+
+        first = test_client.post("/vehicle-detection", json=detection).json()
+        second = test_client.post("/vehicle-detection", json=detection).json()
+
+        assert first["status"] == "success"
+        assert second["status"] == "duplicate"
+        assert mock_db_service.log_vehicle_detection.await_count == 1
+        assert test_client.get("/health").json()["dedup"]["suppressed"] == 1
+
+    def test_bulk_suppresses_repeats_within_batch(self, test_client: TestClient, mock_db_service):
+        """Test repeats inside one batch are marked duplicate and not inserted"""
+        detection = TestData.VALID_VEHICLE_DETECTIONS[0]
+        other = TestData.VALID_VEHICLE_DETECTIONS[1]
+
+        data = test_client.post(
+            "/vehicle-detection/bulk", json=[detection, detection, other, detection]
+        ).json()
+
+        assert data["status"] == "success"
+        assert (data["accepted"], data["duplicates"]) == (2, 2)
+        assert [r["status"] for r in data["results"]] == [
+            "accepted", "duplicate", "accepted", "duplicate"
+        ]
+        (rows,), _ = mock_db_service.log_vehicle_detections_bulk.call_args
+        assert len(rows) == 2
+
+    def test_retry_after_failed_write_is_stored(self, test_client: TestClient, mock_db_service):
+        """Test a read whose write failed is not suppressed when retried"""
+        detection = TestData.VALID_VEHICLE_DETECTIONS[0]
+        mock_db_service.log_vehicle_detection.side_effect = [
+            Exception("write failed"), {"id": 1, "status": "logged"}
+        ]
+
+        failed = test_client.post("/vehicle-detection", json=detection)
+        retried = test_client.post("/vehicle-detection", json=detection).json()
+
+        assert failed.status_code == 500
+        assert retried["status"] == "success"
+        assert mock_db_service.log_vehicle_detection.await_count == 2
+
+    def test_bulk_retry_after_failed_write_is_stored(self, test_client: TestClient, mock_db_service):
+        """Test a failed batch is stored in full when retried"""
+        batch = [TestData.VALID_VEHICLE_DETECTIONS[0], TestData.VALID_VEHICLE_DETECTIONS[0]]
+        mock_db_service.log_vehicle_detections_bulk.side_effect = [
+            Exception("insert failed"), [{"id": 1}]
+        ]
+
+        failed = test_client.post("/vehicle-detection/bulk", json=batch)
+        retried = test_client.post("/vehicle-detection/bulk", json=batch).json()
+
+        assert failed.status_code == 500
+        assert (retried["accepted"], retried["duplicates"]) == (1, 1)
+        assert mock_db_service.log_vehicle_detections_bulk.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_repeats_stored_once(self, mock_db_service):
+        """Test repeats arriving while the first read is being written are suppressed"""
+        import main
+        from app.services.detection_dedup import DetectionDeduplicator
+        from fastapi import BackgroundTasks
+
+        async def slow_write(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return {"id": 1, "status": "logged"}
+
+        mock_db_service.log_vehicle_detection.side_effect = slow_write
+        request = main.VehicleDetectionRequest(**TestData.VALID_VEHICLE_DETECTIONS[0])
+        dedup = DetectionDeduplicator(window_seconds=20)
+
+        replies = await asyncio.gather(*(
+            main.log_vehicle_detection(request, BackgroundTasks(), mock_db_service, None, dedup)
+            for _ in range(5)
+        ))
+
+        assert sorted(r["status"] for r in replies) == ["duplicate"] * 4 + ["success"]
+        assert mock_db_service.log_vehicle_detection.await_count == 1
+
+    def test_dedup_can_be_disabled(self, test_client: TestClient, mock_db_service):
+        """Test with the dependency returning None every read is stored"""
+        from main import app, get_deduplicator
+
+        app.dependency_overrides[get_deduplicator] = lambda: None
+        detection = TestData.VALID_VEHICLE_DETECTIONS[0]
+        test_client.post("/vehicle-detection", json=detection)
+        test_client.post("/vehicle-detection", json=detection)
+
+        assert mock_db_service.log_vehicle_detection.await_count == 2
+
 
 @pytest.mark.unit
 @pytest.mark.api
@@ -407,3 +738,616 @@ class TestDailySummaryEndpoint:
 
         assert data["junction_summaries"] == []
         assert data["total_vehicles"] == 0
+
+
+@pytest.mark.unit
+@pytest.mark.api
+class TestHourlySummaryEndpoint:
+    """Test hourly rollup endpoint (/analytics/junction/{junction_id}/hourly)"""
+
+    def test_get_hourly_summary_success(self, test_client: TestClient):
+        """Test hourly buckets are aggregated per lane and vehicle type"""
+        response = test_client.get("/analytics/junction/1/hourly?target_date=2025-09-15")
+
+        assert response.status_code == 200
+        data = response.json()
+
+        assert data["junction_id"] == 1
+        assert data["date"] == "2025-09-15"
+        assert data["total_vehicles"] == 75
+        assert len(data["hourly"]) == 2
+
+        first_hour = data["hourly"][0]
+        assert first_hour["total_vehicles"] == 45
+        assert first_hour["lanes"] == {"1": 40, "2": 5}
+        assert first_hour["vehicle_types"] == {"car": 40, "truck": 5}
+
+
+@pytest.mark.unit
+@pytest.mark.api
+class TestDailySummaryRangeEndpoint:
+    """Test multi-day summary endpoint (/analytics/daily-summary/range)"""
+
+    def test_get_daily_summary_range_success(self, test_client: TestClient):
+        """Test every day in the range is returned, including zero-traffic junctions"""
+        response = test_client.get(
+            "/analytics/daily-summary/range?start_date=2025-09-14&end_date=2025-09-16"
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+
+        assert [d["date"] for d in data["days"]] == ["2025-09-14", "2025-09-15", "2025-09-16"]
+        assert data["days"][0]["total_vehicles"] == 180
+        assert data["days"][1]["junction_summaries"][1]["total_vehicles"] == 0
+        assert data["days"][2]["total_vehicles"] == 0
+        assert data["total_vehicles"] == 330
+
+    def test_get_daily_summary_range_inverted(self, test_client: TestClient):
+        """Test end_date before start_date is rejected"""
+        response = test_client.get(
+            "/analytics/daily-summary/range?start_date=2025-09-15&end_date=2025-09-14"
+        )
+
+        assert response.status_code == 400
+
+    def test_get_daily_summary_range_too_long(self, test_client: TestClient):
+        """Test overly long ranges are rejected"""
+        response = test_client.get(
+            "/analytics/daily-summary/range?start_date=2024-01-01&end_date=2025-01-01"
+        )
+
+        assert response.status_code == 400
+
+
+@pytest.mark.unit
+@pytest.mark.api
+class TestJunctionCache:
+    """Junction rows are served from the in-memory junction cache"""
+
+    def test_status_reuses_cached_junctions(self, test_client: TestClient, mock_db_service):
+        """Repeated status calls load the junction table once"""
+        for junction_id in (1, 2, 1):
+            response = test_client.get(f"/junction/{junction_id}/status")
+            assert response.status_code == 200
+
+        assert mock_db_service.get_all_junctions.await_count == 1
+
+    def test_status_queries_run_for_each_request(self, test_client: TestClient, mock_db_service):
+        """Live data is still queried on every request"""
+        test_client.get("/junction/1/status")
+        test_client.get("/junction/1/status")
+
+        assert mock_db_service.get_current_lane_counts.await_count == 2
+        assert mock_db_service.get_current_traffic_cycle.await_count == 2
+        assert mock_db_service.get_vehicles_count_by_date.await_count == 2
+
+    def test_junctions_etag_revalidation(self, test_client: TestClient, mock_db_service):
+        """Matching If-None-Match gets a 304 without another database query"""
+        first = test_client.get("/junctions")
+        etag = first.headers["etag"]
+
+        second = test_client.get("/junctions", headers={"If-None-Match": etag})
+
+        assert second.status_code == 304
+        assert second.headers["etag"] == etag
+        assert mock_db_service.get_all_junctions.await_count == 1
+
+    def test_junctions_stale_etag_gets_body(self, test_client: TestClient):
+        """A non-matching ETag gets the full junction list"""
+        response = test_client.get("/junctions", headers={"If-None-Match": '"stale"'})
+
+        assert response.status_code == 200
+        assert len(response.json()["junctions"]) == 2
+
+    def test_invalidate_reloads_and_changes_etag(self, test_client: TestClient, mock_db_service):
+        """Invalidation forces a reload and a new ETag when rows changed"""
+        etag = test_client.get("/junctions").headers["etag"]
+
+        from main import app, get_admin_user
+
+        app.dependency_overrides[get_admin_user] = lambda: {"id": 1, "role": "ADMIN"}
+        mock_db_service.get_all_junctions.return_value = [
+            {"id": 1, "junction_name": "Renamed Junction", "status": "active"}
+        ]
+        assert test_client.post("/junctions/cache/invalidate").status_code == 200
+
+        response = test_client.get("/junctions", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert response.json()["junctions"][0]["junction_name"] == "Renamed Junction"
+        assert mock_db_service.get_all_junctions.await_count == 2
+
+    def test_empty_refresh_keeps_cached_rows(self, test_client: TestClient, mock_db_service, monkeypatch):
+        """A refresh hitting a swallowed database error doesn't empty the cache"""
+        from app.services.junction_cache import junction_cache
+
+        monkeypatch.setattr(junction_cache, "ttl_seconds", 0)
+        test_client.get("/junctions")
+        mock_db_service.get_all_junctions.return_value = []
+
+        response = test_client.get("/junctions")
+
+        assert len(response.json()["junctions"]) == 2
+
+    def test_new_junction_found_before_ttl(self, test_client: TestClient, mock_db_service):
+        """A miss reloads once, so a junction added after the last load is served"""
+        test_client.get("/junctions")
+        mock_db_service.get_all_junctions.return_value = [
+            *mock_db_service.get_all_junctions.return_value,
+            {"id": 3, "junction_name": "New Junction", "status": "active"},
+        ]
+
+        assert test_client.get("/junction/3/status").status_code == 200
+        assert mock_db_service.get_all_junctions.await_count == 2
+
+    def test_unknown_junction_reloads_are_throttled(self, test_client: TestClient, mock_db_service):
+        """Repeated lookups of an unknown ID share one miss reload"""
+        for _ in range(3):
+            assert test_client.get("/junction/99/status").status_code == 404
+
+        assert mock_db_service.get_all_junctions.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_reload(self, mock_db_service):
+        """Misses arriving together wait on the same reload"""
+        from app.services.junction_cache import JunctionCache
+
+        cache = JunctionCache(ttl_seconds=300, miss_reload_seconds=0)
+        await cache.get_all(mock_db_service)
+        mock_db_service.get_all_junctions.return_value = [
+            {"id": 3, "junction_name": "New Junction", "status": "active"}
+        ]
+
+        rows = await asyncio.gather(*(cache.get(mock_db_service, 3) for _ in range(5)))
+
+        assert [row["id"] for row in rows] == [3] * 5
+        assert mock_db_service.get_all_junctions.await_count == 2
+
+    def test_invalidate_requires_admin(self, test_client: TestClient, monkeypatch):
+        """Only admins may drop the junction cache"""
+        import main
+
+        async def verify(token):
+            return {"id": 2, "role": "OPERATOR"} if token == "operator" else None
+
+        monkeypatch.setattr(main, "_verify_stream_token", verify)
+
+        assert test_client.post("/junctions/cache/invalidate").status_code == 403
+        assert test_client.post(
+            "/junctions/cache/invalidate", headers={"Authorization": "Bearer bad"}
+        ).status_code == 401
+        assert test_client.post(
+            "/junctions/cache/invalidate", headers={"Authorization": "Bearer operator"}
+        ).status_code == 403
+
+    def test_daily_summary_uses_cached_junctions(self, test_client: TestClient, mock_db_service):
+        """Daily summary shares the junction cache with /junctions"""
+        test_client.get("/junctions")
+        test_client.get("/analytics/daily-summary")
+
+        assert mock_db_service.get_all_junctions.await_count == 1
+
+
+@pytest.mark.unit
+@pytest.mark.api
+class TestBulkVehicleDetectionEndpoint:
+    """Test bulk ingest endpoint (/vehicle-detection/bulk)"""
+
+    def test_bulk_json_all_valid(self, test_client: TestClient, mock_db_service):
+        """Test a valid batch is written with one insert call"""
+        response = test_client.post(
+            "/vehicle-detection/bulk",
+            json={"detections": TestData.VALID_VEHICLE_DETECTIONS},
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "success"
+        assert data["accepted"] == 3
+        assert [r["status"] for r in data["results"]] == ["accepted"] * 3
+        assert [r["id"] for r in data["results"]] == [1, 2, 3]
+        mock_db_service.log_vehicle_detections_bulk.assert_awaited_once()
+
+    def test_bulk_partial_batch(self, test_client: TestClient, mock_db_service):
+        """Test invalid items are reported per index and valid ones still stored"""
+        detections = TestData.VALID_VEHICLE_DETECTIONS[:1] + TestData.INVALID_VEHICLE_DETECTIONS
+
+        data = test_client.post("/vehicle-detection/bulk", json=detections).json()
+
+        assert data["status"] == "partial"
+        assert data["accepted"] == 1
+        assert data["rejected"] == 3
+        assert data["results"][0]["status"] == "accepted"
+        assert data["results"][2]["errors"][0]["field"] == "lane_number"
+        (rows,), _ = mock_db_service.log_vehicle_detections_bulk.call_args
+        assert len(rows) == 1
+
+    def test_bulk_ndjson(self, test_client: TestClient):
+        """Test NDJSON bodies, including a malformed line"""
+        body = "\n".join(
+            [json.dumps(d) for d in TestData.VALID_VEHICLE_DETECTIONS[:2]] + ["{not json"]
+        )
+
+        data = test_client.post(
+            "/vehicle-detection/bulk",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        ).json()
+
+        assert data["received"] == 3
+        assert data["accepted"] == 2
+        assert data["results"][2]["status"] == "rejected"
+        assert "Invalid JSON" in data["results"][2]["errors"][0]["message"]
+
+    def test_bulk_keeps_scanner_timestamp(self, test_client: TestClient, mock_db_service):
+        """Test buffered reads keep their original detection time"""
+        detection = {**TestData.VALID_VEHICLE_DETECTIONS[0], "detection_timestamp": "2025-09-15T08:00:00Z"}
+
+        test_client.post("/vehicle-detection/bulk", json=[detection])
+
+        (rows,), _ = mock_db_service.log_vehicle_detections_bulk.call_args
+        assert rows[0]["detection_timestamp"].startswith("2025-09-15T08:00:00")
+
+    def test_bulk_too_many(self, test_client: TestClient):
+        """Test oversize batches are refused"""
+        detections = TestData.VALID_VEHICLE_DETECTIONS[:1] * 1001
+
+        response = test_client.post("/vehicle-detection/bulk", json=detections)
+
+        assert response.status_code == 413
+
+    def test_bulk_body_too_large(self, test_client: TestClient, mock_db_service):
+        """Test oversize bodies are refused from Content-Length, before parsing"""
+        from main import MAX_BULK_BODY_BYTES
+
+        body = b"[" + b" " * MAX_BULK_BODY_BYTES + b"]"
+
+        response = test_client.post(
+            "/vehicle-detection/bulk", content=body, headers={"content-type": "application/json"}
+        )
+
+        assert response.status_code == 413
+        mock_db_service.log_vehicle_detections_bulk.assert_not_called()
+
+    def test_bulk_streamed_body_too_large(self, test_client: TestClient, mock_db_service):
+        """Test chunked bodies without Content-Length are cut off at the cap"""
+        from main import MAX_BULK_BODY_BYTES
+
+        line = json.dumps(TestData.VALID_VEHICLE_DETECTIONS[0]).encode() + b"\n"
+
+        def chunks():
+            for _ in range(MAX_BULK_BODY_BYTES // len(line) + 1):
+                yield line
+
+        response = test_client.post(
+            "/vehicle-detection/bulk", content=chunks(), headers={"content-type": "application/x-ndjson"}
+        )
+
+        assert response.status_code == 413
+        mock_db_service.log_vehicle_detections_bulk.assert_not_called()
+
+    def test_bulk_database_error(self, test_client: TestClient, mock_db_service):
+        """Test insert failures surface as 500"""
+        mock_db_service.log_vehicle_detections_bulk.side_effect = Exception("insert failed")
+
+        response = test_client.post(
+            "/vehicle-detection/bulk", json=TestData.VALID_VEHICLE_DETECTIONS
+        )
+
+        assert response.status_code == 500
+
+
+@pytest.mark.unit
+@pytest.mark.api
+class TestWriteSpoolFallback:
+    """Detection writes are spooled while the database is down"""
+
+    @pytest.fixture
+    def spool(self, tmp_path):
+        from app.services.write_spool import WriteSpool
+        from main import app, get_spool
+
+        spool = WriteSpool(str(tmp_path / "spool"))
+        app.dependency_overrides[get_spool] = lambda: spool
+        yield spool
+        spool.close()
+
+    def test_detection_spooled_on_db_failure(self, test_client: TestClient, mock_db_service, spool):
+        """Test a failed insert is spooled instead of returning 500"""
+        mock_db_service.log_vehicle_detection.side_effect = ConnectionError("database unreachable")
+
+        response = test_client.post(
+            "/vehicle-detection", json=TestData.VALID_VEHICLE_DETECTIONS[0]
+        )
+
+        assert response.status_code == 200
+        assert response.json()["spooled"] is True
+        assert spool.depth() == 1
+
+    def test_bulk_spooled_on_db_failure(self, test_client: TestClient, mock_db_service, spool):
+        """Test a failed bulk insert spools every valid item"""
+        mock_db_service.log_vehicle_detections_bulk.side_effect = ConnectionError("down")
+
+        data = test_client.post(
+            "/vehicle-detection/bulk", json=TestData.VALID_VEHICLE_DETECTIONS
+        ).json()
+
+        assert data["spooled"] is True
+        assert data["accepted"] == 3
+        assert [r["id"] for r in data["results"]] == [None] * 3
+        assert spool.depth() == 3
+
+    def test_rejected_detection_not_spooled(self, test_client: TestClient, mock_db_service, spool):
+        """Test a row the database rejects fails instead of being spooled"""
+        from postgrest.exceptions import APIError
+
+        mock_db_service.log_vehicle_detection.side_effect = APIError({"message": "unknown junction"})
+
+        response = test_client.post(
+            "/vehicle-detection", json=TestData.VALID_VEHICLE_DETECTIONS[0]
+        )
+
+        assert response.status_code == 500
+        assert spool.depth() == 0
+
+    def test_health_reports_spool(self, test_client: TestClient, spool):
+        """Test /health exposes spool depth and lag"""
+        spool.append("vehicle_detections", [{"junction_id": 1, "lane_number": 1, "fastag_id": "A"}])
+
+        data = test_client.get("/health").json()
+
+        assert data["spool"]["depth"] == 1
+        assert data["spool"]["lag_seconds"] >= 0
+
+
+class TestTravelTimeEndpoints:
+    """FASTag re-identification across junctions feeds travel times"""
+
+    def test_bulk_detections_produce_link(self, test_client: TestClient, mock_db_service):
+        """Test the same tag seen at two junctions yields a link sample"""
+        detections = [
+            {"junction_id": 1, "lane_number": 1, "fastag_id": "FT-TRAVEL",
+             "detection_timestamp": "2030-01-01T08:00:00Z"},
+            {"junction_id": 2, "lane_number": 3, "fastag_id": "FT-TRAVEL",
+             "detection_timestamp": "2030-01-01T08:02:00Z"},
+        ]
+        mock_db_service.log_vehicle_detections_bulk.side_effect = lambda rows: rows
+        test_client.post("/vehicle-detection/bulk", json=detections)
+
+        data = test_client.get("/analytics/travel-times").json()
+        assert data["engine"]["samples"] == 1
+
+        link = test_client.get("/analytics/travel-times/1/2").json()
+        assert (link["from_junction_id"], link["to_junction_id"]) == (1, 2)
+        assert link["p50_seconds"] == pytest.approx(120, rel=0.015)
+
+    def test_unknown_link_returns_404(self, test_client: TestClient):
+        """Test a link with no observations is 404"""
+        response = test_client.get("/analytics/travel-times/1/2")
+
+        assert response.status_code == 404
+
+    def test_rejected_detection_not_observed(self, test_client: TestClient, mock_db_service):
+        """Test a failed write doesn't feed the travel-time engine"""
+        mock_db_service.log_vehicle_detection.side_effect = Exception("write failed")
+
+        test_client.post("/vehicle-detection", json=TestData.VALID_VEHICLE_DETECTIONS[0])
+
+        assert test_client.get("/analytics/travel-times").json()["engine"]["detections"] == 0
+
+
+class TestWebSocketLogs:
+    """/ws/logs goes through the per-client send queues"""
+
+    def test_ping_answered_through_send_queue(self, test_client: TestClient):
+        """Test a ping gets a pong and the client shows up in /health"""
+        with test_client.websocket_connect("/ws/logs") as ws:
+            ws.send_text("ping")
+            assert ws.receive_json() == {"type": "pong"}
+
+            stats = test_client.get("/health").json()["websockets"]
+            assert stats["clients"] == 1
+            assert stats["sent"] == 1
+
+    def test_subscribe_filters_by_junction(self, test_client: TestClient):
+        """Test a subscription is acknowledged and scopes broadcasts"""
+        from ws_broadcast import manager
+        from main import app, get_ws_user
+
+        app.dependency_overrides[get_ws_user] = lambda: {"id": 1, "role": "ADMIN", "token_data": {}}
+
+        with test_client.websocket_connect("/ws/logs") as ws:
+            ws.send_json({"action": "subscribe", "junction_ids": [2], "levels": ["error"]})
+            ack = ws.receive_json()
+            assert ack["type"] == "subscribed"
+            assert (ack["junction_ids"], ack["levels"]) == ([2], ["ERROR"])
+
+            ws.portal.call(
+                manager.broadcast, {"junction_id": 1, "log_level": "ERROR", "message": "no"}
+            )
+            ws.portal.call(
+                manager.broadcast, {"junction_id": 2, "log_level": "ERROR", "message": "yes"}
+            )
+            assert ws.receive_json()["message"] == "yes"
+
+    def test_subscription_checked_against_user_access(self, test_client: TestClient):
+        """Test junctions outside the user's access are denied"""
+        from main import app, get_ws_user
+
+        app.dependency_overrides[get_ws_user] = lambda: {
+            "id": 3, "role": "OBSERVER", "token_data": {"junction_ids": [1]}
+        }
+        with test_client.websocket_connect("/ws/logs?token=t") as ws:
+            ws.send_json({"action": "subscribe", "junction_ids": [1, 2]})
+            ack = ws.receive_json()
+
+        assert (ack["junction_ids"], ack["denied_junction_ids"]) == ([1], [2])
+
+    def test_anonymous_client_gets_system_messages_only(self, test_client: TestClient):
+        """Test without a token junction events are withheld and subscriptions denied"""
+        from ws_broadcast import manager
+
+        with test_client.websocket_connect("/ws/logs") as ws:
+            ws.send_json({"action": "subscribe", "junction_ids": [1]})
+            ack = ws.receive_json()
+            ws.portal.call(manager.broadcast, {"junction_id": 1, "message": "junction"})
+            ws.portal.call(manager.broadcast, {"message": "system"})
+            received = ws.receive_json()
+
+        assert (ack["junction_ids"], ack["denied_junction_ids"]) == ([], [1])
+        assert received["message"] == "system"
+
+    def test_reconnect_replays_missed_messages(self, test_client: TestClient):
+        """Test ?since= delivers the buffered backlog before live messages"""
+        from ws_broadcast import manager
+        from main import app, get_ws_user
+
+        app.dependency_overrides[get_ws_user] = lambda: {"id": 1, "role": "ADMIN", "token_data": {}}
+
+        with test_client.websocket_connect("/ws/logs") as ws:
+            ws.portal.call(manager.broadcast, {"junction_id": 1, "message": "seen"})
+            seen = ws.receive_json()
+            ws.portal.call(manager.broadcast, {"junction_id": 1, "message": "missed"})
+        stream = manager.replay.stream
+
+        with test_client.websocket_connect(
+            f"/ws/logs?since={seen['sequence']}&stream={stream}"
+        ) as ws:
+            ws.portal.call(manager.broadcast, {"junction_id": 1, "message": "live"})
+            missed, summary, live = ws.receive_json(), ws.receive_json(), ws.receive_json()
+
+        assert missed["message"] == "missed"
+        assert missed["sequence"] == seen["sequence"] + 1
+        assert (summary["type"], summary["replayed"], summary["complete"]) == ("replay", 1, True)
+        assert live["message"] == "live"
+
+    def test_subscribe_sends_live_timing_snapshot(self, test_client: TestClient):
+        """Test subscribing to a junction returns its live timing state"""
+        from app.services.live_timing import live_timing
+        from main import app, get_ws_user
+
+        app.dependency_overrides[get_ws_user] = lambda: {"id": 1, "role": "ADMIN", "token_data": {}}
+
+        live_timing.observe_message(
+            {"type": "plan_calculated", "junction_id": 1, "lane_counts": [4, 3, 2, 1],
+             "green_times": [30, 25, 20, 15], "cycle_time": 110}
+        )
+        with test_client.websocket_connect("/ws/logs") as ws:
+            ws.send_json({"action": "subscribe", "junction_ids": [1], "components": ["live_timing"]})
+            assert ws.receive_json()["type"] == "subscribed"
+            snapshot = ws.receive_json()
+
+        assert (snapshot["type"], snapshot["junction_id"], snapshot["keyframe"]) == (
+            "live_timing", 1, True
+        )
+        assert (snapshot["green_times"], snapshot["phase_lane"]) == ([30, 25, 20, 15], 1)
+
+    def test_invalid_command_reported(self, test_client: TestClient):
+        """Test an unknown action gets an error message, not a disconnect"""
+        with test_client.websocket_connect("/ws/logs") as ws:
+            ws.send_json({"action": "shout"})
+            assert ws.receive_json()["type"] == "error"
+            ws.send_text("ping")
+            assert ws.receive_json() == {"type": "pong"}
+
+    def test_token_required_when_configured(self, test_client: TestClient, monkeypatch):
+        """Test WS_REQUIRE_AUTH rejects anonymous clients with 1008"""
+        from starlette.websockets import WebSocketDisconnect
+
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "WS_REQUIRE_AUTH", True)
+        with pytest.raises(WebSocketDisconnect) as exc:
+            with test_client.websocket_connect("/ws/logs") as ws:
+                ws.receive_text()
+
+        assert exc.value.code == 1008
+
+    def test_sse_token_required_when_configured(self, test_client: TestClient, monkeypatch):
+        """Test WS_REQUIRE_AUTH also rejects anonymous /sse/logs clients"""
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "WS_REQUIRE_AUTH", True)
+        response = test_client.get("/sse/logs")
+
+        assert response.status_code == 401
+        assert response.json()["error"] == "Authentication required"
+
+
+
+class TestDeviceIngest:
+    """/ws/ingest: controllers stream counts and get green times back"""
+
+    def test_report_answered_on_same_socket(self, test_client: TestClient, monkeypatch):
+        """Test an authenticated controller gets green times per report"""
+        from app.config import settings
+        from app.services.device_gateway import device_gateway, device_token
+
+        async def pipeline(report, source, component):
+            return {"green_times": [30, 30, 30, 30], "cycle_time": 140,
+                    "junction_id": report["junction_id"], "cycle_id": report["cycle_id"]}
+
+        monkeypatch.setattr(settings, "DEVICE_TOKEN_SECRET", "s3cret")
+        monkeypatch.setattr(device_gateway, "process", pipeline)
+        with test_client.websocket_connect(
+            f"/ws/ingest?junction_id=4&token={device_token(4)}"
+        ) as ws:
+            for cycle_id in (1, 2):
+                ws.send_json({"lane_counts": [5, 5, 5, 5], "cycle_id": cycle_id})
+                reply = ws.receive_json()
+                assert (reply["type"], reply["cycle_id"], reply["junction_id"]) == (
+                    "green_times", cycle_id, 4
+                )
+            assert test_client.get("/health").json()["devices"]["connected"] == 1
+
+        assert 4 not in device_gateway.connections
+
+    def test_invalid_device_token_rejected(self, test_client: TestClient, monkeypatch):
+        """Test a token for another junction is refused with 1008"""
+        from starlette.websockets import WebSocketDisconnect
+
+        from app.config import settings
+        from app.services.device_gateway import device_token
+
+        monkeypatch.setattr(settings, "DEVICE_TOKEN_SECRET", "s3cret")
+        with pytest.raises(WebSocketDisconnect) as exc:
+            with test_client.websocket_connect(
+                f"/ws/ingest?junction_id=4&token={device_token(5)}"
+            ) as ws:
+                ws.receive_text()
+
+        assert exc.value.code == 1008
+
+    def test_bearer_header_accepted(self, test_client: TestClient, monkeypatch):
+        """Test the token can be sent as Authorization: Bearer"""
+        from app.config import settings
+        from app.services.device_gateway import device_token
+
+        monkeypatch.setattr(settings, "DEVICE_TOKEN_SECRET", "s3cret")
+        with test_client.websocket_connect(
+            "/ws/ingest?junction_id=4", headers={"Authorization": f"Bearer {device_token(4)}"}
+        ) as ws:
+            ws.send_text("ping")
+            assert ws.receive_json() == {"type": "pong"}
+
+
+class TestEventPublishing:
+    """Endpoints publish events instead of calling each sink"""
+
+    def test_detection_and_plan_events_published(self, test_client: TestClient):
+        """Test detections and timing calculations reach the event bus"""
+        from app.services.event_bus import DETECTION, PLAN_CALCULATED, SYSTEM_LOG, event_bus
+
+        before = dict(event_bus.published)
+        test_client.post("/vehicle-detection", json=TestData.VALID_VEHICLE_DETECTIONS[0])
+        test_client.post(
+            "/calculate-timing",
+            json={"lane_counts": TestData.NORMAL_TRAFFIC_LANES, "junction_id": 1},
+        )
+
+        published = test_client.get("/health").json()["events"]["published"]
+        assert published[DETECTION] == before[DETECTION] + 1
+        assert published[PLAN_CALCULATED] == before[PLAN_CALCULATED] + 1
+        assert published[SYSTEM_LOG] == before[SYSTEM_LOG] + 1
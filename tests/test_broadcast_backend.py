@@ -0,0 +1,228 @@
+"""
+Tests for the broadcast backends: in-memory delivery, the Redis envelope and
+cross-process fan-out through Redis pub/sub. The Redis tests drive the real
+redis.asyncio client against a small local RESP server that implements just
+the pub/sub commands, so no Redis installation is needed
+"""
+
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+
+from app.services.broadcast_backend import (
+    InMemoryBroadcastBackend,
+    RedisBroadcastBackend,
+    create_broadcast_backend,
+    decode_envelope,
+    encode_envelope,
+)
+from tests.test_ws_broadcast import ADMIN, FakeWebSocket, _connect, _drain
+from ws_broadcast import WSManager
+
+redis_asyncio = pytest.importorskip("redis.asyncio")
+
+
+def _bulk(value) -> bytes:
+    data = value if isinstance(value, bytes) else str(value).encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+def _array(*items) -> bytes:
+    parts = [b":%d\r\n" % item if isinstance(item, int) else _bulk(item) for item in items]
+    return b"*%d\r\n" % len(items) + b"".join(parts)
+
+
+class RedisStandIn:
+    """Local RESP server speaking SUBSCRIBE / UNSUBSCRIBE / PUBLISH / PING"""
+
+    def __init__(self):
+        self.channels = {}
+        self.published = []
+        self.server = None
+        self.writers = set()
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"redis://127.0.0.1:{port}/0"
+
+    async def stop(self):
+        for writer in list(self.writers):
+            writer.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _read_command(self, reader):
+        header = await reader.readline()
+        if not header:
+            return None
+        count = int(header[1:])
+        args = []
+        for _ in range(count):
+            length = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    async def _serve(self, reader, writer):
+        self.writers.add(writer)
+        subscribed = set()
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                command = args[0].upper()
+                if command == b"SUBSCRIBE":
+                    for channel in args[1:]:
+                        subscribed.add(channel)
+                        self.channels.setdefault(channel, set()).add(writer)
+                        writer.write(_array(b"subscribe", channel, len(subscribed)))
+                elif command == b"UNSUBSCRIBE":
+                    for channel in args[1:] or list(subscribed):
+                        subscribed.discard(channel)
+                        self.channels.get(channel, set()).discard(writer)
+                        writer.write(_array(b"unsubscribe", channel, len(subscribed)))
+                elif command == b"PUBLISH":
+                    channel, data = args[1], args[2]
+                    self.published.append(data)
+                    receivers = self.channels.get(channel, set())
+                    for receiver in receivers:
+                        receiver.write(_array(b"message", channel, data))
+                    writer.write(b":%d\r\n" % len(receivers))
+                elif command == b"PING":
+                    writer.write(_array(b"pong", b"") if subscribed else b"+PONG\r\n")
+                else:
+                    writer.write(b"+OK\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in subscribed:
+                self.channels.get(channel, set()).discard(writer)
+            self.writers.discard(writer)
+            writer.close()
+
+
+@pytest_asyncio.fixture
+async def redis_url():
+    stand_in = RedisStandIn()
+    url = await stand_in.start()
+    yield url
+    await stand_in.stop()
+
+
+def _redis_manager(url, channel="test:ws"):
+    backend = RedisBroadcastBackend(url=url, channel=channel, reconnect_seconds=0.05)
+    return WSManager(max_queue=10, backend=backend)
+
+
+@pytest.mark.unit
+class TestEnvelope:
+    """Routing header + payload, serialised once"""
+
+    def test_round_trip(self):
+        payload = json.dumps({"type": "timing", "junction_id": 1, "note": "a\\nb"})
+        route = (1, "traffic_calculator", "INFO", ("timing", 1))
+
+        decoded_payload, decoded_route = decode_envelope(encode_envelope(payload, route))
+
+        assert decoded_payload == payload
+        assert decoded_route == route
+
+    def test_system_route(self):
+        assert decode_envelope(encode_envelope("hello", (None, None, None, None))) == (
+            "hello",
+            (None, None, None, None),
+        )
+
+
+@pytest.mark.unit
+class TestInMemoryBackend:
+    """The default backend delivers straight to this process's clients"""
+
+    @pytest.mark.asyncio
+    async def test_publish_delivers_locally(self):
+        backend = InMemoryBroadcastBackend()
+        delivered = []
+        backend.bind(lambda payload, route: delivered.append((payload, route)) or 1)
+
+        assert await backend.publish("x", (1, None, None, None)) == 1
+        assert delivered == [("x", (1, None, None, None))]
+        assert backend.stats() == {"backend": "memory", "published": 1}
+
+    def test_factory(self):
+        assert isinstance(create_broadcast_backend("memory"), InMemoryBroadcastBackend)
+        assert isinstance(WSManager().backend, InMemoryBroadcastBackend)
+        with pytest.raises(ValueError):
+            create_broadcast_backend("carrier_pigeon")
+
+    @pytest.mark.asyncio
+    async def test_payload_shared_by_all_clients(self):
+        manager = WSManager(max_queue=10)
+        sockets = await _connect(manager, 3)
+
+        await manager.broadcast({"type": "log", "message": "once"})
+        await _drain(manager)
+
+        assert len({id(ws.sent[0]) for ws in sockets}) == 1
+        await manager.close_all()
+
+
+@pytest.mark.unit
+class TestRedisBackend:
+    """Two managers (two workers) fan out through one Redis channel"""
+
+    @pytest.mark.asyncio
+    async def test_cross_process_delivery_exactly_once(self, redis_url):
+        worker_a, worker_b = _redis_manager(redis_url), _redis_manager(redis_url)
+        await worker_a.start()
+        await worker_b.start()
+        (on_a,) = await _connect(worker_a, 1)
+        (on_b,) = await _connect(worker_b, 1)
+
+        assert await worker_a.broadcast({"message": "from a"}) == 2
+        assert await worker_b.broadcast({"message": "from b"}) == 2
+        await asyncio.sleep(0.05)
+        await _drain(worker_a)
+        await _drain(worker_b)
+
+        for ws in (on_a, on_b):
+            assert [json.loads(p)["message"] for p in ws.sent] == ["from a", "from b"]
+        assert worker_a.stats()["broadcast_backend"]["received"] == 2
+        await worker_a.close_all()
+        await worker_b.close_all()
+
+    @pytest.mark.asyncio
+    async def test_routing_survives_the_channel(self, redis_url):
+        publisher, receiver = _redis_manager(redis_url), _redis_manager(redis_url)
+        await publisher.start()
+        await receiver.start()
+        ws = FakeWebSocket()
+        await receiver.connect(ws, user=ADMIN)
+        receiver.subscribe(ws, junction_ids=[2], levels=["ERROR"])
+
+        await publisher.broadcast({"junction_id": 1, "log_level": "ERROR", "message": "other"})
+        await publisher.broadcast({"junction_id": 2, "log_level": "INFO", "message": "quiet"})
+        await publisher.broadcast({"junction_id": 2, "log_level": "ERROR", "message": "mine"})
+        await asyncio.sleep(0.05)
+        await _drain(receiver)
+
+        assert [json.loads(p)["message"] for p in ws.sent] == ["mine"]
+        await publisher.close_all()
+        await receiver.close_all()
+
+    @pytest.mark.asyncio
+    async def test_unreachable_redis_falls_back_to_local(self, unused_tcp_port):
+        manager = _redis_manager(f"redis://127.0.0.1:{unused_tcp_port}/0")
+        await manager.backend.start(timeout=0.1)
+        (ws,) = await _connect(manager, 1)
+
+        assert await manager.broadcast({"message": "local"}) == 0
+        await _drain(manager)
+
+        assert [json.loads(p)["message"] for p in ws.sent] == ["local"]
+        stats = manager.stats()["broadcast_backend"]
+        assert (stats["subscribed"], stats["publish_errors"]) == (False, 1)
+        await manager.close_all()
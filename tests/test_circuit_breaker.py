@@ -0,0 +1,192 @@
+"""
+Tests for the database circuit breaker, adaptive deadlines and the
+last-good read cache
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    AdaptiveTimeout,
+    CircuitBreaker,
+    CircuitOpenError,
+    LastGoodCache,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(
+        "test",
+        failure_threshold=3,
+        reset_seconds=10,
+        timeout_seconds=0.5,
+        min_timeout_seconds=0.05,
+        max_timeout_seconds=1,
+        ignored_exceptions=(ValueError,),
+        clock=clock,
+    )
+
+
+async def _ok():
+    return "ok"
+
+
+async def _fail():
+    raise ConnectionError("database unreachable")
+
+
+async def _reject():
+    raise ValueError("bad query")
+
+
+async def _hang():
+    await asyncio.sleep(5)
+
+
+@pytest.mark.unit
+class TestCircuitBreaker:
+    """State transitions of the breaker"""
+
+    @pytest.mark.asyncio
+    async def test_opens_after_consecutive_failures(self, breaker):
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                await breaker.call("read", _fail)
+
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            await breaker.call("read", _ok)
+        assert breaker.stats()["rejected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_success_resets_failure_count(self, breaker):
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await breaker.call("read", _fail)
+        assert await breaker.call("read", _ok) == "ok"
+        with pytest.raises(ConnectionError):
+            await breaker.call("read", _fail)
+
+        assert breaker.state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_ignored_exceptions_do_not_trip(self, breaker):
+        for _ in range(5):
+            with pytest.raises(ValueError):
+                await breaker.call("read", _reject)
+
+        assert breaker.state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_half_open_probe_closes_or_reopens(self, breaker, clock):
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                await breaker.call("read", _fail)
+
+        clock.now += 11
+        with pytest.raises(ConnectionError):
+            await breaker.call("read", _fail)
+        assert breaker.state == OPEN
+
+        clock.now += 11
+        assert await breaker.call("read", _ok) == "ok"
+        assert breaker.state == CLOSED
+        assert breaker.stats()["opened"] == 2
+
+    @pytest.mark.asyncio
+    async def test_single_probe_while_half_open(self, breaker, clock):
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                await breaker.call("read", _fail)
+        clock.now += 11
+
+        probe = asyncio.ensure_future(breaker.call("read", lambda: asyncio.sleep(0.01)))
+        await asyncio.sleep(0)
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            await breaker.call("read", _ok)
+
+        await probe
+        assert breaker.state == CLOSED
+
+    @pytest.mark.asyncio
+    async def test_deadline_overrun_counts_as_failure(self, breaker):
+        with pytest.raises(TimeoutError):
+            await breaker.call("slow_read", _hang)
+
+        stats = breaker.stats()
+        assert stats["timeouts"] == 1
+        assert stats["consecutive_failures"] == 1
+
+
+@pytest.mark.unit
+class TestAdaptiveTimeout:
+    """Deadlines follow observed latency within bounds"""
+
+    def test_initial_deadline_before_samples(self):
+        assert AdaptiveTimeout(5, 0.5, 10).seconds == 5
+
+    def test_fast_operations_tighten_to_floor(self):
+        timeout = AdaptiveTimeout(5, 0.5, 10)
+        for _ in range(20):
+            timeout.record(0.01)
+
+        assert timeout.seconds == 0.5
+
+    def test_latency_spikes_widen_up_to_ceiling(self):
+        timeout = AdaptiveTimeout(5, 0.5, 10)
+        timeout.record(1.0)
+        assert timeout.seconds == pytest.approx(3.0)
+
+        for _ in range(10):
+            timeout.record(30.0)
+        assert timeout.seconds == 10
+
+    @pytest.mark.asyncio
+    async def test_deadlines_are_per_operation(self, breaker):
+        await breaker.call("fast", _ok)
+
+        operations = breaker.stats()["operations"]
+        assert operations["fast"]["samples"] == 1
+        assert breaker.timeout_for("other").seconds == 0.5
+
+
+@pytest.mark.unit
+class TestLastGoodCache:
+    """Bounded cache of the last successful read results"""
+
+    def test_get_counts_fallbacks(self):
+        cache = LastGoodCache()
+        assert cache.get("k", []) == []
+        cache.put("k", [1])
+
+        assert cache.get("k", []) == [1]
+        assert cache.stats() == {"entries": 1, "fallbacks_served": 1}
+
+    def test_evicts_least_recently_stored(self):
+        cache = LastGoodCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.put("a", 3)
+        cache.put("c", 4)
+
+        assert cache.get("b", None) is None
+        assert cache.get("a", None) == 3
@@ -0,0 +1,280 @@
+"""
+Unit tests for DatabaseService query helpers
+Supabase client calls are mocked; only the service-side logic is tested
+"""
+
+from datetime import date, datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services.database_service import DatabaseService
+
+
+@pytest.fixture
+def db_service():
+    """DatabaseService with a mocked Supabase client"""
+    service = DatabaseService()
+    service.supabase = MagicMock()
+    return service
+
+
+def _set_table_result(client: MagicMock, data, chain):
+    """Attach `data` to the result of a mocked query builder chain"""
+    node = client.table.return_value
+    for step in chain:
+        node = getattr(node, step).return_value
+    node.execute.return_value = MagicMock(data=data)
+
+
+@pytest.mark.unit
+@pytest.mark.database
+class TestVehicleCountRollups:
+    """Vehicle counts are served from the rollup tables"""
+
+    @pytest.mark.asyncio
+    async def test_count_by_date_sums_daily_rollup(self, db_service):
+        _set_table_result(
+            db_service.supabase,
+            [{"vehicle_count": 120}, {"vehicle_count": 30}, {"vehicle_count": 7}],
+            ["select", "eq", "eq"],
+        )
+
+        total = await db_service.get_vehicles_count_by_date(1, date(2025, 9, 15))
+
+        assert total == 157
+        db_service.supabase.table.assert_called_with("vehicle_counts_daily")
+
+    @pytest.mark.asyncio
+    async def test_count_by_date_empty_rollup(self, db_service):
+        _set_table_result(db_service.supabase, [], ["select", "eq", "eq"])
+
+        assert await db_service.get_vehicles_count_by_date(1, date(2025, 9, 15)) == 0
+
+    @pytest.mark.asyncio
+    async def test_backfill_calls_rpc(self, db_service, monkeypatch):
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "DETECTION_RETENTION_DAYS", 36500)
+        db_service.supabase.rpc.return_value.execute.return_value = MagicMock(data=42)
+
+        written = await db_service.backfill_vehicle_count_rollups(
+            date(2025, 9, 1), date(2025, 9, 2)
+        )
+
+        assert written == 42
+        db_service.supabase.rpc.assert_called_once_with(
+            "backfill_vehicle_count_rollups",
+            {"p_start_date": "2025-09-01", "p_end_date": "2025-09-02"},
+        )
+
+    @pytest.mark.asyncio
+    async def test_backfill_refuses_retired_range(self, db_service, monkeypatch):
+        """Rollups past the retention horizon can't be rebuilt, so they're kept"""
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "DETECTION_RETENTION_DAYS", 30)
+
+        with pytest.raises(ValueError, match="retired"):
+            await db_service.backfill_vehicle_count_rollups(
+                date.today() - timedelta(days=45), date.today()
+            )
+        db_service.supabase.rpc.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_totals_by_date_range_pages_grouped_rpc(self, db_service, monkeypatch):
+        monkeypatch.setattr(DatabaseService, "RPC_PAGE_SIZE", 2)
+        pages = [
+            [
+                {"bucket_date": "2025-09-14", "junction_id": 1, "total_vehicles": 10},
+                {"bucket_date": "2025-09-14", "junction_id": 2, "total_vehicles": 20},
+            ],
+            [{"bucket_date": "2025-09-15", "junction_id": 1, "total_vehicles": 5}],
+        ]
+        builder = db_service.supabase.rpc.return_value.order.return_value.order.return_value
+        builder.range.return_value.execute.side_effect = [MagicMock(data=p) for p in pages]
+
+        totals = await db_service.get_vehicle_totals_by_date_range(
+            date(2025, 9, 14), date(2025, 9, 15)
+        )
+
+        assert totals == {"2025-09-14": {1: 10, 2: 20}, "2025-09-15": {1: 5}}
+        assert builder.range.call_args_list[1].args == (2, 3)
+
+
+@pytest.mark.unit
+@pytest.mark.database
+class TestDetectionHistory:
+    """Detection history is a single joined RPC call"""
+
+    @pytest.mark.asyncio
+    async def test_history_passes_keyset_cursor(self, db_service):
+        rows = [{"id": 5, "cycle_id": 2, "lane_green_time": 30}]
+        db_service.supabase.rpc.return_value.execute.return_value = MagicMock(data=rows)
+
+        result = await db_service.get_recent_detections_with_signals(
+            3, limit=20, before_timestamp="2025-09-15T12:00:00+00:00", before_id=6
+        )
+
+        assert result == rows
+        db_service.supabase.rpc.assert_called_once_with(
+            "get_recent_detections_with_signals",
+            {
+                "p_junction_id": 3,
+                "p_limit": 20,
+                "p_before_timestamp": "2025-09-15T12:00:00+00:00",
+                "p_before_id": 6,
+                "p_lookback_days": 90,
+            },
+        )
+        db_service.supabase.table.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_cycle_history_rpc_with_projection(self, db_service):
+        rpc = db_service.supabase.rpc.return_value
+        rpc.select.return_value.execute.return_value = MagicMock(data=[{"id": 4}])
+
+        result = await db_service.get_traffic_cycle_history(
+            2, start_time="2025-09-01T00:00:00", limit=50,
+            fields=["total_cycle_time", "id"], bucket_seconds=3600,
+        )
+
+        assert result == [{"id": 4}]
+        name, params = db_service.supabase.rpc.call_args[0]
+        assert name == "get_traffic_cycle_history"
+        assert params["p_bucket_seconds"] == 3600
+        assert params["p_start_time"] == "2025-09-01T00:00:00"
+        rpc.select.assert_called_once_with("id,cycle_start_time,total_cycle_time")
+
+
+@pytest.mark.unit
+@pytest.mark.database
+class TestPartitionMaintenance:
+    """Maintenance job pre-creates partitions and retires expired ones"""
+
+    @pytest.mark.asyncio
+    async def test_run_once_covers_both_tables(self):
+        from app.services.partition_maintenance import PartitionMaintenance
+
+        db = MagicMock()
+        db.ensure_time_partitions = AsyncMock(return_value=1)
+        db.apply_partition_retention = AsyncMock(
+            side_effect=lambda table, days, archive: (
+                [{"partition_name": f"{table}_y2025m01", "action": "archived"}]
+                if table == "system_logs"
+                else []
+            )
+        )
+        db.log_system_event = AsyncMock()
+
+        job = PartitionMaintenance(
+            db, detection_retention_days=180, log_retention_days=30, archive=True, premake_days=62
+        )
+        report = await job.run_once()
+
+        assert report["vehicle_detections"] == {"created": 1, "retired": []}
+        assert report["system_logs"]["retired"][0]["partition_name"] == "system_logs_y2025m01"
+        db.apply_partition_retention.assert_any_await("vehicle_detections", 180, archive=True)
+        db.apply_partition_retention.assert_any_await("system_logs", 30, archive=True)
+        table, start, end = db.ensure_time_partitions.await_args_list[0].args
+        assert table == "vehicle_detections"
+        assert (end - start).days == 62
+
+    @pytest.mark.asyncio
+    async def test_retention_rpc_params(self, db_service):
+        db_service.supabase.rpc.return_value.execute.return_value = MagicMock(data=[])
+
+        await db_service.apply_partition_retention("vehicle_detections", 180, archive=False)
+
+        db_service.supabase.rpc.assert_called_once_with(
+            "apply_partition_retention",
+            {"p_table": "vehicle_detections", "p_retain_days": 180, "p_archive": False},
+        )
+
+
+@pytest.mark.unit
+@pytest.mark.database
+class TestRowStreaming:
+    """Keyset-paged streaming used by the Parquet export job"""
+
+    @pytest.mark.asyncio
+    async def test_iter_rows_pages_by_last_id(self, db_service):
+        builder = db_service.supabase.table.return_value.select.return_value
+        filtered = builder.gt.return_value.gte.return_value.lt.return_value
+        filtered.order.return_value.limit.return_value.execute.side_effect = [
+            MagicMock(data=[{"id": 1}, {"id": 2}]),
+            MagicMock(data=[{"id": 5}]),
+        ]
+
+        chunks = [
+            chunk
+            async for chunk in db_service.iter_rows_by_id(
+                "vehicle_detections",
+                "detection_timestamp",
+                datetime(2025, 9, 15),
+                datetime(2025, 9, 16),
+                chunk_size=2,
+            )
+        ]
+
+        assert chunks == [[{"id": 1}, {"id": 2}], [{"id": 5}]]
+        assert [c.args for c in builder.gt.call_args_list] == [("id", 0), ("id", 2)]
+
+
+@pytest.mark.unit
+@pytest.mark.database
+class TestDatabaseDegradation:
+    """Reads fall back to the last good result; an open breaker fails fast"""
+
+    @pytest.mark.asyncio
+    async def test_read_serves_last_good_result_on_failure(self, db_service):
+        _set_table_result(db_service.supabase, [{"vehicle_count": 40}], ["select", "eq", "eq"])
+        assert await db_service.get_vehicles_count_by_date(1, date(2025, 9, 15)) == 40
+
+        db_service.supabase.table.side_effect = ConnectionError("database unreachable")
+
+        assert await db_service.get_vehicles_count_by_date(1, date(2025, 9, 15)) == 40
+        assert await db_service.get_vehicles_count_by_date(2, date(2025, 9, 15)) == 0
+        assert db_service._last_good.stats()["fallbacks_served"] == 1
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_skips_database(self, db_service):
+        db_service.supabase.table.side_effect = ConnectionError("database unreachable")
+        for _ in range(db_service.breaker.failure_threshold):
+            await db_service.get_all_junctions()
+        calls = db_service.supabase.table.call_count
+
+        assert await db_service.get_all_junctions() == []
+        assert (await db_service.health_check())["database_connected"] is False
+        assert db_service.supabase.table.call_count == calls
+        assert db_service.breaker.stats()["state"] == "open"
+
+    @pytest.mark.asyncio
+    async def test_slow_maintenance_does_not_trip_breaker(self, db_service, monkeypatch):
+        """A maintenance RPC longer than DB_TIMEOUT_MAX_SECONDS completes"""
+        import time
+
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "DETECTION_RETENTION_DAYS", 36500)
+        monkeypatch.setattr(db_service.breaker, "max_timeout_seconds", 0.05)
+        monkeypatch.setattr(db_service.breaker, "timeout_seconds", 0.05)
+
+        def slow_rpc():
+            time.sleep(0.1)
+            return MagicMock(data=7)
+
+        db_service.supabase.rpc.return_value.execute.side_effect = slow_rpc
+        for _ in range(db_service.breaker.failure_threshold):
+            assert await db_service.backfill_vehicle_count_rollups(
+                date(2025, 9, 1), date(2025, 9, 2)
+            ) == 7
+
+        stats = db_service.breaker.stats()
+        assert (stats["state"], stats["failures"], stats["timeouts"]) == ("closed", 0, 0)
+        assert "backfill_vehicle_count_rollups" not in stats["operations"]
+
+        monkeypatch.setattr(settings, "DB_MAINTENANCE_TIMEOUT_SECONDS", 0.05)
+        with pytest.raises(TimeoutError):
+            await db_service.backfill_vehicle_count_rollups(date(2025, 9, 1), date(2025, 9, 2))
+        assert db_service.breaker.stats()["failures"] == 0
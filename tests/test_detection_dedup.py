@@ -0,0 +1,100 @@
+"""
+Tests for FASTag duplicate-read suppression
+"""
+
+import pytest
+
+from app.services.detection_dedup import DetectionDeduplicator
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def _read(dedup, *read, **kwargs):
+    """Check a read, then remember it as the endpoints do"""
+    duplicate = dedup.is_duplicate(*read, **kwargs)
+    dedup.record(*read, **kwargs)
+    return duplicate
+
+
+@pytest.fixture
+def dedup(clock):
+    return DetectionDeduplicator(window_seconds=20, max_keys_per_junction=100, clock=clock)
+
+
+@pytest.mark.unit
+class TestDetectionDeduplicator:
+    """Repeat reads within the window are suppressed"""
+
+    def test_repeat_read_suppressed_within_window(self, dedup, clock):
+        assert _read(dedup, 1, 2, "FT1") is False
+        clock.now += 3
+        assert _read(dedup, 1, 2, "FT1") is True
+
+        stats = dedup.stats()
+        assert (stats["reads"], stats["suppressed"]) == (2, 1)
+        assert stats["junctions"][1] == {"reads": 2, "suppressed": 1}
+
+    def test_key_includes_junction_and_lane(self, dedup):
+        assert _read(dedup, 1, 2, "FT1") is False
+        assert _read(dedup, 1, 3, "FT1") is False
+        assert _read(dedup, 2, 2, "FT1") is False
+
+    def test_read_counted_again_after_window(self, dedup, clock):
+        _read(dedup, 1, 1, "FT1")
+        clock.now += 26  # window rounded up to one 5 s bucket
+
+        assert _read(dedup, 1, 1, "FT1") is False
+        assert dedup.stats()["tracked_keys"] == 1
+
+    def test_continuous_reads_stay_suppressed(self, dedup, clock):
+        _read(dedup, 1, 1, "FT1")
+        for _ in range(10):
+            clock.now += 15
+            assert _read(dedup, 1, 1, "FT1") is True
+
+    def test_event_time_is_used_when_given(self, dedup, clock):
+        _read(dedup, 1, 1, "FT1", timestamp=clock.now - 600)
+
+        assert _read(dedup, 1, 1, "FT1", timestamp=clock.now - 598) is True
+        assert _read(dedup, 1, 1, "FT1") is False
+
+    def test_memory_bounded_per_junction(self, dedup, clock):
+        for i in range(1000):
+            _read(dedup, 1, 1, f"FT{i}")
+            clock.now += 0.01
+        _read(dedup, 2, 1, "FT0")
+
+        stats = dedup.stats()
+        assert stats["tracked_keys"] <= 100 + 1
+        assert stats["evicted_buckets"] > 0
+        assert stats["junctions"][2]["suppressed"] == 0
+
+    def test_check_alone_records_nothing(self, dedup):
+        assert dedup.is_duplicate(1, 1, "FT1") is False
+        assert dedup.is_duplicate(1, 1, "FT1") is False
+        assert dedup.stats()["tracked_keys"] == 0
+
+        dedup.record(1, 1, "FT1")
+        assert dedup.is_duplicate(1, 1, "FT1") is True
+
+    def test_released_read_is_not_suppressed(self, dedup):
+        reservation = dedup.record(1, 1, "FT1")
+        assert dedup.is_duplicate(1, 1, "FT1") is True
+
+        dedup.release(reservation)
+
+        assert dedup.is_duplicate(1, 1, "FT1") is False
+        assert dedup.stats()["tracked_keys"] == 0
+        assert dedup.record(1, 1, "FT1") is not None
+        assert dedup.record(1, 1, "FT1") is None
@@ -0,0 +1,219 @@
+"""
+Tests for the junction controller WebSocket gateway: device tokens, report
+validation, the shared MQTT pipeline and thousands of concurrent devices
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.config import settings
+from app.services.device_gateway import (
+    REPLACED_CLOSE_CODE,
+    DeviceGateway,
+    device_token,
+    verify_device_token,
+)
+from tests.test_ws_broadcast import FakeWebSocket
+
+REPORT = {"lane_counts": [12, 8, 5, 3], "cycle_id": 41}
+
+
+def _reply(report, source, component):
+    return {
+        "green_times": [40, 30, 25, 15],
+        "cycle_time": 130,
+        "junction_id": report["junction_id"],
+        "cycle_id": report.get("cycle_id"),
+    }
+
+
+class SlowPipeline:
+    """Stands in for process_car_counts; records peak concurrency"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.running = 0
+        self.peak = 0
+        self.calls = []
+
+    async def __call__(self, report, source, component):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            self.calls.append((report["junction_id"], source, component))
+            return _reply(report, source, component)
+        finally:
+            self.running -= 1
+
+
+@pytest.mark.unit
+class TestDeviceTokens:
+    """Per-junction HMAC tokens, checked without a database"""
+
+    def test_token_bound_to_junction(self, monkeypatch):
+        monkeypatch.setattr(settings, "DEVICE_TOKEN_SECRET", "s3cret")
+
+        token = device_token(7)
+
+        assert verify_device_token(7, token)
+        assert not verify_device_token(8, token)
+        assert not verify_device_token(7, None)
+        assert token != device_token(7, secret="other")
+
+    def test_unset_secret_rejects_everything(self, monkeypatch):
+        monkeypatch.setattr(settings, "DEVICE_TOKEN_SECRET", "")
+        assert not verify_device_token(1, device_token(1, secret="x"))
+
+
+@pytest.mark.unit
+class TestDeviceGateway:
+    """Each report is validated, calculated and answered"""
+
+    @pytest.mark.asyncio
+    async def test_report_answered_with_green_times(self):
+        pipeline = SlowPipeline(delay=0)
+        gateway = DeviceGateway(process=pipeline, max_concurrent=4)
+
+        reply = await gateway.handle(3, json.dumps(REPORT))
+
+        assert reply == {
+            "type": "green_times",
+            "green_times": [40, 30, 25, 15],
+            "cycle_time": 130,
+            "junction_id": 3,
+            "cycle_id": 41,
+        }
+        assert pipeline.calls == [(3, "ws/ingest", "device_gateway")]
+        assert gateway.stats()["reports"] == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "text, message",
+        [
+            ("{not json", "Invalid JSON"),
+            ("[1, 2]", "Report must be a JSON object"),
+            (json.dumps({"lane_counts": [1, 2, 3]}), "lane_counts must contain exactly 4"),
+            (json.dumps({"lane_counts": [1, 2, -3, 4]}), "lane_counts must contain exactly 4"),
+            (json.dumps({**REPORT, "junction_id": 9}), "This connection reports for junction 3"),
+            (json.dumps({**REPORT, "cycle_id": "x"}), "cycle_id must be an integer"),
+        ],
+    )
+    async def test_invalid_reports_rejected(self, text, message):
+        pipeline = SlowPipeline(delay=0)
+        gateway = DeviceGateway(process=pipeline)
+
+        reply = await gateway.handle(3, text)
+
+        assert reply["type"] == "error"
+        assert reply["message"].startswith(message)
+        assert pipeline.calls == []
+        assert gateway.stats()["rejected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_ping_and_failed_calculation(self):
+        async def failing(report, source, component):
+            return None
+
+        gateway = DeviceGateway(process=failing)
+
+        assert await gateway.handle(1, "ping") == {"type": "pong"}
+        reply = await gateway.handle(1, json.dumps(REPORT))
+        assert (reply["type"], reply["cycle_id"]) == ("error", 41)
+        assert gateway.stats()["failed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_unwired_gateway_fails_reports(self):
+        gateway = DeviceGateway()
+
+        reply = await gateway.handle(1, json.dumps(REPORT))
+
+        assert (reply["type"], reply["message"]) == ("error", "Calculation failed")
+        assert gateway.stats()["failed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_reconnect_replaces_old_connection(self):
+        gateway = DeviceGateway(process=SlowPipeline(delay=0))
+        old, new = FakeWebSocket(), FakeWebSocket()
+
+        await gateway.register(5, old)
+        await gateway.register(5, new)
+        gateway.unregister(5, old)
+
+        assert old.closed_with == REPLACED_CLOSE_CODE
+        assert gateway.connections == {5: new}
+        assert gateway.stats()["replaced"] == 1
+
+    @pytest.mark.asyncio
+    async def test_uses_mqtt_pipeline(self, monkeypatch):
+        import mqtt_handler
+        from app.services.event_bus import EventBus
+        from app.services.traffic_calculator import TrafficCalculator
+
+        bus = EventBus(max_queue=10)
+        monkeypatch.setattr(mqtt_handler, "event_bus", bus)
+        monkeypatch.setattr(mqtt_handler, "_calculator", TrafficCalculator())
+        gateway = DeviceGateway(process=mqtt_handler.process_car_counts)
+
+        reply = await gateway.handle(2, json.dumps({"lane_counts": [10, 10, 10, 10]}))
+
+        assert reply["type"] == "green_times"
+        assert (reply["junction_id"], len(reply["green_times"])) == (2, 4)
+        assert bus.stats()["published"]["plan_calculated"] == 1
+        assert bus.stats()["published"]["mqtt_received"] == 1
+
+    @pytest.mark.asyncio
+    async def test_pipeline_writes_through_injected_service(self, monkeypatch):
+        import mqtt_handler
+        from app.services.event_bus import EventBus
+        from app.services.traffic_calculator import TrafficCalculator
+
+        db = MagicMock()
+        db.build_rfid_scanner_row.return_value = {"junction_id": 3, "cycle_id": 41}
+        db.log_rfid_scanner_data = AsyncMock(return_value=True)
+        monkeypatch.setattr(mqtt_handler, "event_bus", EventBus(max_queue=10))
+        monkeypatch.setattr(mqtt_handler, "get_write_spool", lambda: None)
+        monkeypatch.setattr(mqtt_handler, "_db_service", None)
+        monkeypatch.setattr(mqtt_handler, "_calculator", None)
+        mqtt_handler.set_services(db, TrafficCalculator(db_service=db))
+
+        reply = await mqtt_handler.process_car_counts({**REPORT, "junction_id": 3})
+
+        assert reply["cycle_id"] == 41
+        db.log_rfid_scanner_data.assert_awaited_once()
+        assert db.log_rfid_scanner_data.await_args.kwargs["junction_id"] == 3
+
+
+@pytest.mark.performance
+class TestDeviceGatewayLoad:
+    """2,000 controllers reporting at once, calculations capped"""
+
+    @pytest.mark.asyncio
+    async def test_thousands_of_devices(self):
+        pipeline = SlowPipeline(delay=0.01)
+        gateway = DeviceGateway(process=pipeline, max_concurrent=100)
+        devices = {junction_id: FakeWebSocket() for junction_id in range(1, 2001)}
+        for junction_id, ws in devices.items():
+            await gateway.register(junction_id, ws)
+
+        async def device(junction_id, ws):
+            for cycle_id in range(3):
+                text = json.dumps({**REPORT, "cycle_id": cycle_id})
+                await gateway.send(ws, await gateway.handle(junction_id, text))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(device(j, ws) for j, ws in devices.items()))
+        elapsed = time.perf_counter() - started
+
+        assert all(
+            [json.loads(p)["cycle_id"] for p in ws.sent] == [0, 1, 2] for ws in devices.values()
+        )
+        assert pipeline.peak == 100
+        assert gateway.stats()["connected"] == 2000
+        assert gateway.stats()["in_flight"] == 0
+        # 6,000 reports / 100 at a time * 10ms: bounded by the cap, not by connections
+        assert elapsed < 5
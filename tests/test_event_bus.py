@@ -0,0 +1,222 @@
+"""
+Tests for the in-process event bus and its sinks
+"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services.event_bus import (
+    DETECTION,
+    PLAN_CALCULATED,
+    SYSTEM_LOG,
+    EventBus,
+    EventCounters,
+    SystemLogWriter,
+    detection_event,
+    log_event,
+    plan_event,
+)
+
+
+class Recorder:
+    def __init__(self, delay=0.0):
+        self.events = []
+        self.delay = delay
+
+    async def __call__(self, event):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.events.append(event)
+
+
+@pytest.mark.unit
+class TestEventBus:
+    """Events are published once and consumed by every matching sink"""
+
+    @pytest.mark.asyncio
+    async def test_fan_out_by_type(self):
+        bus = EventBus(max_queue=100)
+        everything, logs = Recorder(), Recorder()
+        bus.subscribe("everything", everything)
+        bus.subscribe("logs", logs, types=[SYSTEM_LOG])
+        bus.start()
+
+        assert bus.publish(detection_event(1, 2, "FT1", "car")) == 1
+        assert bus.publish(log_event("hello")) == 2
+        assert await bus.drain()
+
+        assert [e.type for e in everything.events] == [DETECTION, SYSTEM_LOG]
+        assert [e.type for e in logs.events] == [SYSTEM_LOG]
+        assert bus.stats()["published"][DETECTION] == 1
+        await bus.stop()
+
+    def test_fastag_id_not_in_client_message(self):
+        event = detection_event(1, 2, "FT1", "car")
+        message = event.to_message()
+
+        assert event.data["fastag_id"] == "FT1"
+        assert "fastag_id" not in message
+        assert (message["lane_number"], message["vehicle_type"]) == (2, "car")
+
+    @pytest.mark.asyncio
+    async def test_publish_does_not_wait_for_slow_sink(self):
+        bus = EventBus(max_queue=100)
+        slow, fast = Recorder(delay=0.05), Recorder()
+        bus.subscribe("slow", slow)
+        bus.subscribe("fast", fast)
+        bus.start()
+
+        for i in range(5):
+            bus.publish(detection_event(1, 1, f"FT{i}"))
+        await asyncio.sleep(0.01)
+
+        assert len(fast.events) == 5
+        assert len(slow.events) < 5
+        await bus.stop()
+        assert len(slow.events) == 5
+
+    @pytest.mark.asyncio
+    async def test_full_queue_drops_oldest(self):
+        bus = EventBus(max_queue=3)
+        sink = Recorder()
+        bus.subscribe("sink", sink)
+
+        for i in range(5):
+            bus.publish(detection_event(1, 1, f"FT{i}"))
+        bus.start()
+        await bus.drain()
+
+        assert [e.data["fastag_id"] for e in sink.events] == ["FT2", "FT3", "FT4"]
+        assert bus.stats()["sinks"]["sink"]["dropped"] == 2
+        await bus.stop()
+
+    @pytest.mark.asyncio
+    async def test_failing_sink_is_isolated(self):
+        bus = EventBus(max_queue=10)
+        healthy = Recorder()
+        bus.subscribe("broken", AsyncMock(side_effect=RuntimeError("boom")))
+        bus.subscribe("healthy", healthy)
+        bus.start()
+
+        bus.publish(log_event("one"))
+        bus.publish(log_event("two"))
+        await bus.drain()
+
+        stats = bus.stats()["sinks"]
+        assert (stats["broken"]["errors"], stats["healthy"]["delivered"]) == (2, 2)
+        await bus.stop()
+
+    @pytest.mark.asyncio
+    async def test_resubscribe_replaces_sink(self):
+        bus = EventBus(max_queue=10)
+        first, second = Recorder(), Recorder()
+        bus.subscribe("sink", first)
+        bus.start()
+        bus.subscribe("sink", second)
+
+        bus.publish(log_event("x"))
+        await bus.drain()
+
+        assert (len(first.events), len(second.events)) == (0, 1)
+        await bus.stop()
+
+    def test_event_message_is_flat(self):
+        message = plan_event(3, [1, 2, 3, 4], [30, 30, 30, 30], 120).to_message()
+
+        assert message["type"] == PLAN_CALCULATED
+        assert (message["junction_id"], message["cycle_time"]) == (3, 120)
+        assert message["log_level"] == "INFO"
+        json.dumps(message)
+
+    def test_error_log_event(self):
+        event = log_event("db down", component="startup", error_type="DB_ERROR", metadata={"a": 1})
+
+        assert event.level == "ERROR"
+        assert event.data == {"message": "db down", "error_type": "DB_ERROR", "metadata": {"a": 1}}
+
+
+@pytest.mark.unit
+class TestEventSinks:
+    """Rolling counters and the system_logs write-behind"""
+
+    def test_counters_roll_per_junction(self):
+        clock = [0.0]
+        counters = EventCounters(window_seconds=300, clock=lambda: clock[0])
+        old = detection_event(1, 1, "A")
+        recent = detection_event(1, 1, "B")
+        clock[0] = recent.timestamp.timestamp()
+        old.timestamp = old.timestamp.replace(year=old.timestamp.year - 1)
+
+        for event in (old, recent, detection_event(2, 1, "C"), log_event("x")):
+            counters.record(event)
+
+        stats = counters.stats()
+        assert stats["totals"][DETECTION] == 3
+        assert stats["totals"][SYSTEM_LOG] == 1
+        assert stats["junctions"] == {1: {DETECTION: 1}, 2: {DETECTION: 1}}
+
+    @pytest.mark.asyncio
+    async def test_system_log_writer(self):
+        db = MagicMock()
+        db.log_system_event = AsyncMock()
+        db.log_system_error = AsyncMock()
+        writer = SystemLogWriter(db)
+
+        await writer.handle(log_event("started", component="startup", junction_id=2))
+        await writer.handle(log_event("boom", component="mqtt_handler", error_type="MQTT_ERROR"))
+        await writer.handle(detection_event(1, 1, "A"))
+
+        db.log_system_event.assert_awaited_once_with(
+            message="started", log_level="INFO", component="startup", junction_id=2
+        )
+        db.log_system_error.assert_awaited_once_with(
+            error_message="boom",
+            error_type="MQTT_ERROR",
+            component="mqtt_handler",
+            junction_id=None,
+            metadata=None,
+        )
+
+    @pytest.mark.asyncio
+    async def test_websocket_sink_routes_by_junction(self):
+        from tests.test_ws_broadcast import ADMIN, FakeWebSocket
+        from ws_broadcast import WSManager
+
+        manager = WSManager(max_queue=10)
+        ws = FakeWebSocket()
+        await manager.connect(ws, user=ADMIN)
+        manager.subscribe(ws, junction_ids=[2])
+
+        async def broadcast(event):
+            await manager.broadcast(event.to_message())
+
+        bus = EventBus(max_queue=10)
+        bus.subscribe("websocket", broadcast)
+        bus.start()
+        bus.publish(detection_event(1, 1, "A"))
+        bus.publish(detection_event(2, 1, "B"))
+        await bus.stop()
+        await asyncio.sleep(0)
+
+        assert [json.loads(p)["junction_id"] for p in ws.sent] == [2]
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_mqtt_decode_error_published(self, monkeypatch):
+        import mqtt_handler
+
+        bus = EventBus(max_queue=10)
+        sink = Recorder()
+        bus.subscribe("sink", sink)
+        monkeypatch.setattr(mqtt_handler, "event_bus", bus)
+
+        await mqtt_handler.message_handler(None, "flextraff/car_counts", b"not json", 1, None)
+        bus.start()
+        await bus.stop()
+
+        assert [(e.type, e.data["error_type"]) for e in sink.events] == [
+            (SYSTEM_LOG, "JSON_DECODE_ERROR")
+        ]
@@ -0,0 +1,124 @@
+"""
+Tests for the dedicated database / CPU thread pools
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+
+import pytest
+
+from app.services.executors import (
+    CPU,
+    DB_READ,
+    DB_WRITE,
+    InstrumentedExecutor,
+    executor_stats,
+    get_executor,
+    run_db_read,
+    run_db_write,
+    shutdown_executors,
+)
+
+
+@pytest.fixture
+def pool():
+    executor = InstrumentedExecutor("test", max_workers=1)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.mark.unit
+class TestInstrumentedExecutor:
+    """Queue wait and utilisation accounting"""
+
+    @pytest.mark.asyncio
+    async def test_runs_with_arguments_and_context(self, pool):
+        request_id = contextvars.ContextVar("request_id")
+        request_id.set("abc")
+
+        result = await pool.run(lambda a, b=0: (a + b, request_id.get()), 1, b=2)
+
+        assert result == (3, "abc")
+        stats = pool.stats()
+        assert stats["submitted"] == stats["completed"] == 1
+        assert stats["queued"] == stats["active"] == 0
+
+    @pytest.mark.asyncio
+    async def test_queue_wait_measured_when_saturated(self, pool):
+        await asyncio.gather(*(pool.run(time.sleep, 0.05) for _ in range(3)))
+
+        stats = pool.stats()
+        assert stats["queue_wait_ms"]["max"] >= 90
+        assert stats["utilisation"] > 0.5
+
+    @pytest.mark.asyncio
+    async def test_reports_in_flight_work(self, pool):
+        release = threading.Event()
+        running = asyncio.ensure_future(pool.run(release.wait))
+        queued = asyncio.ensure_future(pool.run(lambda: None))
+        await asyncio.sleep(0.05)
+
+        stats = pool.stats()
+        assert (stats["active"], stats["queued"]) == (1, 1)
+
+        release.set()
+        await asyncio.gather(running, queued)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_before_start_leaves_queue(self, pool):
+        release = threading.Event()
+        running = asyncio.ensure_future(pool.run(release.wait))
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pool.run(lambda: None), 0.05)
+
+        assert pool.stats()["queued"] == 0
+        release.set()
+        await running
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate(self, pool):
+        def fail():
+            raise ValueError("bad row")
+
+        with pytest.raises(ValueError):
+            await pool.run(fail)
+        assert pool.stats()["completed"] == 1
+
+
+@pytest.mark.unit
+class TestProcessPools:
+    """Process-wide read, write and CPU pools"""
+
+    @pytest.fixture(autouse=True)
+    def fresh_pools(self):
+        shutdown_executors(wait=True)
+        yield
+        shutdown_executors(wait=True)
+
+    def test_pools_are_separate_singletons(self):
+        assert get_executor(DB_READ) is get_executor(DB_READ)
+        assert len({id(get_executor(n)) for n in (DB_READ, DB_WRITE, CPU)}) == 3
+        with pytest.raises(ValueError):
+            get_executor("default")
+
+    @pytest.mark.asyncio
+    async def test_write_flood_does_not_delay_reads(self):
+        release = threading.Event()
+        workers = get_executor(DB_WRITE).max_workers
+        flood = [asyncio.ensure_future(run_db_write(release.wait)) for _ in range(workers * 4)]
+        await asyncio.sleep(0.05)
+
+        started = time.perf_counter()
+        assert await run_db_read(lambda: "lanes") == "lanes"
+        read_latency = time.perf_counter() - started
+
+        stats = executor_stats()
+        release.set()
+        await asyncio.gather(*flood)
+
+        assert read_latency < 0.05
+        assert stats[DB_WRITE]["queued"] == workers * 3
+        assert stats[DB_READ]["queued"] == 0
@@ -0,0 +1,167 @@
+"""
+Tests for the live timing stream: per-junction state, delta frames,
+frame-rate coalescing and delivery through the WebSocket manager
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.services.event_bus import detection_event, plan_event
+from app.services.live_timing import LIVE_TIMING, LiveTimingTracker
+from tests.test_ws_broadcast import _connect, _drain
+from ws_broadcast import WSManager
+
+
+def _tracker(clock, **kwargs):
+    kwargs.setdefault("keyframe_seconds", 1000)
+    return LiveTimingTracker(max_fps=2, clock=lambda: clock[0], **kwargs)
+
+
+def _observe(tracker, event):
+    tracker.observe_message(json.loads(json.dumps(event.to_message(), default=str)))
+
+
+@pytest.mark.unit
+class TestLiveTimingTracker:
+    """State is diffed into delta frames, one per junction per tick"""
+
+    def test_first_frame_is_keyframe_then_deltas(self):
+        clock = [1000.0]
+        tracker = _tracker(clock)
+        _observe(tracker, detection_event(1, 2, "A"))
+
+        (first,) = tracker.tick()
+        assert (first["frame"], first["keyframe"]) == (1, True)
+        assert first["lane_counts"] == [0, 1, 0, 0]
+
+        _observe(tracker, detection_event(1, 2, "B"))
+        _observe(tracker, detection_event(1, 4, "C"))
+        (delta,) = tracker.tick()
+
+        assert delta["frame"] == 2 and not delta["keyframe"]
+        assert delta["lane_counts"] == [0, 2, 0, 1]
+        assert "green_times" not in delta and "phase_lane" not in delta
+
+    def test_updates_coalesced_per_tick(self):
+        clock = [1000.0]
+        tracker = _tracker(clock)
+        tracker.tick()
+        for i in range(50):
+            _observe(tracker, detection_event(1, 1, f"T{i}"))
+
+        frames = tracker.tick()
+
+        assert len(frames) == 1
+        assert frames[0]["lane_counts"] == [50, 0, 0, 0]
+        assert tracker.tick() == []
+
+    def test_plan_and_phase_countdown(self):
+        clock = [1000.0]
+        tracker = _tracker(clock)
+        _observe(tracker, plan_event(3, [5, 5, 5, 5], [20, 30, 25, 15], 100))
+        (frame,) = tracker.tick()
+        assert (frame["green_times"], frame["cycle_time"]) == ([20, 30, 25, 15], 100)
+        assert (frame["phase_lane"], frame["phase_remaining"]) == (1, 20)
+
+        clock[0] += 0.4
+        assert tracker.tick() == []  # countdown still rounds up to 20
+
+        clock[0] += 24.6
+        (frame,) = tracker.tick()
+        assert set(frame) & {"phase_lane", "phase_remaining", "green_times"} == {
+            "phase_lane", "phase_remaining"
+        }
+        assert (frame["phase_lane"], frame["phase_remaining"]) == (2, 25)
+
+        clock[0] += 85  # 110s in: the plan repeats
+        (frame,) = tracker.tick()
+        assert (frame["phase_lane"], frame["phase_remaining"]) == (1, 10)
+
+    def test_counts_roll_out_of_window(self):
+        clock = [1000.0]
+        tracker = _tracker(clock, window_seconds=60)
+        _observe(tracker, detection_event(1, 1, "A"))
+        tracker.tick()
+
+        clock[0] += 61
+        (frame,) = tracker.tick()
+
+        assert frame["lane_counts"] == [0, 0, 0, 0]
+
+    def test_periodic_keyframe_and_snapshot(self):
+        clock = [1000.0]
+        tracker = _tracker(clock, keyframe_seconds=30)
+        _observe(tracker, detection_event(1, 1, "A"))
+        _observe(tracker, detection_event(2, 1, "B"))
+        tracker.tick()
+
+        clock[0] += 31
+        frames = tracker.tick()
+        assert [(f["junction_id"], f["keyframe"]) for f in frames] == [(1, True), (2, True)]
+        assert "plan_lane_counts" in frames[0]
+
+        (snapshot,) = tracker.snapshots([2, 99])
+        assert (snapshot["junction_id"], snapshot["frame"], snapshot["keyframe"]) == (2, 2, True)
+
+    def test_observe_parses_only_tracked_events(self):
+        tracker = LiveTimingTracker(max_fps=2)
+        tracker.observe("not json", (1, "mqtt_handler", "INFO", ("system_log", 1)))
+        tracker.observe('{"type": "detection"}', (None, None, None, ("detection", None)))
+        tracker.observe(
+            json.dumps({"type": "detection", "junction_id": 1, "lane_number": 3}),
+            (1, "vehicle_detection", "INFO", ("detection", 1)),
+        )
+
+        assert tracker.stats()["events"] == 1
+
+
+@pytest.mark.unit
+class TestLiveTimingDelivery:
+    """Frames go to local subscribers of the junction, never coalesced"""
+
+    @pytest.mark.asyncio
+    async def test_frames_follow_broadcast_events(self):
+        manager = WSManager(max_queue=50, policy="coalesce")
+        tracker = LiveTimingTracker(max_fps=50)
+        manager.add_listener(tracker.observe)
+        (watcher, other) = await _connect(manager, 2)
+        manager.subscribe(watcher, junction_ids=[1], components=[LIVE_TIMING])
+        manager.subscribe(other, junction_ids=[2], components=[LIVE_TIMING])
+        tracker.start(manager.deliver_local)
+
+        await manager.broadcast(detection_event(1, 1, "A").to_message())
+        await asyncio.sleep(0.05)
+        await manager.broadcast(plan_event(1, [1, 0, 0, 0], [30, 20, 20, 20], 90).to_message())
+        await asyncio.sleep(0.05)
+        await tracker.stop()
+        await _drain(manager)
+
+        frames = [json.loads(p) for p in watcher.sent]
+        assert [f["frame"] for f in frames] == list(range(1, len(frames) + 1))
+        assert frames[0]["lane_counts"] == [1, 0, 0, 0]
+        assert any(f.get("green_times") == [30, 20, 20, 20] for f in frames)
+        assert other.sent == []
+        # Frames are derived locally, not replayed after a reconnect
+        assert manager.replay.stats()["buffered"] == 2
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_frame_rate_capped(self):
+        tracker = LiveTimingTracker(max_fps=20)
+        frames = []
+        started = time.monotonic()
+        tracker.start(frames.append)
+
+        for i in range(200):
+            tracker.observe_message({"type": "detection", "junction_id": 1, "lane_number": 1})
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.1)
+        await tracker.stop()
+        elapsed = time.monotonic() - started
+
+        # At most 20 frames a second, instead of one frame per detection
+        assert 2 <= len(frames) <= elapsed * 20 + 1
+        assert frames[-1]["lane_counts"] == [200, 0, 0, 0]
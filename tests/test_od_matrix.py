@@ -0,0 +1,150 @@
+"""
+Tests for the origin-destination matrix job
+Detections come from an in-memory row source or the SQLite backend; output goes to tmp_path
+"""
+
+import csv
+import gzip
+import json
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from app.services.od_matrix import ODMatrixBuilder
+from app.services.sqlite_database_service import SQLiteDatabaseService
+
+DAY = date(2025, 9, 15)
+BASE = datetime(2025, 9, 15, tzinfo=timezone.utc)
+
+
+class RowSource:
+    """Serves rows through the DatabaseService.iter_rows_by_id interface"""
+
+    def __init__(self, rows):
+        self.rows = [{"id": i + 1, **row} for i, row in enumerate(rows)]
+        self.calls = []
+
+    async def iter_rows_by_id(
+        self, table, time_column, start, end, after_id=0, junction_ids=None, columns="*",
+        chunk_size=1000,
+    ):
+        self.calls.append({"table": table, "start": start, "end": end, "columns": columns})
+        selected = [
+            r for r in self.rows
+            if start <= datetime.fromisoformat(r[time_column]) < end
+        ]
+        for i in range(0, len(selected), chunk_size):
+            yield selected[i : i + chunk_size]
+
+
+def _detection(tag, junction_id, minutes):
+    return {
+        "fastag_id": tag,
+        "junction_id": junction_id,
+        "detection_timestamp": (BASE + timedelta(minutes=minutes)).isoformat(),
+    }
+
+
+def _read_matrix(path):
+    with gzip.open(path, "rt") as f:
+        return [
+            (row["slice_start"], int(row["origin_junction_id"]),
+             int(row["destination_junction_id"]), int(row["trips"]))
+            for row in csv.DictReader(f)
+        ]
+
+
+@pytest.mark.unit
+class TestODMatrixBuilder:
+    """Tags are sessionized into trips and counted per slice"""
+
+    @pytest.mark.asyncio
+    async def test_trips_counted_by_origin_destination_and_hour(self, tmp_path):
+        source = RowSource([
+            _detection("A", 1, 60), _detection("A", 2, 65), _detection("A", 3, 70),
+            _detection("B", 1, 61), _detection("B", 3, 80),
+            _detection("C", 2, 130), _detection("C", 1, 140),
+        ])
+        builder = ODMatrixBuilder(source, str(tmp_path), workers=1, read_chunk_size=2)
+
+        result = await builder.build_day(DAY)
+
+        assert _read_matrix(result["file"]) == [
+            ("2025-09-15T01:00:00+00:00", 1, 3, 2),
+            ("2025-09-15T02:00:00+00:00", 2, 1, 1),
+        ]
+        assert (result["trips"], result["tags"], result["cells"]) == (3, 3, 2)
+        assert source.calls[0]["columns"] == "id,junction_id,fastag_id,detection_timestamp"
+
+    @pytest.mark.asyncio
+    async def test_gap_splits_trips_and_single_junction_is_unmatched(self, tmp_path):
+        source = RowSource([
+            _detection("A", 1, 60), _detection("A", 1, 62), _detection("A", 2, 70),
+            _detection("A", 3, 200),  # > 30 min later: a new, single-junction trip
+        ])
+        builder = ODMatrixBuilder(source, str(tmp_path), workers=1)
+
+        result = await builder.build_day(DAY)
+
+        assert _read_matrix(result["file"]) == [("2025-09-15T01:00:00+00:00", 1, 2, 1)]
+        assert (result["trips"], result["unmatched_trips"]) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_trips_over_midnight_counted_once(self, tmp_path):
+        source = RowSource([
+            _detection("A", 1, -10), _detection("A", 2, 5),  # previous day's trip
+            _detection("B", 1, 1435), _detection("B", 2, 1450),  # ends after midnight
+        ])
+        builder = ODMatrixBuilder(source, str(tmp_path), workers=1)
+
+        result = await builder.build_day(DAY)
+
+        assert _read_matrix(result["file"]) == [("2025-09-15T23:00:00+00:00", 1, 2, 1)]
+        assert source.calls[0]["start"] == BASE - timedelta(minutes=30)
+        assert source.calls[0]["end"] == BASE + timedelta(days=1, minutes=30)
+
+    @pytest.mark.asyncio
+    async def test_process_pool_matches_single_worker(self, tmp_path):
+        rows = [
+            _detection(f"T{i}", 1 + (i + hop) % 4, i % 1200 + hop * 3)
+            for i in range(400)
+            for hop in range(3)
+        ]
+
+        single = await ODMatrixBuilder(RowSource(rows), str(tmp_path / "one"), workers=1).build_day(DAY)
+        pooled = await ODMatrixBuilder(RowSource(rows), str(tmp_path / "four"), workers=4).build_day(DAY)
+
+        assert _read_matrix(pooled["file"]) == _read_matrix(single["file"])
+        assert pooled["trips"] == single["trips"] == 400
+        assert not list((tmp_path / "four").glob(".od-spill-*"))
+
+    @pytest.mark.asyncio
+    async def test_summary_written_and_range_builds_each_day(self, tmp_path):
+        source = RowSource([_detection("A", 1, 60), _detection("A", 2, 65)])
+        builder = ODMatrixBuilder(source, str(tmp_path), slice_minutes=15, workers=1)
+
+        results = await builder.build(DAY, DAY + timedelta(days=2))
+
+        assert [r["date"] for r in results] == ["2025-09-15", "2025-09-16"]
+        summary = json.loads((tmp_path / "od_2025-09-15.json").read_text())
+        assert (summary["slice_minutes"], summary["trips"]) == (15, 1)
+        assert _read_matrix(results[1]["file"]) == []
+
+    @pytest.mark.asyncio
+    @pytest.mark.database
+    async def test_reads_from_sqlite_backend(self, tmp_path):
+        db = SQLiteDatabaseService(str(tmp_path / "flextraff.db"))
+        db._conn.executemany(
+            "INSERT INTO traffic_junctions (junction_name, location) VALUES (?, ?)",
+            [("Main Street & Oak Ave", "Mumbai"), ("Central Square Junction", "Bangalore")],
+        )
+        try:
+            await db.log_vehicle_detections_bulk([
+                {"lane_number": 1, "vehicle_type": "car", **_detection("A", 1, 600)},
+                {"lane_number": 1, "vehicle_type": "car", **_detection("A", 2, 610)},
+            ])
+            result = await ODMatrixBuilder(db, str(tmp_path / "od"), workers=1).build_day(DAY)
+        finally:
+            db.close()
+
+        assert _read_matrix(result["file"]) == [("2025-09-15T10:00:00+00:00", 1, 2, 1)]
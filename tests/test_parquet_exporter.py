@@ -0,0 +1,189 @@
+"""
+Tests for the Parquet export job
+The database is replaced by an in-memory row source; files are written to tmp_path
+"""
+
+import json
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from app.services.parquet_exporter import ParquetExporter  # noqa: E402
+
+
+def _detections(count, start_id=1, junctions=(1, 2)):
+    base = datetime(2025, 9, 15, 22, 0, tzinfo=timezone.utc)
+    return [
+        {
+            "id": start_id + i,
+            "junction_id": junctions[i % len(junctions)],
+            "scanner_id": 1,
+            "lane_number": i % 4 + 1,
+            "fastag_id": f"FT{start_id + i:06d}",
+            "detection_timestamp": (base + timedelta(minutes=10 * i)).isoformat(),
+            "vehicle_type": "car",
+            "processing_status": "processed",
+            "created_at": (base + timedelta(minutes=10 * i)).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+class RowSource:
+    """Serves rows through the DatabaseService.iter_rows_by_id interface"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    async def iter_rows_by_id(
+        self, table, time_column, start, end, after_id=0, junction_ids=None, chunk_size=1000
+    ):
+        self.calls.append({"table": table, "after_id": after_id})
+        selected = [
+            r
+            for r in self.rows
+            if r["id"] > after_id
+            and start <= datetime.fromisoformat(r[time_column]) < end
+            and (not junction_ids or r["junction_id"] in junction_ids)
+        ]
+        for i in range(0, len(selected), chunk_size):
+            yield selected[i : i + chunk_size]
+
+
+def _read_rows(root):
+    return sorted(
+        (row for path in root.rglob("*.parquet") for row in pq.read_table(path).to_pylist()),
+        key=lambda r: r["id"],
+    )
+
+
+@pytest.mark.unit
+class TestParquetExporter:
+    """Chunked, partitioned and resumable export"""
+
+    @pytest.mark.asyncio
+    async def test_writes_date_and_junction_partitions(self, tmp_path):
+        source = RowSource(_detections(24))
+        exporter = ParquetExporter(source, str(tmp_path), rows_per_file=10, read_chunk_size=4)
+
+        result = await exporter.export_table(
+            "vehicle_detections", date(2025, 9, 15), date(2025, 9, 17)
+        )
+
+        assert result["rows"] == 24
+        assert result["last_id"] == 24
+        partitions = {p.parent.relative_to(tmp_path / "vehicle_detections").as_posix()
+                      for p in tmp_path.rglob("*.parquet")}
+        assert partitions == {
+            "date=2025-09-15/junction_id=1",
+            "date=2025-09-15/junction_id=2",
+            "date=2025-09-16/junction_id=1",
+            "date=2025-09-16/junction_id=2",
+        }
+
+        rows = _read_rows(tmp_path)
+        assert [r["id"] for r in rows] == list(range(1, 25))
+        assert rows[0]["detection_timestamp"] == datetime(2025, 9, 15, 22, 0, tzinfo=timezone.utc)
+
+    @pytest.mark.asyncio
+    async def test_junction_filter_and_range(self, tmp_path):
+        source = RowSource(_detections(24))
+        exporter = ParquetExporter(source, str(tmp_path))
+
+        result = await exporter.export_table(
+            "vehicle_detections", date(2025, 9, 15), date(2025, 9, 16), junction_ids=[2]
+        )
+
+        rows = _read_rows(tmp_path)
+        assert result["rows"] == len(rows) == 6
+        assert {r["junction_id"] for r in rows} == {2}
+
+    @pytest.mark.asyncio
+    async def test_incremental_resumes_from_last_id(self, tmp_path):
+        source = RowSource(_detections(10))
+        exporter = ParquetExporter(source, str(tmp_path), rows_per_file=4)
+        await exporter.export_table(
+            "vehicle_detections", date(2025, 9, 15), date(2025, 9, 17), incremental=True
+        )
+
+        state = json.loads((tmp_path / "_export_state.json").read_text())
+        assert state["vehicle_detections:2025-09-15..2025-09-17"]["last_id"] == 10
+
+        source.rows += _detections(5, start_id=11)
+        result = await exporter.export_table(
+            "vehicle_detections", date(2025, 9, 15), date(2025, 9, 17), incremental=True
+        )
+
+        assert source.calls[-1]["after_id"] == 10
+        assert result["rows"] == 5
+        assert [r["id"] for r in _read_rows(tmp_path)] == list(range(1, 16))
+
+    @pytest.mark.asyncio
+    async def test_state_kept_per_junction_selection(self, tmp_path):
+        source = RowSource(_detections(10))
+        exporter = ParquetExporter(source, str(tmp_path), rows_per_file=4)
+        period = (date(2025, 9, 15), date(2025, 9, 17))
+
+        await exporter.export_table("vehicle_detections", *period)
+        assert not (tmp_path / "_export_state.json").exists()
+
+        await exporter.export_table("vehicle_detections", *period, junction_ids=[2], incremental=True)
+        result = await exporter.export_table("vehicle_detections", *period, incremental=True)
+
+        state = json.loads((tmp_path / "_export_state.json").read_text())
+        key = ParquetExporter.state_key("vehicle_detections", *period)
+        assert state[f"{key}:junction_id=2"]["last_id"] == 10
+        assert source.calls[-1]["after_id"] == 0
+        assert (result["rows"], state[key]["last_id"]) == (10, 10)
+        assert [r["id"] for r in _read_rows(tmp_path)] == list(range(1, 11))
+
+    @pytest.mark.asyncio
+    async def test_state_kept_per_date_range(self, tmp_path):
+        """An earlier range exported after a later one doesn't resume past it"""
+        source = RowSource(_detections(20))
+        exporter = ParquetExporter(source, str(tmp_path))
+
+        later = await exporter.export_table(
+            "vehicle_detections", date(2025, 9, 16), date(2025, 9, 17), incremental=True
+        )
+        result = await exporter.export_table(
+            "vehicle_detections", date(2025, 9, 15), date(2025, 9, 16), incremental=True
+        )
+
+        assert (later["rows"], later["last_id"]) == (8, 20)
+        assert (source.calls[-1]["after_id"], result["rows"]) == (0, 12)
+
+    @pytest.mark.asyncio
+    async def test_rerun_overwrites_instead_of_duplicating(self, tmp_path):
+        source = RowSource(_detections(8))
+        exporter = ParquetExporter(source, str(tmp_path), rows_per_file=3)
+
+        for _ in range(2):
+            await exporter.export_table("vehicle_detections", date(2025, 9, 15), date(2025, 9, 17))
+
+        assert [r["id"] for r in _read_rows(tmp_path)] == list(range(1, 9))
+        assert not list(tmp_path.rglob("*.tmp"))
+
+    @pytest.mark.asyncio
+    async def test_rerun_with_new_rows_replaces_parts(self, tmp_path):
+        """File boundaries move when rows arrive; a full rerun still has each row once"""
+        source = RowSource(_detections(8))
+        exporter = ParquetExporter(source, str(tmp_path), rows_per_file=3)
+        period = (date(2025, 9, 15), date(2025, 9, 17))
+        await exporter.export_table("vehicle_detections", *period)
+
+        source.rows += _detections(4, start_id=9)
+        exporter.rows_per_file = 5
+        await exporter.export_table("vehicle_detections", *period)
+
+        assert [r["id"] for r in _read_rows(tmp_path)] == list(range(1, 13))
+
+    @pytest.mark.asyncio
+    async def test_rejects_unknown_table(self, tmp_path):
+        exporter = ParquetExporter(RowSource([]), str(tmp_path))
+
+        with pytest.raises(ValueError):
+            await exporter.export_table("users", date(2025, 9, 15), date(2025, 9, 16))
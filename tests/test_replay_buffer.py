@@ -0,0 +1,132 @@
+"""
+Tests for the per-junction replay buffer and WebSocket resume
+"""
+
+import json
+
+import pytest
+
+from app.services.replay_buffer import ReplayBuffer, stamp_sequence
+from tests.test_ws_broadcast import ADMIN, FakeWebSocket, _connect, _drain
+from ws_broadcast import WSManager
+
+
+def _record(buffer, junction_id, message, component=None, level="INFO"):
+    payload = json.dumps({"junction_id": junction_id, "message": message})
+    return buffer.record(payload, junction_id, component, level)
+
+
+@pytest.mark.unit
+class TestReplayBuffer:
+    """Sequenced, bounded rings per junction"""
+
+    def test_stamp_sequence(self):
+        assert json.loads(stamp_sequence('{"a": 1}', 7)) == {"sequence": 7, "a": 1}
+        assert json.loads(stamp_sequence("{}", 1)) == {"sequence": 1}
+        assert stamp_sequence("plain text", 1) is None
+
+    def test_since_merges_junction_and_system_rings(self):
+        buffer = ReplayBuffer(size=10)
+        for junction_id, message in [(1, "a"), (2, "b"), (None, "sys"), (1, "c")]:
+            _record(buffer, junction_id, message)
+
+        entries, complete = buffer.since(1, junction_ids=[1])
+
+        assert [json.loads(e[1])["message"] for e in entries] == ["sys", "c"]
+        assert [e[0] for e in entries] == [3, 4]
+        assert complete
+
+    def test_memory_capped_per_junction(self):
+        buffer = ReplayBuffer(size=3)
+        for i in range(10):
+            _record(buffer, 1, f"m{i}")
+        _record(buffer, 2, "other")
+
+        assert buffer.stats()["buffered"] == 4
+        entries, complete = buffer.since(0, junction_ids=[1])
+        assert [e[0] for e in entries] == [8, 9, 10]
+        assert not complete
+        assert buffer.since(7, junction_ids=[1])[1]
+        # Junction 2's ring never evicted anything
+        assert buffer.since(0, junction_ids=[2])[1]
+
+    def test_foreign_stream_replays_everything_incomplete(self):
+        buffer = ReplayBuffer(size=10)
+        for i in range(3):
+            _record(buffer, 1, f"m{i}")
+
+        entries, complete = buffer.since(2, stream="another-worker")
+        assert (len(entries), complete) == (3, False)
+        # A cursor ahead of this buffer comes from before a restart
+        assert buffer.since(99)[1] is False
+
+    def test_disabled(self):
+        buffer = ReplayBuffer(size=0)
+        assert _record(buffer, 1, "x") == '{"junction_id": 1, "message": "x"}'
+        assert buffer.since(0) == ([], True)
+
+
+@pytest.mark.unit
+class TestWebSocketResume:
+    """A reconnecting client gets what it missed, then live messages"""
+
+    @pytest.mark.asyncio
+    async def test_reconnect_loses_nothing(self):
+        manager = WSManager(max_queue=10, replay_size=100)
+        (first,) = await _connect(manager, 1)
+        await manager.broadcast({"junction_id": 1, "seq": 0})
+        await _drain(manager)
+        last_seen = json.loads(first.sent[-1])["sequence"]
+        manager.disconnect(first)
+
+        for i in range(1, 4):
+            await manager.broadcast({"junction_id": 1, "seq": i})
+        second = FakeWebSocket()
+        await manager.connect(second, user=ADMIN, since=last_seen, stream=manager.replay.stream)
+        await manager.broadcast({"junction_id": 1, "seq": 4})
+        await _drain(manager)
+
+        messages = [json.loads(p) for p in second.sent]
+        assert [m.get("seq") for m in messages] == [1, 2, 3, None, 4]
+        assert messages[3] == {
+            "type": "replay",
+            "stream": manager.replay.stream,
+            "since": last_seen,
+            "replayed": 3,
+            "last_sequence": last_seen + 3,
+            "complete": True,
+        }
+        assert [m["sequence"] for m in messages if "seq" in m] == list(range(2, 6))
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_replay_respects_subscription_and_access(self):
+        manager = WSManager(max_queue=10, replay_size=100)
+        await manager.broadcast({"junction_id": 1, "log_level": "ERROR", "message": "j1"})
+        await manager.broadcast({"junction_id": 2, "log_level": "ERROR", "message": "j2"})
+        await manager.broadcast({"junction_id": 2, "log_level": "INFO", "message": "info"})
+
+        ws = FakeWebSocket()
+        operator = {"id": 7, "role": "OPERATOR", "token_data": {"junction_ids": [2]}}
+        await manager.connect(ws, user=operator)
+        manager.subscribe(ws, levels=["ERROR"])
+        summary = manager.replay_since(ws, 0)
+        await _drain(manager)
+
+        assert [json.loads(p).get("message") for p in ws.sent] == ["j2", None]
+        assert summary["replayed"] == 1
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_replay_larger_than_send_queue(self):
+        manager = WSManager(max_queue=4, replay_size=50)
+        for i in range(20):
+            await manager.broadcast({"junction_id": 1, "seq": i})
+
+        ws = FakeWebSocket()
+        await manager.connect(ws, user=ADMIN, since=0, stream=manager.replay.stream)
+        await _drain(manager)
+
+        assert [json.loads(p).get("seq") for p in ws.sent][:-1] == list(range(20))
+        assert manager.stats()["replay"]["buffered"] == 20
+        await manager.close_all()
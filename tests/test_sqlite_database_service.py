@@ -0,0 +1,300 @@
+"""
+Tests for the embedded SQLite database backend
+Runs the real schema (app/database/sqlite_schema.sql) in a temporary file
+"""
+
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from app.services.database_service import DatabaseService, create_database_service
+from app.services.sqlite_database_service import SQLiteDatabaseService, to_db_timestamp
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    service = SQLiteDatabaseService(str(tmp_path / "flextraff.db"))
+    service._conn.executemany(
+        "INSERT INTO traffic_junctions (junction_name, location) VALUES (?, ?)",
+        [("Main Street & Oak Ave", "Mumbai"), ("Central Square Junction", "Bangalore")],
+    )
+    yield service
+    service.close()
+
+
+def _ts(hour, minute=0, day=15):
+    return datetime(2025, 9, day, hour, minute, tzinfo=timezone.utc).isoformat()
+
+
+@pytest.mark.unit
+@pytest.mark.database
+class TestSQLiteBackend:
+    """The SQLite backend honours the DatabaseService contract"""
+
+    def test_timestamps_are_fixed_width_utc(self):
+        assert to_db_timestamp("2025-09-15T10:00:00Z") == "2025-09-15T10:00:00.000000+00:00"
+        assert to_db_timestamp(datetime(2025, 9, 15, 15, 30, tzinfo=timezone(timedelta(hours=5, minutes=30)))) == (
+            "2025-09-15T10:00:00.000000+00:00"
+        )
+        assert to_db_timestamp(date(2025, 9, 15)) == "2025-09-15T00:00:00.000000+00:00"
+
+    @pytest.mark.asyncio
+    async def test_health_and_junctions(self, sqlite_db):
+        health = await sqlite_db.health_check()
+        junctions = await sqlite_db.get_all_junctions()
+
+        assert health["database_connected"] is True
+        assert [j["junction_name"] for j in junctions] == [
+            "Central Square Junction",
+            "Main Street & Oak Ave",
+        ]
+        assert junctions[0]["algorithm_config"]["base_cycle_time"] == 120
+
+    @pytest.mark.asyncio
+    async def test_detections_feed_rollups(self, sqlite_db, monkeypatch):
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "DETECTION_RETENTION_DAYS", 36500)
+        await sqlite_db.log_vehicle_detections_bulk(
+            [
+                {"junction_id": 1, "lane_number": 1, "fastag_id": "A", "vehicle_type": "car",
+                 "detection_timestamp": _ts(10, 5)},
+                {"junction_id": 1, "lane_number": 2, "fastag_id": "B", "vehicle_type": "truck",
+                 "detection_timestamp": _ts(10, 40)},
+                {"junction_id": 1, "lane_number": 1, "fastag_id": "C", "vehicle_type": "car",
+                 "detection_timestamp": _ts(11, 15)},
+                {"junction_id": 2, "lane_number": 3, "fastag_id": "D", "vehicle_type": "car",
+                 "detection_timestamp": _ts(9, 0, day=16)},
+            ]
+        )
+
+        assert await sqlite_db.get_vehicles_count_by_date(1, date(2025, 9, 15)) == 3
+        assert await sqlite_db.get_vehicle_totals_by_date(date(2025, 9, 15)) == {1: 3}
+        assert await sqlite_db.get_vehicle_totals_by_date_range(
+            date(2025, 9, 15), date(2025, 9, 16)
+        ) == {"2025-09-15": {1: 3}, "2025-09-16": {2: 1}}
+
+        hourly = await sqlite_db.get_hourly_vehicle_counts(1, date(2025, 9, 15))
+        assert [(h["bucket_hour"][11:13], h["vehicle_count"]) for h in hourly] == [
+            ("10", 1),
+            ("10", 1),
+            ("11", 1),
+        ]
+
+        # Rebuilding from raw detections gives the same counts
+        await sqlite_db.backfill_vehicle_count_rollups(date(2025, 9, 15), date(2025, 9, 17))
+        assert await sqlite_db.get_vehicles_count_by_date(1, date(2025, 9, 15)) == 3
+
+    @pytest.mark.asyncio
+    async def test_backfill_keeps_rollups_of_retired_detections(self, sqlite_db, monkeypatch):
+        from app.config import settings
+
+        await sqlite_db.log_vehicle_detections_bulk(
+            [{"junction_id": 1, "lane_number": 1, "fastag_id": "A", "detection_timestamp": _ts(10)}]
+        )
+        await sqlite_db.apply_partition_retention("vehicle_detections", 30)
+        monkeypatch.setattr(settings, "DETECTION_RETENTION_DAYS", 30)
+
+        with pytest.raises(ValueError):
+            await sqlite_db.backfill_vehicle_count_rollups(date(2025, 9, 15), date.today())
+        assert await sqlite_db.get_vehicles_count_by_date(1, date(2025, 9, 15)) == 1
+
+    @pytest.mark.asyncio
+    async def test_bulk_insert_is_atomic(self, sqlite_db):
+        with pytest.raises(Exception):
+            await sqlite_db.log_vehicle_detections_bulk(
+                [
+                    {"junction_id": 1, "lane_number": 1, "fastag_id": "A"},
+                    {"junction_id": 1, "lane_number": 1, "fastag_id": None},
+                ]
+            )
+
+        rows = sqlite_db._fetch_all("SELECT count(*) AS n FROM vehicle_detections")
+        assert rows[0]["n"] == 0
+
+    @pytest.mark.asyncio
+    async def test_cycles_and_lane_counts(self, sqlite_db):
+        for i in range(3):
+            await sqlite_db.log_vehicle_detection(1, i % 2 + 1, f"FT{i}")
+        cycle = await sqlite_db.log_traffic_cycle(1, [2, 1, 0, 0], [40, 30, 15, 15], 100, 3)
+
+        counts = await sqlite_db.get_current_lane_counts(1)
+        current = await sqlite_db.get_current_traffic_cycle(1)
+
+        assert [c["count"] for c in counts] == [2, 1, 0, 0]
+        assert current["id"] == cycle["id"]
+        assert current["total_vehicles_detected"] == 3
+
+    @pytest.mark.asyncio
+    async def test_history_joins_active_cycle_and_pages(self, sqlite_db):
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        sqlite_db._insert_many(
+            "traffic_cycles",
+            [
+                {"junction_id": 1, "cycle_start_time": to_db_timestamp(now - timedelta(minutes=30)),
+                 "total_cycle_time": 120, "lane_1_green_time": 30, "lane_2_green_time": 30,
+                 "lane_3_green_time": 30, "lane_4_green_time": 30, "total_vehicles_detected": 0},
+                {"junction_id": 1, "cycle_start_time": to_db_timestamp(now - timedelta(minutes=10)),
+                 "total_cycle_time": 100, "lane_1_green_time": 40, "lane_2_green_time": 20,
+                 "lane_3_green_time": 20, "lane_4_green_time": 20, "total_vehicles_detected": 0},
+            ],
+        )
+        await sqlite_db.log_vehicle_detections_bulk(
+            [
+                {"junction_id": 1, "lane_number": 1, "fastag_id": f"FT{m}",
+                 "detection_timestamp": (now - timedelta(minutes=m)).isoformat()}
+                for m in (40, 20, 5)
+            ]
+        )
+
+        page = await sqlite_db.get_recent_detections_with_signals(1, limit=2)
+        assert [(r["fastag_id"], r["lane_green_time"]) for r in page] == [("FT5", 40), ("FT20", 30)]
+
+        last = page[-1]
+        older = await sqlite_db.get_recent_detections_with_signals(
+            1, limit=2, before_timestamp=last["detection_timestamp"], before_id=last["id"]
+        )
+        assert [(r["fastag_id"], r["cycle_id"]) for r in older] == [("FT40", None)]
+
+    @pytest.mark.asyncio
+    async def test_cycle_history_pages_projects_and_downsamples(self, sqlite_db):
+        sqlite_db._insert_many(
+            "traffic_cycles",
+            [
+                {"junction_id": 1, "cycle_start_time": _ts(10, m),
+                 "total_cycle_time": 100 + m, "lane_1_green_time": 25, "lane_2_green_time": 25,
+                 "lane_3_green_time": 25, "lane_4_green_time": 25, "total_vehicles_detected": m}
+                for m in range(0, 60, 10)
+            ]
+            + [
+                {"junction_id": 2, "cycle_start_time": _ts(10, 5), "total_cycle_time": 90,
+                 "lane_1_green_time": 20, "lane_2_green_time": 20, "lane_3_green_time": 20,
+                 "lane_4_green_time": 30, "total_vehicles_detected": 0}
+            ],
+        )
+
+        page = await sqlite_db.get_traffic_cycle_history(
+            1, start_time=_ts(10, 10), end_time=_ts(10, 50), limit=2,
+            fields=["total_cycle_time"],
+        )
+        assert page == [
+            {"id": 5, "cycle_start_time": to_db_timestamp(_ts(10, 40)), "total_cycle_time": 140},
+            {"id": 4, "cycle_start_time": to_db_timestamp(_ts(10, 30)), "total_cycle_time": 130},
+        ]
+
+        rest = await sqlite_db.get_traffic_cycle_history(
+            1, start_time=_ts(10, 10), end_time=_ts(10, 50),
+            before_timestamp=page[-1]["cycle_start_time"], before_id=page[-1]["id"],
+        )
+        assert [c["total_cycle_time"] for c in rest] == [120, 110]
+
+        # 20-minute buckets: [10:00, 10:20) [10:20, 10:40) [10:40, 11:00)
+        buckets = await sqlite_db.get_traffic_cycle_history(1, bucket_seconds=1200, limit=2)
+        assert [c["total_cycle_time"] for c in buckets] == [150, 130]
+        older = await sqlite_db.get_traffic_cycle_history(
+            1, bucket_seconds=1200, before_timestamp=buckets[-1]["cycle_start_time"]
+        )
+        assert [c["total_cycle_time"] for c in older] == [110]
+
+    @pytest.mark.asyncio
+    async def test_cycle_history_rejects_unknown_fields(self, sqlite_db):
+        with pytest.raises(ValueError):
+            await sqlite_db.get_traffic_cycle_history(1, fields=["id; DROP TABLE users"])
+
+    @pytest.mark.asyncio
+    async def test_iter_rows_by_id(self, sqlite_db):
+        await sqlite_db.log_vehicle_detections_bulk(
+            [
+                {"junction_id": 1 + i % 2, "lane_number": 1, "fastag_id": f"FT{i}",
+                 "detection_timestamp": _ts(10, i)}
+                for i in range(7)
+            ]
+        )
+
+        chunks = [
+            chunk
+            async for chunk in sqlite_db.iter_rows_by_id(
+                "vehicle_detections",
+                "detection_timestamp",
+                datetime(2025, 9, 15),
+                datetime(2025, 9, 16),
+                after_id=1,
+                junction_ids=[1],
+                chunk_size=2,
+            )
+        ]
+
+        assert [[r["id"] for r in c] for c in chunks] == [[3, 5], [7]]
+
+    @pytest.mark.asyncio
+    async def test_retention_downsamples_logs(self, sqlite_db):
+        old = to_db_timestamp(datetime.now(timezone.utc) - timedelta(days=40))
+        sqlite_db._insert_many(
+            "system_logs",
+            [
+                {"log_level": "INFO", "component": "startup", "message": "m", "timestamp": old},
+                {"log_level": "INFO", "component": "startup", "message": "m", "timestamp": old},
+            ],
+        )
+        await sqlite_db.log_system_event("recent")
+
+        retired = await sqlite_db.apply_partition_retention("system_logs", 30, archive=True)
+
+        assert retired[0]["action"] == "archived"
+        remaining = sqlite_db._fetch_all("SELECT message FROM system_logs")
+        counts = sqlite_db._fetch_all("SELECT log_count FROM system_log_counts_daily")
+        archived = sqlite_db._fetch_all("SELECT count(*) AS n FROM archive_system_logs")
+        assert [r["message"] for r in remaining] == ["recent"]
+        assert counts == [{"log_count": 2}]
+        assert archived[0]["n"] == 2
+        assert await sqlite_db.apply_partition_retention("system_logs", 30) == []
+
+
+@pytest.mark.unit
+class TestBackendSelection:
+    """create_database_service picks the backend from settings"""
+
+    def test_auto_without_credentials_uses_sqlite(self, tmp_path, monkeypatch):
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "DATABASE_BACKEND", "auto")
+        monkeypatch.setattr(settings, "LOCAL_DATABASE_PATH", str(tmp_path / "edge.db"))
+        monkeypatch.delenv("SUPABASE_URL", raising=False)
+        monkeypatch.delenv("SUPABASE_SERVICE_KEY", raising=False)
+
+        service = create_database_service()
+
+        assert isinstance(service, SQLiteDatabaseService)
+        assert (tmp_path / "edge.db").exists()
+        service.close()
+
+    def test_auto_without_credentials_refused_in_production(self, tmp_path, monkeypatch):
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "DATABASE_BACKEND", "auto")
+        monkeypatch.setattr(settings, "ENVIRONMENT", "production")
+        monkeypatch.setattr(settings, "LOCAL_DATABASE_PATH", str(tmp_path / "edge.db"))
+        monkeypatch.delenv("SUPABASE_URL", raising=False)
+        monkeypatch.delenv("SUPABASE_SERVICE_KEY", raising=False)
+
+        with pytest.raises(RuntimeError):
+            create_database_service()
+        assert not (tmp_path / "edge.db").exists()
+
+    def test_explicit_supabase(self, monkeypatch):
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "DATABASE_BACKEND", "supabase")
+        monkeypatch.delenv("SUPABASE_URL", raising=False)
+
+        service = create_database_service()
+
+        assert type(service) is DatabaseService
+
+    def test_unknown_backend(self, monkeypatch):
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "DATABASE_BACKEND", "oracle")
+
+        with pytest.raises(ValueError):
+            create_database_service()
@@ -0,0 +1,141 @@
+"""
+Tests for the SSE transport: event framing, heartbeats, Last-Event-ID
+resume and sharing the WebSocket fan-out
+"""
+
+import asyncio
+import json
+
+import pytest
+from starlette.requests import Request
+
+from app.services.sse import SSEConnection, parse_event_id, sse_frame
+from tests.test_ws_broadcast import ADMIN, FakeWebSocket, _drain
+from ws_broadcast import WSManager
+
+
+async def _take(frames, count, timeout=2.0):
+    """The next `count` frames of an SSE body"""
+    taken = []
+    async with asyncio.timeout(timeout):
+        while len(taken) < count:
+            taken.append(await anext(frames))
+    return taken
+
+
+def _data(frame):
+    return json.loads(frame.split("data: ", 1)[1])
+
+
+def _request(last_event_id=None):
+    headers = [(b"last-event-id", last_event_id.encode())] if last_event_id else []
+    return Request({
+        "type": "http", "method": "GET", "path": "/sse/logs", "headers": headers,
+        "query_string": b"", "client": ("127.0.0.1", 5000),
+    })
+
+
+@pytest.mark.unit
+class TestSSEFraming:
+    """Sequenced messages carry a resumable id; framing is shared"""
+
+    def test_frame_with_and_without_id(self):
+        assert sse_frame('{"sequence": 12, "a": 1}', "abc") == (
+            'id: abc-12\ndata: {"sequence": 12, "a": 1}\n\n'
+        )
+        assert sse_frame('{"type": "pong"}', "abc") == 'data: {"type": "pong"}\n\n'
+        assert sse_frame("two\nlines", "abc") == "data: two\ndata: lines\n\n"
+
+    def test_parse_event_id(self):
+        assert parse_event_id("3f9c2a7b1e04-1041") == ("3f9c2a7b1e04", 1041)
+        assert parse_event_id("garbage") is None
+        assert parse_event_id("abc-") is None
+        assert parse_event_id(None) is None
+
+
+@pytest.mark.unit
+class TestSSEConnection:
+    """SSE clients are WSManager clients with a streaming body"""
+
+    @pytest.mark.asyncio
+    async def test_one_serialisation_for_ws_and_sse_clients(self):
+        manager = WSManager(max_queue=10)
+        first = SSEConnection(manager.replay.stream, heartbeat_seconds=5)
+        second = SSEConnection(manager.replay.stream, heartbeat_seconds=5)
+        ws = FakeWebSocket()
+        for client in (first, second, ws):
+            await manager.connect(client, user=ADMIN)
+        body_one, body_two = first.frames(), second.frames()
+
+        assert await manager.broadcast({"junction_id": 1, "message": "hi"}) == 3
+        (_, event_one), (_, event_two) = await _take(body_one, 2), await _take(body_two, 2)
+        await _drain(manager)
+
+        assert event_one is event_two
+        assert event_one.startswith(f"id: {manager.replay.stream}-1\n")
+        assert event_one == f"id: {manager.replay.stream}-1\ndata: {ws.sent[0]}\n\n"
+        assert {c["transport"] for c in manager.client_stats()} == {"sse", "websocket"}
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_heartbeat_while_idle(self):
+        manager = WSManager(max_queue=10)
+        connection = SSEConnection(manager.replay.stream, heartbeat_seconds=0.02)
+        await manager.connect(connection, user=ADMIN)
+        body = connection.frames(lambda: connection in manager.clients)
+
+        assert await _take(body, 3) == ["retry: 3000\n\n", ": heartbeat\n\n", ": heartbeat\n\n"]
+
+        manager.disconnect(connection)
+        with pytest.raises(StopAsyncIteration):
+            await _take(body, 1, timeout=1)
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_stalled_reader_dropped_by_send_timeout(self):
+        manager = WSManager(max_queue=10, send_timeout=0.05)
+        connection = SSEConnection(manager.replay.stream, heartbeat_seconds=5)
+        await manager.connect(connection, user=ADMIN)
+
+        # Nobody reads the body: one payload fits the hand-off, the next times out
+        for i in range(3):
+            await manager.broadcast({"message": i})
+        await asyncio.sleep(0.15)
+
+        assert connection not in manager.clients
+        await manager.close_all()
+
+
+@pytest.mark.unit
+class TestSSEEndpoint:
+    """/sse/logs subscribes from query parameters and resumes from Last-Event-ID"""
+
+    @pytest.mark.asyncio
+    async def test_resume_from_last_event_id(self, monkeypatch):
+        import main
+
+        manager = WSManager(max_queue=10)
+        monkeypatch.setattr(main, "manager", manager)
+        for i in range(4):
+            await manager.broadcast({"junction_id": 1, "message": f"m{i}"})
+        await manager.broadcast({"junction_id": 2, "message": "other junction"})
+
+        response = await main.sse_logs_endpoint(
+            _request(f"{manager.replay.stream}-2"), user=ADMIN, junction_ids=[1],
+            components=None, levels=None, since=None, stream=None,
+        )
+        body = response.body_iterator
+        retry, ack, third, fourth, summary = await _take(body, 5)
+        await manager.broadcast({"junction_id": 1, "message": "live"})
+        (live,) = await _take(body, 1)
+
+        assert response.media_type == "text/event-stream"
+        assert retry.startswith("retry:")
+        assert _data(ack)["junction_ids"] == [1]
+        assert [_data(f)["message"] for f in (third, fourth, live)] == ["m2", "m3", "live"]
+        assert third.startswith(f"id: {manager.replay.stream}-3\n")
+        assert (_data(summary)["type"], _data(summary)["complete"]) == ("replay", True)
+
+        await body.aclose()
+        assert manager.clients == {}
+        await manager.close_all()
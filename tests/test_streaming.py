@@ -0,0 +1,77 @@
+"""
+Tests for the NDJSON / CSV streaming helpers
+"""
+
+import pytest
+
+from app.utils.streaming import abort_on_error, csv_lines, iter_keyset_pages, ndjson_lines
+
+
+async def _rows(rows):
+    for row in rows:
+        yield row
+
+
+async def _failing_rows():
+    yield {"id": 1}
+    raise ConnectionError("database unreachable")
+
+
+async def _collect(chunks):
+    return b"".join([chunk async for chunk in chunks]).decode()
+
+
+@pytest.mark.unit
+class TestStreamingHelpers:
+    """Encoders and keyset paging"""
+
+    @pytest.mark.asyncio
+    async def test_keyset_pages_until_short_page(self):
+        data = list(range(7))
+        cursors = []
+
+        async def fetch_page(last):
+            cursors.append(last)
+            start = 0 if last is None else last["n"] + 1
+            return [{"n": n} for n in data[start:start + 3]]
+
+        rows = [row["n"] async for row in iter_keyset_pages(fetch_page, 3)]
+
+        assert rows == data
+        assert cursors == [None, {"n": 2}, {"n": 5}]
+
+    @pytest.mark.asyncio
+    async def test_ndjson_one_object_per_line(self):
+        body = await _collect(ndjson_lines(_rows([{"a": 1}, {"a": 2, "b": [1]}])))
+
+        assert body == '{"a": 1}\n{"a": 2, "b": [1]}\n'
+
+    @pytest.mark.asyncio
+    async def test_csv_header_first_and_nested_values_as_json(self):
+        chunks = csv_lines(_rows([{"hour": "10", "lanes": {"1": 4}}]), ["hour", "lanes"])
+
+        assert await chunks.__anext__() == b"hour,lanes\r\n"
+        assert await chunks.__anext__() == b'10,"{""1"":4}"\r\n'
+
+    @pytest.mark.asyncio
+    async def test_csv_header_from_first_row(self):
+        body = await _collect(csv_lines(_rows([{"id": 1, "x": "a"}, {"id": 2, "x": "b"}])))
+
+        assert body.splitlines() == ["id,x", "1,a", "2,b"]
+        assert await _collect(csv_lines(_rows([]))) == ""
+
+    @pytest.mark.asyncio
+    async def test_failure_mid_stream_is_raised(self):
+        ndjson, csv_chunks = [], []
+
+        with pytest.raises(ConnectionError):
+            async for chunk in abort_on_error(ndjson_lines(_failing_rows()), "ndjson"):
+                ndjson.append(chunk)
+        with pytest.raises(ConnectionError):
+            async for chunk in abort_on_error(csv_lines(_failing_rows(), ["id"]), "csv"):
+                csv_chunks.append(chunk)
+
+        assert b"".join(ndjson).decode().splitlines() == [
+            '{"id": 1}', '{"error": "Export aborted: database unreachable"}'
+        ]
+        assert b"".join(csv_chunks) == b"id\r\n1\r\n"
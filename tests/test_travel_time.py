@@ -0,0 +1,218 @@
+"""
+Tests for junction-to-junction travel times
+"""
+
+import random
+from datetime import datetime, timezone
+
+import pytest
+
+from app.services.travel_time import (
+    QuantileSketch,
+    RollingQuantileSketch,
+    TravelTimeEngine,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def engine(clock):
+    return TravelTimeEngine(
+        max_travel_seconds=600,
+        window_seconds=900,
+        baseline_seconds=3600,
+        slice_seconds=300,
+        max_tags=1000,
+        clock=clock,
+    )
+
+
+class FakeDatabase:
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+        self.calls = []
+
+    async def iter_rows_by_id(self, table, time_column, start, end, **kwargs):
+        self.calls.append((table, time_column, kwargs))
+        for chunk in self.chunks:
+            yield chunk
+        if self.error:
+            raise self.error
+
+
+@pytest.mark.unit
+class TestQuantileSketch:
+    """Quantiles are within the relative accuracy"""
+
+    def test_quantiles_within_relative_accuracy(self):
+        rng = random.Random(7)
+        values = sorted(rng.uniform(10, 2000) for _ in range(5000))
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for value in values:
+            sketch.add(value)
+
+        for q in (0.1, 0.5, 0.9, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            assert sketch.quantile(q) == pytest.approx(exact, rel=0.011)
+        assert len(sketch.bins) < 500
+
+    def test_merge_matches_single_sketch(self):
+        a, b, both = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for value in range(1, 101):
+            (a if value % 2 else b).add(value)
+            both.add(value)
+        a.merge(b)
+
+        assert a.count == 100
+        assert a.bins == both.bins
+
+    def test_empty_sketch_has_no_quantile(self):
+        assert QuantileSketch().quantile(0.5) is None
+
+    def test_rolling_sketch_drops_old_slices(self):
+        rolling = RollingQuantileSketch(slice_seconds=60, slices=2)
+        rolling.add(10, 0)
+        rolling.add(20, 60)
+        rolling.add(30, 120)
+
+        assert rolling.window(0).count == 2
+        assert rolling.window(120).quantile(0.5) == pytest.approx(30, rel=0.015)
+
+
+@pytest.mark.unit
+class TestTravelTimeEngine:
+    """Detections of the same tag at successive junctions become samples"""
+
+    def test_joins_tag_across_junctions(self, engine, clock):
+        assert engine.observe(1, "FT1", clock.now) is None
+        assert engine.observe(2, "FT1", clock.now + 90) == 90
+
+        (link,) = engine.links()
+        assert (link["from_junction_id"], link["to_junction_id"]) == (1, 2)
+        assert link["samples"] == 1
+        assert link["p50_seconds"] == pytest.approx(90, rel=0.015)
+
+    def test_same_junction_is_not_a_sample(self, engine, clock):
+        engine.observe(1, "FT1", clock.now)
+        assert engine.observe(1, "FT1", clock.now + 30) is None
+        assert engine.links() == []
+
+    def test_sighting_beyond_max_travel_time_ignored(self, engine, clock):
+        engine.observe(1, "FT1", clock.now)
+        assert engine.observe(2, "FT1", clock.now + 601) is None
+        assert engine.stats()["samples"] == 0
+
+    def test_chained_links(self, engine, clock):
+        engine.observe(1, "FT1", clock.now)
+        engine.observe(2, "FT1", clock.now + 60)
+        engine.observe(3, "FT1", clock.now + 180)
+
+        pairs = {(l["from_junction_id"], l["to_junction_id"]): l for l in engine.links()}
+        assert set(pairs) == {(1, 2), (2, 3)}
+        assert pairs[(2, 3)]["p50_seconds"] == pytest.approx(120, rel=0.015)
+
+    def test_out_of_order_detection_skipped(self, engine, clock):
+        engine.observe(1, "FT1", clock.now)
+        assert engine.observe(2, "FT1", clock.now - 10) is None
+        assert engine.stats()["out_of_order"] == 1
+
+    def test_observe_many_sorts_and_parses_timestamps(self, engine, clock):
+        start = datetime.fromtimestamp(clock.now, tz=timezone.utc)
+        samples = engine.observe_many([
+            {"junction_id": 2, "fastag_id": "FT1",
+             "detection_timestamp": datetime.fromtimestamp(clock.now + 75, tz=timezone.utc).isoformat()},
+            {"junction_id": 1, "fastag_id": "FT1", "detection_timestamp": start.isoformat()},
+        ])
+
+        assert samples == 1
+        assert engine.link(1, 2)["p50_seconds"] == pytest.approx(75, rel=0.015)
+
+    def test_stale_tags_evicted(self, engine, clock):
+        engine.observe(1, "FT1", clock.now)
+        engine.observe(1, "FT2", clock.now + 700)
+
+        stats = engine.stats()
+        assert stats["tracked_tags"] == 1
+        assert stats["evicted_tags"] == 1
+
+    def test_max_tags_caps_index(self, clock):
+        engine = TravelTimeEngine(max_travel_seconds=600, max_tags=10, clock=clock)
+        for i in range(25):
+            engine.observe(1, f"FT{i}", clock.now + i)
+
+        assert engine.stats()["tracked_tags"] == 10
+
+    def test_congestion_index_compares_recent_to_baseline(self, engine, clock):
+        base = clock.now
+        for i in range(40):
+            engine.observe(1, f"A{i}", base + i)
+            engine.observe(2, f"A{i}", base + i + 60)
+        clock.now = base + 2400
+        for i in range(10):
+            engine.observe(1, f"B{i}", clock.now + i)
+            engine.observe(2, f"B{i}", clock.now + i + 180)
+        clock.now += 200
+
+        link = engine.link(1, 2)
+        assert link["samples"] == 10
+        assert link["baseline_samples"] == 50
+        assert link["p50_seconds"] == pytest.approx(180, rel=0.015)
+        assert link["baseline_p50_seconds"] == pytest.approx(60, rel=0.015)
+        assert link["congestion_index"] == pytest.approx(3.0, rel=0.02)
+
+    def test_min_samples_filters_links(self, engine, clock):
+        engine.observe(1, "FT1", clock.now)
+        engine.observe(2, "FT1", clock.now + 60)
+
+        assert engine.links(min_samples=2) == []
+        assert engine.link(2, 1) is None
+
+    @pytest.mark.asyncio
+    async def test_warm_up_replays_stored_detections(self, engine, clock):
+        db = FakeDatabase([[
+            {"id": 1, "junction_id": 1, "fastag_id": "FT1", "detection_timestamp": clock.now - 100},
+            {"id": 2, "junction_id": 2, "fastag_id": "FT1", "detection_timestamp": clock.now - 40},
+        ]])
+
+        assert await engine.warm_up(db) == 2
+        assert db.calls[0][:2] == ("vehicle_detections", "detection_timestamp")
+        assert engine.link(1, 2)["p50_seconds"] == pytest.approx(60, rel=0.015)
+
+    @pytest.mark.asyncio
+    async def test_live_detections_wait_for_warm_up(self, engine, clock):
+        class SlowDatabase(FakeDatabase):
+            async def iter_rows_by_id(self, *args, **kwargs):
+                # A live sighting of the same tag arrives mid-replay
+                engine.observe(3, "FT1", clock.now)
+                async for chunk in super().iter_rows_by_id(*args, **kwargs):
+                    yield chunk
+
+        db = SlowDatabase([[
+            {"id": 1, "junction_id": 1, "fastag_id": "FT1", "detection_timestamp": clock.now - 100},
+            {"id": 2, "junction_id": 2, "fastag_id": "FT1", "detection_timestamp": clock.now - 40},
+        ]])
+
+        assert await engine.warm_up(db) == 2
+        assert engine.stats()["out_of_order"] == 0
+        assert engine.stats()["pending"] == 0
+        assert engine.link(1, 2)["p50_seconds"] == pytest.approx(60, rel=0.015)
+        assert engine.link(2, 3)["p50_seconds"] == pytest.approx(40, rel=0.015)
+
+    @pytest.mark.asyncio
+    async def test_warm_up_survives_database_error(self, engine):
+        db = FakeDatabase([], error=RuntimeError("connection reset"))
+
+        assert await engine.warm_up(db) == 0
@@ -0,0 +1,262 @@
+"""
+Tests for the write-ahead disk spool and its replayer
+Replay is exercised against the embedded SQLite backend
+"""
+
+import json
+import os
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+import pytest
+from postgrest.exceptions import APIError
+
+from app.services.database_service import DatabaseService
+from app.services.sqlite_database_service import SQLiteDatabaseService
+from app.services.write_spool import (
+    SpoolLockedError, SpoolReplayer, WriteSpool, claim_write_spool, write_or_spool
+)
+
+
+def _detection(i, junction_id=1):
+    return DatabaseService.build_vehicle_detection_row(junction_id, 1 + i % 4, f"FT{i:06d}")
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = WriteSpool(str(tmp_path / "spool"), segment_bytes=1024)
+    yield spool
+    spool.close()
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    db = SQLiteDatabaseService(str(tmp_path / "flextraff.db"))
+    db._conn.execute("INSERT INTO traffic_junctions (junction_name) VALUES ('Main Street')")
+    yield db
+    db.close()
+
+
+def _count(db, table="vehicle_detections"):
+    return db._fetch_all(f"SELECT count(*) AS n FROM {table}")[0]["n"]
+
+
+@pytest.mark.unit
+class TestWriteSpool:
+    """Append, read back, commit and recover after restart"""
+
+    def test_append_stamps_rows(self, spool):
+        stamped = spool.append("vehicle_detections", [_detection(1)])
+
+        assert stamped[0]["ingest_key"]
+        assert stamped[0]["detection_timestamp"]
+        assert spool.depth() == 1
+
+    def test_rejects_unknown_table(self, spool):
+        with pytest.raises(ValueError):
+            spool.append("users", [{"id": 1}])
+
+    def test_segments_rotate_and_are_removed_after_commit(self, spool):
+        for i in range(40):
+            spool.append("vehicle_detections", [_detection(i)])
+        assert spool.stats()["segments"] > 1
+
+        records, position = spool.read_batch(1000)
+        spool.commit(position, len(records))
+
+        assert [r["row"]["fastag_id"] for r in records] == [f"FT{i:06d}" for i in range(40)]
+        assert spool.depth() == 0
+        assert spool.stats()["segments"] == 1
+
+    def test_restart_resumes_from_cursor(self, tmp_path):
+        directory = str(tmp_path / "spool")
+        first = WriteSpool(directory, segment_bytes=1024)
+        first.append("vehicle_detections", [_detection(i) for i in range(10)])
+        records, position = first.read_batch(4)
+        first.commit(position, len(records))
+        first.close()
+
+        second = WriteSpool(directory, segment_bytes=1024)
+        pending, _ = second.read_batch(100)
+
+        assert second.depth() == 6
+        assert [r["row"]["fastag_id"] for r in pending] == [f"FT{i:06d}" for i in range(4, 10)]
+        second.close()
+
+    def test_torn_tail_is_discarded_on_restart(self, tmp_path):
+        directory = str(tmp_path / "spool")
+        first = WriteSpool(directory)
+        first.append("vehicle_detections", [_detection(1)])
+        first.close()
+        segment = next(n for n in os.listdir(directory) if n.startswith("segment-"))
+        with open(os.path.join(directory, segment), "ab") as f:
+            f.write(b'{"table": "vehicle_detections", "row": {"fas')
+
+        second = WriteSpool(directory)
+        second.append("vehicle_detections", [_detection(2)])
+        records, _ = second.read_batch(100)
+
+        assert [r["row"]["fastag_id"] for r in records] == ["FT000001", "FT000002"]
+        second.close()
+
+    def test_each_process_claims_its_own_directory(self, tmp_path):
+        first = claim_write_spool(str(tmp_path))
+        second = claim_write_spool(str(tmp_path))
+
+        assert first.directory != second.directory
+        with pytest.raises(SpoolLockedError):
+            WriteSpool(first.directory)
+
+        first.close()
+        second.close()
+
+    def test_stats_report_lag(self, spool):
+        assert spool.stats() == {"depth": 0, "lag_seconds": 0.0, "segments": 1, "bytes": 0}
+
+        spool.append("traffic_cycles", [{"junction_id": 1}])
+        stats = spool.stats()
+
+        assert stats["depth"] == 1
+        assert stats["lag_seconds"] >= 0
+        assert stats["bytes"] > 0
+
+
+@pytest.mark.unit
+class TestWriteOrSpool:
+    """Direct writes fall back to the spool"""
+
+    @pytest.mark.asyncio
+    async def test_direct_write_when_healthy(self, spool):
+        write = AsyncMock(return_value={"id": 7})
+
+        result, spooled = await write_or_spool(spool, "vehicle_detections", [_detection(1)], write)
+
+        assert (result, spooled) == ({"id": 7}, False)
+        assert spool.depth() == 0
+
+    @pytest.mark.asyncio
+    async def test_spools_on_failure_and_while_backlogged(self, spool):
+        failing = AsyncMock(side_effect=ConnectionError("database unreachable"))
+        _, spooled = await write_or_spool(spool, "vehicle_detections", [_detection(1)], failing)
+
+        healthy = AsyncMock()
+        _, spooled_again = await write_or_spool(spool, "vehicle_detections", [_detection(2)], healthy)
+
+        assert spooled and spooled_again
+        healthy.assert_not_awaited()
+        assert spool.depth() == 2
+
+    @pytest.mark.asyncio
+    async def test_write_and_spool_share_ingest_key(self, spool, sqlite_db):
+        """A write that commits but times out is not stored twice on replay"""
+        written = []
+
+        async def commits_then_times_out(rows):
+            written.extend(await sqlite_db.log_vehicle_detections_bulk(rows))
+            raise TimeoutError("deadline exceeded")
+
+        _, spooled = await write_or_spool(
+            spool, "vehicle_detections", [_detection(1)], commits_then_times_out
+        )
+        await SpoolReplayer(sqlite_db, spool, batch_size=10).drain_once()
+
+        assert spooled
+        assert len(written) == 1
+        assert _count(sqlite_db) == 1
+
+    @pytest.mark.asyncio
+    async def test_rejected_row_raised_not_spooled(self, spool):
+        rejected = AsyncMock(side_effect=APIError({"message": "violates foreign key constraint"}))
+
+        with pytest.raises(APIError):
+            await write_or_spool(spool, "vehicle_detections", [_detection(1)], rejected)
+
+        assert spool.depth() == 0
+
+    @pytest.mark.asyncio
+    async def test_without_spool_errors_propagate(self):
+        with pytest.raises(ConnectionError):
+            await write_or_spool(
+                None, "vehicle_detections", [], AsyncMock(side_effect=ConnectionError())
+            )
+
+
+@pytest.mark.unit
+@pytest.mark.database
+class TestSpoolReplayer:
+    """Spooled rows reach the database exactly once"""
+
+    @pytest.mark.asyncio
+    async def test_drain_is_idempotent(self, spool, sqlite_db):
+        spool.append("vehicle_detections", [_detection(i) for i in range(25)])
+        records, _ = spool.read_batch(100)
+        replayer = SpoolReplayer(sqlite_db, spool, batch_size=10)
+
+        assert await replayer.drain_once() == 25
+        assert spool.depth() == 0
+
+        # Crash before the cursor commit: the same records are replayed again
+        await sqlite_db.insert_spooled_rows("vehicle_detections", [r["row"] for r in records])
+
+        assert _count(sqlite_db) == 25
+        assert await sqlite_db.get_vehicles_count_by_date(1, datetime.utcnow().date()) == 25
+
+    @pytest.mark.asyncio
+    async def test_rejected_rows_are_dead_lettered(self, spool, sqlite_db):
+        spool.append("vehicle_detections", [_detection(1), _detection(2, junction_id=99), _detection(3)])
+
+        replayer = SpoolReplayer(sqlite_db, spool)
+        await replayer.drain_once()
+
+        assert _count(sqlite_db) == 2
+        assert replayer.dead_lettered == 1
+        with open(os.path.join(spool.directory, "dead_letter.jsonl")) as f:
+            dead = [json.loads(line) for line in f]
+        assert dead[0]["row"]["junction_id"] == 99
+
+    @pytest.mark.asyncio
+    async def test_drain_waits_while_database_down(self, spool):
+        spool.append("vehicle_detections", [_detection(1)])
+        db = AsyncMock()
+        db.insert_spooled_rows.side_effect = ConnectionError("down")
+        db.health_check.return_value = {"database_connected": False}
+
+        with pytest.raises(ConnectionError):
+            await SpoolReplayer(db, spool).drain_once()
+
+        assert spool.depth() == 1
+
+    @pytest.mark.asyncio
+    async def test_flap_mid_retry_keeps_rows_spooled(self, spool):
+        """A timeout during the row-by-row retry is an outage, not a bad row"""
+        spool.append("vehicle_detections", [_detection(i) for i in range(3)])
+        db = AsyncMock()
+        db.insert_spooled_rows.side_effect = [
+            APIError({"message": "bad row", "code": "23503"}),
+            None,
+            TimeoutError("breaker deadline"),
+        ]
+        db.health_check.return_value = {"database_connected": True}
+        replayer = SpoolReplayer(db, spool)
+
+        with pytest.raises(TimeoutError):
+            await replayer.drain_once()
+
+        assert spool.depth() == 3
+        assert replayer.dead_lettered == 0
+        assert not os.path.exists(os.path.join(spool.directory, "dead_letter.jsonl"))
+
+    @pytest.mark.asyncio
+    async def test_spool_of_exited_worker_is_replayed(self, tmp_path, sqlite_db):
+        live = claim_write_spool(str(tmp_path))
+        exited = claim_write_spool(str(tmp_path))
+        exited.append("vehicle_detections", [_detection(i) for i in range(3)])
+        exited.close()
+
+        assert await SpoolReplayer(sqlite_db, live).tick() == 3
+
+        assert _count(sqlite_db) == 3
+        reopened = WriteSpool(exited.directory)
+        assert reopened.depth() == 0
+        reopened.close()
+        live.close()
@@ -0,0 +1,321 @@
+"""
+Tests for the WebSocket fan-out: per-client queues, slow-consumer policies
+and lag metrics, plus a load test with 1,000 simulated clients
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from ws_broadcast import WSManager
+
+
+class FakeWebSocket:
+    """Records sent payloads; a stalled client never completes a send"""
+
+    def __init__(self, stalled=False, delay=0.0):
+        self.stalled = stalled
+        self.delay = delay
+        self.sent = []
+        self.accepted = False
+        self.closed_with = None
+        self._release = asyncio.Event()
+
+    async def accept(self):
+        self.accepted = True
+
+    async def send_text(self, payload):
+        if self.stalled:
+            await self._release.wait()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(payload)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+    def release(self):
+        self.stalled = False
+        self._release.set()
+
+
+async def _drain(manager, timeout=5.0):
+    """Wait until no connected, non-stalled client has anything queued"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(not c.queue or c.ws.stalled for c in manager.clients.values()):
+            await asyncio.sleep(0)
+            return
+        await asyncio.sleep(0.001)
+    raise AssertionError("clients did not drain")
+
+
+OPERATOR = {"id": 7, "role": "OPERATOR", "token_data": {"junction_ids": [1, 2]}}
+ADMIN = {"id": 1, "role": "ADMIN", "token_data": {}}
+
+
+async def _connect(manager, count, user=ADMIN, **kwargs):
+    sockets = [FakeWebSocket(**kwargs) for _ in range(count)]
+    for ws in sockets:
+        await manager.connect(ws, user=user)
+    return sockets
+
+
+@pytest.mark.unit
+class TestWSManager:
+    """Broadcast enqueues once per client; writers deliver independently"""
+
+    @pytest.mark.asyncio
+    async def test_broadcast_delivers_in_order(self):
+        manager = WSManager(max_queue=10, policy="drop_oldest")
+        (ws,) = await _connect(manager, 1)
+
+        for i in range(3):
+            assert await manager.broadcast({"seq": i}) == 1
+        await _drain(manager)
+
+        assert [json.loads(p)["seq"] for p in ws.sent] == [0, 1, 2]
+        assert ws.accepted
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_stalled_client_does_not_block_others(self):
+        manager = WSManager(max_queue=4, policy="drop_oldest")
+        (stalled,) = await _connect(manager, 1, stalled=True)
+        (fast,) = await _connect(manager, 1)
+
+        for i in range(10):
+            await manager.broadcast({"seq": i})
+            await asyncio.sleep(0)
+        await _drain(manager)
+
+        assert len(fast.sent) == 10
+        assert stalled.sent == []
+        stats = {c["id"]: c for c in manager.client_stats()}
+        slow_stats = stats[manager.clients[stalled].id]
+        # One message is in flight in the writer, the last 4 are queued
+        assert (slow_stats["queued"], slow_stats["dropped"]) == (4, 5)
+
+        stalled.release()
+        await _drain(manager)
+        assert [json.loads(p)["seq"] for p in stalled.sent] == [0, 6, 7, 8, 9]
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_coalesce_keeps_latest_per_key(self):
+        manager = WSManager(max_queue=10, policy="coalesce")
+        (ws,) = await _connect(manager, 1, stalled=True)
+
+        await manager.broadcast({"type": "timing", "junction_id": 1, "v": 0})
+        await asyncio.sleep(0)  # v=0 is now in flight
+        for v in range(1, 5):
+            await manager.broadcast({"type": "timing", "junction_id": 1, "v": v})
+        await manager.broadcast({"type": "timing", "junction_id": 2, "v": 9})
+
+        ws.release()
+        await _drain(manager)
+
+        assert [(m["junction_id"], m["v"]) for m in map(json.loads, ws.sent)] == [
+            (1, 0), (1, 4), (2, 9)
+        ]
+        assert manager.stats()["coalesced"] == 3
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_disconnect_policy_closes_slow_client(self):
+        manager = WSManager(max_queue=2, policy="disconnect")
+        (ws,) = await _connect(manager, 1, stalled=True)
+
+        for i in range(5):
+            await manager.broadcast({"seq": i})
+        await asyncio.sleep(0.01)
+
+        assert ws not in manager.clients
+        assert ws.closed_with == 1013
+        assert manager.stats()["slow_disconnects"] == 1
+
+    @pytest.mark.asyncio
+    async def test_send_timeout_disconnects(self):
+        manager = WSManager(max_queue=10, send_timeout=0.05)
+        (ws,) = await _connect(manager, 1, stalled=True)
+
+        await manager.broadcast("hello")
+        await asyncio.sleep(0.1)
+
+        assert manager.clients == {}
+
+    @pytest.mark.asyncio
+    async def test_failed_send_disconnects(self):
+        manager = WSManager(max_queue=10)
+        (ws,) = await _connect(manager, 1)
+
+        async def broken(payload):
+            raise RuntimeError("socket closed")
+
+        ws.send_text = broken
+        await manager.broadcast("hello")
+        await asyncio.sleep(0.01)
+
+        assert manager.clients == {}
+
+    @pytest.mark.asyncio
+    async def test_lag_metrics(self):
+        clock = [100.0]
+        manager = WSManager(max_queue=10, clock=lambda: clock[0])
+        (ws,) = await _connect(manager, 1, stalled=True)
+
+        await manager.broadcast("a")
+        await manager.broadcast("b")
+        clock[0] += 2.5
+
+        stats = manager.stats()
+        assert stats["max_lag_ms"] == 2500.0
+        assert stats["slowest_clients"][0]["lag_ms"] == 2500.0
+
+        ws.release()
+        await _drain(manager)
+        assert manager.client_stats()[0]["max_delivery_ms"] == 2500.0
+        await manager.close_all()
+
+    def test_unknown_policy_rejected(self):
+        with pytest.raises(ValueError):
+            WSManager(policy="buffer_forever")
+
+
+@pytest.mark.unit
+class TestWSSubscriptions:
+    """Messages are routed by junction topic and filtered by component / level"""
+
+    @pytest.mark.asyncio
+    async def test_junction_subscription_routes_through_index(self):
+        manager = WSManager(max_queue=10)
+        one, two, everyone = await _connect(manager, 3)
+        manager.subscribe(one, junction_ids=[1])
+        manager.subscribe(two, junction_ids=[2])
+
+        assert await manager.broadcast({"junction_id": 1, "message": "a"}) == 2
+        assert await manager.broadcast({"junction_id": 2, "message": "b"}) == 2
+        assert await manager.broadcast({"message": "system"}) == 3
+        await _drain(manager)
+
+        assert [json.loads(p)["message"] for p in one.sent] == ["a", "system"]
+        assert [json.loads(p)["message"] for p in two.sent] == ["b", "system"]
+        assert len(everyone.sent) == 3
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_component_and_level_filters(self):
+        manager = WSManager(max_queue=10)
+        (ws,) = await _connect(manager, 1)
+        ack = manager.subscribe(ws, components=["mqtt_handler"], levels=["error"])
+
+        await manager.broadcast({"component": "mqtt_handler", "log_level": "ERROR", "message": "x"})
+        await manager.broadcast({"component": "mqtt_handler", "log_level": "INFO", "message": "y"})
+        await manager.broadcast({"component": "startup", "level": "error", "message": "z"})
+        await _drain(manager)
+
+        assert ack["levels"] == ["ERROR"]
+        assert [json.loads(p)["message"] for p in ws.sent] == ["x"]
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_user_limited_to_accessible_junctions(self):
+        manager = WSManager(max_queue=10)
+        ws = FakeWebSocket()
+        await manager.connect(ws, user=OPERATOR)
+
+        ack = manager.subscribe(ws, junction_ids=[2, 3])
+        await manager.broadcast({"junction_id": 3, "message": "denied"})
+        await manager.broadcast({"junction_id": 2, "message": "granted"})
+        await _drain(manager)
+
+        assert (ack["junction_ids"], ack["denied_junction_ids"]) == ([2], [3])
+        assert [json.loads(p)["message"] for p in ws.sent] == ["granted"]
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_default_subscription_follows_user_access(self):
+        manager = WSManager(max_queue=10)
+        operator, admin = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(operator, user=OPERATOR)
+        await manager.connect(admin, user=ADMIN)
+
+        assert manager.subscribe(operator)["junction_ids"] == [1, 2]
+        assert manager.subscribe(admin, junction_ids=[5])["denied_junction_ids"] == []
+        assert await manager.broadcast({"junction_id": 9}) == 0
+        assert await manager.broadcast({"junction_id": 1}) == 1
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_disconnect_removes_from_topics(self):
+        manager = WSManager(max_queue=10)
+        (ws,) = await _connect(manager, 1)
+        manager.subscribe(ws, junction_ids=[1, 2])
+        assert manager.stats()["junction_topics"] == 2
+
+        manager.disconnect(ws)
+
+        assert manager.stats()["junction_topics"] == 0
+        assert await manager.broadcast({"junction_id": 1}) == 0
+
+
+@pytest.mark.performance
+class TestWSBroadcastLoad:
+    """1,000 clients, 5% of them stalled, 200 broadcasts"""
+
+    @pytest.mark.asyncio
+    async def test_thousand_clients_with_stalled_minority(self):
+        manager = WSManager(max_queue=64, policy="drop_oldest", send_timeout=30)
+        fast = await _connect(manager, 950, delay=0)
+        stalled = await _connect(manager, 50, stalled=True)
+
+        slowest_broadcast = 0.0
+        for i in range(200):
+            started = time.perf_counter()
+            assert await manager.broadcast({"type": "log", "seq": i}) == 1000
+            slowest_broadcast = max(slowest_broadcast, time.perf_counter() - started)
+            await asyncio.sleep(0)
+        await _drain(manager, timeout=30)
+
+        # Queuing for 1,000 clients never waits on a stalled socket
+        assert slowest_broadcast < 0.25
+        assert all(len(ws.sent) == 200 for ws in fast)
+        assert all(ws.sent == [] for ws in stalled)
+
+        stats = manager.stats()
+        assert stats["clients"] == 1000
+        assert stats["sent"] == 950 * 200
+        assert stats["dropped"] == 50 * (200 - 1 - 64)
+        assert stats["queued"] == 50 * 64
+        for ws in stalled:
+            ws.release()
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_thousand_clients_disconnect_policy(self):
+        manager = WSManager(max_queue=16, policy="disconnect", send_timeout=30)
+        fast = await _connect(manager, 990)
+        stalled = await _connect(manager, 10, stalled=True)
+
+        for i in range(100):
+            await manager.broadcast({"type": "log", "seq": i})
+            await asyncio.sleep(0)
+        await _drain(manager, timeout=30)
+
+        assert len(manager.clients) == 990
+        assert all(len(ws.sent) == 100 for ws in fast)
+        assert manager.stats()["slow_disconnects"] == 10
+        await manager.close_all()
+
+    @pytest.mark.asyncio
+    async def test_junction_message_visits_only_its_subscribers(self):
+        manager = WSManager(max_queue=16)
+        sockets = await _connect(manager, 1000)
+        for i, ws in enumerate(sockets):
+            manager.subscribe(ws, junction_ids=[i % 100])
+
+        assert len(manager._recipients(7)) == 10
+        assert await manager.broadcast({"type": "timing", "junction_id": 7}) == 10
+        await manager.close_all()
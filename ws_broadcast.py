@@ -1,40 +1,507 @@
 # backend/ws_broadcast.py
+"""
+WebSocket fan-out. Every connection has its own bounded outbound queue and
+writer task, so broadcast() only serialises once and enqueues - a slow or
+stalled dashboard never delays the caller or the other clients.
+
+When a client's queue is full the slow-consumer policy applies:
+- drop_oldest: discard the oldest queued message
+- coalesce: a message with the same key (default: type + junction_id)
+  replaces the queued one, so a slow client gets the latest state rather
+  than a backlog; otherwise the oldest is dropped
+- disconnect: close the client (code 1013, try again later)
+
+Clients subscribe to junctions, components and log levels. Subscriptions
+are indexed by junction, so a junction message only visits that junction's
+subscribers (plus those subscribed to every junction); messages without a
+junction_id are system-wide and go to every client whose filters match.
+A client only ever gets junctions its user has access to; anonymous clients
+get system-wide messages only.
+
+broadcast() goes through a pluggable backend (WS_BROADCAST_BACKEND): in
+memory for a single process, Redis pub/sub so clients of every worker and
+replica see every event.
+
+Each JSON object broadcast is stamped with a "sequence" number and kept in
+a bounded per-junction replay buffer; a client that reconnects with the
+last sequence it saw gets the messages it missed before any live ones.
+"""
+import asyncio
+import itertools
 import json
-from typing import List
-from fastapi import WebSocket
+import logging
+import time
+from collections import deque
+from typing import (
+    Any, Callable, Deque, Dict, FrozenSet, Hashable, Iterable, List, Optional, Protocol, Set
+)
+
+from app.config import settings
+from app.services.broadcast_backend import Route, create_broadcast_backend
+from app.services.replay_buffer import ReplayBuffer
+from app.utils.access_helpers import filter_junctions
+
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+# Close code sent to clients disconnected for falling behind
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+# Topic of clients subscribed to every junction
+ALL_JUNCTIONS = "*"
+
+# Queue key of replayed messages; they are never coalesced
+_REPLAYED = object()
+
+logger = logging.getLogger(__name__)
+_client_ids = itertools.count(1)
+
+
+class Connection(Protocol):
+    """
+    What the manager needs of a client: a Starlette WebSocket, or an
+    SSEConnection streaming the same messages over HTTP
+    """
+
+    async def accept(self) -> None: ...
+
+    async def send_text(self, data: str, /) -> None: ...
+
+    async def close(self, code: int = 1000) -> None: ...
+
+
+class _Client:
+    """Outbound queue, writer task and delivery counters for one connection"""
+
+    def __init__(self, ws: Connection, user: Optional[dict] = None):
+        self.ws = ws
+        self.user = user
+        self.id = next(_client_ids)
+        client = getattr(ws, "client", None)
+        self.address = f"{client.host}:{client.port}" if client else None
+        # Entries are [key, payload, enqueued_at]; `pending` indexes keyed
+        # entries for coalescing
+        self.queue: Deque[list] = deque()
+        self.pending: Dict[Hashable, list] = {}
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.connected_at = time.time()
+        # Last replay sequence when the client joined; later ones arrive live
+        self.connected_sequence = 0
+        # Replayed messages still queued; they don't count against the limit
+        self.replay_backlog = 0
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.last_delivery_ms = 0.0
+        self.max_delivery_ms = 0.0
+        # Filters; None means everything (the user is allowed to see)
+        self.junctions: Optional[FrozenSet[int]] = None
+        self.components: Optional[FrozenSet[str]] = None
+        self.levels: Optional[FrozenSet[str]] = None
+
+    def accepts(self, component: Optional[str], level: Optional[str]) -> bool:
+        return (self.components is None or component in self.components) and (
+            self.levels is None or level in self.levels
+        )
+
+    def subscription(self) -> Dict[str, Any]:
+        return {
+            "junction_ids": sorted(self.junctions) if self.junctions is not None else None,
+            "components": sorted(self.components) if self.components is not None else None,
+            "levels": sorted(self.levels) if self.levels is not None else None,
+        }
+
+    def lag_ms(self, now: float) -> float:
+        """Age of the oldest undelivered message"""
+        return (now - self.queue[0][2]) * 1000 if self.queue else 0.0
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "address": self.address,
+            "transport": getattr(self.ws, "transport", "websocket"),
+            "user_id": self.user.get("id") if self.user else None,
+            "junction_ids": sorted(self.junctions) if self.junctions is not None else None,
+            "queued": len(self.queue),
+            "lag_ms": round(self.lag_ms(now), 1),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "last_delivery_ms": round(self.last_delivery_ms, 1),
+            "max_delivery_ms": round(self.max_delivery_ms, 1),
+        }
+
 
 class WSManager:
-    def __init__(self):
-        self.active: List[WebSocket] = []
+    def __init__(
+        self,
+        max_queue: Optional[int] = None,
+        policy: Optional[str] = None,
+        send_timeout: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        backend=None,
+        replay_size: Optional[int] = None,
+    ):
+        self.max_queue = max_queue or settings.WS_SEND_QUEUE_SIZE
+        self.policy = policy or settings.WS_SLOW_CONSUMER_POLICY
+        if self.policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(
+                f"Unknown slow-consumer policy {self.policy!r} "
+                f"(expected one of {', '.join(SLOW_CONSUMER_POLICIES)})"
+            )
+        self.send_timeout = send_timeout or settings.WS_SEND_TIMEOUT_SECONDS
+        self._clock = clock
+        self.clients: Dict[Connection, _Client] = {}
+        # junction_id (or ALL_JUNCTIONS) -> subscribed clients
+        self._topics: Dict[Any, Set[_Client]] = {}
+        self.broadcasts = 0
+        self.slow_disconnects = 0
+        self._closing: set = set()
+        self.backend = backend or create_broadcast_backend()
+        self.backend.bind(self._deliver)
+        self.replay = ReplayBuffer(replay_size)
+        # Called with (payload, route) for every delivered broadcast
+        self._listeners: List[Callable[[str, Route], None]] = []
 
-    async def connect(self, ws: WebSocket):
+    async def start(self) -> None:
+        """Start the broadcast backend (subscribes to Redis)"""
+        await self.backend.start()
+
+    @property
+    def active(self) -> List[Connection]:
+        return list(self.clients)
+
+    async def connect(
+        self,
+        ws: Connection,
+        user: Optional[dict] = None,
+        since: Optional[int] = None,
+        stream: Optional[str] = None,
+    ):
+        """
+        Accept a client. `user` (from its token) limits the junctions it can
+        receive; without one (anonymous access allowed) it gets everything.
+        With `since` (and the `stream` it came from) the buffered messages
+        after that sequence are queued ahead of any live message.
+        """
         await ws.accept()
-        self.active.append(ws)
+        client = _Client(ws, user)
+        client.junctions = self._permitted_junctions(user)
+        client.connected_sequence = self.replay.sequence
+        client.task = asyncio.create_task(self._writer(client))
+        self.clients[ws] = client
+        self._index(client)
+        if since is not None:
+            self.replay_since(ws, since, stream)
+
+    def disconnect(self, ws: Connection):
+        client = self.clients.pop(ws, None)
+        if client is None:
+            return
+        self._unindex(client)
+        if client.task is not None and client.task is not asyncio.current_task():
+            client.task.cancel()
+
+    # ------------------------------------------------------------------
+    # Subscriptions
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _permitted_junctions(user: Optional[dict]) -> Optional[FrozenSet[int]]:
+        if user is None:
+            # Anonymous clients only get system-wide (non-junction) messages
+            return frozenset()
+        if user.get("role") == "ADMIN":
+            return None
+        return frozenset(user.get("token_data", {}).get("junction_ids", []))
+
+    @staticmethod
+    def _client_topics(client: _Client) -> Iterable[Any]:
+        return (ALL_JUNCTIONS,) if client.junctions is None else client.junctions
+
+    def _index(self, client: _Client) -> None:
+        for topic in self._client_topics(client):
+            self._topics.setdefault(topic, set()).add(client)
+
+    def _unindex(self, client: _Client) -> None:
+        for topic in self._client_topics(client):
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def subscribe(
+        self,
+        ws: Connection,
+        junction_ids: Optional[List[int]] = None,
+        components: Optional[List[str]] = None,
+        levels: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Replace a client's filters (None: no filter). Requested junctions
+        the user has no access to are left out and reported as denied.
+        Returns the acknowledgement to send to the client.
+        """
+        client = self.clients.get(ws)
+        if client is None:
+            return {}
+
+        denied: List[int] = []
+        if junction_ids is None:
+            junctions = self._permitted_junctions(client.user)
+        else:
+            requested = sorted(set(junction_ids))
+            granted = [] if client.user is None else filter_junctions(client.user, requested)
+            denied = [j for j in requested if j not in granted]
+            junctions = frozenset(granted)
+
+        self._unindex(client)
+        client.junctions = junctions
+        client.components = frozenset(components) if components else None
+        client.levels = frozenset(level.upper() for level in levels) if levels else None
+        self._index(client)
+
+        return {"type": "subscribed", **client.subscription(), "denied_junction_ids": denied}
+
+    def replay_since(
+        self, ws: Connection, since: int, stream: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Queue the buffered messages after `since` that match the client's
+        subscription, up to the sequence it joined at, followed by a
+        {"type": "replay"} summary. "complete" is False when some of the
+        missed messages are no longer buffered (or the cursor is from
+        another stream), in which case the client should refetch state.
+        """
+        client = self.clients.get(ws)
+        if client is None:
+            return {}
+        entries, complete = self.replay.since(
+            since, client.junctions, upto=client.connected_sequence, stream=stream
+        )
+        now = self._clock()
+        replayed = 0
+        # Replayed messages bypass the queue limit: the buffer bounds them
+        for _, payload, component, level in entries:
+            if client.accepts(component, level):
+                client.queue.append([_REPLAYED, payload, now])
+                replayed += 1
+        client.replay_backlog += replayed
+        summary = {
+            "type": "replay",
+            "stream": self.replay.stream,
+            "since": since,
+            "replayed": replayed,
+            "last_sequence": client.connected_sequence,
+            "complete": complete,
+        }
+        self._enqueue(client, None, self._serialise(summary), now)
+        return summary
+
+    def add_listener(self, listener: Callable[[str, Route], None]) -> None:
+        """Have `listener` see every broadcast this process delivers"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
 
-    def disconnect(self, ws: WebSocket):
+    def _recipients(self, junction_id: Optional[int]) -> List[_Client]:
+        if junction_id is None:
+            return list(self.clients.values())
+        return [
+            *self._topics.get(junction_id, ()),
+            *self._topics.get(ALL_JUNCTIONS, ()),
+        ]
+
+    @staticmethod
+    def _serialise(message) -> str:
+        if isinstance(message, (dict, list)):
+            return json.dumps(message, default=str)
+        return str(message)
+
+    @staticmethod
+    def _default_key(message) -> Optional[Hashable]:
+        if isinstance(message, dict) and "type" in message:
+            return (message["type"], message.get("junction_id"))
+        return None
+
+    def _enqueue(self, client: _Client, key: Optional[Hashable], payload: str, now: float) -> None:
+        if self.policy == "coalesce" and key is not None:
+            entry = client.pending.get(key)
+            if entry is not None:
+                entry[1] = payload
+                client.coalesced += 1
+                return
+
+        if len(client.queue) - client.replay_backlog >= self.max_queue:
+            if self.policy == "disconnect":
+                self._drop_slow_client(client)
+                return
+            oldest = client.queue.popleft()
+            if oldest[0] is _REPLAYED:
+                client.replay_backlog -= 1
+            elif client.pending.get(oldest[0]) is oldest:
+                del client.pending[oldest[0]]
+            client.dropped += 1
+
+        entry = [key, payload, now]
+        client.queue.append(entry)
+        if key is not None:
+            client.pending[key] = entry
+        client.wakeup.set()
+
+    def _drop_slow_client(self, client: _Client) -> None:
+        self.slow_disconnects += 1
+        logger.warning(
+            f"⚠️ WebSocket client {client.id} ({client.address}) disconnected: "
+            f"{len(client.queue)} messages behind"
+        )
+        self.disconnect(client.ws)
+        task = asyncio.create_task(self._close(client.ws, SLOW_CONSUMER_CLOSE_CODE))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, ws: Connection, code: int) -> None:
         try:
-            self.active.remove(ws)
-        except ValueError:
+            await asyncio.wait_for(ws.close(code=code), self.send_timeout)
+        except Exception:
             pass
 
-    async def broadcast(self, message):
+    async def _writer(self, client: _Client) -> None:
+        queue = client.queue
+        while True:
+            if not queue:
+                client.wakeup.clear()
+                await client.wakeup.wait()
+                continue
+
+            entry = queue.popleft()
+            key, payload, enqueued_at = entry
+            if key is _REPLAYED:
+                client.replay_backlog -= 1
+            elif key is not None and client.pending.get(key) is entry:
+                del client.pending[key]
+            try:
+                async with asyncio.timeout(self.send_timeout):
+                    await client.ws.send_text(payload)
+            except Exception:
+                # Closed by the peer, or stuck past the send timeout
+                self.disconnect(client.ws)
+                return
+
+            client.sent += 1
+            client.last_delivery_ms = (self._clock() - enqueued_at) * 1000
+            client.max_delivery_ms = max(client.max_delivery_ms, client.last_delivery_ms)
+
+    async def broadcast(self, message, key: Optional[Hashable] = None) -> int:
         """
         message: python dict or list -> will be JSON-dumped
+        key: coalescing key (default: the message's type and junction_id)
+
+        A dict message is routed by its junction_id, component and
+        log_level (or level) keys. The message is serialised once and handed
+        to the backend. Returns the number of clients it was queued for (in
+        memory) or of processes it was published to (Redis); delivery
+        happens in each client's writer task.
         """
-        if isinstance(message, (dict, list)):
-            payload = json.dumps(message)
-        else:
-            payload = str(message)
+        self.broadcasts += 1
+        return await self.backend.publish(self._serialise(message), self._route(message, key))
 
-        to_remove = []
-        for ws in list(self.active):
+    def deliver_local(self, message, key: Optional[Hashable] = None) -> int:
+        """
+        Queue a message for this process's matching clients only, without
+        the backend or the replay buffer - for state every process derives
+        itself (live timing frames). Only an explicit `key` coalesces.
+        Returns the number of clients.
+        """
+        junction_id, component, level, _ = self._route(message, key)
+        return self._fan_out(self._serialise(message), (junction_id, component, level, key))
+
+    def send_routed(self, ws: Connection, message) -> bool:
+        """Queue a message for one client if its subscription would accept it"""
+        client = self.clients.get(ws)
+        if client is None:
+            return False
+        junction_id, component, level, _ = self._route(message, None)
+        if junction_id is not None and client.junctions is not None and (
+            junction_id not in client.junctions
+        ):
+            return False
+        if not client.accepts(component, level):
+            return False
+        self._enqueue(client, None, self._serialise(message), self._clock())
+        return True
+
+    def _route(self, message, key: Optional[Hashable]) -> Route:
+        if key is None:
+            key = self._default_key(message)
+        junction_id = component = level = None
+        if isinstance(message, dict):
+            junction_id = message.get("junction_id")
+            component = message.get("component")
+            level = message.get("log_level") or message.get("level")
+            level = level.upper() if isinstance(level, str) else level
+        return junction_id, component, level, key
+
+    def _deliver(self, payload: str, route: Route) -> int:
+        """Queue a serialised broadcast for this process's matching clients"""
+        junction_id, component, level, _ = route
+        payload = self.replay.record(payload, junction_id, component, level)
+        for listener in self._listeners:
             try:
-                await ws.send_text(payload)
-            except Exception:
-                to_remove.append(ws)
+                listener(payload, route)
+            except Exception as e:
+                logger.error(f"❌ Broadcast listener failed: {e}")
+        return self._fan_out(payload, route)
+
+    def _fan_out(self, payload: str, route: Route) -> int:
+        junction_id, component, level, key = route
+        now = self._clock()
+        queued = 0
+        for client in self._recipients(junction_id):
+            if client.accepts(component, level):
+                self._enqueue(client, key, payload, now)
+                queued += 1
+        return queued
+
+    async def send(self, ws: Connection, message) -> None:
+        """Queue a message for one client, in order with its broadcasts"""
+        client = self.clients.get(ws)
+        if client is not None:
+            self._enqueue(client, None, self._serialise(message), self._clock())
+
+    def client_stats(self) -> List[Dict[str, Any]]:
+        now = self._clock()
+        return [client.stats(now) for client in self.clients.values()]
+
+    def stats(self, slowest: int = 5) -> Dict[str, Any]:
+        """Totals plus the clients furthest behind"""
+        clients = self.client_stats()
+        return {
+            "clients": len(clients),
+            "policy": self.policy,
+            "max_queue": self.max_queue,
+            "broadcasts": self.broadcasts,
+            "queued": sum(c["queued"] for c in clients),
+            "sent": sum(c["sent"] for c in clients),
+            "dropped": sum(c["dropped"] for c in clients),
+            "coalesced": sum(c["coalesced"] for c in clients),
+            "slow_disconnects": self.slow_disconnects,
+            "junction_topics": sum(1 for topic in self._topics if topic != ALL_JUNCTIONS),
+            "max_lag_ms": max((c["lag_ms"] for c in clients), default=0.0),
+            "slowest_clients": sorted(clients, key=lambda c: c["lag_ms"], reverse=True)[:slowest],
+            "broadcast_backend": self.backend.stats(),
+            "replay": self.replay.stats(),
+        }
 
-        for r in to_remove:
-            self.disconnect(r)
+    async def close_all(self) -> None:
+        """Stop every writer task and the broadcast backend (shutdown)"""
+        tasks = [client.task for client in self.clients.values()] + list(self._closing)
+        self.clients.clear()
+        self._topics.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.backend.stop()
 
 # single manager instance imported by main and mqtt handler
 manager = WSManager()